@@ -12,14 +12,12 @@ import traceback
 from contextlib import contextmanager
 from logging.handlers import BufferingHandler
 from typing import Any
-from typing import Dict
 from typing import Generator
 from typing import Iterable
 from typing import List
 from typing import Mapping
 from typing import Optional
 from typing import TypeVar
-from typing import Union
 
 from django.conf import settings
 from django.utils import timezone
@@ -28,7 +26,55 @@ from main.models import Task
 logger = logging.getLogger("archivematica.mcp.client.job")
 
 SelfJob = TypeVar("SelfJob", bound="Job")
-TaskData = Dict[str, Union[int, Optional[datetime.datetime], str]]
+
+# Limits of a single UPDATE statement when writing back the results of a batch
+# of jobs. The size limit keeps statements carrying large outputs well under
+# the default MySQL ``max_allowed_packet``.
+TASK_UPDATE_BATCH_SIZE = 128
+TASK_UPDATE_BATCH_MAX_BYTES = 16 * 1024 * 1024
+
+TRUNCATION_NOTICE = "\n[... {} bytes truncated ...]\n"
+
+
+def truncate_output(output: str, max_size: int) -> str:
+    """Limit ``output`` to ``max_size`` UTF-8 bytes plus a truncation notice.
+
+    The beginning and the end of the output are kept, since they usually
+    describe what the script was doing and how it failed. A ``max_size`` of
+    zero or less disables truncation.
+    """
+    if max_size <= 0 or len(output) * 4 <= max_size:
+        return output
+    encoded = output.encode("utf-8")
+    if len(encoded) <= max_size:
+        return output
+    head_size = max_size // 2
+    tail_size = max_size - head_size
+    # Cutting in the middle of a multibyte character drops that character.
+    head = encoded[:head_size].decode("utf-8", errors="ignore")
+    tail = encoded[-tail_size:].decode("utf-8", errors="ignore")
+    truncated = len(encoded) - len(head.encode("utf-8")) - len(tail.encode("utf-8"))
+    return head + TRUNCATION_NOTICE.format(truncated) + tail
+
+
+def _batch_tasks(
+    tasks: List[Task], sizes: List[int]
+) -> Generator[List[Task], None, None]:
+    """Group tasks so every batch respects the UPDATE statement limits."""
+    batch: List[Task] = []
+    batch_bytes = 0
+    for task, size in zip(tasks, sizes):
+        if batch and (
+            len(batch) >= TASK_UPDATE_BATCH_SIZE
+            or batch_bytes + size > TASK_UPDATE_BATCH_MAX_BYTES
+        ):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(task)
+        batch_bytes += size
+    if batch:
+        yield batch
 
 
 class Job:
@@ -78,6 +124,51 @@ class Job:
         for job in jobs:
             job.set_status(1, status_code=message)
 
+    @classmethod
+    def bulk_update_task_status(cls, jobs: List[SelfJob]) -> List[int]:
+        """Update the Task models after a batch of jobs has been completed.
+
+        The results are written with as few UPDATE statements as the limits
+        allow and the number of rows written by each statement is returned.
+        """
+        end_time = timezone.now()
+        fields = ["exitcode", "endtime"]
+        if settings.CAPTURE_CLIENT_SCRIPT_OUTPUT:
+            fields += ["stdout", "stderror"]
+
+        tasks = []
+        sizes = []
+        for job in jobs:
+            # Not all jobs set an exit code. They expect a default of 0,
+            # so keep compatibility with that
+            if job.int_code is None:
+                job.set_status(0)
+            job.end_time = end_time
+
+            task = Task(
+                taskuuid=job.uuid, exitcode=job.get_exit_code(), endtime=end_time
+            )
+            size = 0
+            if settings.CAPTURE_CLIENT_SCRIPT_OUTPUT:
+                task.stdout = truncate_output(
+                    job.get_stdout(), settings.CLIENT_SCRIPT_OUTPUT_MAX_SIZE
+                )
+                task.stderror = truncate_output(
+                    job.get_stderr(), settings.CLIENT_SCRIPT_OUTPUT_MAX_SIZE
+                )
+                size = len(task.stdout.encode("utf-8")) + len(
+                    task.stderror.encode("utf-8")
+                )
+            tasks.append(task)
+            sizes.append(size)
+
+        rows_per_statement = []
+        for batch in _batch_tasks(tasks, sizes):
+            Task.objects.bulk_update(batch, fields)
+            rows_per_statement.append(len(batch))
+
+        return rows_per_statement
+
     def log_results(self) -> None:
         logger.info(
             (
@@ -100,24 +191,7 @@ class Job:
 
     def update_task_status(self) -> None:
         """Updates the Task model after a job has been completed."""
-        # Not all jobs set an exit code. They expect a default of 0,
-        # so keep compatibility with that
-        if self.int_code is None:
-            self.set_status(0)
-        self.end_time = timezone.now()
-
-        kwargs: TaskData = {
-            "exitcode": self.get_exit_code(),
-            "endtime": self.end_time,
-        }
-        if settings.CAPTURE_CLIENT_SCRIPT_OUTPUT:
-            kwargs.update(
-                {
-                    "stdout": self.get_stdout(),
-                    "stderror": self.get_stderr(),
-                }
-            )
-        Task.objects.filter(taskuuid=self.uuid).update(**kwargs)
+        self.bulk_update_task_status([self])
 
     def set_status(self, int_code: int, status_code: str = "success") -> None:
         if int_code:
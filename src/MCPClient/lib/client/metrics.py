@@ -7,6 +7,7 @@ import datetime
 import functools
 import threading
 from typing import Callable
+from typing import List
 from typing import Optional
 from typing import Tuple
 from typing import TypeVar
@@ -128,6 +129,12 @@ sip_error_timestamp = Gauge(
     multiprocess_mode="livesum",
 )
 
+task_results_rows_histogram = Histogram(
+    "mcpclient_task_results_rows_per_statement",
+    "Histogram of number of task results written back per UPDATE statement",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, float("inf")),
+)
+
 aips_stored_counter = Counter("mcpclient_aips_stored_total", "Number of AIPs stored")
 dips_stored_counter = Counter("mcpclient_dips_stored_total", "Number of DIPs stored")
 aips_stored_timestamp = Gauge(
@@ -282,6 +289,12 @@ def job_failed(script_name: str) -> None:
     job_error_timestamp.labels(script_name=script_name).set_to_current_time()
 
 
+@skip_if_prometheus_disabled
+def task_results_written(rows_per_statement: List[int]) -> None:
+    for rows in rows_per_statement:
+        task_results_rows_histogram.observe(rows)
+
+
 def _get_file_group(raw_file_group_use: str) -> str:
     """Convert one of the file group use values we know about into
     the smaller subset that we track:
@@ -27,8 +27,9 @@ def run_task(task_name: str, job_module: ModuleType, jobs: List[Job]) -> None:
     else:
         for job in jobs:
             job.log_results()
-            job.update_task_status()
+        metrics.task_results_written(Job.bulk_update_task_status(jobs))
 
+        for job in jobs:
             exit_code = job.get_exit_code()
             if exit_code == 0:
                 metrics.job_completed(task_name)
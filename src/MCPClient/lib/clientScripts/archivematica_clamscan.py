@@ -32,7 +32,7 @@ from clamd import ClamdNetworkSocket
 from clamd import ClamdUnixSocket
 from clamd import ConnectionError
 from custom_handlers import get_script_logger
-from databaseFunctions import insertIntoEvents
+from databaseFunctions import EventBatch
 from django.conf import settings as mcpclient_settings
 from django.core.exceptions import ValidationError
 from django.db import transaction
@@ -368,6 +368,6 @@ def call(jobs):
         with job.JobContext(logger=logger):
             job.set_status(scan_file(event_queue, *job.args[1:]))
 
-    with transaction.atomic():
+    with transaction.atomic(), EventBatch() as events:
         for e in event_queue:
-            insertIntoEvents(**e)
+            events.add(**e)
@@ -29,21 +29,19 @@ path to the SIP directory, and the subdirectory being targeted if any.
 """
 
 import argparse
+import collections
 import os
 import uuid
 
 import django
-from django.db import transaction
 
 django.setup()
 
 import metsrw
 import namespaces as ns
-from archivematicaFunctions import chunk_iterable
 from archivematicaFunctions import find_mets_file
 from custom_handlers import get_script_logger
-from fileOperations import addFileToSIP
-from fileOperations import addFileToTransfer
+from fileOperations import FileRegistry
 from main.models import File
 from main.models import Transfer
 
@@ -52,10 +50,41 @@ logger = get_script_logger("archivematica.mcp.client.assignFileUUID")
 TRANSFER = "Transfer"
 SIP = "SIP"
 
+# Number of files registered in each transaction.
+REGISTRATION_BATCH_SIZE = 1000
 
-def get_file_info_from_mets(job, mets, file_path_relative_to_sip):
+MetsFileInfo = collections.namedtuple(
+    "MetsFileInfo", ["file_uuid", "use", "original_name"]
+)
+
+
+def get_mets_file_index(mets):
+    """Index the files of a reingested METS document by path.
+
+    The index is built with a single pass over the document and maps the
+    paths (relative to the SIP) to ``MetsFileInfo`` tuples.
     """
-    Look up information about the file in the METS document using metsrw.
+    index = {}
+    for entry in mets.all_files():
+        if entry.path is None or entry.path in index:
+            continue
+        original_name = None
+        techmd = None
+        if entry.amdsecs:
+            for item in entry.amdsecs[0].subsections:
+                if item.subsection == "techMD":
+                    techmd = item
+        if techmd is not None:
+            pobject = techmd.contents.document  # Element
+            original_name = ns.xml_findtext_premis(pobject, "premis:originalName")
+        index[entry.path] = MetsFileInfo(entry.file_uuid, entry.use, original_name)
+    return index
+
+
+def get_file_info_from_mets(job, mets_index, file_path_relative_to_sip):
+    """
+    Look up information about the file in the index of the METS document
+    returned by ``get_mets_file_index``.
 
     :return: Dict with info. Keys: 'uuid', 'filegrpuse'
     """
@@ -65,32 +94,26 @@ def get_file_info_from_mets(job, mets, file_path_relative_to_sip):
         "%transferDirectory%", "", 1
     ).replace("%SIPDirectory%", "", 1)
 
-    # Warning! This is not the fastest way to achieve this. But we will focus
-    # on optimizations later.
     # TODO: is it ok to assume that the file structure is flat?
     # TODO will this work with original vs normalized paths?
-    entry = mets.get_file(path=file_path_relative_to_sip)
+    entry = mets_index.get(file_path_relative_to_sip)
     if not entry:
         job.print_error(
             f"FSEntry for file {file_path_relative_to_sip} not found in METS"
         )
         return {}
-    job.print_output(f"File {entry.path} with UUID {entry.file_uuid} found in METS.")
-
-    # Get original path
-    amdsec = entry.amdsecs[0]
-    for item in amdsec.subsections:
-        if item.subsection == "techMD":
-            techmd = item
-    pobject = techmd.contents.document  # Element
-    original_path = ns.xml_findtext_premis(pobject, "premis:originalName")
+    job.print_output(
+        f"File {file_path_relative_to_sip} with UUID {entry.file_uuid} found in METS."
+    )
 
-    return {
+    info = {
         "uuid": entry.file_uuid,
         "filegrpuse": entry.use,
         "current_path": current_path,
-        "original_path": original_path,
     }
+    if entry.original_name is not None:
+        info["original_path"] = entry.original_name
+    return info
 
 
 def get_transfer_file_queryset(transfer_uuid):
@@ -104,6 +127,9 @@ def assign_transfer_file_uuid(
     file_path,
     target_dir,
     mets,
+    registry,
+    transfer,
+    mets_index=None,
     date="",
     event_uuid=None,
     sip_directory="",
@@ -113,23 +139,19 @@ def assign_transfer_file_uuid(
     update_use=True,
     filter_subdir=None,
 ):
-    """Walk transaction directory and write files to database.
+    """Register a transfer file in the ``registry``.
 
     If files are in a re-ingested Archivematica AIP, parse the METS
     file and reuse existing information. Otherwise, create a new UUID.
-
-    We open a database transaction for each chunk of 10 files, in an
-    attempt to balance performance with reasonable transaction lengths.
     """
     file_path_relative_to_sip = file_path.replace(
         sip_directory, "%transferDirectory%", 1
     )
-    transfer = Transfer.objects.get(uuid=transfer_uuid)
     event_type = "ingestion"
     file_uuid = None
 
     if transfer.type == Transfer.ARCHIVEMATICA_AIP and mets:
-        info = get_file_info_from_mets(job, mets, file_path_relative_to_sip)
+        info = get_file_info_from_mets(job, mets_index, file_path_relative_to_sip)
         event_type = "reingestion"
         file_uuid = info.get("uuid")
         use = info.get("filegrpuse", use)
@@ -139,23 +161,33 @@ def assign_transfer_file_uuid(
         file_uuid = str(uuid.uuid4())
         job.print_output(f"Generated UUID for file {file_uuid}")
 
-    addFileToTransfer(
+    # For reingest, the original location was parsed from the METS.
+    # The current location reflects what's on disk.
+    current_location = None
+    if transfer.type == Transfer.ARCHIVEMATICA_AIP and mets:
+        job.print_output("Updating current location for", file_uuid, "with", info)
+        current_location = info["current_path"]
+
+    registry.add(
         file_path_relative_to_sip,
-        file_uuid,
-        transfer_uuid,
-        event_uuid,
-        date,
+        file_uuid=file_uuid,
+        date=date,
         use=use,
-        sourceType=event_type,
+        source_type=event_type,
+        current_location=current_location,
     )
 
-    # For reingest, the original location was parsed from the METS.
-    # Update the current location to reflect what's on disk.
-    if transfer.type == Transfer.ARCHIVEMATICA_AIP and mets:
-        job.print_output("Updating current location for", file_uuid, "with", info)
-        File.objects.filter(uuid=file_uuid).update(
-            currentlocation=info["current_path"].encode()
-        )
+
+def get_sip_file_locations(sip_uuid):
+    """Return the UUIDs of the files of the SIP indexed by current location."""
+    locations = {}
+    for location, file_uuid in (
+        File.objects.filter(sip=sip_uuid)
+        .order_by("pk")
+        .values_list("currentlocation", "uuid")
+    ):
+        locations.setdefault(bytes(location or b""), file_uuid)
+    return locations
 
 
 def assign_sip_file_uuid(
@@ -163,7 +195,10 @@ def assign_sip_file_uuid(
     filename,
     file_path,
     target_dir,
+    registry,
+    sip_file_locations,
     mets=None,
+    mets_index=None,
     date="",
     event_uuid=None,
     sip_directory="",
@@ -173,28 +208,26 @@ def assign_sip_file_uuid(
     update_use=True,
     filter_subdir=None,
 ):
-    """Write SIP file to database with new UUID."""
+    """Register a SIP file with new UUID in the ``registry``.
+
+    ``sip_file_locations`` are the files already registered, as returned by
+    ``get_sip_file_locations``.
+    """
     file_uuid = str(uuid.uuid4())
     file_path_relative_to_sip = file_path.replace(sip_directory, "%SIPDirectory%", 1)
 
-    matching_file = File.objects.filter(
-        currentlocation=file_path_relative_to_sip.encode(),
-        sip=sip_uuid,
-    ).first()
-    if matching_file:
-        job.print_error(f"File already has UUID: {matching_file.uuid}")
+    matching_file_uuid = sip_file_locations.get(file_path_relative_to_sip.encode())
+    if matching_file_uuid:
+        job.print_error(f"File already has UUID: {matching_file_uuid}")
         if update_use:
-            matching_file.filegrpuse = use
-            matching_file.save()
+            File.objects.filter(uuid=matching_file_uuid).update(filegrpuse=use)
         return
 
     job.print_output(f"Generated UUID for file {file_uuid}.")
-    addFileToSIP(
+    registry.add(
         file_path_relative_to_sip,
-        file_uuid,
-        sip_uuid,
-        event_uuid,
-        date,
+        file_uuid=file_uuid,
+        date=date,
         use=use,
     )
 
@@ -202,23 +235,33 @@ def assign_sip_file_uuid(
 def assign_uuids_to_files_in_dir(**kwargs):
     """Walk target directory and write files to database with new UUID.
 
-    We open a database transaction for each chunk of 10 files, in an
-    attempt to balance performance with reasonable transaction lengths.
+    Files are registered in bulk, in transactions of
+    ``REGISTRATION_BATCH_SIZE`` files.
     """
     target_dir = kwargs["target_dir"]
     transfer_uuid = kwargs["transfer_uuid"]
-    for root, _, filenames in os.walk(target_dir):
-        for file_chunk in chunk_iterable(filenames):
-            with transaction.atomic():
-                for filename in file_chunk:
-                    if not filename:
-                        continue
-                    kwargs["filename"] = filename
-                    kwargs["file_path"] = os.path.join(root, filename)
-                    if transfer_uuid:
-                        assign_transfer_file_uuid(**kwargs)
-                    else:
-                        assign_sip_file_uuid(**kwargs)
+    with FileRegistry(
+        transfer_uuid=transfer_uuid,
+        sip_uuid=kwargs["sip_uuid"],
+        batch_size=REGISTRATION_BATCH_SIZE,
+    ) as registry:
+        kwargs["registry"] = registry
+        if transfer_uuid:
+            kwargs["transfer"] = Transfer.objects.get(uuid=transfer_uuid)
+            if kwargs["transfer"].type == Transfer.ARCHIVEMATICA_AIP and kwargs["mets"]:
+                kwargs["mets_index"] = get_mets_file_index(kwargs["mets"])
+        else:
+            kwargs["sip_file_locations"] = get_sip_file_locations(kwargs["sip_uuid"])
+        for root, _, filenames in os.walk(target_dir):
+            for filename in filenames:
+                if not filename:
+                    continue
+                kwargs["filename"] = filename
+                kwargs["file_path"] = os.path.join(root, filename)
+                if transfer_uuid:
+                    assign_transfer_file_uuid(**kwargs)
+                else:
+                    assign_sip_file_uuid(**kwargs)
     return 0
 
 
@@ -7,23 +7,27 @@
 # If a tool has no defined characterization commands, then the default
 # will be run instead.
 import argparse
+import concurrent.futures
 import dataclasses
 import multiprocessing
 import uuid
+from typing import Dict
 from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
 
 import django
 
 django.setup()
 
 from client.job import Job
-from databaseFunctions import insertIntoFPCommandOutput
 from dicts import ReplacementDict
-from dicts import replace_string_values
 from django.conf import settings as mcpclient_settings
 from django.core.exceptions import ValidationError
 from django.db import transaction
 from executeOrRunSubProcess import executeOrRun
+from fpr import cache as fpr_cache
 from fpr.models import FormatVersion
 from fpr.models import FPRule
 from lib import setup_dicts
@@ -37,53 +41,114 @@ class CharacterizeFileArgs:
     sip_uuid: uuid.UUID
 
 
+@dataclasses.dataclass
+class Invocation:
+    """A characterization command ready to run for a file."""
+
+    rule: FPRule
+    command: str
+    arguments: List[str]
+
+
 def concurrent_instances() -> int:
     return multiprocessing.cpu_count()
 
 
-def main(job: Job, file_uuid: uuid.UUID, sip_uuid: uuid.UUID) -> int:
-    setup_dicts(mcpclient_settings)
+def get_characterized_files(file_uuids: List[uuid.UUID]) -> Set[str]:
+    """Return the UUIDs of the files that have been characterized already."""
+    return {
+        str(file_uuid)
+        for file_uuid in FPCommandOutput.objects.filter(
+            file_id__in=file_uuids
+        ).values_list("file_id", flat=True)
+    }
 
-    failed = False
 
-    # Check to see whether the file has already been characterized; don't try
-    # to characterize it a second time if so.
-    if FPCommandOutput.objects.filter(file_id=file_uuid).exists():
-        return 0
-
-    try:
-        format = FormatVersion.active.get(fileformatversion__file_uuid=file_uuid)
-    except (FormatVersion.DoesNotExist, ValidationError):
-        rules = format = None
+def get_rules(
+    file_uuid: uuid.UUID, format_versions: Dict[str, Tuple[FormatVersion, ...]]
+) -> Tuple[FPRule, ...]:
+    """Return the characterization rules of a file.
 
-    if format:
-        rules = FPRule.active.filter(format=format.uuid, purpose="characterization")
+    ``format_versions`` are the format versions of the files of the batch as
+    returned by ``RuleCache.get_format_versions_for_files``.
+    """
+    rules: Tuple[FPRule, ...] = ()
+    file_format_versions = format_versions.get(str(file_uuid), ())
+    if len(file_format_versions) > 1:
+        raise FormatVersion.MultipleObjectsReturned(
+            f"{len(file_format_versions)} FormatVersion objects matching file_uuid={file_uuid} found"
+        )
+    if file_format_versions:
+        rules = fpr_cache.rules.filter_fprules(
+            file_format_versions[0], "characterization"
+        )
 
     # Characterization always occurs - if nothing is specified, get one or more
     # defaults specified in the FPR.
     if not rules:
-        rules = FPRule.active.filter(purpose="default_characterization")
+        rules = fpr_cache.rules.filter_fprules_by_purpose("default_characterization")
 
-    for rule in rules:
+    return rules
+
+
+def plan(
+    file_uuid: uuid.UUID,
+    sip_uuid: uuid.UUID,
+    format_versions: Dict[str, Tuple[FormatVersion, ...]],
+) -> List[Invocation]:
+    """Return the characterization commands to run for a file.
+
+    Replacement values are read from the database, so commands are planned
+    before running them in the pool.
+    """
+    invocations = []
+    rd = None
+    for rule in get_rules(file_uuid, format_versions):
+        if rd is None:
+            rd = ReplacementDict.frommodel(file_=file_uuid, sip=sip_uuid, type_="file")
         if (
             rule.command.script_type == "bashScript"
             or rule.command.script_type == "command"
         ):
             args = []
-            command_to_execute = replace_string_values(
-                rule.command.command, file_=file_uuid, sip=sip_uuid, type_="file"
-            )
+            command_to_execute = rd.replace(rule.command.command)[0]
         else:
-            rd = ReplacementDict.frommodel(file_=file_uuid, sip=sip_uuid, type_="file")
             args = rd.to_gnu_options()
             command_to_execute = rule.command.command
+        invocations.append(Invocation(rule, command_to_execute, args))
+
+    return invocations
+
+
+def run(invocation: Invocation) -> Tuple[int, str, str]:
+    exitstatus: int
+    stdout: str
+    stderr: str
+    exitstatus, stdout, stderr = executeOrRun(
+        invocation.rule.command.script_type,
+        invocation.command,
+        arguments=invocation.arguments,
+        capture_output=True,
+    )
+    return exitstatus, stdout, stderr
 
-        exitstatus, stdout, stderr = executeOrRun(
-            rule.command.script_type,
-            command_to_execute,
-            arguments=args,
-            capture_output=True,
-        )
+
+def record(
+    job: Job,
+    file_uuid: uuid.UUID,
+    invocations: List[Invocation],
+    results: List[Tuple[int, str, str]],
+    outputs: List[FPCommandOutput],
+) -> int:
+    """Report the results of the commands run for a file.
+
+    Valid XML output is added to ``outputs`` to be saved with the rest of the
+    batch. Returns the exit code of the job.
+    """
+    failed = False
+
+    for invocation, (exitstatus, stdout, stderr) in zip(invocations, results):
+        rule = invocation.rule
 
         job.write_output(stdout)
         job.write_error(stderr)
@@ -105,7 +170,11 @@ def main(job: Job, file_uuid: uuid.UUID, sip_uuid: uuid.UUID) -> int:
         ):
             try:
                 etree.fromstring(stdout.encode("utf8"))
-                insertIntoFPCommandOutput(file_uuid, stdout, rule.uuid)
+                outputs.append(
+                    FPCommandOutput(
+                        file_id=file_uuid, content=stdout, rule_id=rule.uuid
+                    )
+                )
                 job.write_output(
                     f'Saved XML output for command "{rule.command.description}" ({rule.command.uuid})'
                 )
@@ -125,6 +194,55 @@ def main(job: Job, file_uuid: uuid.UUID, sip_uuid: uuid.UUID) -> int:
         return 0
 
 
+def characterize(
+    jobs: List[Tuple[Job, CharacterizeFileArgs]], max_workers: Optional[int] = None
+) -> None:
+    """Characterize the files of a batch of jobs.
+
+    Whether the files have been characterized already and their format
+    versions are looked up for the whole batch, then the commands of every
+    file are run in a pool of ``max_workers`` threads (each one waiting for a
+    subprocess) and the XML output of the batch is saved at once.
+    """
+    setup_dicts(mcpclient_settings)
+    if max_workers is None:
+        max_workers = mcpclient_settings.CHARACTERIZATION_TOOL_WORKERS
+
+    file_uuids = [args.file_uuid for _, args in jobs]
+    characterized = get_characterized_files(file_uuids)
+    try:
+        format_versions = fpr_cache.rules.get_format_versions_for_files(file_uuids)
+    except ValidationError:
+        format_versions = {}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+        pending = []
+        for job, args in jobs:
+            # Check to see whether the file has already been characterized;
+            # don't try to characterize it a second time if so.
+            if str(args.file_uuid) in characterized:
+                job.set_status(0)
+                continue
+            with job.JobContext():
+                invocations = plan(args.file_uuid, args.sip_uuid, format_versions)
+                futures = [pool.submit(run, inv) for inv in invocations]
+                pending.append((job, args, invocations, futures))
+
+        outputs: List[FPCommandOutput] = []
+        statuses = []
+        for job, args, invocations, futures in pending:
+            with job.JobContext():
+                results = [future.result() for future in futures]
+                statuses.append(
+                    (job, record(job, args.file_uuid, invocations, results, outputs))
+                )
+
+    FPCommandOutput.objects.bulk_create(outputs)
+
+    for job, status in statuses:
+        job.set_status(status)
+
+
 def get_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Characterize file.")
     parser.add_argument("file_uuid", type=uuid.UUID)
@@ -141,9 +259,12 @@ def parse_args(parser: argparse.ArgumentParser, job: Job) -> CharacterizeFileArg
 
 def call(jobs: List[Job]) -> None:
     parser = get_parser()
+    fpr_cache.rules.refresh()
+
+    batch = []
+    for job in jobs:
+        with job.JobContext():
+            batch.append((job, parse_args(parser, job)))
 
     with transaction.atomic():
-        for job in jobs:
-            with job.JobContext():
-                args = parse_args(parser, job)
-                job.set_status(main(job, args.file_uuid, args.sip_uuid))
+        characterize(batch)
@@ -18,6 +18,7 @@
 # along with Archivematica.    If not, see <http://www.gnu.org/licenses/>.
 import collections
 import copy
+import itertools
 import os
 import pprint
 import re
@@ -69,6 +70,10 @@ from main.models import SIPArrange
 
 SIP_DIR_VAR = r"%SIPDirectory%"
 
+# Number of files whose PREMIS data is fetched with a single query.
+PREFETCH_CHUNK_SIZE = 1000
+CHARACTERIZATION_PURPOSES = ("characterization", "default_characterization")
+
 
 class ErrorAccumulator:
     def __init__(self):
@@ -114,6 +119,164 @@ class MetsState:
 
         self.CSV_METADATA = {}
         self.error_accumulator = ErrorAccumulator()
+        self.sip_file_data = None
+
+    def get_file_data(self, file_uuid):
+        """Return the ``SIPFileData`` holding the rows of a file, if loaded."""
+        if self.sip_file_data is not None and self.sip_file_data.is_loaded(file_uuid):
+            return self.sip_file_data
+        return None
+
+
+class SIPFileData:
+    """Rows used to describe the files of a SIP, fetched in bulk.
+
+    Generating the amdSec of a file takes several queries per file. Instead,
+    ``createFileSec`` loads the rows of the files of each directory with a few
+    queries per chunk of files and unloads them once the directory has been
+    processed. The rows are ordered by primary key like the per-file queries
+    return them, so the generated METS doesn't change.
+    """
+
+    def __init__(self, sip_uuid):
+        self.sip_uuid = sip_uuid
+        self.uuids_by_location = collections.defaultdict(list)
+        try:
+            for location, file_uuid in File.objects.filter(
+                removedtime__isnull=True, sip_id=sip_uuid
+            ).values_list("currentlocation", "uuid"):
+                self.uuids_by_location[bytes(location)].append(str(file_uuid))
+        except ValidationError:
+            pass
+
+        self.files = {}
+        self.file_ids = {}
+        self.characterization_outputs = {}
+        self.derivations_as_source = {}
+        self.derivations_as_derived = {}
+        self.events = {}
+        self.event_agent_ids = {}
+        self.agents = {}
+
+    def get_file(self, location):
+        """Return the ``File`` at ``location`` like ``File.objects.get``."""
+        file_uuids = self.uuids_by_location.get(location, [])
+        if len(file_uuids) != 1 or file_uuids[0] not in self.files:
+            return File.objects.get(
+                removedtime__isnull=True, sip_id=self.sip_uuid, currentlocation=location
+            )
+        return self.files[file_uuids[0]]
+
+    def is_loaded(self, file_uuid):
+        return str(file_uuid) in self.files
+
+    def load(self, locations):
+        """Fetch the rows of the files found at ``locations``.
+
+        Return the UUIDs of the loaded files so they can be unloaded later.
+        """
+        file_uuids = [
+            self.uuids_by_location[location][0]
+            for location in locations
+            if len(self.uuids_by_location.get(location, [])) == 1
+        ]
+        for start in range(0, len(file_uuids), PREFETCH_CHUNK_SIZE):
+            self._load_chunk(file_uuids[start : start + PREFETCH_CHUNK_SIZE])
+        return file_uuids
+
+    def _load_chunk(self, file_uuids):
+        for file_uuid in file_uuids:
+            self.file_ids[file_uuid] = []
+            self.characterization_outputs[file_uuid] = []
+            self.derivations_as_source[file_uuid] = []
+            self.derivations_as_derived[file_uuid] = []
+            self.events[file_uuid] = []
+
+        for f in (
+            File.objects.filter(uuid__in=file_uuids)
+            .select_related("transfer")
+            .prefetch_related("identifiers")
+        ):
+            self.files[str(f.uuid)] = f
+
+        for file_uuid, *row in (
+            FileID.objects.filter(file_id__in=file_uuids)
+            .order_by("pk")
+            .values_list(
+                "file_id",
+                "format_name",
+                "format_version",
+                "format_registry_name",
+                "format_registry_key",
+            )
+        ):
+            self.file_ids[str(file_uuid)].append(tuple(row))
+
+        for file_uuid, content in (
+            FPCommandOutput.objects.filter(
+                file_id__in=file_uuids, rule__purpose__in=CHARACTERIZATION_PURPOSES
+            )
+            .order_by("pk")
+            .values_list("file_id", "content")
+        ):
+            self.characterization_outputs[str(file_uuid)].append(content)
+
+        derivations = Derivation.objects.filter(event__isnull=False).order_by("pk")
+        for source_file_uuid, derived_file_uuid, event_uuid in derivations.filter(
+            source_file_id__in=file_uuids
+        ).values_list("source_file_id", "derived_file_id", "event_id"):
+            self.derivations_as_source[str(source_file_uuid)].append(
+                (derived_file_uuid, event_uuid)
+            )
+        for source_file_uuid, derived_file_uuid, event_uuid in derivations.filter(
+            derived_file_id__in=file_uuids
+        ).values_list("source_file_id", "derived_file_id", "event_id"):
+            self.derivations_as_derived[str(derived_file_uuid)].append(
+                (source_file_uuid, event_uuid)
+            )
+
+        event_pks = []
+        for event in Event.objects.filter(file_uuid_id__in=file_uuids).order_by("pk"):
+            self.events[str(event.file_uuid_id)].append(event)
+            self.event_agent_ids[event.pk] = []
+            event_pks.append(event.pk)
+        for event_pk, agent_pk in (
+            Event.agents.through.objects.filter(event_id__in=event_pks)
+            .order_by("event_id", "agent_id")
+            .values_list("event_id", "agent_id")
+        ):
+            self.event_agent_ids[event_pk].append(agent_pk)
+
+        # Agents are few and shared by most events, so they are kept until the
+        # whole SIP has been processed.
+        missing_agent_pks = {
+            agent_pk
+            for event_pk in event_pks
+            for agent_pk in self.event_agent_ids[event_pk]
+        } - set(self.agents)
+        self.agents.update(Agent.objects.in_bulk(list(missing_agent_pks)))
+
+    def unload(self, file_uuids):
+        for file_uuid in file_uuids:
+            self.files.pop(file_uuid, None)
+            self.file_ids.pop(file_uuid, None)
+            self.characterization_outputs.pop(file_uuid, None)
+            self.derivations_as_source.pop(file_uuid, None)
+            self.derivations_as_derived.pop(file_uuid, None)
+            for event in self.events.pop(file_uuid, []):
+                self.event_agent_ids.pop(event.pk, None)
+
+    def get_event_agents(self, event):
+        return [self.agents[agent_pk] for agent_pk in self.event_agent_ids[event.pk]]
+
+    def get_file_agents(self, file_uuid):
+        """Agents of the events of a file, without duplicates, by primary key."""
+        agent_pks = set(
+            itertools.chain.from_iterable(
+                self.event_agent_ids[event.pk] for event in self.events[str(file_uuid)]
+            )
+        )
+        return [self.agents[agent_pk] for agent_pk in sorted(agent_pks)]
 
 
 logger = get_script_logger("archivematica.mcp.client.createMETS2")
@@ -504,21 +667,25 @@ def createTechMD(fileUUID, state):
     mdWrap.set("MDTYPE", "PREMIS:OBJECT")
     xmlData = etree.SubElement(mdWrap, ns.metsBNS + "xmlData")
 
-    premis_object = create_premis_object(fileUUID)
+    premis_object = create_premis_object(fileUUID, state.get_file_data(fileUUID))
     xmlData.append(premis_object)
     return ret
 
 
-def create_premis_object(fileUUID):
+def create_premis_object(fileUUID, file_data=None):
     """
     Create a PREMIS:OBJECT for fileUUID.
 
     Access the models for File, FileID, FPCommandOutput, Derivation
 
     :param str fileUUID: UUID of the File to create an object for
+    :param SIPFileData file_data: Prefetched rows of the file, if available
     :return: premis:object Element, suitable for inserting into mets:xmlData
     """
-    f = File.objects.get(uuid=str(fileUUID))
+    if file_data is None:
+        f = File.objects.get(uuid=str(fileUUID))
+    else:
+        f = file_data.files[str(fileUUID)]
     # PREMIS:OBJECT
     object_elem = etree.Element(ns.premisBNS + "object", nsmap={"premis": ns.premisNS})
     object_elem.set(ns.xsiBNS + "type", "premis:file")
@@ -548,7 +715,7 @@ def create_premis_object(fileUUID):
 
     etree.SubElement(objectCharacteristics, ns.premisBNS + "size").text = str(f.size)
 
-    for elem in create_premis_object_formats(fileUUID):
+    for elem in create_premis_object_formats(fileUUID, file_data):
         objectCharacteristics.append(elem)
 
     creatingApplication = etree.Element(ns.premisBNS + "creatingApplication")
@@ -557,32 +724,39 @@ def create_premis_object(fileUUID):
     ).text = f.modificationtime.strftime("%Y-%m-%dT%H:%M:%SZ")
     objectCharacteristics.append(creatingApplication)
 
-    for elem in create_premis_object_characteristics_extensions(fileUUID):
+    for elem in create_premis_object_characteristics_extensions(fileUUID, file_data):
         objectCharacteristics.append(elem)
 
     etree.SubElement(
         object_elem, ns.premisBNS + "originalName"
     ).text = f.originallocation.decode()
 
-    for elem in create_premis_object_derivations(fileUUID):
+    for elem in create_premis_object_derivations(fileUUID, file_data):
         object_elem.append(elem)
 
     return object_elem
 
 
-def create_premis_object_formats(fileUUID):
-    files = FileID.objects.filter(file_id=fileUUID)
+def create_premis_object_formats(fileUUID, file_data=None):
+    if file_data is None:
+        rows = FileID.objects.filter(file_id=fileUUID).values_list(
+            "format_name",
+            "format_version",
+            "format_registry_name",
+            "format_registry_key",
+        )
+    else:
+        rows = file_data.file_ids[str(fileUUID)]
+    rows = list(rows)
     elements = []
-    if not files.exists():
+    if not rows:
         fmt = etree.Element(ns.premisBNS + "format")
         formatDesignation = etree.SubElement(fmt, ns.premisBNS + "formatDesignation")
         etree.SubElement(
             formatDesignation, ns.premisBNS + "formatName"
         ).text = "Unknown"
         elements.append(fmt)
-    for row in files.values_list(
-        "format_name", "format_version", "format_registry_name", "format_registry_key"
-    ):
+    for row in rows:
         fmt = etree.Element(ns.premisBNS + "format")
 
         formatDesignation = etree.SubElement(fmt, ns.premisBNS + "formatDesignation")
@@ -603,17 +777,20 @@ def create_premis_object_formats(fileUUID):
     return elements
 
 
-def create_premis_object_characteristics_extensions(fileUUID):
+def create_premis_object_characteristics_extensions(fileUUID, file_data=None):
     elements = []
     objectCharacteristicsExtension = etree.Element(
         ns.premisBNS + "objectCharacteristicsExtension"
     )
     parser = etree.XMLParser(remove_blank_text=True)
-    documents = FPCommandOutput.objects.filter(
-        file_id=fileUUID,
-        rule__purpose__in=["characterization", "default_characterization"],
-    ).values_list("content")
-    for (document,) in documents:
+    if file_data is None:
+        documents = FPCommandOutput.objects.filter(
+            file_id=fileUUID,
+            rule__purpose__in=CHARACTERIZATION_PURPOSES,
+        ).values_list("content", flat=True)
+    else:
+        documents = file_data.characterization_outputs[str(fileUUID)]
+    for document in documents:
         # This needs to be converted into an str because lxml doesn't accept
         # XML documents in unicode strings if the document contains an
         # encoding declaration.
@@ -625,13 +802,16 @@ def create_premis_object_characteristics_extensions(fileUUID):
     return elements
 
 
-def create_premis_object_derivations(fileUUID):
+def create_premis_object_derivations(fileUUID, file_data=None):
     elements = []
     # Derivations
-    derivations = Derivation.objects.filter(
-        source_file_id=fileUUID, event__isnull=False
-    )
-    for derivation in derivations:
+    if file_data is None:
+        derivations = Derivation.objects.filter(
+            source_file_id=fileUUID, event__isnull=False
+        ).values_list("derived_file_id", "event_id")
+    else:
+        derivations = file_data.derivations_as_source[str(fileUUID)]
+    for derived_file_id, event_id in derivations:
         relationship = etree.Element(ns.premisBNS + "relationship")
         etree.SubElement(
             relationship, ns.premisBNS + "relationshipType"
@@ -648,7 +828,7 @@ def create_premis_object_derivations(fileUUID):
         ).text = "UUID"
         etree.SubElement(
             relatedObjectIdentifier, ns.premisBNS + "relatedObjectIdentifierValue"
-        ).text = str(derivation.derived_file_id)
+        ).text = str(derived_file_id)
 
         relatedEventIdentifier = etree.SubElement(
             relationship, ns.premisBNS + "relatedEventIdentifier"
@@ -658,14 +838,17 @@ def create_premis_object_derivations(fileUUID):
         ).text = "UUID"
         etree.SubElement(
             relatedEventIdentifier, ns.premisBNS + "relatedEventIdentifierValue"
-        ).text = str(derivation.event_id)
+        ).text = str(event_id)
 
         elements.append(relationship)
 
-    derivations = Derivation.objects.filter(
-        derived_file_id=fileUUID, event__isnull=False
-    )
-    for derivation in derivations:
+    if file_data is None:
+        derivations = Derivation.objects.filter(
+            derived_file_id=fileUUID, event__isnull=False
+        ).values_list("source_file_id", "event_id")
+    else:
+        derivations = file_data.derivations_as_derived[str(fileUUID)]
+    for source_file_id, event_id in derivations:
         relationship = etree.Element(ns.premisBNS + "relationship")
         etree.SubElement(
             relationship, ns.premisBNS + "relationshipType"
@@ -682,7 +865,7 @@ def create_premis_object_derivations(fileUUID):
         ).text = "UUID"
         etree.SubElement(
             relatedObjectIdentifier, ns.premisBNS + "relatedObjectIdentifierValue"
-        ).text = str(derivation.source_file_id)
+        ).text = str(source_file_id)
 
         relatedEventIdentifier = etree.SubElement(
             relationship, ns.premisBNS + "relatedEventIdentifier"
@@ -692,7 +875,7 @@ def create_premis_object_derivations(fileUUID):
         ).text = "UUID"
         etree.SubElement(
             relatedEventIdentifier, ns.premisBNS + "relatedEventIdentifierValue"
-        ).text = str(derivation.event_id)
+        ).text = str(event_id)
 
         elements.append(relationship)
 
@@ -705,7 +888,18 @@ def createDigiprovMD(fileUUID, state):
     """
     ret = []
 
-    events = Event.objects.filter(file_uuid_id=str(fileUUID))
+    file_data = state.get_file_data(fileUUID)
+    if file_data is None:
+        events = Event.objects.filter(file_uuid_id=str(fileUUID))
+        agents = (
+            Agent.objects.filter(event__file_uuid_id=str(fileUUID))
+            .distinct()
+            .order_by("pk")
+        )
+    else:
+        events = file_data.events[str(fileUUID)]
+        agents = file_data.get_file_agents(fileUUID)
+
     for event_record in events:
         state.globalDigiprovMDCounter += 1
         digiprovMD = etree.Element(
@@ -718,11 +912,14 @@ def createDigiprovMD(fileUUID, state):
             digiprovMD, ns.metsBNS + "mdWrap", MDTYPE="PREMIS:EVENT"
         )
         xmlData = etree.SubElement(mdWrap, ns.metsBNS + "xmlData")
-        xmlData.append(createEvent(event_record))
+        xmlData.append(
+            createEvent(
+                event_record,
+                file_data.get_event_agents(event_record) if file_data else None,
+            )
+        )
 
-    for agent in Agent.objects.extend_queryset_with_preservation_system(
-        Agent.objects.filter(event__file_uuid_id=str(fileUUID)).distinct()
-    ):
+    for agent in Agent.objects.extend_queryset_with_preservation_system(agents):
         state.globalDigiprovMDCounter += 1
         digiprovMD = etree.Element(
             ns.metsBNS + "digiprovMD",
@@ -739,8 +936,11 @@ def createDigiprovMD(fileUUID, state):
     return ret
 
 
-def createEvent(event_record):
-    """Returns a PREMIS Event."""
+def createEvent(event_record, agents=None):
+    """Returns a PREMIS Event.
+
+    The linking agents are queried unless they are given in ``agents``.
+    """
     event = etree.Element(ns.premisBNS + "event", nsmap={"premis": ns.premisNS})
     event.set(
         ns.xsiBNS + "schemaLocation",
@@ -781,9 +981,9 @@ def createEvent(event_record):
     ).text = event_record.event_outcome_detail
 
     # linkingAgentIdentifier
-    for agent in Agent.objects.extend_queryset_with_preservation_system(
-        event_record.agents.all()
-    ):
+    if agents is None:
+        agents = event_record.agents.all()
+    for agent in Agent.objects.extend_queryset_with_preservation_system(agents):
         linkingAgentIdentifier = etree.SubElement(
             event, ns.premisBNS + "linkingAgentIdentifier"
         )
@@ -1032,6 +1232,17 @@ def createFileSec(
         else:
             structMapDiv.set("DMDID", dir_dmd_id)
 
+    if state.sip_file_data is None or state.sip_file_data.sip_uuid != sipUUID:
+        state.sip_file_data = SIPFileData(sipUUID)
+    loaded_file_uuids = state.sip_file_data.load(
+        [
+            os.path.join(directoryPath, item)
+            .replace(baseDirectoryPath, SIP_DIR_VAR, 1)
+            .encode()
+            for item in directoryContents
+        ]
+    )
+
     for item in directoryContents:
         itemdirectoryPath = os.path.join(directoryPath, item)
         if os.path.isdir(itemdirectoryPath):
@@ -1053,13 +1264,8 @@ def createFileSec(
                 baseDirectoryPath, SIP_DIR_VAR, 1
             )
 
-            kwargs = {
-                "removedtime__isnull": True,
-                "sip_id": sipUUID,
-                "currentlocation": directoryPathSTR.encode(),
-            }
             try:
-                f = File.objects.get(**kwargs)
+                f = state.sip_file_data.get_file(directoryPathSTR.encode())
             except (File.DoesNotExist, ValidationError):
                 job.pyprint(
                     'No uuid for file: "', directoryPathSTR, '"', file=sys.stderr
@@ -1304,6 +1510,8 @@ def createFileSec(
         for file_elem in filesInThisDirectory:
             file_elem.set("DMDID", dspaceMetsDMDID)
 
+    state.sip_file_data.unload(loaded_file_uuids)
+
     return structMapDiv
 
 
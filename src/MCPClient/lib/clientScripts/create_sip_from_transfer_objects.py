@@ -34,6 +34,9 @@ from main.models import File
 from main.models import Transfer
 from main.models import UnitVariable
 
+# Number of rows updated with each query.
+BATCH_SIZE = 1000
+
 
 def call(jobs):
     with transaction.atomic():
@@ -144,7 +147,8 @@ def call(jobs):
                 # Get the ``Directory`` models representing the subdirectories in the
                 # objects/ directory. For each subdirectory, confirm it's in the SIP
                 # objects/ directory, and update the current location and owning SIP.
-                for dir_mdl in dir_mdls:
+                moved_dirs = []
+                for dir_mdl in dir_mdls.only("uuid", "currentlocation"):
                     currentSIPDirPath = dir_mdl.currentlocation.decode().replace(
                         "%transferDirectory%", tmpSIPDir
                     )
@@ -155,11 +159,14 @@ def call(jobs):
                             .encode()
                         )
                         dir_mdl.sip = sip
-                        dir_mdl.save()
+                        moved_dirs.append(dir_mdl)
                     else:
                         job.pyprint(
                             "directory not found: ", currentSIPDirPath, file=sys.stderr
                         )
+                Directory.objects.bulk_update(
+                    moved_dirs, ["currentlocation", "sip"], batch_size=BATCH_SIZE
+                )
 
                 # Get the database list of files in the objects directory.
                 # For each file, confirm it's in the SIP objects directory, and update the
@@ -168,8 +175,9 @@ def call(jobs):
                     transfer_id=transferUUID,
                     currentlocation__startswith="%transferDirectory%objects",
                     removedtime__isnull=True,
-                )
-                for f in files:
+                ).only("uuid", "currentlocation")
+                moved_files = []
+                for f in files.iterator(chunk_size=BATCH_SIZE):
                     currentSIPFilePath = f.currentlocation.decode().replace(
                         "%transferDirectory%", tmpSIPDir
                     )
@@ -180,11 +188,14 @@ def call(jobs):
                             .encode()
                         )
                         f.sip = sip
-                        f.save()
+                        moved_files.append(f)
                     else:
                         job.pyprint(
                             "file not found: ", currentSIPFilePath, file=sys.stderr
                         )
+                File.objects.bulk_update(
+                    moved_files, ["currentlocation", "sip"], batch_size=BATCH_SIZE
+                )
 
                 archivematicaFunctions.create_directories(
                     archivematicaFunctions.MANUAL_NORMALIZATION_DIRECTORIES,
@@ -1,7 +1,11 @@
 #!/usr/bin/env python
+import concurrent.futures
+import dataclasses
 import os
 import sys
 import uuid
+from collections import defaultdict
+from typing import List
 
 import django
 from django.db import transaction
@@ -12,10 +16,11 @@ from archivematicaFunctions import format_subdir_path
 from archivematicaFunctions import get_dir_uuids
 from custom_handlers import get_script_logger
 from databaseFunctions import fileWasRemoved
+from django.conf import settings as mcpclient_settings
 from executeOrRunSubProcess import executeOrRun
-from fileOperations import addFileToTransfer
-from fileOperations import updateSizeAndChecksum
+from fileOperations import FileRegistry
 from fpr.models import FPCommand
+from fpr.models import FPRule
 from has_packages import already_extracted
 from main.models import Directory
 from main.models import File
@@ -44,12 +49,11 @@ def tree(root):
 
 def assign_uuid(
     job,
+    registry,
     filename,
     extracted_file_original_location,
     package_uuid,
-    transfer_uuid,
     date,
-    task_uuid,
     sip_directory,
     package_filename,
 ):
@@ -65,17 +69,15 @@ def assign_uuid(
     )
     package_detail = f"{relative_package_path} ({package_uuid})"
     event_detail = "Unpacked from: " + package_detail
-    addFileToTransfer(
+    registry.add(
         relative_path,
-        file_uuid,
-        transfer_uuid,
-        task_uuid,
-        date,
-        sourceType="unpacking",
-        eventDetail=event_detail,
-        originalLocation=extracted_file_original_location,
+        file_uuid=file_uuid,
+        date=date,
+        source_type="unpacking",
+        event_detail=event_detail,
+        original_location=extracted_file_original_location,
+        checksum_path=filename,
     )
-    updateSizeAndChecksum(file_uuid, filename, date, str(uuid.uuid4()))
     job.pyprint("Assigning new file UUID:", file_uuid, "to file", filename)
 
 
@@ -114,65 +116,87 @@ def delete_and_record_package_file(job, file_path, file_uuid, current_location):
     fileWasRemoved(file_uuid, eventDetail=event_detail_note)
 
 
-def main(job, transfer_uuid, sip_directory, date, task_uuid, delete=False):
-    file_path_cache = {}
-    files = File.objects.filter(transfer=transfer_uuid, removedtime__isnull=True)
-    if not files:
-        job.pyprint("No files found for transfer: ", transfer_uuid)
+@dataclasses.dataclass
+class Extraction:
+    """An archive of the transfer and the command to extract its contents."""
 
-    transfer_mdl = Transfer.objects.get(uuid=transfer_uuid)
+    file_: File
+    command: FPCommand
+    path: str
+    target: str
+    command_to_execute: str = ""
+    arguments: List[str] = dataclasses.field(default_factory=list)
 
-    # We track whether or not anything was extracted because that controls what
-    # the next microservice chain link will be.
-    # If something was extracted, then a new identification step has to be
-    # kicked off on those files; otherwise, we can go ahead with the transfer.
-    extracted = False
 
+def get_identified_format_versions(files):
+    """Return the format version of every identified file, by file UUID.
+
+    Files with no or more than one format version are left out, they can't be
+    extracted.
+    """
+    format_versions = defaultdict(list)
+    for file_uuid, format_version_id in FileFormatVersion.objects.filter(
+        file_uuid__in=files
+    ).values_list("file_uuid_id", "format_version_id"):
+        format_versions[str(file_uuid)].append(format_version_id)
+    return {
+        file_uuid: ids[0]
+        for file_uuid, ids in format_versions.items()
+        if len(ids) == 1 and ids[0] is not None
+    }
+
+
+def get_extract_commands(format_version_ids):
+    """Return the active extraction commands indexed by format version."""
+    commands = defaultdict(list)
+    for rule in FPRule.active.filter(
+        format_id__in=set(format_version_ids),
+        purpose="extract",
+        command__enabled=True,
+    ).select_related("command"):
+        commands[str(rule.format_id)].append(rule.command)
+    return commands
+
+
+def get_extract_command(commands, format_version_id):
+    """Return the extraction command of a format version like ``get`` would."""
+    format_commands = commands.get(str(format_version_id), [])
+    if len(format_commands) > 1:
+        raise FPCommand.MultipleObjectsReturned(
+            f"{len(format_commands)} FPCommand objects matching format={format_version_id} found"
+        )
+    return format_commands[0] if format_commands else None
+
+
+def plan_extractions(files, sip_directory, date):
+    """Decide what to do with every file of the transfer.
+
+    Returns a list of ``(file, extraction)`` tuples in the order of ``files``,
+    where ``extraction`` is an ``Extraction`` or the reason why the file is
+    not extracted. Formats and commands are looked up for all the files at
+    once.
+    """
+    file_path_cache = {}
+    format_versions = get_identified_format_versions(files)
+    commands = get_extract_commands(format_versions.values())
+
+    plans = []
     for file_ in files:
-        try:
-            file_format_version = FileFormatVersion.objects.get(file_uuid=file_.uuid)
+        format_version_id = format_versions.get(str(file_.uuid))
         # Can't do anything if the file wasn't identified in the previous step
-        except Exception:
-            job.pyprint(
-                "Not extracting contents from",
-                os.path.basename(file_.currentlocation.decode()),
-                " - file format not identified",
-                file=sys.stderr,
-            )
-            continue
-        if file_format_version.format_version is None:
-            job.pyprint(
-                "Not extracting contents from",
-                os.path.basename(file_.currentlocation.decode()),
-                " - file format not identified",
-                file=sys.stderr,
-            )
+        if format_version_id is None:
+            plans.append((file_, " - file format not identified"))
             continue
         # Extraction commands are defined in the FPR just like normalization
         # commands
-        try:
-            command = FPCommand.active.get(
-                fprule__format=file_format_version.format_version,
-                fprule__purpose="extract",
-                fprule__enabled=True,
-            )
-        except FPCommand.DoesNotExist:
-            job.pyprint(
-                "Not extracting contents from",
-                os.path.basename(file_.currentlocation.decode()),
-                " - No rule found to extract",
-                file=sys.stderr,
-            )
+        command = get_extract_command(commands, format_version_id)
+        if command is None:
+            plans.append((file_, " - No rule found to extract"))
             continue
 
         # Check if file has already been extracted
         if already_extracted(file_):
-            job.pyprint(
-                "Not extracting contents from",
-                os.path.basename(file_.currentlocation.decode()),
-                " - extraction already happened.",
-                file=sys.stderr,
-            )
+            plans.append((file_, " - extraction already happened."))
             continue
 
         file_to_be_extracted_path = file_.currentlocation.decode().replace(
@@ -181,62 +205,115 @@ def main(job, transfer_uuid, sip_directory, date, task_uuid, delete=False):
         extraction_target, file_path_cache = temporary_directory(
             file_to_be_extracted_path, date, file_path_cache
         )
+        extraction = Extraction(
+            file_, command, file_to_be_extracted_path, extraction_target
+        )
 
         # Create the extract packages command.
         if command.script_type == "command" or command.script_type == "bashScript":
-            args = []
-            command_to_execute = command.command.replace(
+            extraction.command_to_execute = command.command.replace(
                 "%inputFile%", file_to_be_extracted_path
-            )
-            command_to_execute = command_to_execute.replace(
-                "%outputDirectory%", extraction_target
-            )
+            ).replace("%outputDirectory%", extraction_target)
         else:
-            command_to_execute = command.command
-            args = [file_to_be_extracted_path, extraction_target]
-
-        # Make the command clear to users when inspecting stdin/stdout.
-        logger.info("Command to execute is: %s", command_to_execute)
-        exitstatus, stdout, stderr = executeOrRun(
-            command.script_type,
-            command_to_execute,
-            arguments=args,
-            printing=True,
-            capture_output=True,
-        )
-        job.write_output(stdout)
-        job.write_error(stderr)
+            extraction.command_to_execute = command.command
+            extraction.arguments = [file_to_be_extracted_path, extraction_target]
+        plans.append((file_, extraction))
+
+    return plans
+
+
+def extract(extraction):
+    return executeOrRun(
+        extraction.command.script_type,
+        extraction.command_to_execute,
+        arguments=extraction.arguments,
+        printing=True,
+        capture_output=True,
+    )
+
+
+def main(
+    job, transfer_uuid, sip_directory, date, task_uuid, delete=False, max_workers=None
+):
+    if max_workers is None:
+        max_workers = mcpclient_settings.EXTRACTION_TOOL_WORKERS
+
+    files = File.objects.filter(transfer=transfer_uuid, removedtime__isnull=True)
+    if not files:
+        job.pyprint("No files found for transfer: ", transfer_uuid)
+
+    transfer_mdl = Transfer.objects.get(uuid=transfer_uuid)
+    registry = FileRegistry(transfer_uuid=transfer_uuid)
+
+    # Only the files of the transfer found now are extracted. The contents of
+    # nested packages are extracted when the workflow runs this job again
+    # after identifying the files extracted this time.
+    plans = plan_extractions(files, sip_directory, date)
+
+    # We track whether or not anything was extracted because that controls what
+    # the next microservice chain link will be.
+    # If something was extracted, then a new identification step has to be
+    # kicked off on those files; otherwise, we can go ahead with the transfer.
+    extracted = False
+
+    # Every package is extracted to its own directory, so the extraction
+    # commands can run at the same time while their results are recorded in
+    # the order of the files.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+        futures = {}
+        for file_, extraction in plans:
+            if isinstance(extraction, Extraction):
+                # Make the command clear to users when inspecting stdin/stdout.
+                logger.info("Command to execute is: %s", extraction.command_to_execute)
+                futures[file_.uuid] = pool.submit(extract, extraction)
+
+        for file_, extraction in plans:
+            if not isinstance(extraction, Extraction):
+                job.pyprint(
+                    "Not extracting contents from",
+                    os.path.basename(file_.currentlocation.decode()),
+                    extraction,
+                    file=sys.stderr,
+                )
+                continue
+
+            exitstatus, stdout, stderr = futures.pop(file_.uuid).result()
+            job.write_output(stdout)
+            job.write_error(stderr)
+
+            if not exitstatus == 0:
+                # Dang, looks like the extraction failed
+                job.pyprint(
+                    "Command",
+                    extraction.command.description,
+                    "failed!",
+                    file=sys.stderr,
+                )
+                continue
 
-        if not exitstatus == 0:
-            # Dang, looks like the extraction failed
-            job.pyprint("Command", command.description, "failed!", file=sys.stderr)
-        else:
             extracted = True
-            job.pyprint(
-                "Extracted contents from", os.path.basename(file_to_be_extracted_path)
-            )
+            job.pyprint("Extracted contents from", os.path.basename(extraction.path))
 
             # Assign UUIDs and insert them into the database, so the newly
             # extracted files are properly tracked by Archivematica
-            for extracted_file in tree(extraction_target):
+            for extracted_file in tree(extraction.target):
                 extracted_file_original_location = extracted_file.replace(
-                    extraction_target, file_.originallocation.decode(), 1
+                    extraction.target, file_.originallocation.decode(), 1
                 )
                 assign_uuid(
                     job,
+                    registry,
                     extracted_file,
                     extracted_file_original_location,
                     file_.uuid,
-                    transfer_uuid,
                     date,
-                    task_uuid,
                     sip_directory,
-                    file_to_be_extracted_path,
+                    extraction.path,
                 )
 
             if transfer_mdl.diruuids:
                 create_extracted_dir_uuids(
-                    job, transfer_mdl, extraction_target, sip_directory, file_
+                    job, transfer_mdl, extraction.target, sip_directory, file_
                 )
 
             # We may want to remove the original package file after extracting
@@ -244,11 +321,13 @@ def main(job, transfer_uuid, sip_directory, date, task_uuid, delete=False):
             if delete:
                 delete_and_record_package_file(
                     job,
-                    file_to_be_extracted_path,
+                    extraction.path,
                     file_.uuid,
                     file_.currentlocation.decode(),
                 )
 
+    registry.flush()
+
     if extracted:
         return 0
     else:
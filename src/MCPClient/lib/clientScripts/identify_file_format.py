@@ -1,23 +1,34 @@
 #!/usr/bin/env python
 import argparse
+import base64
 import dataclasses
 import multiprocessing
+import os
 import uuid
+from typing import Any
+from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Set
+from typing import Tuple
 
 import django
+import requests
 
 django.setup()
 
 from client.job import Job
+from databaseFunctions import EventBatch
 from databaseFunctions import insertIntoEvents
+from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
 from executeOrRunSubProcess import executeOrRun
+from fpr import cache as fpr_cache
 from fpr.models import FormatVersion
 from fpr.models import IDCommand
 from fpr.models import IDRule
+from main.models import Event
 from main.models import File
 from main.models import FileFormatVersion
 from main.models import FileID
@@ -66,6 +77,7 @@ def write_identification_event(
     command: IDCommand,
     format: Optional[str] = None,
     success: bool = True,
+    events: Optional[EventBatch] = None,
 ) -> None:
     event_detail_text = (
         f'program="{command.tool.description}"; version="{command.tool.version}"'
@@ -80,7 +92,8 @@ def write_identification_event(
 
     date = timezone.now()
 
-    insertIntoEvents(
+    insert = insertIntoEvents if events is None else events.add
+    insert(
         fileUUID=file_uuid,
         eventIdentifierUUID=str(uuid.uuid4()),
         eventType="format identification",
@@ -123,21 +136,143 @@ def _default_idcommand() -> IDCommand:
 
     We only expect to find one command enabled/active.
     """
-    return IDCommand.active.first()
+    return fpr_cache.rules.get_default_idcommand()
+
+
+class IdentificationError(Exception):
+    pass
+
+
+class SiegfriedServer:
+    """Client of a long-running Siegfried server (``sf -serve``).
+
+    The server loads its signature file once, so identifying a file is an HTTP
+    request over a kept-alive connection instead of the process start-up and
+    signature load paid by the FPR command for every file. Results follow the
+    contract of the FPR Siegfried command: the PUID of the first match.
+    """
+
+    def __init__(self, address: str, timeout: float) -> None:
+        self.url = f"http://{address}/identify/"
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    @staticmethod
+    def find_puid(result: Dict[str, Any]) -> str:
+        try:
+            matches = result["files"][0]["matches"]
+        except (KeyError, IndexError, TypeError) as err:
+            raise IdentificationError(
+                f"The output produced by siegfried could not be parsed: {err}"
+            )
+        if not matches:
+            raise IdentificationError(
+                "The output produced by siegfried could not be parsed: no matches found"
+            )
+        puid: Optional[str] = matches[0].get("puid") or matches[0].get("id")
+        if puid is None:
+            raise IdentificationError(
+                "The output produced by siegfried could not be parsed"
+            )
+        if puid == "UNKNOWN":
+            raise IdentificationError(
+                "siegfried determined that the file format is UNKNOWN"
+            )
+        return puid
+
+    def identify(self, file_path: str) -> Tuple[int, str, str]:
+        # Paths are sent base64 encoded so they don't need to be URL-safe.
+        encoded_path = base64.urlsafe_b64encode(os.fsencode(file_path)).decode()
+        try:
+            response = self.session.get(
+                self.url + encoded_path,
+                params={"base64": "true", "format": "json"},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            return 0, self.find_puid(response.json()), ""
+        except (requests.RequestException, ValueError, IdentificationError) as err:
+            return 1, "", str(err)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class Identifier:
+    """Identify the files of a batch with a single ``fpr.IDCommand``."""
+
+    def __init__(
+        self, command: IDCommand, server: Optional[SiegfriedServer] = None
+    ) -> None:
+        self.command = command
+        self.server = server
+
+    @classmethod
+    def for_command(cls, command: IDCommand) -> "Identifier":
+        server = None
+        if (
+            settings.SIEGFRIED_SERVER
+            and command.config == "PUID"
+            and command.tool.description.lower() == "siegfried"
+        ):
+            server = SiegfriedServer(
+                settings.SIEGFRIED_SERVER, settings.SIEGFRIED_CLIENT_TIMEOUT
+            )
+        return cls(command, server)
+
+    def run(self, file_path: str) -> Tuple[int, str, str]:
+        if self.server is not None:
+            return self.server.identify(file_path)
+        exitcode, output, err = executeOrRun(
+            self.command.script_type,
+            self.command.script,
+            arguments=[file_path],
+            printing=False,
+            capture_output=True,
+        )
+        return exitcode, output.strip(), err
+
+    def get_format_version(self, output: str) -> FormatVersion:
+        """Map the command output to a ``FormatVersion``."""
+        # PUIDs are the same regardless of tool, so PUID-producing tools don't
+        # have "rules" per se - we just go straight to the FormatVersion table
+        # to see if there's a matching PUID
+        if self.command.config == "PUID":
+            format_version: FormatVersion = (
+                fpr_cache.rules.get_format_version_by_pronom_id(output)
+            )
+            return format_version
+        rule = fpr_cache.rules.get_idrule(self.command, output)
+        return rule.format
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
 
 
 def main(
-    job: Job, enabled: str, file_path: str, file_uuid: str, disable_reidentify: bool
+    job: Job,
+    enabled: str,
+    file_path: str,
+    file_uuid: str,
+    disable_reidentify: bool,
+    identifier: Optional[Identifier] = None,
+    file_: Optional[File] = None,
+    identified_files: Optional[Set[str]] = None,
+    events: Optional[EventBatch] = None,
 ) -> int:
     enabled_bool = True if enabled == "True" else False
     if not enabled_bool:
         job.print_output("Skipping file format identification")
         return SUCCESS
 
-    command = _default_idcommand()
-    if command is None:
-        job.write_error("Unable to determine IDCommand.\n")
-        return ERROR
+    if identifier is None:
+        command = _default_idcommand()
+        if command is None:
+            job.write_error("Unable to determine IDCommand.\n")
+            return ERROR
+        identifier = Identifier(command)
+    command = identifier.command
 
     command_uuid = command.uuid
     job.print_output("IDCommand:", command.description)
@@ -146,30 +281,28 @@ def main(
     job.print_output("IDTool UUID:", command.tool.uuid)
     job.print_output(f"File: ({file_uuid}) {file_path}")
 
-    file_ = File.objects.get(uuid=file_uuid)
+    if file_ is None:
+        file_ = File.objects.get(uuid=file_uuid)
 
     # If reidentification is disabled and a format identification event exists for this file, exit
-    if (
-        disable_reidentify
-        and file_.event_set.filter(event_type="format identification").exists()
-    ):
-        job.print_output(
-            "This file has already been identified, and re-identification is disabled. Skipping."
-        )
-        return SUCCESS
+    if disable_reidentify:
+        if identified_files is not None:
+            already_identified = str(file_.uuid) in identified_files
+        else:
+            already_identified = file_.event_set.filter(
+                event_type="format identification"
+            ).exists()
+        if already_identified:
+            job.print_output(
+                "This file has already been identified, and re-identification is disabled. Skipping."
+            )
+            return SUCCESS
 
     # Save whether identification was enabled by the user for use in a later
     # chain.
     _save_id_preference(file_, enabled_bool)
 
-    exitcode, output, err = executeOrRun(
-        command.script_type,
-        command.script,
-        arguments=[file_path],
-        printing=False,
-        capture_output=True,
-    )
-    output = output.strip()
+    exitcode, output, err = identifier.run(file_path)
 
     if exitcode != 0:
         job.print_error(f"Error: IDCommand with UUID {command_uuid} exited non-zero.")
@@ -177,29 +310,23 @@ def main(
         return ERROR
 
     job.print_output("Command output:", output)
-    # PUIDs are the same regardless of tool, so PUID-producing tools don't have "rules" per se - we just
-    # go straight to the FormatVersion table to see if there's a matching PUID
     try:
-        if command.config == "PUID":
-            format_version = FormatVersion.active.get(pronom_id=output)
-        else:
-            rule = IDRule.active.get(command_output=output, command=command)
-            format_version = rule.format
+        format_version = identifier.get_format_version(output)
     except IDRule.DoesNotExist:
         job.print_error(
             f'Error: No FPR identification rule for tool output "{output}" found'
         )
-        write_identification_event(file_uuid, command, success=False)
+        write_identification_event(file_uuid, command, success=False, events=events)
         return ERROR
     except IDRule.MultipleObjectsReturned:
         job.print_error(
             f'Error: Multiple FPR identification rules for tool output "{output}" found'
         )
-        write_identification_event(file_uuid, command, success=False)
+        write_identification_event(file_uuid, command, success=False, events=events)
         return ERROR
     except FormatVersion.DoesNotExist:
         job.print_error(f"Error: No FPR format record found for PUID {output}")
-        write_identification_event(file_uuid, command, success=False)
+        write_identification_event(file_uuid, command, success=False, events=events)
         return ERROR
 
     (ffv, created) = FileFormatVersion.objects.get_or_create(
@@ -210,7 +337,9 @@ def main(
         ffv.save()
     job.print_output(f"{file_path} identified as a {format_version.description}")
 
-    write_identification_event(file_uuid, command, format=format_version.pronom_id)
+    write_identification_event(
+        file_uuid, command, format=format_version.pronom_id, events=events
+    )
     write_file_id(file_uuid=file_uuid, format=format_version, output=output)
 
     return SUCCESS
@@ -245,16 +374,48 @@ def parse_args(parser: argparse.ArgumentParser, job: Job) -> IdentifyFileFormatA
 def call(jobs: List[Job]) -> None:
     parser = get_parser()
 
-    with transaction.atomic():
-        for job in jobs:
-            with job.JobContext():
-                args = parse_args(parser, job)
-                job.set_status(
-                    main(
-                        job,
-                        args.idcommand,
-                        args.file_path,
-                        args.file_uuid,
-                        args.disable_reidentify,
+    fpr_cache.rules.refresh()
+
+    parsed_jobs = []
+    for job in jobs:
+        with job.JobContext():
+            parsed_jobs.append((job, parse_args(parser, job)))
+
+    # Everything that doesn't depend on the file being identified is resolved
+    # once for the whole batch.
+    command = _default_idcommand()
+    identifier = Identifier.for_command(command) if command is not None else None
+    file_uuids = [args.file_uuid for _, args in parsed_jobs]
+    files = {
+        str(file_.uuid): file_
+        for file_ in File.objects.select_related("sip", "transfer").filter(
+            uuid__in=file_uuids
+        )
+    }
+    identified_files = {
+        str(file_uuid)
+        for file_uuid in Event.objects.filter(
+            file_uuid_id__in=file_uuids, event_type="format identification"
+        ).values_list("file_uuid_id", flat=True)
+    }
+
+    try:
+        with transaction.atomic(), EventBatch() as events:
+            for job, args in parsed_jobs:
+                with job.JobContext():
+                    job.set_status(
+                        main(
+                            job,
+                            args.idcommand,
+                            args.file_path,
+                            args.file_uuid,
+                            args.disable_reidentify,
+                            identifier=identifier,
+                            file_=files.get(args.file_uuid),
+                            identified_files=identified_files,
+                            events=events,
+                        )
                     )
-                )
+    finally:
+        if identifier is not None:
+            identifier.close()
@@ -27,7 +27,14 @@ from main.models import Event
 from main.models import File
 
 
-def main(job):
+def get_unit_agents(unit_agents, sip_uuid):
+    """Return the agents of the events of the SIP, caching them in ``unit_agents``."""
+    if sip_uuid not in unit_agents:
+        unit_agents[sip_uuid] = databaseFunctions.getAMAgentsForUnit(sipUUID=sip_uuid)
+    return unit_agents[sip_uuid]
+
+
+def main(job, unit_agents):
     # "%SIPUUID%" "%SIPName%" "%SIPDirectory%" "%fileUUID%" "%filePath%"
     # job.args[2] (SIPName) is unused.
     SIPUUID = job.args[1]
@@ -171,6 +178,7 @@ def main(job):
             eventDetail="manual normalization",
             eventOutcome="",
             eventOutcomeDetailNote=dstR,
+            agents=get_unit_agents(unit_agents, SIPUUID),
         )
         job.print_output(
             f"Created a manual normalization Event for file {original_file.uuid}."
@@ -192,7 +200,9 @@ def main(job):
 
 
 def call(jobs):
+    # Agents of the events, fetched once per SIP of the batch.
+    unit_agents = {}
     with transaction.atomic():
         for job in jobs:
             with job.JobContext():
-                job.set_status(main(job))
+                job.set_status(main(job, unit_agents))
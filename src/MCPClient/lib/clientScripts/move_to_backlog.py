@@ -24,7 +24,7 @@ from archivematicaFunctions import get_bag_size
 from archivematicaFunctions import get_setting
 from bagit import make_bag
 from custom_handlers import get_script_logger
-from databaseFunctions import insertIntoEvents
+from databaseFunctions import EventBatch
 from django.conf import settings as mcpclient_settings
 from django.core.exceptions import ValidationError
 from django.db import transaction
@@ -78,7 +78,13 @@ def _index_transfer(job, transfer_id, transfer_path, size):
     elasticSearchFunctions.setup_reading_from_conf(mcpclient_settings)
     client = elasticSearchFunctions.get_client()
     elasticSearchFunctions.index_transfer_and_files(
-        client, transfer_id, transfer_path, size, printfn=job.pyprint
+        client,
+        transfer_id,
+        transfer_path,
+        size,
+        printfn=job.pyprint,
+        chunk_size=mcpclient_settings.ELASTICSEARCH_BULK_CHUNK_SIZE,
+        thread_count=mcpclient_settings.ELASTICSEARCH_BULK_THREAD_COUNT,
     )
 
 
@@ -154,24 +160,27 @@ def _record_backlog_event(transfer_id, transfer_path, created_at):
     fsentries = {entry.file_uuid: entry for entry in mets.all_files()}
 
     # Assuming the same agents apply to all files.
-    agents = _transfer_agents(transfer_id)
-
-    for file_obj in File.objects.filter(transfer_id=transfer_id).iterator():
-        try:
-            fsentry = fsentries[str(file_obj.uuid)]
-        except KeyError:
-            continue
-        event_id, event_type = str(uuid.uuid4()), "placement in backlog"
-        fsentry.add_premis_event(
-            _premis_event_data(event_id, event_type, created_at, agents)
-        )
-        insertIntoEvents(
-            fileUUID=file_obj.uuid,
-            eventIdentifierUUID=event_id,
-            eventType=event_type,
-            eventDateTime=created_at,
-            agents=agents,
-        )
+    agents = list(_transfer_agents(transfer_id))
+
+    with EventBatch() as events:
+        for file_uuid in File.objects.filter(transfer_id=transfer_id).values_list(
+            "uuid", flat=True
+        ):
+            try:
+                fsentry = fsentries[str(file_uuid)]
+            except KeyError:
+                continue
+            event_id, event_type = str(uuid.uuid4()), "placement in backlog"
+            fsentry.add_premis_event(
+                _premis_event_data(event_id, event_type, created_at, agents)
+            )
+            events.add(
+                fileUUID=file_uuid,
+                eventIdentifierUUID=event_id,
+                eventType=event_type,
+                eventDateTime=created_at,
+                agents=agents,
+            )
 
     mets.write(mets_path, pretty_print=True)
 
@@ -8,6 +8,7 @@ import os
 import shutil
 import traceback
 import uuid
+from typing import Any
 from typing import Callable
 from typing import List
 from typing import Optional
@@ -24,6 +25,7 @@ from dicts import ReplacementDict
 from django.conf import settings as mcpclient_settings
 from django.core.exceptions import ValidationError
 from django.db import transaction
+from fpr import cache as fpr_cache
 from fpr.models import FPRule
 from lib import setup_dicts
 from main.models import Derivation
@@ -214,6 +216,7 @@ def once_normalized(
     command: transcoder.Command,
     opts: NormalizeArgs,
     replacement_dict: ReplacementDict,
+    events: Optional[databaseFunctions.EventBatch] = None,
 ) -> None:
     """Updates the database if normalization completed successfully.
 
@@ -284,6 +287,7 @@ def once_normalized(
                 event_detail_output=event_detail_output,
                 outcome_detail_note=path_relative_to_sip,
                 today=today,
+                events=events,
             )
         # Other derivatives go into the Derivations table, but
         # don't get added to the PREMIS Events because they will
@@ -310,17 +314,27 @@ def once_normalized(
         )
 
 
-def once_normalized_callback(job: Job) -> Callable[..., None]:
+def once_normalized_callback(
+    job: Job, events: Optional[databaseFunctions.EventBatch] = None
+) -> Callable[..., None]:
     def wrapper(
         command: transcoder.Command,
         opts: NormalizeArgs,
         replacement_dict: ReplacementDict,
     ) -> None:
-        return once_normalized(job, command, opts, replacement_dict)
+        return once_normalized(job, command, opts, replacement_dict, events=events)
 
     return wrapper
 
 
+def insert_event(events: Optional[databaseFunctions.EventBatch], **kwargs: Any) -> None:
+    """Queue the event in ``events`` or insert it right away without a batch."""
+    if events is None:
+        databaseFunctions.insertIntoEvents(**kwargs)
+    else:
+        events.add(**kwargs)
+
+
 def insert_derivation_event(
     original_uuid: str,
     output_uuid: str,
@@ -328,12 +342,14 @@ def insert_derivation_event(
     event_detail_output: str,
     outcome_detail_note: Optional[str],
     today: Optional[datetime.datetime] = None,
+    events: Optional[databaseFunctions.EventBatch] = None,
 ) -> None:
     """Add the derivation link for preservation files and the event."""
     if today is None:
         today = timezone.now()
     # Add event information to current file
-    databaseFunctions.insertIntoEvents(
+    insert_event(
+        events,
         fileUUID=original_uuid,
         eventIdentifierUUID=derivation_uuid,
         eventType="normalization",
@@ -342,20 +358,31 @@ def insert_derivation_event(
         eventOutcome="",
         eventOutcomeDetailNote=outcome_detail_note or "",
     )
-
     # Add linking information between files
-    databaseFunctions.insertIntoDerivations(
-        sourceFileUUID=original_uuid,
-        derivedFileUUID=output_uuid,
-        relatedEventUUID=derivation_uuid,
-    )
+    if events is None:
+        databaseFunctions.insertIntoDerivations(
+            sourceFileUUID=original_uuid,
+            derivedFileUUID=output_uuid,
+            relatedEventUUID=derivation_uuid,
+        )
+    else:
+        events.add_derivation(
+            sourceFileUUID=original_uuid,
+            derivedFileUUID=output_uuid,
+            relatedEventUUID=derivation_uuid,
+        )
 
 
 def get_default_rule(purpose: str) -> FPRule:
-    return FPRule.active.get(purpose="default_" + purpose)
+    rule: FPRule = fpr_cache.rules.get_fprule_by_purpose("default_" + purpose)
+    return rule
 
 
-def main(job: Job, opts: NormalizeArgs) -> int:
+def main(
+    job: Job,
+    opts: NormalizeArgs,
+    events: Optional[databaseFunctions.EventBatch] = None,
+) -> int:
     """Find and execute normalization commands on input file."""
     # TODO fix for maildir working only on attachments
 
@@ -415,8 +442,8 @@ def main(job: Job, opts: NormalizeArgs) -> int:
         )
         # Don't create events for thumbnail files
         if opts.purpose != "thumbnail":
-            databaseFunctions.insertIntoEvents(
-                fileUUID=derivative.derived_file_id, eventType="deletion"
+            insert_event(
+                events, fileUUID=derivative.derived_file_id, eventType="deletion"
             )
     if derivatives_to_delete:
         Derivation.objects.filter(id__in=derivatives_to_delete).delete()
@@ -437,6 +464,7 @@ def main(job: Job, opts: NormalizeArgs) -> int:
                 derivation_uuid=str(uuid.uuid4()),
                 event_detail_output="manual normalization",
                 outcome_detail_note=None,
+                events=events,
             )
         return SUCCESS
 
@@ -450,8 +478,8 @@ def main(job: Job, opts: NormalizeArgs) -> int:
     if file_format_version:
         job.print_output("File format:", file_format_version.format_version)
         try:
-            rule = FPRule.active.get(
-                format=file_format_version.format_version, purpose=opts.purpose
+            rule = fpr_cache.rules.get_fprule(
+                file_format_version.format_version_id, opts.purpose
             )
         except FPRule.DoesNotExist:
             if (
@@ -489,7 +517,12 @@ def main(job: Job, opts: NormalizeArgs) -> int:
 
     replacement_dict = get_replacement_dict(job, opts)
     cl = transcoder.CommandLinker(
-        job, rule, command, replacement_dict, opts, once_normalized_callback(job)
+        job,
+        rule,
+        command,
+        replacement_dict,
+        opts,
+        once_normalized_callback(job, events),
     )
     exitstatus = cl.execute()
 
@@ -539,7 +572,7 @@ def main(job: Job, opts: NormalizeArgs) -> int:
                 command,
                 replacement_dict,
                 opts,
-                once_normalized_callback(job),
+                once_normalized_callback(job, events),
             )
             exitstatus = cl.execute()
 
@@ -610,8 +643,9 @@ def parse_args(parser: argparse.ArgumentParser, job: Job) -> NormalizeArgs:
 
 def call(jobs: List[Job]) -> None:
     parser = get_parser()
+    fpr_cache.rules.refresh()
 
-    with transaction.atomic():
+    with transaction.atomic(), databaseFunctions.EventBatch() as events:
         for job in jobs:
             with job.JobContext():
                 opts = parse_args(parser, job)
@@ -625,7 +659,7 @@ def call(jobs: List[Job]) -> None:
                     continue
 
                 try:
-                    job.set_status(main(job, opts))
+                    job.set_status(main(job, opts, events=events))
                 except Exception as e:
                     job.print_error(str(e))
                     job.set_status(1)
@@ -29,35 +29,87 @@ from main import models
 logger = get_script_logger("archivematica.mcp.client.storeFileModificationDates")
 
 
+# Number of files updated with a single query.
+BATCH_SIZE = 1000
+
+
 def get_modification_date(file_path, timezone):
     mod_time = os.path.getmtime(file_path)
     return datetime.datetime.fromtimestamp(int(mod_time), tz=timezone)
 
 
+def get_modification_times(directory):
+    """Return the modification times of the files under ``directory``.
+
+    The tree is scanned once with ``os.scandir`` and the times are indexed by
+    path. Symbolic links to directories are not followed, like ``os.walk``.
+    """
+    mod_times = {}
+    pending = [directory]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    else:
+                        mod_times[os.path.normpath(entry.path)] = entry.stat().st_mtime
+                except OSError:
+                    continue
+    return mod_times
+
+
 def main(transfer_uuid, shared_directory_path, timezone):
     transfer = models.Transfer.objects.get(uuid=transfer_uuid)
+    transfer_path = transfer.currentlocation.replace(
+        "%sharedPath%", shared_directory_path, 1
+    )
+    mod_times = get_modification_times(transfer_path)
 
-    files = models.File.objects.filter(transfer=transfer)
+    files = (
+        models.File.objects.filter(transfer=transfer)
+        .values_list("uuid", "currentlocation")
+        .iterator(chunk_size=BATCH_SIZE)
+    )
     mods_stored = 0
-    for transfer_file in files:
+    batch = []
+    for file_uuid, current_location in files:
         try:
-            file_path_relative_to_shared_directory = (
-                transfer_file.currentlocation.decode().replace(
-                    "%transferDirectory%", transfer.currentlocation, 1
-                )
+            file_path_relative_to_shared_directory = current_location.decode().replace(
+                "%transferDirectory%", transfer.currentlocation, 1
             )
         except AttributeError:
             logger.info(
                 "No modification date stored for file %s because it has no current location. It was probably a deleted compressed package.",
-                transfer_file.uuid,
+                file_uuid,
             )
+            continue
+
+        file_path = file_path_relative_to_shared_directory.replace(
+            "%sharedPath%", shared_directory_path, 1
+        )
+        mod_time = mod_times.get(os.path.normpath(file_path))
+        if mod_time is None:
+            # Not found in the transfer directory, e.g. a path with a different
+            # spelling, so ask the file system.
+            modification_date = get_modification_date(file_path, timezone)
         else:
-            file_path = file_path_relative_to_shared_directory.replace(
-                "%sharedPath%", shared_directory_path, 1
+            modification_date = datetime.datetime.fromtimestamp(
+                int(mod_time), tz=timezone
             )
-            transfer_file.modificationtime = get_modification_date(file_path, timezone)
-            transfer_file.save()
-            mods_stored += 1
+        batch.append(models.File(uuid=file_uuid, modificationtime=modification_date))
+        if len(batch) >= BATCH_SIZE:
+            models.File.objects.bulk_update(batch, ["modificationtime"])
+            mods_stored += len(batch)
+            batch = []
+
+    if batch:
+        models.File.objects.bulk_update(batch, ["modificationtime"])
+        mods_stored += len(batch)
 
     logger.info("Stored modification dates of %d files.", mods_stored)
 
@@ -17,6 +17,7 @@
 # along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
 from django.db.models import F
 from executeOrRunSubProcess import executeOrRun
+from fpr.models import FPRule
 
 
 class Command:
@@ -129,12 +130,15 @@ class CommandLinker:
 
         Returns 0 on success, non-0 on failure."""
         # Track success/failure rates of FP Rules
-        # Use Django's F() to prevent race condition updating the counts
-        self.fprule.count_attempts = F("count_attempts") + 1
+        # Use Django's F() to prevent race condition updating the counts. The
+        # counters are updated in the database only so the rule, which may be
+        # shared through the FPR cache, isn't modified and the FPR revision
+        # isn't bumped by a save.
         ret = self.commandObject.execute()
+        counts = {"count_attempts": F("count_attempts") + 1}
         if ret:
-            self.fprule.count_not_okay = F("count_not_okay") + 1
+            counts["count_not_okay"] = F("count_not_okay") + 1
         else:
-            self.fprule.count_okay = F("count_okay") + 1
-        self.fprule.save()
+            counts["count_okay"] = F("count_okay") + 1
+        FPRule.objects.filter(pk=self.fprule.pk).update(**counts)
         return ret
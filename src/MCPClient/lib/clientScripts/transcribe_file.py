@@ -22,6 +22,7 @@ from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.utils import timezone
 from executeOrRunSubProcess import executeOrRun
+from fpr import cache as fpr_cache
 from fpr.models import FPRule
 from lib import setup_dicts
 from main.models import Derivation
@@ -97,8 +98,8 @@ def insert_file_into_database(
 def fetch_rules_for(file_: File) -> Sequence[FPRule]:
     try:
         format = FileFormatVersion.objects.get(file_uuid=file_)
-        result: Sequence[FPRule] = FPRule.active.filter(
-            format=format.format_version, purpose="transcription"
+        result: Sequence[FPRule] = fpr_cache.rules.filter_fprules(
+            format.format_version_id, "transcription"
         )
         return result
     except (FileFormatVersion.DoesNotExist, ValidationError):
@@ -205,6 +206,7 @@ def parse_args(parser: argparse.ArgumentParser, job: Job) -> TranscribeFileArgs:
 
 def call(jobs: List[Job]) -> None:
     parser = get_parser()
+    fpr_cache.rules.refresh()
 
     with transaction.atomic():
         for job in jobs:
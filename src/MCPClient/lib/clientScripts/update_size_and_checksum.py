@@ -24,9 +24,11 @@ from django.db import transaction
 
 django.setup()
 
+import fixity
 import metsrw
 import parse_mets_to_db
 from archivematicaFunctions import find_mets_file
+from archivematicaFunctions import get_setting
 from custom_handlers import get_script_logger
 from databaseFunctions import insertIntoDerivations
 from fileOperations import get_size_and_checksum
@@ -96,7 +98,9 @@ def _filter_queryset_by_subdir(queryset, replacement_path_string, filter_subdir)
 
 def get_transfer_file_queryset(transfer_uuid, filter_subdir):
     """Return Queryset of files in this transfer."""
-    files = File.objects.filter(transfer=transfer_uuid)
+    files = File.objects.filter(transfer=transfer_uuid).select_related(
+        "transfer", "sip"
+    )
     if filter_subdir:
         files = _filter_queryset_by_subdir(
             files, TRANSFER_REPLACEMENT_PATH_STRING, filter_subdir
@@ -106,7 +110,7 @@ def get_transfer_file_queryset(transfer_uuid, filter_subdir):
 
 def get_sip_file_queryset(sip_uuid, filter_subdir):
     """Return Queryset of files in this SIP."""
-    files = File.objects.filter(sip=sip_uuid)
+    files = File.objects.filter(sip=sip_uuid).select_related("transfer", "sip")
     if filter_subdir:
         files = _filter_queryset_by_subdir(
             files, SIP_REPLACEMENT_PATH_STRING, filter_subdir
@@ -114,6 +118,35 @@ def get_sip_file_queryset(sip_uuid, filter_subdir):
     return files
 
 
+def get_file_path(file_, sip_directory, transfer_uuid):
+    """Return the absolute path of a file in the transfer or SIP."""
+    if transfer_uuid:
+        return file_.currentlocation.decode().replace(
+            TRANSFER_REPLACEMENT_PATH_STRING, sip_directory
+        )
+    return file_.currentlocation.decode().replace(
+        SIP_REPLACEMENT_PATH_STRING, sip_directory
+    )
+
+
+def prefetch_checksums(files, mets, sip_directory, transfer_uuid):
+    """Compute the checksums of the files concurrently.
+
+    Return a dictionary of checksums by file path. Files described by the METS
+    of a reingested AIP are skipped because their checksums are read from it.
+    """
+    checksum_type = get_setting("checksum_type", "sha256")
+    checksums = fixity.get_checksums_for_paths(
+        (
+            get_file_path(file_, sip_directory, transfer_uuid)
+            for file_ in files
+            if not (file_.in_reingested_aip and mets)
+        ),
+        [checksum_type],
+    )
+    return {path: digests[checksum_type] for path, digests in checksums.items()}
+
+
 def get_size_and_checksum_for_file(
     job,
     file_,
@@ -125,21 +158,16 @@ def get_size_and_checksum_for_file(
     date,
     event_uuid,
     filter_subdir,
+    checksums=None,
 ):
     """Get size and checksum for a file.
 
     If file is from Archivematica AIP transfer, try to extract and use
-    the size, checksum, and checksum type values from the METS.
+    the size, checksum, and checksum type values from the METS. Otherwise
+    the checksum is taken from ``checksums`` (by file path) when available.
     """
     kw = {}
-    if transfer_uuid:
-        file_path = file_.currentlocation.decode().replace(
-            TRANSFER_REPLACEMENT_PATH_STRING, sip_directory
-        )
-    else:
-        file_path = file_.currentlocation.decode().replace(
-            SIP_REPLACEMENT_PATH_STRING, sip_directory
-        )
+    file_path = get_file_path(file_, sip_directory, transfer_uuid)
 
     if not os.path.exists(file_path):
         return {}
@@ -162,7 +190,7 @@ def get_size_and_checksum_for_file(
     fileSize, checksum, checksumType = get_size_and_checksum(
         file_path,
         file_size=kw.get("fileSize"),
-        checksum=kw.get("checksum"),
+        checksum=kw.get("checksum", (checksums or {}).get(file_path)),
         checksum_type=kw.get("checksumType"),
     )
     kw.update(
@@ -217,9 +245,12 @@ def call(jobs):
                 job.print_output(f"Reading METS file {mets_file}")
                 mets = metsrw.METSDocument.fromfile(mets_file)
 
+            files = [file_ for file_ in files if file_]
+            checksums = prefetch_checksums(
+                files, mets, args.sip_directory, args.transfer_uuid
+            )
+
             for file_ in files:
-                if not file_:
-                    continue
                 file_info = get_size_and_checksum_for_file(
                     job,
                     file_,
@@ -231,6 +262,7 @@ def call(jobs):
                     args.date,
                     args.event_uuid,
                     args.filter_subdir,
+                    checksums=checksums,
                 )
                 if file_info:
                     state.append((file_.uuid, file_info, args))
@@ -36,6 +36,7 @@ from django.conf import settings as mcpclient_settings
 from django.core.exceptions import ValidationError
 from django.db import transaction
 from executeOrRunSubProcess import executeOrRun
+from fpr import cache as fpr_cache
 from fpr.models import FormatVersion
 from fpr.models import FPRule
 from lib import setup_dicts
@@ -125,14 +126,14 @@ class Validator:
     def _get_rules(self) -> FPRule:
         """Return all FPR rules that apply to files of this type."""
         try:
-            fmt = FormatVersion.active.get(fileformatversion__file_uuid=self.file_uuid)
+            fmt = fpr_cache.rules.get_format_version_for_file(self.file_uuid)
         except (FormatVersion.DoesNotExist, ValidationError):
             rules = fmt = None
         if fmt:
-            rules = FPRule.active.filter(format=fmt.uuid, purpose=self.purpose)
+            rules = fpr_cache.rules.filter_fprules(fmt, self.purpose)
         # Check default rules.
         if not rules:
-            rules = FPRule.active.filter(purpose=f"default_{self.purpose}")
+            rules = fpr_cache.rules.filter_fprules_by_purpose(f"default_{self.purpose}")
         return rules
 
     def _execute_rule_command(self, rule: FPRule) -> str:
@@ -339,6 +340,8 @@ def _get_file_type(argv: List[str]) -> str:
 
 
 def call(jobs: List[Job]) -> None:
+    fpr_cache.rules.refresh()
+
     with transaction.atomic():
         for job in jobs:
             with job.JobContext(logger=logger):
@@ -31,14 +31,13 @@ import datetime
 import os
 import subprocess
 import sys
-import uuid
 
 import django
 from django.db import transaction
 
 django.setup()
 from custom_handlers import get_script_logger
-from main.models import Event
+from databaseFunctions import EventBatch
 from main.models import File
 from main.models import Transfer
 
@@ -217,28 +216,19 @@ def write_premis_event_per_file(file_uuids, transfer_uuid, event_detail):
     """Generate PREMIS events per File object verified in this transfer."""
     event_type = "fixity check"
     event_outcome = "pass"
-    events = []
-    agents = Transfer.objects.get(uuid=transfer_uuid).agents
-    with transaction.atomic():
+    agents = list(
+        Transfer.objects.get(uuid=transfer_uuid).agents.values_list("pk", flat=True)
+    )
+    with transaction.atomic(), EventBatch() as events:
         for file_obj in file_uuids:
-            checksum_event = Event(
-                file_uuid=file_obj,
-                event_type=event_type,
-                event_datetime=datetime.datetime.now(),
-                event_outcome=event_outcome,
-                event_detail=event_detail,
-                event_id=uuid.uuid4(),
+            events.add(
+                fileUUID=file_obj.uuid,
+                eventType=event_type,
+                eventDateTime=datetime.datetime.now(),
+                eventOutcome=event_outcome,
+                eventDetail=event_detail,
+                agents=agents,
             )
-            events.append(checksum_event)
-        # All the events sit in memory at this point and are then written.
-        # We could write this in batches if we need to optimize further.
-        Event.objects.bulk_create(events)
-        # Adding many-to-many fields with bulk create is awkward, we have to
-        # loop through again.
-        for event in Event.objects.filter(
-            file_uuid__in=[event.file_uuid for event in events]
-        ):
-            event.agents.add(*agents)
 
 
 def run_hashsum_commands(job):
@@ -107,6 +107,16 @@ CONFIG_MAPPING = {
         "option": "elasticsearchTimeout",
         "type": "float",
     },
+    "elasticsearch_bulk_chunk_size": {
+        "section": "MCPClient",
+        "option": "elasticsearch_bulk_chunk_size",
+        "type": "int",
+    },
+    "elasticsearch_bulk_thread_count": {
+        "section": "MCPClient",
+        "option": "elasticsearch_bulk_thread_count",
+        "type": "int",
+    },
     "search_enabled": {
         "section": "MCPClient",
         "process_function": process_search_enabled,
@@ -121,6 +131,11 @@ CONFIG_MAPPING = {
         "option": "capture_client_script_output",
         "type": "boolean",
     },
+    "client_script_output_max_size": {
+        "section": "MCPClient",
+        "option": "client_script_output_max_size",
+        "type": "int",
+    },
     "removable_files": {
         "section": "MCPClient",
         "option": "removableFiles",
@@ -142,6 +157,11 @@ CONFIG_MAPPING = {
         "option": "storage_service_client_quick_timeout",
         "type": "float",
     },
+    "storage_service_client_cache_ttl": {
+        "section": "MCPClient",
+        "option": "storage_service_client_cache_ttl",
+        "type": "float",
+    },
     "agentarchives_client_timeout": {
         "section": "MCPClient",
         "option": "agentarchives_client_timeout",
@@ -200,6 +220,27 @@ CONFIG_MAPPING = {
         "option": "clamav_client_max_scan_size",
         "type": "float",
     },
+    # [siegfried]
+    "siegfried_server": {
+        "section": "MCPClient",
+        "option": "siegfried_server",
+        "type": "string",
+    },
+    "siegfried_client_timeout": {
+        "section": "MCPClient",
+        "option": "siegfried_client_timeout",
+        "type": "float",
+    },
+    "characterization_tool_workers": {
+        "section": "MCPClient",
+        "option": "characterization_tool_workers",
+        "type": "int",
+    },
+    "extraction_tool_workers": {
+        "section": "MCPClient",
+        "option": "extraction_tool_workers",
+        "type": "int",
+    },
     # [client]
     "db_engine": {"section": "client", "option": "engine", "type": "string"},
     "db_name": {"section": "client", "option": "database", "type": "string"},
@@ -221,16 +262,20 @@ archivematicaClientModules = /usr/lib/archivematica/MCPClient/archivematicaClien
 clientAssetsDirectory = /usr/lib/archivematica/MCPClient/assets/
 elasticsearchServer = localhost:9200
 elasticsearchTimeout = 10
+elasticsearch_bulk_chunk_size = 500
+elasticsearch_bulk_thread_count = 1
 search_enabled = true
 metadata_xml_validation_enabled = false
 index_aip_continue_on_error = false
 capture_client_script_output = true
+client_script_output_max_size = 1048576
 temp_dir = /var/archivematica/sharedDirectory/tmp
 removableFiles = Thumbs.db, Icon, Icon\r, .DS_Store
 clamav_server = /var/run/clamav/clamd.ctl
 clamav_pass_by_stream = True
 storage_service_client_timeout = 86400
 storage_service_client_quick_timeout = 5
+storage_service_client_cache_ttl = 60
 agentarchives_client_timeout = 300
 prometheus_bind_address =
 prometheus_bind_port =
@@ -242,6 +287,10 @@ clamav_client_timeout = 86400
 clamav_client_backend = clamdscanner    ; Options: clamdscanner or clamscanner
 clamav_client_max_file_size = 42        ; MB
 clamav_client_max_scan_size = 42        ; MB
+siegfried_server =
+siegfried_client_timeout = 300
+characterization_tool_workers = 4
+extraction_tool_workers = 4
 
 
 [client]
@@ -362,20 +411,28 @@ REMOVABLE_FILES = config.get("removable_files")
 TEMP_DIRECTORY = config.get("temp_directory")
 ELASTICSEARCH_SERVER = config.get("elasticsearch_server")
 ELASTICSEARCH_TIMEOUT = config.get("elasticsearch_timeout")
+ELASTICSEARCH_BULK_CHUNK_SIZE = config.get("elasticsearch_bulk_chunk_size")
+ELASTICSEARCH_BULK_THREAD_COUNT = config.get("elasticsearch_bulk_thread_count")
 CLAMAV_SERVER = config.get("clamav_server")
 CLAMAV_PASS_BY_STREAM = config.get("clamav_pass_by_stream")
 CLAMAV_CLIENT_TIMEOUT = config.get("clamav_client_timeout")
 CLAMAV_CLIENT_BACKEND = config.get("clamav_client_backend")
 CLAMAV_CLIENT_MAX_FILE_SIZE = config.get("clamav_client_max_file_size")
 CLAMAV_CLIENT_MAX_SCAN_SIZE = config.get("clamav_client_max_scan_size")
+SIEGFRIED_SERVER = config.get("siegfried_server")
+SIEGFRIED_CLIENT_TIMEOUT = config.get("siegfried_client_timeout")
+CHARACTERIZATION_TOOL_WORKERS = config.get("characterization_tool_workers")
+EXTRACTION_TOOL_WORKERS = config.get("extraction_tool_workers")
 STORAGE_SERVICE_CLIENT_TIMEOUT = config.get("storage_service_client_timeout")
 STORAGE_SERVICE_CLIENT_QUICK_TIMEOUT = config.get(
     "storage_service_client_quick_timeout"
 )
+STORAGE_SERVICE_CLIENT_CACHE_TTL = config.get("storage_service_client_cache_ttl")
 AGENTARCHIVES_CLIENT_TIMEOUT = config.get("agentarchives_client_timeout")
 SEARCH_ENABLED = config.get("search_enabled")
 INDEX_AIP_CONTINUE_ON_ERROR = config.get("index_aip_continue_on_error")
 CAPTURE_CLIENT_SCRIPT_OUTPUT = config.get("capture_client_script_output")
+CLIENT_SCRIPT_OUTPUT_MAX_SIZE = config.get("client_script_output_max_size")
 DEFAULT_CHECKSUM_ALGORITHM = "sha256"
 PROMETHEUS_DETAILED_METRICS = config.get("prometheus_detailed_metrics")
 PROMETHEUS_BIND_ADDRESS = config.get("prometheus_bind_address")
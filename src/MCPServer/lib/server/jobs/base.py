@@ -10,6 +10,8 @@ from dbconns import auto_close_old_connections
 from django.utils import timezone
 from main import models
 
+from server.unit_changes import changes
+
 logger = logging.getLogger("archivematica.mcp.server.jobs")
 
 
@@ -67,7 +69,7 @@ class Job(metaclass=abc.ABCMeta):
 
     @auto_close_old_connections()
     def save_to_db(self):
-        return models.Job.objects.create(
+        job = models.Job.objects.create(
             jobuuid=self.uuid,
             jobtype=self.description,
             directory=self.package.current_path_for_db,
@@ -79,12 +81,32 @@ class Job(metaclass=abc.ABCMeta):
             createdtimedec=float(self.created_at.strftime("0.%f")),
             microservicechainlink=self.link.id,
         )
+        self._record_change(self.STATUS_EXECUTING_COMMANDS)
+
+        return job
+
+    def _record_change(self, status):
+        """Publish a change of status of the job, once it's in the database."""
+        changes.record(
+            self.package.uuid,
+            unit_type=self.package.UNIT_VARIABLE_TYPE,
+            job=str(self.uuid),
+            status=status,
+        )
 
     @auto_close_old_connections()
-    def mark_awaiting_decision(self):
-        return models.Job.objects.filter(jobuuid=self.uuid).update(
-            currentstep=self.STATUS_AWAITING_DECISION
+    def update_status(self, status):
+        """Update the status of the job in the database."""
+        updated = models.Job.objects.filter(jobuuid=self.uuid).update(
+            currentstep=status
         )
+        self._record_change(status)
+
+        return updated
+
+    @auto_close_old_connections()
+    def mark_awaiting_decision(self):
+        return self.update_status(self.STATUS_AWAITING_DECISION)
 
     @auto_close_old_connections()
     def mark_complete(self):
@@ -94,6 +116,4 @@ class Job(metaclass=abc.ABCMeta):
             self.uuid,
             self.exit_code,
         )
-        return models.Job.objects.filter(jobuuid=self.uuid).update(
-            currentstep=self.STATUS_COMPLETED_SUCCESSFULLY
-        )
+        return self.update_status(self.STATUS_COMPLETED_SUCCESSFULLY)
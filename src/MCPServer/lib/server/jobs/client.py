@@ -52,6 +52,8 @@ class ClientScriptJob(Job, metaclass=abc.ABCMeta):
 
         # Lazy initialize in `run` method
         self.task_backend = None
+        # Set while the tasks are processed, see `awaiting_results`
+        self.results_future = None
 
         # Exit code is the maximum task exit code; start with None
         self.exit_code = None
@@ -118,6 +120,24 @@ class ClientScriptJob(Job, metaclass=abc.ABCMeta):
 
         self.task_backend = get_task_backend()
         self.submit_tasks()
+
+        # If the backend supports it, give the thread back while out of
+        # process tasks are running. The queue calls `collect_results` later.
+        self.results_future = self.task_backend.get_results_future(self)
+        if self.results_future is not None:
+            return self
+
+        return self.collect_results()
+
+    @property
+    def awaiting_results(self):
+        """True if the job is waiting for its tasks to be processed."""
+        return self.results_future is not None
+
+    @auto_close_old_connections()
+    def collect_results(self):
+        """Process the results of the tasks and return the next job."""
+        self.results_future = None
         # Block until out of process tasks have completed
         self.wait_for_task_results()
 
@@ -152,9 +172,7 @@ class ClientScriptJob(Job, metaclass=abc.ABCMeta):
     def update_status_from_exit_code(self):
         status_code = self.link.get_status_id(self.exit_code)
 
-        return models.Job.objects.filter(jobuuid=self.uuid).update(
-            currentstep=status_code
-        )
+        return self.update_status(status_code)
 
 
 class DirectoryClientScriptJob(ClientScriptJob):
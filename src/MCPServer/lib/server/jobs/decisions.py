@@ -12,7 +12,7 @@ from main import models
 
 from server.jobs.base import Job
 from server.processing_config import load_preconfigured_choice
-from server.processing_config import load_processing_xml
+from server.processing_config import load_preconfigured_choices
 from server.translation import TranslationLabel
 from server.workflow_abilities import choice_is_available
 
@@ -249,26 +249,23 @@ class UpdateContextDecisionJob(DecisionJob):
     def load_preconfigured_context(self):
         normalized_choice_id = self.CHOICE_MAPPING.get(self.link.id, self.link.id)
 
-        processing_xml = load_processing_xml(self.package.current_path)
-        if processing_xml is not None:
-            for preconfiguredChoice in processing_xml.findall(".//preconfiguredChoice"):
-                if preconfiguredChoice.find("appliesTo").text == normalized_choice_id:
-                    desired_choice = preconfiguredChoice.find("goToChain").text
-                    desired_choice = self.CHOICE_MAPPING.get(
-                        desired_choice, desired_choice
-                    )
-
-                    try:
-                        link = self.workflow.get_link(normalized_choice_id)
-                    except KeyError:
-                        return None
-
-                    for replacement in link.config["replacements"]:
-                        if replacement["id"] == desired_choice:
-                            # In our JSON-encoded document, the items in
-                            # the replacements are not wrapped, do it here.
-                            # Needed by ReplacementDict.
-                            return self._format_items(replacement["items"])
+        desired_choice = load_preconfigured_choices(self.package.current_path).get(
+            normalized_choice_id
+        )
+        if desired_choice is None:
+            return None
+        desired_choice = self.CHOICE_MAPPING.get(desired_choice, desired_choice)
+
+        try:
+            link = self.workflow.get_link(normalized_choice_id)
+        except KeyError:
+            return None
+
+        for replacement in link.config["replacements"]:
+            if replacement["id"] == desired_choice:
+                # In our JSON-encoded document, the items in the replacements
+                # are not wrapped, do it here. Needed by ReplacementDict.
+                return self._format_items(replacement["items"])
 
         return None
 
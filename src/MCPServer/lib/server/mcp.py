@@ -45,6 +45,7 @@ from server.packages import Package
 from server.packages import Transfer
 from server.queues import PackageQueue
 from server.tasks import Task
+from server.tasks import stop_task_backend
 from server.watch_dirs import watch_directories
 from server.workflow import load_workflow
 
@@ -141,6 +142,8 @@ def main(shutdown_event=None):
     for thread in rpc_threads:
         thread.join(0.1)
     logger.debug("RPC threads stopped.")
+    stop_task_backend(timeout=1.0)
+    logger.debug("Task backend stopped.")
 
     logger.info("MCP server shut down complete.")
 
@@ -18,7 +18,9 @@ from django.utils import timezone
 from main import models
 
 from server.jobs import JobChain
+from server.processing_config import invalidate_preconfigured_choices
 from server.processing_config import processing_configuration_file_exists
+from server.unit_changes import changes
 from server.utils import uuid_from_path
 
 logger = logging.getLogger("archivematica.mcp.server.packages")
@@ -495,16 +497,20 @@ class LocationPath:
         return self.uuid, self.path
 
 
+def _get_file_absolute_path(current_location, unit_directory):
+    absolute_path = current_location.replace(r"%SIPDirectory%", unit_directory)
+    return absolute_path.replace(r"%transferDirectory%", unit_directory)
+
+
 def get_file_replacement_mapping(file_obj, unit_directory):
     mapping = BASE_REPLACEMENTS.copy()
     dirname = os.path.dirname(file_obj.currentlocation.decode())
     name, ext = os.path.splitext(file_obj.currentlocation.decode())
     name = os.path.basename(name)
 
-    absolute_path = file_obj.currentlocation.decode().replace(
-        r"%SIPDirectory%", unit_directory
+    absolute_path = _get_file_absolute_path(
+        file_obj.currentlocation.decode(), unit_directory
     )
-    absolute_path = absolute_path.replace(r"%transferDirectory%", unit_directory)
 
     mapping.update(
         {
@@ -526,6 +532,46 @@ def get_file_replacement_mapping(file_obj, unit_directory):
     return mapping
 
 
+def _scan_files(start_path):
+    """Find the files under ``start_path`` with a single ``os.scandir`` walk.
+
+    Files are listed in the order ``os.walk`` would list them, and like
+    ``os.walk`` symbolic links to directories are not followed and
+    directories that can't be read are skipped.
+
+    Yields the files of each directory as it is read, as a list of
+    ``(path, exists)`` tuples where ``exists`` is false for broken symbolic
+    links.
+    """
+    directories = [start_path]
+    while directories:
+        directory = directories.pop()
+        files = []
+        subdirectories = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        if not entry.is_symlink():
+                            subdirectories.append(entry.path)
+                        continue
+                    files.append(
+                        (
+                            entry.path,
+                            not entry.is_symlink() or os.path.exists(entry.path),
+                        )
+                    )
+        except OSError:
+            continue
+        directories.extend(reversed(subdirectories))
+        if files:
+            yield files
+
+
 class Package(metaclass=abc.ABCMeta):
     """A `Package` can be a Transfer, a SIP, or a DIP."""
 
@@ -570,6 +616,9 @@ class Package(metaclass=abc.ABCMeta):
         """
         with auto_close_old_connections():
             self.queryset().update(status=status, **defaults)
+        changes.record(
+            self.uuid, unit_type=self.UNIT_VARIABLE_TYPE, package_status=status
+        )
 
     def mark_as_done(self):
         """Change the status of the package to Done."""
@@ -586,9 +635,10 @@ class Package(metaclass=abc.ABCMeta):
     @current_path.setter
     def current_path(self, value):
         """The real (no shared dir vars) path to the package."""
-        self._current_path = value.replace(
-            r"%sharedPath%", _get_setting("SHARED_DIRECTORY")
-        )
+        value = value.replace(r"%sharedPath%", _get_setting("SHARED_DIRECTORY"))
+        if value != self._current_path:
+            invalidate_preconfigured_choices(self._current_path)
+        self._current_path = value
 
     @property
     def current_path_for_db(self):
@@ -642,6 +692,11 @@ class Package(metaclass=abc.ABCMeta):
     def files(self, filter_filename_end=None, filter_subdir=None):
         """Generator that yields all files associated with the package or that
         should be associated with a package.
+
+        The File rows are read upfront and matched in memory against the
+        paths found while walking the package directory, so files are yielded
+        directory by directory as the walk goes. Replacement mappings are only
+        built for the files that are yielded.
         """
         with auto_close_old_connections():
             queryset = self.base_queryset
@@ -658,30 +713,45 @@ class Package(metaclass=abc.ABCMeta):
             if filter_subdir:
                 start_path = start_path + filter_subdir
 
-            files_returned_already = set()
-            if queryset.exists():
-                for file_obj in queryset.iterator():
-                    file_obj_mapped = get_file_replacement_mapping(
-                        file_obj, self.current_path
-                    )
-                    if not os.path.exists(file_obj_mapped.get("%inputFile%")):
-                        continue
-                    files_returned_already.add(file_obj_mapped.get("%inputFile%"))
-                    yield file_obj_mapped
-
-            for basedir, _, files in os.walk(start_path):
-                for file_name in files:
-                    if filter_filename_end and not file_name.endswith(
+            file_rows = collections.defaultdict(list)
+            for file_row in queryset.values_list(
+                "pk", "originallocation", "currentlocation", "filegrpuse", named=True
+            ).iterator():
+                absolute_path = _get_file_absolute_path(
+                    file_row.currentlocation.decode(), self.current_path
+                )
+                file_rows[absolute_path].append(file_row)
+
+            for files in _scan_files(start_path):
+                unregistered_file_paths = []
+                for file_path, exists in files:
+                    if file_path in file_rows:
+                        rows = file_rows.pop(file_path)
+                        if exists:
+                            for file_row in rows:
+                                yield get_file_replacement_mapping(
+                                    file_row, self.current_path
+                                )
+                            continue
+                    if filter_filename_end and not os.path.basename(file_path).endswith(
                         filter_filename_end
                     ):
                         continue
-                    file_path = os.path.join(basedir, file_name)
-                    if file_path not in files_returned_already:
-                        yield {
-                            r"%relativeLocation%": file_path,
-                            r"%fileUUID%": "None",
-                            r"%fileGrpUse%": "",
-                        }
+                    unregistered_file_paths.append(file_path)
+                for file_path in unregistered_file_paths:
+                    yield {
+                        r"%relativeLocation%": file_path,
+                        r"%fileUUID%": "None",
+                        r"%fileGrpUse%": "",
+                    }
+
+            # Only rows outside of the walk (or that aren't regular files) are
+            # left, and those need to be checked on disk.
+            for absolute_path, rows in file_rows.items():
+                if not os.path.exists(absolute_path):
+                    continue
+                for file_row in rows:
+                    yield get_file_replacement_mapping(file_row, self.current_path)
 
     @auto_close_old_connections()
     def set_variable(self, key, value, chain_link_id):
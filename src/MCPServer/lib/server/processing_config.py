@@ -3,11 +3,16 @@
 This module lists the processing configuration fields where the user has the
 ability to establish predefined choices via the user interface, and handles
 processing config file operations.
+
+The preconfigured choices of each package are parsed once and cached until
+its processing config file changes, see ``ProcessingConfigCache``.
 """
 
 import abc
 import logging
 import os
+import threading
+from collections import OrderedDict
 
 import storageService as storage_service
 from django.conf import settings
@@ -17,6 +22,9 @@ from server.workflow_abilities import choice_is_available
 
 logger = logging.getLogger("archivematica.mcp.server.processing_config")
 
+# Maximum number of packages whose preconfigured choices are kept in memory.
+MAX_CACHED_CONFIGS = 256
+
 
 class ProcessingConfigField(metaclass=abc.ABCMeta):
     def __init__(self, link_id, name, **kwargs):
@@ -317,16 +325,91 @@ def load_processing_xml(package_path):
         return None
 
 
+def _get_preconfigured_choices(processing_xml):
+    """Map the workflow link IDs of a processing config to their choices.
+
+    If a link has more than one choice, the last one wins.
+    """
+    return {
+        preconfigured_choice.find("appliesTo").text: preconfigured_choice.find(
+            "goToChain"
+        ).text
+        for preconfigured_choice in processing_xml.findall(".//preconfiguredChoice")
+    }
+
+
+class ProcessingConfigCache:
+    """LRU cache of the preconfigured choices of each package.
+
+    Decision points used to read and parse the processing config file of the
+    package, often on a network filesystem, every time. Entries are keyed by
+    the path of the file and validated against its modification time and
+    size, so checking for changes costs a ``stat`` call.
+    """
+
+    def __init__(self, max_size=MAX_CACHED_CONFIGS):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_choices(self, package_path):
+        """Return the preconfigured choices of a package by link ID.
+
+        The dictionary returned is shared and must not be modified.
+        """
+        processing_file_path = os.path.join(package_path, settings.PROCESSING_XML_FILE)
+        try:
+            stat = os.stat(processing_file_path)
+        except OSError:
+            self.invalidate(package_path)
+            return {}
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(processing_file_path)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(processing_file_path)
+                return entry[1]
+
+        processing_xml = load_processing_xml(package_path)
+        choices = {}
+        if processing_xml is not None:
+            choices = _get_preconfigured_choices(processing_xml)
+
+        with self._lock:
+            self._entries[processing_file_path] = (version, choices)
+            self._entries.move_to_end(processing_file_path)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return choices
+
+    def invalidate(self, package_path):
+        """Forget the choices of the package at ``package_path``."""
+        processing_file_path = os.path.join(package_path, settings.PROCESSING_XML_FILE)
+        with self._lock:
+            self._entries.pop(processing_file_path, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = ProcessingConfigCache()
+
+
+def load_preconfigured_choices(package_path):
+    """Return the preconfigured choices of a package by workflow link ID."""
+    return cache.get_choices(package_path)
+
+
 def load_preconfigured_choice(package_path, workflow_link_id):
-    choice = None
+    return load_preconfigured_choices(package_path).get(str(workflow_link_id))
 
-    processing_xml = load_processing_xml(package_path)
-    if processing_xml is not None:
-        for preconfigured_choice in processing_xml.findall(".//preconfiguredChoice"):
-            if preconfigured_choice.find("appliesTo").text == str(workflow_link_id):
-                choice = preconfigured_choice.find("goToChain").text
 
-    return choice
+def invalidate_preconfigured_choices(package_path):
+    """Forget the cached choices of a package, e.g. when it's moved."""
+    cache.invalidate(package_path)
 
 
 def processing_configuration_file_exists(processing_configuration_name):
@@ -10,9 +10,11 @@ import threading
 from django.conf import settings
 
 from server import metrics
+from server.jobs import ClientScriptJob
 from server.jobs import DecisionJob
 from server.packages import DIP
 from server.packages import SIP
+from server.unit_changes import changes
 
 logger = logging.getLogger("archivematica.mcp.server.queues")
 
@@ -42,11 +44,13 @@ class PackageQueue:
        schedules their `run` method for execution in a worker thread (via
        `ThreadPoolExecutor.submit`).
     3. The `Job.run` method executes. If it is a `ClientScriptJob` (executing
-       on MCPClient), it generates the `Task` objects required, and sends them
-       to MCPClient via `GearmanTaskBackend`, and waits for the results. All of
-       this happens on the one worker thread.
+       on MCPClient), it generates the `Task` objects required, sends them
+       to MCPClient via `GearmanTaskBackend` and returns itself, releasing the
+       worker thread. When Gearman reports that all its tasks are done, the
+       job's `collect_results` method is scheduled on a worker thread to
+       process the results.
     4. On the completion of tasks (i.e. results are returned by Gearman),
-       `Job.run` returns the _next_ job to schedule, if any. In practice this
+       `Job.run` (or `ClientScriptJob.collect_results`) returns the _next_ job to schedule, if any. In practice this
        is usually retrieved from the `JobChain` via `next(self.job_chain)`.
     5. Back in the main thread, a callback attached to the result of `Job.run`
        triggers adding the next job to the active job queue. This cycle
@@ -174,9 +178,14 @@ class PackageQueue:
             return
 
         metrics.job_queue_length_gauge.dec()
+
+        return self._submit_job(job, job.run)
+
+    def _submit_job(self, job, fn):
+        """Run `fn`, a step of `job`, in our thread pool."""
         metrics.active_jobs_gauge.inc()
 
-        result = self.executor.submit(job.run)
+        result = self.executor.submit(fn)
         result.add_done_callback(self._job_completed_callback)
 
         if job.link.is_terminal:
@@ -195,7 +204,11 @@ class PackageQueue:
         job in the chain. This function is called by an executor on completion
         of a Job.
         """
-        if future.result() is not None:
+        result = future.result()
+        if isinstance(result, ClientScriptJob) and result.link.id == link_id:
+            # Still waiting for its tasks, we'll be called again.
+            return
+        if result is not None:
             logger.warning(
                 "Unexpectedly received another job on package completion. "
                 "Please verify the value of `end` in the workflow. Link %s.",
@@ -221,6 +234,8 @@ class PackageQueue:
 
         if not next_job:
             return
+        elif isinstance(next_job, ClientScriptJob) and next_job.awaiting_results:
+            self.await_results(next_job)
         elif isinstance(next_job, DecisionJob) and next_job.awaiting_decision:
             self.await_decision(next_job)
             self.queue_next_job()
@@ -273,6 +288,9 @@ class PackageQueue:
             if package.uuid not in self.active_packages:
                 self.active_packages[package.uuid] = package
                 metrics.active_package_gauge.inc()
+                changes.record(
+                    package.uuid, unit_type=package.UNIT_VARIABLE_TYPE, active=True
+                )
                 if self.debug:
                     logger.debug("Marked package %s as active", package.uuid)
             else:
@@ -286,6 +304,9 @@ class PackageQueue:
             if package.uuid in self.active_packages:
                 del self.active_packages[package.uuid]
                 metrics.active_package_gauge.dec()
+                changes.record(
+                    package.uuid, unit_type=package.UNIT_VARIABLE_TYPE, active=False
+                )
                 if self.debug:
                     logger.debug("Marked package %s as inactive", package.uuid)
             else:
@@ -334,6 +355,24 @@ class PackageQueue:
         if self.debug:
             logger.debug("Marked job %s as awaiting a decision", job.uuid)
 
+    def await_results(self, job):
+        """Collect the results of a job once its tasks are done.
+
+        No thread is used while waiting; the results are processed in our
+        thread pool when the future of the job is resolved.
+        """
+
+        def collect(future):
+            try:
+                self._submit_job(job, job.collect_results)
+            except RuntimeError:
+                # The executor has been shut down
+                logger.warning(
+                    "Unable to collect the results of job %s", job.uuid, exc_info=True
+                )
+
+        job.results_future.add_done_callback(collect)
+
     def jobs_awaiting_decisions(self):
         """Returns all jobs waiting for input."""
         with self.waiting_choices_lock:
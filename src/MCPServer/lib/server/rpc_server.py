@@ -20,17 +20,19 @@ from socket import gethostname
 import gearman
 from dbconns import auto_close_old_connections
 from django.conf import settings as django_settings
-from django.db import connection
 from gearman import GearmanWorker
 from gearman_encoder import JSONDataEncoder
 from lxml import etree
+from main.models import PACKAGE_STATUS_PROCESSING
 from main.models import SIP
+from main.models import File
 from main.models import Job
 from main.models import Transfer
 
 from server.packages import create_package
 from server.packages import get_approve_transfer_chain_id
 from server.processing_config import get_processing_fields
+from server.unit_changes import changes
 
 logger = logging.getLogger("archivematica.mcp.server.rpc_server")
 
@@ -337,60 +339,115 @@ class RPCServer(GearmanWorker):
     def _units_statuses_handler(self, worker, job, payload):
         """Returns the status of units that are of type SIP or Transfer.
 
-        It returns a JSON-encoded objects. Its ``objects`` attribute is an
+        It returns a JSON-encoded object. Its ``objects`` attribute is an
         array of objects, each of which represents a single unit. Each unit
-        has a ``jobs`` attribute shoe value is an array of objects, each of
+        has a ``jobs`` attribute whose value is an array of objects, each of
         which represents a job of the unit.
 
+        If the optional ``since`` parameter is given, only the units that
+        changed after it are returned, if that's known (``full`` is false).
+        Its value should be the ``timestamp`` attribute of the response to a
+        previous request.
+
         [config]
         name = getUnitsStatuses
         raise_exc = False
         """
         unit_types = {"SIP": (SIP, "unitSIP"), "Transfer": (Transfer, "unitTransfer")}
         try:
-            model_attrs = unit_types[payload["type"]]
+            model, unit_type = unit_types[payload["type"]]
             lang = payload["lang"]
         except KeyError as err:
             raise UnexpectedPayloadError(f"Missing parameter: {err}")
-        model = model_attrs[0]
-        sql = """
-        SELECT SIPUUID,
-               MAX(UNIX_TIMESTAMP(createdTime) + createdTimeDec) AS timestamp
-            FROM Jobs
-            WHERE unitType=%s AND NOT SIPUUID LIKE '%%None%%'
-            GROUP BY SIPUUID;"""
-        with connection.cursor() as cursor:
-            cursor.execute(sql, (model_attrs[1],))
-            sipuuids_and_timestamps = cursor.fetchall()
+        since = payload.get("since")
+        if since is not None:
+            try:
+                since = float(since)
+            except (TypeError, ValueError):
+                raise UnexpectedPayloadError(f"Invalid parameter: since={since!r}")
+
+        # Take the timestamp before reading anything so changes made while we
+        # read are returned again next time rather than missed.
+        timestamp = changes.now()
+        changed_unit_ids = changes.changed_since(since)
+        if changed_unit_ids == []:
+            objects = []
+        else:
+            objects = self._get_units_statuses(
+                model, unit_type, lang, unit_ids=changed_unit_ids
+            )
+
+        return {
+            "objects": objects,
+            "timestamp": timestamp,
+            "full": changed_unit_ids is None,
+        }
+
+    def _get_units_statuses(self, model, unit_type, lang, unit_ids=None):
+        """Build the status of the visible units of a given type.
+
+        Units, jobs and (for SIPs) access system IDs are read with one query
+        each. `unit_ids` optionally restricts the units returned.
+        """
+        units = model.objects.filter(hidden=False)
+        if unit_ids is not None:
+            units = units.filter(pk__in=unit_ids)
+        unit_statuses = dict(units.values_list("pk", "status"))
+
+        jobs_by_unit = {}
+        jobs = (
+            Job.objects.filter(unittype=unit_type, sipuuid__in=units.values("pk"))
+            .order_by("-createdtime", "-createdtimedec")
+            .values_list(
+                "jobuuid",
+                "sipuuid",
+                "directory",
+                "currentstep",
+                "microservicechainlink",
+                "createdtime",
+                "createdtimedec",
+                named=True,
+            )
+        )
+        for job_ in jobs.iterator():
+            jobs_by_unit.setdefault(job_.sipuuid, []).append(job_)
+
+        # Embed "Access System ID" in status data (used in Upload DIP).
+        # `access_system_id` is a field of the Transfer model - the only way
+        # we have at the moment to look up the Transfer is by using the files
+        # in common.
+        access_system_ids = {}
+        if model is SIP:
+            for sip_id, access_system_id in (
+                File.objects.filter(sip_id__in=jobs_by_unit, transfer__isnull=False)
+                .values_list("sip_id", "transfer__access_system_id")
+                .distinct()
+            ):
+                access_system_ids.setdefault(sip_id, access_system_id)
+
         jobs_awaiting_for_approval = self.package_queue.jobs_awaiting_decisions()
         objects = []
-        for unit_id, timestamp in sipuuids_and_timestamps:
-            unit = model.objects.get(pk=unit_id)
-            if unit.hidden:
+        for unit_id, unit_jobs in jobs_by_unit.items():
+            if unit_id not in unit_statuses:
                 continue
             item = {
-                "id": unit_id,
-                "uuid": unit_id,
-                "timestamp": float(timestamp),
-                "active": unit.active,
+                "id": str(unit_id),
+                "uuid": str(unit_id),
+                "timestamp": max(
+                    calendar.timegm(job_.createdtime.timetuple())
+                    + float(job_.createdtimedec)
+                    for job_ in unit_jobs
+                ),
+                "active": unit_statuses[unit_id] == PACKAGE_STATUS_PROCESSING,
+                "directory": Job(
+                    sipuuid=unit_id, directory=unit_jobs[0].directory
+                ).get_directory_name(),
                 "jobs": [],
             }
-            jobs = Job.objects.filter(sipuuid=unit_id).order_by("-createdtime")
-            if jobs:
-                item["directory"] = jobs[0].get_directory_name()
-            # Embed "Access System ID" in status data (used in Upload DIP).
-            # `access_system_id` is a property of the Transfer model - the
-            # only way we have at the moment to look up the Transfer is by
-            # using the files in common.
-            if model is SIP:
-                try:
-                    trfs = Transfer.objects.filter(file__sip_id=item["uuid"]).distinct()
-                    if trfs:
-                        item["access_system_id"] = trfs[0].access_system_id
-                except Exception:
-                    pass
+            if unit_id in access_system_ids:
+                item["access_system_id"] = access_system_ids[unit_id]
             # Append jobs
-            for job_ in jobs:
+            for job_ in unit_jobs:
                 try:
                     link = self.workflow.get_link(job_.microservicechainlink)
                 except KeyError:
@@ -415,6 +472,23 @@ class RPCServer(GearmanWorker):
             objects.append(item)
         return objects
 
+    def _units_events_handler(self, worker, job, payload):
+        """Returns the events published after a cursor.
+
+        Events are objects describing a change of a unit, e.g. the status of
+        one of its jobs. The response has the list of ``events``, the
+        ``cursor`` to send next time and ``reset``, which is true when the
+        events since the ``cursor`` given are unknown and clients should
+        reload the status of all the units. Without a cursor, only the cursor
+        to follow the events from now on is returned.
+
+        [config]
+        name = getUnitsEvents
+        raise_exc = False
+        """
+        events, cursor, reset = changes.events_since(payload.get("cursor"))
+        return {"events": events, "cursor": cursor, "reset": reset}
+
     def _unit_status_handler(self, worker, job, payload):
         """Retrieve status information about a unit.
 
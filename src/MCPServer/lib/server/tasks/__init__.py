@@ -1,6 +1,13 @@
 from server.tasks.backends import GearmanTaskBackend
 from server.tasks.backends import TaskBackend
 from server.tasks.backends import get_task_backend
+from server.tasks.backends import stop_task_backend
 from server.tasks.task import Task
 
-__all__ = ("GearmanTaskBackend", "Task", "TaskBackend", "get_task_backend")
+__all__ = (
+    "GearmanTaskBackend",
+    "Task",
+    "TaskBackend",
+    "get_task_backend",
+    "stop_task_backend",
+)
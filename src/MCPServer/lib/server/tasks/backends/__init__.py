@@ -6,22 +6,33 @@ import threading
 
 from server.tasks.backends.base import TaskBackend
 from server.tasks.backends.gearman_backend import GearmanTaskBackend
+from server.tasks.backends.gearman_backend import stop_dispatcher
 
-backend_local = threading.local()
+_task_backend = None
+_task_backend_lock = threading.Lock()
 
 
 def get_task_backend():
     """Return the backend for processing tasks.
 
-    The backend is thread-local, so each thread will have a different
-    instance.
+    The backend is shared by all the threads of the process, since the results
+    of a job are collected on a different thread than the one that submitted
+    its tasks.
     """
+    global _task_backend
+
     # In future, this could be a configuration setting, but for now it
     # is always gearman.
-    if not getattr(backend_local, "task_backend", None):
-        backend_local.task_backend = GearmanTaskBackend()
+    with _task_backend_lock:
+        if _task_backend is None:
+            _task_backend = GearmanTaskBackend()
+
+    return _task_backend
+
 
-    return backend_local.task_backend
+def stop_task_backend(timeout=None):
+    """Stop the threads used by the backend, e.g. on shutdown."""
+    stop_dispatcher(timeout)
 
 
-__all__ = ("GearmanTaskBackend", "TaskBackend", "get_task_backend")
+__all__ = ("GearmanTaskBackend", "TaskBackend", "get_task_backend", "stop_task_backend")
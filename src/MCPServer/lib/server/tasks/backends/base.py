@@ -22,3 +22,11 @@ class TaskBackend(metaclass=abc.ABCMeta):
         Note that task objects are not necessarily returned in the order
         they were submitted.
         """
+
+    def get_results_future(self, job):
+        """Return a future resolved once all the tasks of the job are done.
+
+        Once it's resolved `wait_for_results` returns without blocking.
+        Backends that can only wait synchronously return `None`.
+        """
+        return None
@@ -1,14 +1,24 @@
 """
 Gearman task backend. Submits `Task` objects to gearman for processing,
 and returns results.
+
+A single `GearmanDispatcher` thread owns the connections to the Gearman
+server. It submits the batches of tasks of every job and waits for all of
+them at once, resolving a future per batch as soon as Gearman reports it
+complete, so jobs don't need to hold a worker thread while MCPClient
+processes their tasks.
 """
 
+import concurrent.futures
 import datetime
 import logging
+import queue
+import threading
 import uuid
 
 from django.conf import settings
 from gearman import GearmanClient
+from gearman.client_handler import GearmanClientCommandHandler
 from gearman.constants import JOB_COMPLETE
 from gearman.constants import JOB_FAILED
 from gearman.constants import JOB_UNKNOWN
@@ -21,39 +31,229 @@ from server.tasks.task import Task
 logger = logging.getLogger("archivematica.mcp.server.jobs.tasks")
 
 
+class MCPGearmanClientCommandHandler(GearmanClientCommandHandler):
+    """Reports the requests that are done to the client as they happen."""
+
+    def recv_work_complete(self, job_handle, data):
+        result = super().recv_work_complete(job_handle, data)
+        self.connection_manager.request_done(self.handle_to_request_map[job_handle])
+        return result
+
+    def recv_work_fail(self, job_handle):
+        result = super().recv_work_fail(job_handle)
+        self.connection_manager.request_done(self.handle_to_request_map[job_handle])
+        return result
+
+    def on_io_error(self):
+        super().on_io_error()
+        # Requests sent through this connection are lost.
+        for request in list(self.requests_awaiting_handles) + list(
+            self.handle_to_request_map.values()
+        ):
+            self.connection_manager.request_done(request)
+
+
 class MCPGearmanClient(GearmanClient):
     """
-    Client that adds `wait_until_any_job_completed`, so that we can poll a bit
-    more efficiently.
+    Client that keeps track of the requests that are done, so that we can
+    wait for many requests without checking all of them after every poll.
     """
 
+    command_handler_class = MCPGearmanClientCommandHandler
     data_encoder = JSONDataEncoder
 
-    def wait_until_any_job_completed(self, job_requests, poll_timeout=None):
-        """
-        Go into a select loop until any of our jobs have completed or failed.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.done_requests = []
 
-        This is a modified version of `wait_until_jobs_completed`.
-        """
+    def request_done(self, request):
+        self.done_requests.append(request)
 
-        def continue_while_no_job_completed(any_activity):
-            """Returns False (exiting the poll loop) if anything was completed."""
-            for current_request in job_requests:
-                if current_request.complete and current_request.state != JOB_UNKNOWN:
-                    return False
 
-            return True
+class GearmanDispatcher:
+    """Submits Gearman jobs and waits for their completion in one thread.
 
-        self.poll_connections_until_stopped(
-            self.connection_list, continue_while_no_job_completed, timeout=poll_timeout
-        )
+    `submit_job` can be called from any thread. It returns a future that is
+    resolved with the `GearmanJobRequest` once Gearman reports the job as
+    complete or failed, or with an exception if the job is lost.
+
+    Callbacks added to the futures run on the dispatcher thread, so they
+    must not block.
+    """
+
+    # Maximum time (in seconds) a job waits in our queue before it's
+    # submitted while the dispatcher is waiting for other jobs to complete.
+    POLL_TIMEOUT = 0.05
+    # Time (in seconds) to wait for new jobs when there are none in flight.
+    IDLE_TIMEOUT = 1.0
+    # Maximum time (in seconds) to wait for Gearman to accept a job. The
+    # dispatcher can't submit or resolve other jobs in the meantime.
+    SUBMIT_TIMEOUT = 10.0
+
+    def __init__(self, client=None):
+        if client is None:
+            client = MCPGearmanClient([settings.GEARMAN_SERVER])
+        self.client = client
+
+        self._submissions = queue.Queue()
+        self._in_flight = {}  # GearmanJobRequest: Future
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def submit_job(self, **kwargs):
+        """Queue a job for submission, see `GearmanClient.submit_job`."""
+        future = concurrent.futures.Future()
+        self._submissions.put((kwargs, future))
+        self.start()
+        return future
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(
+                    target=self.run, name="GearmanDispatcher", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the dispatcher thread and wait for it to finish."""
+        self._stopped.set()
+        # Wake the thread up if it's waiting for new jobs.
+        self._submissions.put(None)
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def run(self):
+        while not self._stopped.is_set():
+            self._submit_queued_jobs(block=not self._in_flight)
+            if not self._in_flight:
+                continue
+
+            try:
+                self.client.poll_connections_until_stopped(
+                    self.client.connection_list,
+                    self._continue_polling,
+                    timeout=self.POLL_TIMEOUT,
+                )
+            except Exception as err:
+                logger.exception("Error waiting for Gearman jobs")
+                self._fail_in_flight_jobs(err)
+                continue
+
+            self._resolve_done_jobs()
+
+    def _continue_polling(self, any_activity):
+        return not self.client.done_requests and self._submissions.empty()
+
+    def _submit_queued_jobs(self, block):
+        try:
+            submissions = [
+                self._submissions.get(block=block, timeout=self.IDLE_TIMEOUT)
+            ]
+        except queue.Empty:
+            return
+        while True:
+            try:
+                submissions.append(self._submissions.get_nowait())
+            except queue.Empty:
+                break
+
+        for submission in submissions:
+            if submission is None:
+                # Queued by `stop`.
+                continue
+            kwargs, future = submission
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                request = self.client.submit_job(
+                    wait_until_complete=False,
+                    background=False,
+                    poll_timeout=self.SUBMIT_TIMEOUT,
+                    **kwargs,
+                )
+            except Exception as err:
+                logger.exception("Error submitting Gearman job")
+                future.set_exception(err)
+                continue
+            if request.timed_out:
+                logger.error("Timed out submitting Gearman job %r", request)
+                self.client.request_to_rotating_connection_queue.pop(request, None)
+                future.set_exception(
+                    TimeoutError(f"Timed out submitting job to Gearman ({request!r})")
+                )
+                continue
+            # If it's already done, it is resolved after the next poll.
+            self._in_flight[request] = future
+
+    def _resolve_done_jobs(self):
+        done_requests = list(self.client.done_requests)
+        self.client.done_requests.clear()
+        for request in done_requests:
+            if request not in self._in_flight:
+                continue
+            future = self._in_flight.pop(request)
+            self.client.request_to_rotating_connection_queue.pop(request, None)
+            if request.state == JOB_UNKNOWN:
+                future.set_exception(
+                    ConnectionError(f"Lost connection to Gearman ({request!r})")
+                )
+            else:
+                future.set_result(request)
+
+    def _fail_in_flight_jobs(self, err):
+        in_flight, self._in_flight = self._in_flight, {}
+        self.client.done_requests.clear()
+        for request, future in in_flight.items():
+            self.client.request_to_rotating_connection_queue.pop(request, None)
+            future.set_exception(err)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """Return the dispatcher shared by all the task backends of the process."""
+    global _dispatcher
+
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = GearmanDispatcher()
+        return _dispatcher
 
-        # Mark any job still in the queued state to poll_timeout
-        for current_request in job_requests:
-            if current_request.complete:
-                self.request_to_rotating_connection_queue.pop(current_request, None)
 
-        return job_requests
+def stop_dispatcher(timeout=None):
+    """Stop the dispatcher of the process, if it was started."""
+    with _dispatcher_lock:
+        dispatcher = _dispatcher
+    if dispatcher is not None:
+        dispatcher.stop(timeout)
+
+
+def _gather(futures):
+    """Return a future resolved once all the `futures` given are done."""
+    result = concurrent.futures.Future()
+    pending = set(futures)
+    lock = threading.Lock()
+
+    def done(future):
+        with lock:
+            pending.discard(future)
+            if pending:
+                return
+        result.set_result(None)
+
+    if not pending:
+        result.set_result(None)
+    for future in list(pending):
+        future.add_done_callback(done)
+
+    return result
 
 
 class GearmanTaskBackend(TaskBackend):
@@ -61,6 +261,10 @@ class GearmanTaskBackend(TaskBackend):
 
     Tasks are batched into BATCH_SIZE groups (default 128), serialized and sent
     to MCPClient. This adds some complexity but saves a lot of overhead.
+
+    A backend is shared by the threads of the process, e.g. the tasks of a job
+    are submitted on one thread and their results collected on another, so
+    the batches are only accessed while holding a lock.
     """
 
     # The number of files we'll pack into each MCP Client job.  Chosen somewhat
@@ -72,11 +276,14 @@ class GearmanTaskBackend(TaskBackend):
     TASK_BATCH_SIZE = settings.BATCH_SIZE
     MAX_RETRIES = 5
 
-    def __init__(self):
-        self.client = MCPGearmanClient([settings.GEARMAN_SERVER])
+    def __init__(self, dispatcher=None):
+        if dispatcher is None:
+            dispatcher = get_dispatcher()
+        self.dispatcher = dispatcher
 
         self.current_task_batches = {}  # job_uuid: GearmanTaskBatch
         self.pending_gearman_jobs = {}  # job_uuid: List[GearmanTaskBatch]
+        self._lock = threading.Lock()
 
     def submit_task(self, job, task):
         """Submit a `Task` (as part of the `Job` given) for processing.
@@ -84,65 +291,55 @@ class GearmanTaskBackend(TaskBackend):
         We add the task to the batch, and only actually send the batch
         to gearman if it's "full".
         """
-        current_task_batch = self._get_current_task_batch(job.uuid)
-        if len(current_task_batch) == 0:
-            metrics.gearman_pending_jobs_gauge.inc()
+        with self._lock:
+            current_task_batch = self._get_current_task_batch(job.uuid)
+            if len(current_task_batch) == 0:
+                metrics.gearman_pending_jobs_gauge.inc()
 
-        current_task_batch.add_task(task)
+            current_task_batch.add_task(task)
 
-        # If we've hit TASK_BATCH_SIZE, send the batch to gearman
-        if (len(current_task_batch) % self.TASK_BATCH_SIZE) == 0:
-            self._submit_batch(job, current_task_batch)
+            # If we've hit TASK_BATCH_SIZE, send the batch to gearman
+            full = (len(current_task_batch) % self.TASK_BATCH_SIZE) == 0
+            if full:
+                del self.current_task_batches[job.uuid]
 
-    def wait_for_results(self, job):
-        # Check if we have anything for this job that hasn't been submitted
-        current_task_batch = self._get_current_task_batch(job.uuid)
-        if len(current_task_batch) > 0:
+        if full:
             self._submit_batch(job, current_task_batch)
 
-        try:
-            pending_batches = self.pending_gearman_jobs[job.uuid]
-        except KeyError:
-            # No batches submitted
-            return
-
-        completed_request_count = 0
-        gearman_requests = [request.pending for request in pending_batches]
-
-        # Make sure everything has been accepted by gearman before getting results
-        # Note that accepted here means STATE_PENDING, that is accepted by the
-        # gearman server, not a client.
-        self.client.wait_until_jobs_accepted(gearman_requests)
-
-        while len(pending_batches) > completed_request_count:
-            gearman_requests = self.client.wait_until_any_job_completed(
-                gearman_requests
-            )
+    def get_results_future(self, job):
+        """Return a future resolved once every batch of the job is done."""
+        self._submit_current_batch(job)
 
-            for batch in pending_batches:
-                if batch.collected:
-                    continue
+        with self._lock:
+            futures = [
+                batch.future for batch in self.pending_gearman_jobs.get(job.uuid, [])
+            ]
+        return _gather(futures)
 
-                if batch.complete or batch.failed:
-                    yield from batch.update_task_results()
+    def wait_for_results(self, job):
+        self._submit_current_batch(job)
 
-                    batch.collected = True
-                    completed_request_count += 1
-                    metrics.gearman_active_jobs_gauge.dec()
+        with self._lock:
+            pending_batches = self.pending_gearman_jobs.pop(job.uuid, None)
+        if pending_batches is None:
+            # No batches submitted
+            return
 
-            # Only keep checking unfinished requests
-            gearman_requests = [
-                request
-                for request in gearman_requests
-                if request.state not in (JOB_COMPLETE, JOB_FAILED)
-            ]
+        batches_by_future = {batch.future: batch for batch in pending_batches}
+        for future in concurrent.futures.as_completed(batches_by_future):
+            yield from batches_by_future[future].update_task_results()
+            metrics.gearman_active_jobs_gauge.dec()
 
-        # Once we've gotten results for all job tasks, clear the batches
-        del self.pending_gearman_jobs[job.uuid]
+    def _submit_current_batch(self, job):
+        # Check if we have anything for this job that hasn't been submitted
+        with self._lock:
+            current_task_batch = self.current_task_batches.pop(job.uuid, None)
+        if current_task_batch is not None:
+            self._submit_batch(job, current_task_batch)
 
     def _get_current_task_batch(self, job_uuid):
         """Return the current GearmanTaskBatch for the job, or initialize a new
-        one.
+        one. The caller must hold the lock.
         """
         try:
             return self.current_task_batches[job_uuid]
@@ -154,18 +351,13 @@ class GearmanTaskBackend(TaskBackend):
         if len(task_batch) == 0:
             return
 
-        task_batch.submit(self.client, job, max_retries=self.MAX_RETRIES)
+        task_batch.submit(self.dispatcher, job, max_retries=self.MAX_RETRIES)
 
         metrics.gearman_active_jobs_gauge.inc()
         metrics.gearman_pending_jobs_gauge.dec()
 
-        if job.uuid not in self.pending_gearman_jobs:
-            self.pending_gearman_jobs[job.uuid] = []
-        self.pending_gearman_jobs[job.uuid].append(task_batch)
-
-        # Clear the current task batch
-        if self.current_task_batches[job.uuid] is task_batch:
-            del self.current_task_batches[job.uuid]
+        with self._lock:
+            self.pending_gearman_jobs.setdefault(job.uuid, []).append(task_batch)
 
 
 class GearmanTaskBatch:
@@ -174,19 +366,31 @@ class GearmanTaskBatch:
     def __init__(self):
         self.uuid = uuid.uuid4()
         self.tasks = []
-        self.pending = None
-        self.collected = False
+        # Resolved with the gearman request by the dispatcher.
+        self.future = None
 
     def __len__(self):
         return len(self.tasks)
 
+    @property
+    def pending(self):
+        """The gearman request, once it's done."""
+        if self.future is None or not self.future.done():
+            return None
+        if self.future.exception() is not None:
+            return None
+        return self.future.result()
+
     @property
     def complete(self):
-        return self.pending and self.pending.state == JOB_COMPLETE
+        return bool(self.pending and self.pending.state == JOB_COMPLETE)
 
     @property
     def failed(self):
-        return self.pending and self.pending.state == JOB_FAILED
+        if self.future is not None and self.future.done():
+            if self.future.exception() is not None:
+                return True
+        return bool(self.pending and self.pending.state == JOB_FAILED)
 
     def serialize_task(self, task):
         return {
@@ -199,7 +403,7 @@ class GearmanTaskBatch:
     def add_task(self, task):
         self.tasks.append(task)
 
-    def submit(self, client, job, max_retries=0):
+    def submit(self, dispatcher, job, max_retries=0):
         # Log tasks to DB, before submitting the batch, as mcpclient then updates them
         Task.bulk_log(self.tasks, job)
 
@@ -208,12 +412,10 @@ class GearmanTaskBatch:
             task_uuid = str(task.uuid)
             data["tasks"][task_uuid] = self.serialize_task(task)
 
-        self.pending = client.submit_job(
+        self.future = dispatcher.submit_job(
             task=job.name.encode(),
             data=data,
             unique=str(self.uuid).encode(),
-            wait_until_complete=False,
-            background=False,
             max_retries=max_retries,
         )
         logger.debug("Submitted gearman job %s (%s)", self.uuid, job.name)
@@ -39,6 +39,8 @@ class TranslationLabel:
 
     """
 
+    __slots__ = ("_src", "__weakref__")
+
     def __init__(self, translations):
         if not isinstance(translations, dict):
             translations = {FALLBACK_LANG: str(translations)}
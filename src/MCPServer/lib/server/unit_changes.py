@@ -0,0 +1,122 @@
+"""
+Tracking of the units whose status changed.
+
+Every change made by MCPServer to the jobs or the status of a unit is recorded
+here after it's written to the database, so clients polling the status of all
+the units (e.g. the dashboard grids) can ask only for the units that changed
+since their previous poll.
+
+Changes are also published as a stream of events kept in a ring buffer. The
+dashboard follows the stream with a cursor and pushes the events to the
+browsers, which then refresh the units that changed.
+"""
+
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections import deque
+
+# Number of events kept in memory. Readers that fall further behind miss
+# events and must reload the status of every unit.
+EVENT_BUFFER_SIZE = 10000
+
+
+class UnitChangeLog:
+    """Remembers when each unit changed for the last time.
+
+    Changes are only known since the log was created, i.e. since MCPServer
+    started, so `changed_since` can't answer for earlier timestamps.
+    """
+
+    def __init__(self, clock=time.time, max_events=EVENT_BUFFER_SIZE):
+        self.clock = clock
+        self.started_at = clock()
+        # Identifies this log in cursors, which are not valid after a restart.
+        self.epoch = uuid.uuid4().hex
+
+        self._lock = threading.Lock()
+        self._changes = OrderedDict()  # unit uuid: timestamp, oldest first
+        self._events = deque(maxlen=max_events)
+        self._last_event_id = 0
+
+    def now(self):
+        return self.clock()
+
+    def record(self, unit_id, **details):
+        """Record that the unit given has just changed.
+
+        `details` describe the change and are published with the event, e.g.
+        ``unit_type``, ``job`` or ``status``.
+        """
+        unit_id = str(unit_id)
+        with self._lock:
+            timestamp = self.clock()
+            self._changes[unit_id] = timestamp
+            self._changes.move_to_end(unit_id)
+
+            self._last_event_id += 1
+            self._events.append(
+                {
+                    "id": self._last_event_id,
+                    "timestamp": timestamp,
+                    "unit": unit_id,
+                    **details,
+                }
+            )
+
+    def changed_since(self, since):
+        """Return the ids of the units changed at or after `since`.
+
+        Returns `None` if the changes made at that time are unknown.
+        """
+        if since is None or since < self.started_at:
+            return None
+
+        changed = []
+        with self._lock:
+            for unit_id, timestamp in reversed(self._changes.items()):
+                if timestamp < since:
+                    break
+                changed.append(unit_id)
+
+        return changed
+
+    def _get_cursor(self):
+        return f"{self.epoch}:{self._last_event_id}"
+
+    def events_since(self, cursor):
+        """Return the events published after the `cursor` given.
+
+        Returns a tuple with the list of events, the cursor to pass next time
+        and whether the events can't be followed from the cursor given, e.g.
+        because it was issued before a restart or the events were dropped from
+        the buffer. Without a cursor, the stream is followed from now on.
+        """
+        with self._lock:
+            if cursor is None:
+                return [], self._get_cursor(), False
+
+            epoch, _, last_event_id = str(cursor).partition(":")
+            try:
+                last_event_id = int(last_event_id)
+            except ValueError:
+                last_event_id = -1
+            if (
+                epoch != self.epoch
+                or last_event_id < 0
+                or last_event_id > self._last_event_id
+            ):
+                return [], self._get_cursor(), True
+
+            # Event ids are consecutive, so we can find the cursor position.
+            first_event_id = self._last_event_id - len(self._events) + 1
+            missed = last_event_id + 1 < first_event_id
+            start = max(last_event_id + 1 - first_event_id, 0)
+            events = list(itertools.islice(self._events, start, None))
+
+            return events, self._get_cursor(), missed
+
+
+changes = UnitChangeLog()
@@ -12,10 +12,23 @@ Otherwise, ``load`` will return an instance of ``Workflow`` which is used in
 MCPServer to read workflow links that can be instances of three different
 classes ``Chain``, ``Link`` and ``WatchedDir``. They have different method
 sets.
+
+Validating the document is the slowest part of loading it, so ``load`` can
+keep a snapshot of the validated document in a cache directory, named after
+the hash of the document and the schema. Loading the same document again only
+needs to read the snapshot. Snapshots are trusted without validating them
+again, so they are only read from directories that other users can't write to.
 """
 
+import hashlib
 import json
+import logging
+import marshal
 import os
+import stat
+import sys
+import tempfile
+import weakref
 
 from django.conf import settings as django_settings
 from jsonschema import FormatChecker
@@ -26,6 +39,8 @@ from server.jobs import Job
 from server.translation import FALLBACK_LANG
 from server.translation import TranslationLabel
 
+logger = logging.getLogger("archivematica.mcp.server.workflow")
+
 _LATEST_SCHEMA = "workflow-schema-v1.json"
 ASSETS_DIR = os.path.join(
     os.path.dirname(os.path.dirname(os.path.abspath(os.path.join(__file__)))), "assets"
@@ -33,6 +48,9 @@ ASSETS_DIR = os.path.join(
 
 DEFAULT_WORKFLOW = os.path.join(ASSETS_DIR, "workflow.json")
 
+# Bump when the contents of the snapshots change.
+_SNAPSHOT_VERSION = 1
+
 
 def _invert_job_statuses():
     """Return an inverted dict of job statuses, i.e. indexed by labels."""
@@ -49,30 +67,51 @@ def _invert_job_statuses():
 # where we're using labels instead of IDs.
 _STATUSES = _invert_job_statuses()
 
+# Identical translations are shared by all the workflow elements using them.
+_TRANSLATION_LABELS: weakref.WeakValueDictionary[
+    tuple[tuple[str, str], ...], TranslationLabel
+] = weakref.WeakValueDictionary()
+
+
+def _decode_translation(translation_dict):
+    if not isinstance(translation_dict, dict):
+        translation_dict = {FALLBACK_LANG: str(translation_dict)}
+    key = tuple(sorted(translation_dict.items()))
+    label = _TRANSLATION_LABELS.get(key)
+    if label is None:
+        label = _TRANSLATION_LABELS[key] = TranslationLabel(
+            {sys.intern(lang): sys.intern(text) for lang, text in key}
+        )
+    return label
+
 
 class Workflow:
     def __init__(self, parsed_obj):
-        self._src = parsed_obj
-        self._decode_chains()
-        self._decode_links()
-        self._decode_wdirs()
+        self._decode_chains(parsed_obj["chains"])
+        self._decode_links(parsed_obj["links"])
+        self._decode_wdirs(parsed_obj["watched_directories"])
 
     def __str__(self):
         return f"Chains {len(self.chains)}, links {len(self.links)}, watched directories: {len(self.wdirs)}"
 
-    def _decode_chains(self):
+    def _decode_chains(self, chains):
         self.chains = {}
-        for chain_id, chain_obj in self._src["chains"].items():
+        for chain_id, chain_obj in chains.items():
+            chain_id = sys.intern(chain_id)
             self.chains[chain_id] = Chain(chain_id, chain_obj, self)
 
-    def _decode_links(self):
+    def _decode_links(self, links):
         self.links = {}
-        for link_id, link_obj in self._src["links"].items():
+        for link_id, link_obj in links.items():
+            link_id = sys.intern(link_id)
             self.links[link_id] = Link(link_id, link_obj, self)
+        # Exit codes point to the next links, known once all are decoded.
+        for link in self.links.values():
+            link._resolve_next_links()
 
-    def _decode_wdirs(self):
+    def _decode_wdirs(self, wdirs):
         self.wdirs = []
-        for wdir_obj in self._src["watched_directories"]:
+        for wdir_obj in wdirs:
             self.wdirs.append(WatchedDir(wdir_obj, self))
 
     def get_chains(self):
@@ -92,115 +131,172 @@ class Workflow:
 
 
 class BaseLink:
+    """Base class of the workflow elements.
+
+    Their attributes are stored in slots named after the keys of the document,
+    which can also be read with the subscript notation, e.g. ``link["group"]``.
+    """
+
+    __slots__ = ("_workflow",)
+
+    # Keys of the JSON document exposed with the subscript notation.
+    _KEYS: tuple[str, ...] = ()
+
     def __str__(self):
         return self.id
 
+    def __getitem__(self, key):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
     def get_label(self, key, lang=FALLBACK_LANG, fallback_label=None):
         """Proxy to find translated attributes."""
         try:
-            instance = self._src[key]
+            instance = self[key]
         except KeyError:
             return None
         return instance.get_label(lang, fallback_label)
 
-    def _decode_translation(self, translation_dict):
-        return TranslationLabel(translation_dict)
-
     @property
     def workflow(self):
         return self._workflow
 
 
 class Chain(BaseLink):
+    __slots__ = ("id", "description", "link_id")
+
+    _KEYS = ("description", "link_id")
+
     def __init__(self, id_, attrs, workflow):
         self.id = id_
-        self._src = attrs
         self._workflow = workflow
-        self._decode_translations()
+        self.description = _decode_translation(attrs["description"])
+        self.link_id = sys.intern(attrs["link_id"])
 
     def __repr__(self):
         return f"Chain <{self.id}>"
 
-    def __getitem__(self, key):
-        return self._src[key]
-
-    def _decode_translations(self):
-        self._src["description"] = self._decode_translation(self._src["description"])
-
     @property
     def link(self):
-        return self._workflow.get_link(self._src["link_id"])
+        return self._workflow.get_link(self.link_id)
 
 
 class Link(BaseLink):
+    __slots__ = (
+        "id",
+        "config",
+        "description",
+        "group",
+        "fallback_link_id",
+        "fallback_job_status",
+        "end",
+        "_exit_codes",
+        "_fallback_link",
+    )
+
+    _KEYS = (
+        "config",
+        "description",
+        "group",
+        "exit_codes",
+        "fallback_link_id",
+        "fallback_job_status",
+        "end",
+    )
+
     def __init__(self, id_, attrs, workflow):
         self.id = id_
-        self._src = attrs
         self._workflow = workflow
-        self._decode_job_statuses()
-        self._decode_translations()
+        self.config = attrs["config"]
+        self.end = attrs.get("end", False)
+        self.fallback_link_id = attrs.get("fallback_link_id")
+        self._decode_job_statuses(attrs)
+        self._decode_translations(attrs)
 
     def __repr__(self):
         return f"Link <{self.id}>"
 
-    def __getitem__(self, key):
-        return self._src[key]
-
-    def _decode_job_statuses(self):
+    def _decode_job_statuses(self, attrs):
         """Replace status labels with their IDs.
 
         In JSON, a job status is encoded using its English label, e.g. "Failed"
         instead of the corresponding value in ``JOB.STATUS_FAILED``. This
         method decodes the statuses so it becomes easier to work with them
         internally.
+
+        Exit codes are kept in a table of ``(next link, status ID)`` tuples
+        indexed by exit code, where the next links are IDs until
+        ``_resolve_next_links`` replaces them with the links.
         """
-        self._src["fallback_job_status"] = _STATUSES[self._src["fallback_job_status"]]
-        for obj in self._src["exit_codes"].values():
-            obj["job_status"] = _STATUSES[obj["job_status"]]
-
-    def _decode_translations(self):
-        self._src["description"] = self._decode_translation(self._src["description"])
-        self._src["group"] = self._decode_translation(self._src["group"])
-        config = self._src["config"]
+        self.fallback_job_status = _STATUSES[attrs["fallback_job_status"]]
+        self._exit_codes = {
+            sys.intern(code): (obj.get("link_id"), _STATUSES[obj["job_status"]])
+            for code, obj in attrs["exit_codes"].items()
+        }
+
+    def _decode_translations(self, attrs):
+        self.description = _decode_translation(attrs["description"])
+        self.group = _decode_translation(attrs["group"])
+        config = self.config
         if config["@manager"] == "linkTaskManagerReplacementDicFromChoice":
             for item in config["replacements"]:
-                item["description"] = self._decode_translation(item["description"])
+                item["description"] = _decode_translation(item["description"])
+
+    def _resolve_next_links(self):
+        links = self._workflow.links
+        self._exit_codes = {
+            code: (links.get(str(link_id)), status_id)
+            for code, (link_id, status_id) in self._exit_codes.items()
+        }
+        self._fallback_link = links.get(str(self.fallback_link_id))
 
     @property
-    def config(self):
-        return self._src["config"]
+    def exit_codes(self):
+        """Exit codes as found in the document, with decoded job statuses."""
+        exit_codes = {}
+        for code, (link, status_id) in self._exit_codes.items():
+            exit_codes[code] = {"job_status": status_id}
+            if link is not None:
+                exit_codes[code]["link_id"] = link.id
+        return exit_codes
 
     @property
     def is_terminal(self):
         """Check if the link is indicated as a terminal link."""
-        return self._src.get("end", False)
+        return self.end
 
     def get_next_link(self, code):
         """Return the next link based on the exit code.
 
         Raises KeyError which should be handled by the caller.
         """
-        code = str(code)
         try:
-            link_id = self._src["exit_codes"][code].get("link_id")
+            link = self._exit_codes[str(code)][0]
         except KeyError:
-            link_id = self._src.get("fallback_link_id")
-        return self._workflow.get_link(link_id)
+            link = self._fallback_link
+        if link is None:
+            raise KeyError(f"No link follows {self.id} with exit code {code}")
+        return link
 
     def get_status_id(self, code):
         """Return the expected Job status ID given an exit code."""
-        code = str(code)
         try:
-            status_id = self._src["exit_codes"][code]["job_status"]
+            return self._exit_codes[str(code)][1]
         except KeyError:
-            status_id = self._src["fallback_job_status"]
-        return status_id
+            return self.fallback_job_status
 
 
 class WatchedDir(BaseLink):
+    __slots__ = ("path", "chain_id", "only_dirs", "unit_type")
+
+    _KEYS = ("path", "chain_id", "only_dirs", "unit_type")
+
     def __init__(self, attrs, workflow):
         self.path = attrs["path"]
-        self._src = attrs
+        self.chain_id = sys.intern(attrs["chain_id"])
+        self.only_dirs = bool(attrs["only_dirs"])
+        self.unit_type = attrs["unit_type"]
         self._workflow = workflow
 
     def __str__(self):
@@ -209,20 +305,9 @@ class WatchedDir(BaseLink):
     def __repr__(self):
         return f"Watched directory <{self.path}>"
 
-    def __getitem__(self, key):
-        return self._src[key]
-
-    @property
-    def only_dirs(self):
-        return bool(self._src["only_dirs"])
-
-    @property
-    def unit_type(self):
-        return self._src["unit_type"]
-
     @property
     def chain(self):
-        return self._workflow.get_chain(self._src["chain_id"])
+        return self._workflow.get_chain(self.chain_id)
 
 
 class WorkflowJSONDecoder(json.JSONDecoder):
@@ -231,31 +316,98 @@ class WorkflowJSONDecoder(json.JSONDecoder):
         return Workflow(parsed_json)
 
 
-def load(fp):
-    """Read JSON document from file-like object, validate and decode it."""
-    blob = fp.read()  # Read once, used twice.
-    _validate(blob)
-    parsed = json.loads(blob, cls=WorkflowJSONDecoder)
+def load(fp, cache_dir=None):
+    """Read JSON document from file-like object, validate and decode it.
+
+    If ``cache_dir`` is given, the validated document is read from or saved
+    to a snapshot in that directory.
+    """
+    blob = fp.read()
+    if isinstance(blob, str):
+        blob = blob.encode("utf-8")
+
+    snapshot_path = None
+    if cache_dir:
+        snapshot_path = os.path.join(cache_dir, f"workflow-{_get_hash(blob)}.marshal")
+        parsed = _read_snapshot(snapshot_path)
+        if parsed is not None:
+            return Workflow(parsed)
 
-    return parsed
+    parsed = json.loads(blob)
+    _validate(parsed)
+    if snapshot_path is not None:
+        _write_snapshot(snapshot_path, parsed)
+
+    return Workflow(parsed)
 
 
 def load_workflow():
     workflow_path = DEFAULT_WORKFLOW
     if django_settings.WORKFLOW_FILE != "":
         workflow_path = django_settings.WORKFLOW_FILE
-    with open(workflow_path) as workflow_file:
-        return load(workflow_file)
+    with open(workflow_path, "rb") as workflow_file:
+        return load(workflow_file, cache_dir=django_settings.WORKFLOW_CACHE_DIR)
+
+
+def _get_hash(blob):
+    """Hash a workflow document with everything its snapshot depends on."""
+    digest = hashlib.sha256(blob)
+    with open(os.path.join(ASSETS_DIR, _LATEST_SCHEMA), "rb") as fp:
+        digest.update(fp.read())
+    digest.update(f"{_SNAPSHOT_VERSION}:{marshal.version}".encode())
+    return digest.hexdigest()
+
+
+def _is_private(path):
+    """Check that only the current user can write to ``path``."""
+    st = os.stat(path)
+    return st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def _read_snapshot(path):
+    """Return the validated document saved at ``path`` or ``None``."""
+    try:
+        if not (_is_private(os.path.dirname(path)) and _is_private(path)):
+            logger.warning(
+                "Ignoring workflow snapshot %s, it is writable by other users", path
+            )
+            return None
+        with open(path, "rb") as fp:
+            return marshal.load(fp)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError, TypeError) as err:
+        logger.warning("Unable to read workflow snapshot %s: %s", path, err)
+        return None
+
+
+def _write_snapshot(path, parsed):
+    """Save the validated document at ``path``, ignoring errors."""
+    tmp_path = None
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        # Write to a temporary file first so readers never see partial files.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as fp:
+            marshal.dump(parsed, fp)
+        os.replace(tmp_path, path)
+    except (OSError, ValueError) as err:
+        logger.warning("Unable to write workflow snapshot %s: %s", path, err)
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
 
 
 class SchemaValidationError(ValidationError):
     """It wraps ``jsonschema.exceptions.ValidationError``."""
 
 
-def _validate(blob):
-    """Decode and validate the JSON document."""
+def _validate(parsed):
+    """Validate the decoded JSON document."""
     try:
-        validate(json.loads(blob), _get_schema(), format_checker=FormatChecker())
+        validate(parsed, _get_schema(), format_checker=FormatChecker())
     except ValidationError as err:
         raise SchemaValidationError(**err._contents())
 
@@ -103,6 +103,11 @@ CONFIG_MAPPING = {
         "option": "storage_service_client_quick_timeout",
         "type": "float",
     },
+    "storage_service_client_cache_ttl": {
+        "section": "MCPServer",
+        "option": "storage_service_client_cache_ttl",
+        "type": "float",
+    },
     "prometheus_bind_address": {
         "section": "MCPServer",
         "option": "prometheus_bind_address",
@@ -118,6 +123,11 @@ CONFIG_MAPPING = {
         "option": "workflow_file",
         "type": "string",
     },
+    "workflow_cache_dir": {
+        "section": "MCPServer",
+        "option": "workflow_cache_dir",
+        "type": "string",
+    },
     "time_zone": {"section": "MCPServer", "option": "time_zone", "type": "string"},
     # [client]
     "db_engine": {"section": "client", "option": "engine", "type": "string"},
@@ -146,9 +156,11 @@ batch_size = 128
 rpc_threads = 4
 storage_service_client_timeout = 86400
 storage_service_client_quick_timeout = 5
+storage_service_client_cache_ttl = 60
 prometheus_bind_address =
 prometheus_bind_port =
 workflow_file =
+workflow_cache_dir = /var/archivematica/.cache/MCPServer/
 time_zone = UTC
 
 [client]
@@ -278,6 +290,7 @@ STORAGE_SERVICE_CLIENT_TIMEOUT = config.get("storage_service_client_timeout")
 STORAGE_SERVICE_CLIENT_QUICK_TIMEOUT = config.get(
     "storage_service_client_quick_timeout"
 )
+STORAGE_SERVICE_CLIENT_CACHE_TTL = config.get("storage_service_client_cache_ttl")
 PROMETHEUS_BIND_ADDRESS = config.get("prometheus_bind_address")
 try:
     PROMETHEUS_BIND_PORT = int(config.get("prometheus_bind_port"))
@@ -287,6 +300,7 @@ else:
     PROMETHEUS_ENABLED = True
 
 WORKFLOW_FILE = config.get("workflow_file")
+WORKFLOW_CACHE_DIR = config.get("workflow_cache_dir")
 
 # Apply email settings
 globals().update(email_settings.get_settings(config))
@@ -22,7 +22,6 @@ import base64
 import collections
 import errno
 import glob
-import hashlib
 import locale
 import os
 import pprint
@@ -33,6 +32,7 @@ from typing import Dict
 from typing import Iterable
 from uuid import uuid4
 
+import fixity
 from amclient import AMClient
 from django.apps import apps
 from lxml import etree
@@ -188,18 +188,14 @@ def get_file_checksum(filename, algorithm="sha256"):
     """
     Perform a checksum on the specified file.
 
-    This function reads in files incrementally to avoid memory exhaustion.
-    See: https://stackoverflow.com/a/4213255
+    The file is read incrementally to avoid memory exhaustion, see
+    ``fixity.get_checksums``.
 
     :param filename: The path to the file we want to check
     :param algorithm: Which algorithm to use for hashing, e.g. 'md5'
     :return: Returns a checksum string for the specified file.
     """
-    hash_ = hashlib.new(algorithm)
-    with open(filename, "rb") as file_:
-        for chunk in iter(lambda: file_.read(1024 * hash_.block_size), b""):
-            hash_.update(chunk)
-    return hash_.hexdigest()
+    return fixity.get_checksums(filename, [algorithm])[algorithm]
 
 
 def find_metadata_files(sip_path, filename, only_transfers=False):
@@ -18,6 +18,7 @@ import logging
 import sys
 import uuid
 
+from django.db import transaction
 from django.utils import timezone
 from main.models import SIP
 from main.models import Agent
@@ -25,6 +26,7 @@ from main.models import Derivation
 from main.models import Event
 from main.models import File
 from main.models import FPCommandOutput
+from main.models import Transfer
 
 LOGGER = logging.getLogger("archivematica.common")
 
@@ -115,6 +117,29 @@ def getAMAgentsForFile(fileUUID):
     ).values_list("pk", flat=True)
 
 
+def getAMAgentsForUnit(sipUUID=None, transferUUID=None):
+    """
+    Fetches the IDs for the Archivematica agents associated with the events of
+    the files of a unit, see ``getAMAgentsForFile``.
+
+    This is useful to create the events of many files of the same unit, as the
+    agents don't need to be fetched for every file.
+
+    :returns: A list of Agent IDs
+    """
+    if sipUUID:
+        return list(SIP(uuid=sipUUID).agents.values_list("pk", flat=True))
+    elif transferUUID:
+        return list(Transfer(uuid=transferUUID).agents.values_list("pk", flat=True))
+
+    # Fetch the default Agents
+    return list(
+        Agent.objects.filter(Agent.objects.default_agents_query_keywords()).values_list(
+            "pk", flat=True
+        )
+    )
+
+
 def insertIntoEvents(
     fileUUID,
     eventIdentifierUUID="",
@@ -167,6 +192,183 @@ def insertIntoEvents(
     return event
 
 
+def bulkInsertIntoEvents(events):
+    """Creates many entries in the Events table with a few queries.
+
+    :param list events: List of ``(event, agents)`` tuples where ``event`` is
+        an unsaved Event with an ``event_id`` and ``agents`` is a list of
+        Agent IDs to associate with it.
+    :returns: None
+    """
+    if not events:
+        return
+    event_objs = [event for event, _ in events]
+    Event.objects.bulk_create(event_objs)
+    if any(event.pk is None for event in event_objs):
+        # Not every database returns the primary keys of new rows.
+        pks = {
+            str(event_id): pk
+            for event_id, pk in Event.objects.filter(
+                event_id__in=[event.event_id for event in event_objs]
+            ).values_list("event_id", "pk")
+        }
+        for event in event_objs:
+            event.pk = pks[str(event.event_id)]
+    Event.agents.through.objects.bulk_create(
+        [
+            Event.agents.through(event_id=event.pk, agent_id=agent_id)
+            for event, agents in events
+            for agent_id in agents
+        ]
+    )
+
+
+class EventBatch:
+    """Queue events to insert them in bulk.
+
+    It is the bulk version of ``insertIntoEvents``, taking the same arguments
+    in ``add``. Events are inserted every ``batch_size`` events and when the
+    batch is used as a context manager, on exit::
+
+        with EventBatch() as events:
+            for file_uuid in file_uuids:
+                events.add(fileUUID=file_uuid, eventType="virus check")
+
+    Events added without agents get the agents of the unit of their file,
+    which are fetched once per unit. Derivations linked to the events can be
+    queued with ``add_derivation``, they are inserted after the events.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self._unit_agents = {}
+        self._events = []
+        self._derivations = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def __len__(self):
+        return len(self._events) + len(self._derivations)
+
+    def add(
+        self,
+        fileUUID,
+        eventIdentifierUUID="",
+        eventType="",
+        eventDateTime=None,
+        eventDetail="",
+        eventOutcome="",
+        eventOutcomeDetailNote="",
+        agents=None,
+    ):
+        """Queue an event, see ``insertIntoEvents`` for the arguments.
+
+        :param list agents: Agents or Agent IDs to associate with the event.
+        :returns Event: The unsaved event.
+        """
+        if eventDateTime is None:
+            eventDateTime = timezone.now()
+        if not eventIdentifierUUID:
+            eventIdentifierUUID = str(uuid.uuid4())
+        if agents:
+            agents = [getattr(agent, "pk", agent) for agent in agents]
+
+        event = Event(
+            event_id=eventIdentifierUUID,
+            file_uuid_id=fileUUID,
+            event_type=eventType,
+            event_datetime=eventDateTime,
+            event_detail=eventDetail,
+            event_outcome=eventOutcome,
+            event_outcome_detail=eventOutcomeDetailNote,
+        )
+        self._events.append((event, agents or None))
+        if len(self) >= self.batch_size:
+            self.flush()
+
+        return event
+
+    def add_derivation(self, sourceFileUUID, derivedFileUUID, relatedEventUUID=None):
+        """Queue a derivation, see ``insertIntoDerivations`` for the arguments.
+
+        :returns Derivation: The unsaved derivation.
+        """
+        if not sourceFileUUID:
+            raise ValueError("sourceFileUUID must be specified")
+        if not derivedFileUUID:
+            raise ValueError("derivedFileUUID must be specified")
+
+        derivation = Derivation(
+            source_file_id=sourceFileUUID,
+            derived_file_id=derivedFileUUID,
+            event_id=relatedEventUUID,
+        )
+        self._derivations.append(derivation)
+        if len(self) >= self.batch_size:
+            self.flush()
+
+        return derivation
+
+    def get_unit_agents(self, sipUUID=None, transferUUID=None):
+        """Cached version of ``getAMAgentsForUnit``."""
+        key = (
+            str(sipUUID) if sipUUID else None,
+            str(transferUUID) if transferUUID else None,
+        )
+        if key not in self._unit_agents:
+            self._unit_agents[key] = getAMAgentsForUnit(*key)
+        return self._unit_agents[key]
+
+    def _resolve_agents(self):
+        """Set the agents of the events added without them."""
+        file_uuids = {
+            str(event.file_uuid_id) for event, agents in self._events if agents is None
+        }
+        if not file_uuids:
+            return
+        units = {
+            str(file_uuid): (sip_uuid, transfer_uuid)
+            for file_uuid, sip_uuid, transfer_uuid in File.objects.filter(
+                uuid__in=file_uuids
+            ).values_list("uuid", "sip_id", "transfer_id")
+        }
+        for i, (event, agents) in enumerate(self._events):
+            if agents is not None:
+                continue
+            try:
+                sip_uuid, transfer_uuid = units[str(event.file_uuid_id)]
+            except KeyError:
+                LOGGER.warning(
+                    "File with UUID %s does not exist in database; unable to fetch Agents",
+                    event.file_uuid_id,
+                )
+                agents = []
+            else:
+                # The agents of the SIP are preferred, see getAMAgentsForFile.
+                if sip_uuid:
+                    transfer_uuid = None
+                agents = self.get_unit_agents(sip_uuid, transfer_uuid)
+            self._events[i] = (event, agents)
+
+    def flush(self):
+        """Insert the events and derivations added since the last flush."""
+        if not self:
+            return
+        with transaction.atomic():
+            if self._events:
+                self._resolve_agents()
+                bulkInsertIntoEvents(self._events)
+            # The derivations reference the events, which must be inserted first.
+            Derivation.objects.bulk_create(self._derivations)
+        self._events = []
+        self._derivations = []
+
+
 def insertIntoDerivations(sourceFileUUID, derivedFileUUID, relatedEventUUID=None):
     """Creates a new entry in the Derivations table using the supplied
     arguments. The two files in this relationship should already exist in the
@@ -15,25 +15,31 @@
 # You should have received a copy of the GNU General Public License
 # along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
 import calendar
+import collections
 import copy
 import datetime
+import itertools
 import logging
 import os
 import re
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import namespaces as ns
 import version
 from archivematicaFunctions import get_dashboard_uuid
 from django.db.models import Min
 from django.db.models import Q
+from elasticsearch import ConnectionError as ElasticsearchConnectionError
 from elasticsearch import Elasticsearch
 from elasticsearch import ImproperlyConfigured
 from elasticsearch.helpers import bulk
+from elasticsearch.helpers import scan
 from externals import xmltodict
 from lxml import etree
 from main.models import File
+from main.models import FileFormatVersion
 from main.models import Identifier
 from main.models import Transfer
 
@@ -97,6 +103,15 @@ TOTAL_FIELDS_LIMIT = 10000
 # `structMap` element from the METS file is parsed may create a big depth
 # in documents for AIPs with a big directories hierarchy.
 DEPTH_LIMIT = 1000
+# Default number of documents sent per bulk request and number of bulk
+# requests sent concurrently when indexing transfer files.
+BULK_CHUNK_SIZE = 500
+BULK_THREAD_COUNT = 1
+# Number of times a bulk request is retried when the cluster is busy or can't
+# be reached, waiting twice as long as the previous time before each retry.
+BULK_MAX_RETRIES = 10
+BULK_INITIAL_BACKOFF = 2
+BULK_MAX_BACKOFF = 600
 
 
 def setup(hosts, timeout=DEFAULT_TIMEOUT, enabled=(AIPS_INDEX, TRANSFERS_INDEX)):
@@ -404,6 +419,7 @@ def index_aip_and_files(
     encrypted=False,
     location="",
     printfn=print,
+    mets=None,
 ):
     """Index AIP and AIP files with UUID `uuid` at path `path`.
 
@@ -417,6 +433,8 @@ def index_aip_and_files(
     :param identifiers: optional additional identifiers (MODS, Islandora, etc.).
     :param encrypted: optional AIP encrypted boolean (defaults to `False`).
     :param printfn: optional print funtion.
+    :param mets: optional ElementTree of the METS file if the caller has
+                 already parsed it. Tool output is removed from it in place.
     :return: 0 is succeded, 1 otherwise.
     """
     # Stop if METS file is not at staging path.
@@ -428,9 +446,10 @@ def index_aip_and_files(
         printfn(error_message, file=sys.stderr)
         return 1
 
-    tree = etree.parse(mets_staging_path)
+    tree = mets if mets is not None else etree.parse(mets_staging_path)
     _remove_tool_output_from_mets(tree)
     root = tree.getroot()
+    mets_index = METSIndex(root)
     # Extract AIC identifier, other specially-indexed information
     aic_identifier = None
     is_part_of = None
@@ -465,7 +484,7 @@ def index_aip_and_files(
         identifiers = []
     identifiers += _get_sip_identifiers(uuid)
 
-    aip_metadata = _get_aip_metadata(root)
+    aip_metadata = _get_aip_metadata(root, mets_index=mets_index)
 
     printfn("AIP UUID: " + uuid)
     printfn("Indexing AIP files ...")
@@ -477,6 +496,7 @@ def index_aip_and_files(
         name=name,
         identifiers=identifiers,
         aip_metadata=aip_metadata,
+        mets_index=mets_index,
     )
 
     printfn("Files indexed: " + str(files_indexed))
@@ -508,7 +528,9 @@ def index_aip_and_files(
     return 0
 
 
-def _index_aip_files(client, uuid, mets, name, identifiers=None, aip_metadata=None):
+def _index_aip_files(
+    client, uuid, mets, name, identifiers=None, aip_metadata=None, mets_index=None
+):
     """Index AIP files from AIP with UUID `uuid` and METS at path `mets_path`.
 
     :param client: The ElasticSearch client.
@@ -518,8 +540,11 @@ def _index_aip_files(client, uuid, mets, name, identifiers=None, aip_metadata=No
     :param identifiers: optional additional identifiers (MODS, Islandora, etc.).
     :param aip_metadata: list with the descriptive and administrative metadata
                          of each directory in the AIP
+    :param mets_index: optional METSIndex of `mets`.
     :return: number of files indexed, list of accession numbers
     """
+    if mets_index is None:
+        mets_index = METSIndex(mets)
 
     # Extract isPartOf (for AIPs) or identifier (for AICs) from DublinCore.
     dublincore = ns.xml_find_premis(
@@ -595,7 +620,7 @@ def _index_aip_files(client, uuid, mets, name, identifiers=None, aip_metadata=No
                 if len(set(uuids)) == 1:
                     fileUUID = uuids[0]
             else:
-                amdSec = _get_amdSec(admID, mets)
+                amdSec = mets_index.amd_secs.get(admID)
                 fileUUID = _get_file_uuid(amdSec)
                 accession_id = _get_accession_number(amdSec)
                 if accession_id is not None:
@@ -613,12 +638,11 @@ def _index_aip_files(client, uuid, mets, name, identifiers=None, aip_metadata=No
             # Get the parent division for the file pointer by searching the
             # physical structural map section (structMap).
             file_id = file_.attrib.get("ID", None)
-            file_pointer_division = ns.xml_find_premis(
-                mets,
-                f"mets:structMap[@TYPE='physical']//mets:fptr[@FILEID='{file_id}']/..",
-            )
+            file_pointer_division = mets_index.file_pointer_divisions.get(file_id)
             if file_pointer_division is not None:
-                descriptive_metadata = _get_file_metadata(file_pointer_division, mets)
+                descriptive_metadata = _get_file_metadata(
+                    file_pointer_division, mets, mets_index=mets_index
+                )
                 if descriptive_metadata:
                     file_metadata.append(descriptive_metadata)
                 # If the parent division has a DMDID attribute then index
@@ -630,9 +654,11 @@ def _index_aip_files(client, uuid, mets, name, identifiers=None, aip_metadata=No
                     # has both DC and non-DC metadata).
                     # Attempt to index only the DC dmdSec if available.
                     for dmd_section_id_item in dmd_section_id.split():
+                        dmd_section = mets_index.dmd_secs.get(dmd_section_id_item)
+                        if dmd_section is None:
+                            continue
                         dmd_section_info = ns.xml_find_premis(
-                            mets,
-                            f"mets:dmdSec[@ID='{dmd_section_id_item}']/mets:mdWrap[@MDTYPE='DC']/mets:xmlData",
+                            dmd_section, "mets:mdWrap[@MDTYPE='DC']/mets:xmlData"
                         )
                         if dmd_section_info is not None:
                             xml = etree.tostring(dmd_section_info, encoding="utf8")
@@ -678,7 +704,14 @@ def _index_aip_files(client, uuid, mets, name, identifiers=None, aip_metadata=No
 
 
 def index_transfer_and_files(
-    client, uuid, path, size, pending_deletion=False, printfn=print
+    client,
+    uuid,
+    path,
+    size,
+    pending_deletion=False,
+    printfn=print,
+    chunk_size=BULK_CHUNK_SIZE,
+    thread_count=BULK_THREAD_COUNT,
 ):
     """Indexes Transfer and Transfer files with UUID `uuid` at path `path`.
 
@@ -688,6 +721,8 @@ def index_transfer_and_files(
                  trailing / but not including objects/.
     :param size: size of transfer in bytes.
     :param printfn: optional print funtion.
+    :param chunk_size: number of file documents per bulk request.
+    :param thread_count: number of bulk requests sent concurrently.
     :return: 0 is succeded, 1 otherwise.
     """
     # Stop if Transfer does not exist
@@ -731,6 +766,8 @@ def index_transfer_and_files(
         pending_deletion=pending_deletion,
         status=status,
         printfn=printfn,
+        chunk_size=chunk_size,
+        thread_count=thread_count,
     )
 
     printfn("Files indexed: " + str(files_indexed))
@@ -754,6 +791,35 @@ def index_transfer_and_files(
     return 0
 
 
+def _get_transfer_files(uuid):
+    """Return the File rows of a transfer by current location."""
+    return {
+        bytes(currentlocation): (file_uuid, modificationtime)
+        for file_uuid, currentlocation, modificationtime in File.objects.filter(
+            transfer_id=uuid
+        ).values_list("uuid", "currentlocation", "modificationtime")
+    }
+
+
+def _get_transfer_file_formats(uuid):
+    """Return the formats of the files of a transfer by file UUID."""
+    formats = {}
+    for file_uuid, puid, fmt, group in (
+        FileFormatVersion.objects.filter(file_uuid__transfer_id=uuid)
+        .order_by("pk")
+        .values_list(
+            "file_uuid_id",
+            "format_version__pronom_id",
+            "format_version__description",
+            "format_version__format__group__description",
+        )
+    ):
+        formats.setdefault(str(file_uuid), []).append(
+            {"puid": puid, "format": fmt, "group": group}
+        )
+    return formats
+
+
 def _index_transfer_files(
     client,
     uuid,
@@ -764,9 +830,15 @@ def _index_transfer_files(
     status="",
     pending_deletion=False,
     printfn=print,
+    chunk_size=BULK_CHUNK_SIZE,
+    thread_count=BULK_THREAD_COUNT,
 ):
     """Indexes files in the Transfer with UUID `uuid` at path `path`.
 
+    The File rows and formats of the transfer are fetched upfront and the
+    documents are sent to Elasticsearch in bulk requests of `chunk_size`
+    documents, `thread_count` of them at a time.
+
     :param client: ElasticSearch client.
     :param uuid: UUID of the Transfer in the DB.
     :param path: path on disk, including the transfer directory and a
@@ -776,10 +848,10 @@ def _index_transfer_files(
     :param ingest_date: date Transfer was indexed
     :param status: optional Transfer status.
     :param printfn: optional print funtion.
+    :param chunk_size: number of documents per bulk request.
+    :param thread_count: number of bulk requests sent concurrently.
     :return: number of files indexed.
     """
-    files_indexed = 0
-
     # Some files should not be indexed.
     # This should match the basename of the file.
     ignore_files = ["processingMCP.xml"]
@@ -787,8 +859,13 @@ def _index_transfer_files(
     # Get dashboard UUID
     dashboard_uuid = get_dashboard_uuid()
 
-    for filepath in _list_files_in_dir(path):
-        if os.path.isfile(filepath):
+    transfer_files = _get_transfer_files(uuid)
+    transfer_file_formats = _get_transfer_file_formats(uuid)
+
+    def _generator():
+        for filepath in _list_files_in_dir(path):
+            if not os.path.isfile(filepath):
+                continue
             # We need to account for the possibility of dealing with a BagIt
             # transfer package - the new default in Archivematica.
             # The BagIt is created when the package is sent to backlog hence
@@ -797,34 +874,39 @@ def _index_transfer_files(
             stripped_path = re.sub(r"^data/", "", os.path.relpath(filepath, path))
             currentlocation = "%transferDirectory%" + stripped_path
             try:
-                f = File.objects.get(
-                    currentlocation=currentlocation.encode(), transfer_id=uuid
-                )
-                file_uuid = str(f.uuid)
-                formats = _get_file_formats(f)
-                bulk_extractor_reports = _list_bulk_extractor_reports(path, file_uuid)
-                if f.modificationtime is not None:
-                    modification_date = f.modificationtime.strftime("%Y-%m-%d")
-                else:
-                    modification_date = ""
-            except File.DoesNotExist:
+                file_uuid, modificationtime = transfer_files[currentlocation.encode()]
+            except KeyError:
                 file_uuid, modification_date = "", ""
                 formats = []
                 bulk_extractor_reports = []
+            else:
+                file_uuid = str(file_uuid)
+                formats = transfer_file_formats.get(file_uuid, [])
+                bulk_extractor_reports = _list_bulk_extractor_reports(path, file_uuid)
+                if modificationtime is not None:
+                    modification_date = modificationtime.strftime("%Y-%m-%d")
+                else:
+                    modification_date = ""
 
             # Get file path info
             stripped_path = filepath.replace(path, transfer_name + "/")
-            file_extension = os.path.splitext(filepath)[1][1:].lower()
             filename = os.path.basename(filepath)
-            # Size in megabytes
-            size = os.path.getsize(filepath) / (1024 * 1024)
-            create_time = os.stat(filepath).st_ctime
 
-            if filename not in ignore_files:
-                printfn(f"Indexing {stripped_path} (UUID: {file_uuid})")
+            if filename in ignore_files:
+                printfn(f"Skipping indexing {stripped_path}")
+                continue
 
-                # TODO: Index Backlog Location UUID?
-                indexData = {
+            file_extension = os.path.splitext(filepath)[1][1:].lower()
+            stat = os.stat(filepath)
+
+            printfn(f"Indexing {stripped_path} (UUID: {file_uuid})")
+
+            # TODO: Index Backlog Location UUID?
+            yield {
+                "_op_type": "index",
+                "_index": TRANSFER_FILES_INDEX,
+                "_type": DOC_TYPE,
+                "_source": {
                     "filename": filename,
                     "relative_path": stripped_path,
                     "fileuuid": file_uuid,
@@ -833,26 +915,81 @@ def _index_transfer_files(
                     ES_FIELD_STATUS: status,
                     "origin": dashboard_uuid,
                     "ingestdate": ingest_date,
-                    ES_FIELD_CREATED: create_time,
+                    ES_FIELD_CREATED: stat.st_ctime,
                     "modification_date": modification_date,
-                    ES_FIELD_SIZE: size,
+                    # Size in megabytes
+                    ES_FIELD_SIZE: stat.st_size / (1024 * 1024),
                     "tags": [],
                     "file_extension": file_extension,
                     "bulk_extractor_reports": bulk_extractor_reports,
                     "format": formats,
                     "pending_deletion": pending_deletion,
-                }
+                },
+            }
 
-                _wait_for_cluster_yellow_status(client)
-                _try_to_index(client, indexData, TRANSFER_FILES_INDEX, printfn=printfn)
+    # The cluster health is checked once for the whole transfer.
+    _wait_for_cluster_yellow_status(client)
 
-                files_indexed = files_indexed + 1
-            else:
-                printfn(f"Skipping indexing {stripped_path}")
+    # The documents are built and reported in this thread, only the bulk
+    # requests are sent from the pool.
+    chunks = _chunk_actions(_generator(), chunk_size)
+    if thread_count <= 1:
+        return sum(_bulk_index(client, chunk) for chunk in chunks)
 
+    files_indexed = 0
+    with ThreadPoolExecutor(max_workers=thread_count) as executor:
+        pending = collections.deque()
+        for chunk in chunks:
+            # Don't build more documents than the pool can send at once.
+            if len(pending) >= thread_count:
+                files_indexed += pending.popleft().result()
+            pending.append(executor.submit(_bulk_index, client, chunk))
+        for future in pending:
+            files_indexed += future.result()
     return files_indexed
 
 
+def _chunk_actions(actions, chunk_size):
+    """Split the ``actions`` iterable into lists of ``chunk_size`` actions."""
+    actions = iter(actions)
+    while chunk := list(itertools.islice(actions, chunk_size)):
+        yield chunk
+
+
+def _bulk_index(
+    client,
+    actions,
+    max_retries=BULK_MAX_RETRIES,
+    initial_backoff=BULK_INITIAL_BACKOFF,
+    max_backoff=BULK_MAX_BACKOFF,
+):
+    """Send ``actions`` in a single bulk request, retrying failed documents.
+
+    Documents rejected because the cluster is busy are retried by ``bulk``,
+    and the request is sent again if the cluster can't be reached, like
+    ``_try_to_index`` does for single documents.
+
+    :return: number of documents indexed.
+    """
+    for attempt in range(max_retries + 1):
+        if attempt:
+            time.sleep(min(max_backoff, initial_backoff * 2 ** (attempt - 1)))
+        try:
+            indexed, _ = bulk(
+                client,
+                actions,
+                chunk_size=len(actions),
+                max_retries=max_retries,
+                initial_backoff=initial_backoff,
+                max_backoff=max_backoff,
+            )
+            return indexed
+        except ElasticsearchConnectionError as err:
+            if attempt == max_retries:
+                raise
+            logger.warning("Error sending bulk request, retrying: %s", err)
+
+
 def _try_to_index(
     client, data, index, wait_between_tries=10, max_tries=10, printfn=print
 ):
@@ -902,6 +1039,41 @@ def _remove_tool_output_from_mets(doc):
     print("Removed FITS output from METS.")
 
 
+class METSIndex:
+    """Sections of a METS document indexed by their identifiers.
+
+    Looking up a section with XPath scans the whole document, which makes
+    indexing the files of an AIP quadratic in the number of files. The
+    lookup tables are built in a single pass instead. The first element
+    found wins if an identifier is repeated, like ``find`` would do.
+
+    :param doc: root Element (or ElementTree) of the METS document.
+    """
+
+    def __init__(self, doc):
+        if hasattr(doc, "getroot"):
+            doc = doc.getroot()
+        # amdSec and dmdSec elements by ID.
+        self.amd_secs = {}
+        self.dmd_secs = {}
+        # Parent division of each file pointer of the physical structMap by
+        # FILEID.
+        self.file_pointer_divisions = {}
+        for element in doc:
+            if element.tag == ns.metsBNS + "amdSec":
+                self.amd_secs.setdefault(element.get("ID"), element)
+            elif element.tag == ns.metsBNS + "dmdSec":
+                self.dmd_secs.setdefault(element.get("ID"), element)
+            elif (
+                element.tag == ns.metsBNS + "structMap"
+                and element.get("TYPE") == "physical"
+            ):
+                for fptr in element.iter(ns.metsBNS + "fptr"):
+                    self.file_pointer_divisions.setdefault(
+                        fptr.get("FILEID"), fptr.getparent()
+                    )
+
+
 def _get_directories_with_metadata(container):
     """Return Directory entries with metadata sections.
 
@@ -955,11 +1127,13 @@ def _get_relative_path_element(directory):
     return result
 
 
-def _get_latest_dmd_secs(dmd_id, doc):
+def _get_latest_dmd_secs(dmd_id, doc, mets_index=None):
+    if mets_index is None:
+        mets_index = METSIndex(doc)
     # Build a mapping of dmdSec by metadata type.
     dmd_secs = {}
     for id in dmd_id.split():
-        dmd_sec = ns.xml_find_premis(doc, f'mets:dmdSec[@ID="{id}"]')
+        dmd_sec = mets_index.dmd_secs.get(id)
         if not dmd_sec:
             continue
         # Use mdWrap MDTYPE and OTHERMDTYPE to generate a unique key.
@@ -992,7 +1166,7 @@ def _get_latest_dmd_secs(dmd_id, doc):
     return final_dmd_secs
 
 
-def _get_file_metadata(file_pointer_division, doc):
+def _get_file_metadata(file_pointer_division, doc, mets_index=None):
     """Get descriptive metadata for a file pointer.
 
     There are various types of metadata elements extracted: dublin core
@@ -1001,21 +1175,22 @@ def _get_file_metadata(file_pointer_division, doc):
     related XML files.
 
     These types are parsed and combined into a single dictionary of
-    metadata attributes.
+    metadata attributes. Pass the METSIndex of `doc` as `mets_index` when
+    calling this repeatedly on the same document.
     """
     result = {}
     elements_with_metadata = []
     dmd_id = file_pointer_division.attrib.get("DMDID")
     if not dmd_id:
         return result
-    for dmd_sec in _get_latest_dmd_secs(dmd_id, doc):
+    for dmd_sec in _get_latest_dmd_secs(dmd_id, doc, mets_index=mets_index):
         elements_with_metadata += _get_descriptive_section_metadata(dmd_sec)
     if elements_with_metadata:
         result = _combine_elements(elements_with_metadata)
     return _normalize_dict(result)
 
 
-def _get_directory_metadata(directory, doc):
+def _get_directory_metadata(directory, doc, mets_index=None):
     """Get descriptive or administrive metadata for a directory.
 
     There are three types of metadata elements extracted:
@@ -1031,16 +1206,19 @@ def _get_directory_metadata(directory, doc):
 
     These types are parsed and combined into a single dictionary of
     metadata attributes. A marker element with the label of the
-    Directory entry is added to the result.
+    Directory entry is added to the result. Pass the METSIndex of `doc` as
+    `mets_index` when calling this repeatedly on the same document.
     """
+    if mets_index is None:
+        mets_index = METSIndex(doc)
     result = {}
     elements_with_metadata = []
     dmd_id = directory.attrib.get("DMDID")
     if dmd_id:
-        for dmd_sec in _get_latest_dmd_secs(dmd_id, doc):
+        for dmd_sec in _get_latest_dmd_secs(dmd_id, doc, mets_index=mets_index):
             elements_with_metadata += _get_descriptive_section_metadata(dmd_sec)
     for ADMID in directory.attrib.get("ADMID", "").split():
-        amd_sec = ns.xml_find_premis(doc, f'mets:amdSec[@ID="{ADMID}"]')
+        amd_sec = mets_index.amd_secs.get(ADMID)
         if amd_sec is not None:
             # look for bag/disk image metadata
             elements_with_metadata += ns.xml_findall_premis(
@@ -1053,7 +1231,7 @@ def _get_directory_metadata(directory, doc):
     return _normalize_dict(result)
 
 
-def _get_aip_metadata(doc):
+def _get_aip_metadata(doc, mets_index=None):
     """Get metadata about the directories in the AIP.
 
     Given a doc representing a METS file, look for Directory entries
@@ -1061,11 +1239,15 @@ def _get_aip_metadata(doc):
     structMap and return dictionaries with metadata attributes for
     each directory.
     """
+    if mets_index is None:
+        mets_index = METSIndex(doc)
     result = []
     physical_struct_map = ns.xml_find_premis(doc, 'mets:structMap[@TYPE="physical"]')
     if physical_struct_map is not None:
         for directory in _get_directories_with_metadata(physical_struct_map):
-            directory_metadata = _get_directory_metadata(directory, doc)
+            directory_metadata = _get_directory_metadata(
+                directory, doc, mets_index=mets_index
+            )
             if directory_metadata:
                 result.append(directory_metadata)
     return result
@@ -1098,19 +1280,6 @@ def _normalize_dict(data):
     return new
 
 
-def _get_file_formats(f):
-    formats = []
-    fields = [
-        "format_version__pronom_id",
-        "format_version__description",
-        "format_version__format__group__description",
-    ]
-    for puid, fmt, group in f.fileformatversion_set.all().values_list(*fields):
-        formats.append({"puid": puid, "format": fmt, "group": group})
-
-    return formats
-
-
 def _list_bulk_extractor_reports(transfer_path, file_uuid):
     reports = []
     log_path = os.path.join(transfer_path, "data", "logs", "bulk-" + file_uuid)
@@ -1142,16 +1311,6 @@ def _list_files_in_dir(path, filepaths=None):
     return filepaths
 
 
-def _get_amdSec(admID, doc):
-    """Get amdSec with given admID.
-
-    :param admID: admID.
-    :param doc: ElementTree object.
-    :return: amdSec.
-    """
-    return ns.xml_find_premis(doc, f"mets:amdSec[@ID='{admID}']")
-
-
 def _get_file_uuid(amdSec):
     """Get UUID of a file from amdSec.
 
@@ -1213,6 +1372,62 @@ def search_all_results(client, body, index):
     return results
 
 
+def iter_search_pages(client, index, body, sort, _source=None, page_size=1000):
+    """Yield the hits of a search a page at a time.
+
+    Pages are fetched with ``search_after``, which, unlike ``from``/``size``
+    paging, isn't bounded by the index ``max_result_window`` and costs the
+    same for every page, so every matching document can be visited.
+
+    :param Elasticsearch client: Elasticsearch client
+    :param str index: Name of the index to search.
+    :param dict body: Search body, e.g. a query.
+    :param list sort: Sort specification. Its last field must be unique per
+    document (e.g. a UUID) so pages don't overlap.
+    :param str _source: Comma-separated fields to return.
+    :param int page_size: Number of hits per page.
+    """
+    body = dict(body, sort=sort)
+    while True:
+        results = client.search(index=index, body=body, size=page_size, _source=_source)
+        hits = results["hits"]["hits"]
+        if hits:
+            yield hits
+        if len(hits) < page_size:
+            return
+        body = dict(body, search_after=hits[-1]["sort"])
+
+
+def iter_aggregation_pages(client, index, body, field, page_size=1000):
+    """Yield the buckets of the distinct values of a field a page at a time.
+
+    Pages are fetched with a composite aggregation and its ``after_key``, so
+    every distinct value can be visited, unlike a ``terms`` aggregation whose
+    size is bounded. Buckets are sorted by value and their ``key`` is a dict
+    with ``field`` as the only key.
+
+    :param Elasticsearch client: Elasticsearch client
+    :param str index: Name of the index to search.
+    :param dict body: Search body, e.g. a query.
+    :param str field: Field whose values are aggregated.
+    :param int page_size: Number of buckets per page.
+    """
+    composite = {"size": page_size, "sources": [{field: {"terms": {"field": field}}}]}
+    while True:
+        results = client.search(
+            index=index,
+            body=dict(body, size=0, aggs={"values": {"composite": composite}}),
+        )
+        aggregation = results["aggregations"]["values"]
+        buckets = aggregation["buckets"]
+        if buckets:
+            yield buckets
+        after_key = aggregation.get("after_key")
+        if len(buckets) < page_size or not after_key:
+            return
+        composite = dict(composite, after=after_key)
+
+
 def get_aip_data(client, uuid, fields=None):
     search_params = {
         "body": {"query": {"term": {ES_FIELD_UUID: uuid}}},
@@ -1227,6 +1442,39 @@ def get_aip_data(client, uuid, fields=None):
     return aips["hits"]["hits"][0]
 
 
+def get_aips_data(client, uuids, fields=None):
+    """Return the documents of many AIPs by UUID using a single search.
+
+    AIPs that can't be found are left out.
+
+    :param Elasticsearch client: Elasticsearch client
+    :param list uuids: AIP UUIDs.
+    :param str fields: Comma-separated fields to return, always including the
+    AIP UUID.
+    """
+    uuids = list(dict.fromkeys(uuids))
+    if not uuids:
+        return {}
+
+    search_params = {
+        "body": {"query": {"terms": {ES_FIELD_UUID: uuids}}},
+        "index": AIPS_INDEX,
+        "size": len(uuids),
+    }
+
+    if fields:
+        search_params["_source"] = ",".join(
+            dict.fromkeys([ES_FIELD_UUID] + fields.split(","))
+        )
+
+    aips = client.search(**search_params)
+
+    result = {}
+    for aip in aips["hits"]["hits"]:
+        result.setdefault(aip["_source"][ES_FIELD_UUID], aip)
+    return result
+
+
 def get_aipfile_data(client, uuid, fields=None):
     search_params = {
         "body": {"query": {"term": {"FILEUUID": uuid}}},
@@ -1412,6 +1660,35 @@ def delete_aip_files(client, uuid):
     _delete_matching_documents(client, AIP_FILES_INDEX, "AIPUUID", uuid)
 
 
+def remove_backlog_transfers(client, uuids):
+    """Delete many transfers and their files from the backlog indices."""
+    _delete_packages_and_files(
+        client, TRANSFERS_INDEX, TRANSFER_FILES_INDEX, "sipuuid", uuids
+    )
+
+
+def delete_aips(client, uuids):
+    """Delete many AIPs and their files from the AIP indices."""
+    _delete_packages_and_files(client, AIPS_INDEX, AIP_FILES_INDEX, "AIPUUID", uuids)
+
+
+def _delete_packages_and_files(
+    client, package_index, files_index, package_uuid_field, package_uuids
+):
+    """Deletes many packages and their related files with a query per index."""
+    package_uuids = list(package_uuids)
+    if not package_uuids:
+        return
+    for index, field in (
+        (package_index, ES_FIELD_UUID),
+        (files_index, package_uuid_field),
+    ):
+        query = {"query": {"terms": {field: package_uuids}}}
+        logger.info("Deleting with query %s", query)
+        results = client.delete_by_query(index=index, body=query)
+        logger.info("Deleted by query %s", results)
+
+
 def _delete_matching_documents(client, index, field, value):
     """Deletes all documents in index where field = value
 
@@ -1541,6 +1818,80 @@ def _update_field_for_package_and_files(
         )
 
 
+def update_backlog_pending_deletion(client, values):
+    """Update transfer indices to reflect the deletion requests of many transfers.
+
+    :param client: ES client.
+    :param values: Dictionary of pending_deletion values by transfer UUID.
+    :returns: None.
+    """
+    _bulk_update_field_for_packages_and_files(
+        client,
+        TRANSFERS_INDEX,
+        TRANSFER_FILES_INDEX,
+        "sipuuid",
+        "pending_deletion",
+        values,
+    )
+
+
+def update_aips_status(client, values):
+    """Update AIP indices to reflect the status of many AIPs.
+
+    :param client: ES client.
+    :param values: Dictionary of statuses by AIP UUID.
+    :returns: None.
+    """
+    _bulk_update_field_for_packages_and_files(
+        client, AIPS_INDEX, AIP_FILES_INDEX, "AIPUUID", ES_FIELD_STATUS, values
+    )
+
+
+def _bulk_update_field_for_packages_and_files(
+    client, package_index, files_index, package_uuid_field, field, values
+):
+    """Update the specified field for many packages and their related files
+
+    The documents to update are found with a scroll per index, so every file
+    of the packages is updated, and the updates are streamed in bulk requests.
+
+    :param client: ES client.
+    :param package_index: Name of package index to update.
+    :param files_index: Name of files index to update.
+    :param package_uuid_field: Name of ES field for package UUID in files_index.
+    :param field: Field in indices to update.
+    :param values: Dictionary of values to set in the field by package UUID.
+    :return: None.
+    """
+    if not values:
+        return
+
+    package_uuids = list(values)
+
+    def _actions():
+        for index, uuid_field in (
+            (package_index, ES_FIELD_UUID),
+            (files_index, package_uuid_field),
+        ):
+            query = {
+                "query": {"terms": {uuid_field: package_uuids}},
+                "_source": [uuid_field],
+            }
+            for document in scan(client, query=query, index=index):
+                package_uuid = document["_source"].get(uuid_field)
+                if package_uuid not in values:
+                    continue
+                yield {
+                    "_op_type": "update",
+                    "_index": index,
+                    "_type": DOC_TYPE,
+                    "_id": document["_id"],
+                    "doc": {field: values[package_uuid]},
+                }
+
+    bulk(client, _actions())
+
+
 # ---------------
 # RESULTS HELPERS
 # ---------------
@@ -24,9 +24,14 @@ from pathlib import Path
 
 from archivematicaFunctions import get_file_checksum
 from archivematicaFunctions import get_setting
+from databaseFunctions import bulkInsertIntoEvents
+from databaseFunctions import getAMAgentsForUnit
 from databaseFunctions import insertIntoEvents
 from databaseFunctions import insertIntoFiles
+from django.db import transaction
+from django.utils import timezone
 from executeOrRunSubProcess import executeOrRun
+from main.models import Event
 from main.models import File
 from main.models import Transfer
 
@@ -147,6 +152,140 @@ def addFileToSIP(
     )
 
 
+class FileRegistry:
+    """Register many new files of a unit with a few queries.
+
+    It is the bulk version of ``addFileToTransfer`` and ``addFileToSIP``. Files
+    passed to ``add`` are inserted with their events every ``batch_size``
+    files and when the registry is used as a context manager, on exit::
+
+        with FileRegistry(transfer_uuid=transfer_uuid) as registry:
+            for path in paths:
+                registry.add(path, date=date)
+
+    The agents of the events, and the accession number of a transfer, are
+    fetched once for the whole unit.
+    """
+
+    def __init__(self, transfer_uuid=None, sip_uuid=None, batch_size=1000):
+        if bool(transfer_uuid) == bool(sip_uuid):
+            raise ValueError("SIP exclusive-or Transfer UUID must be defined")
+        self.transfer_uuid = str(transfer_uuid) if transfer_uuid else None
+        self.sip_uuid = str(sip_uuid) if sip_uuid else None
+        self.batch_size = batch_size
+        self.agents = getAMAgentsForUnit(
+            sipUUID=self.sip_uuid, transferUUID=self.transfer_uuid
+        )
+        self.accession_id = None
+        if self.transfer_uuid:
+            self.accession_id = (
+                Transfer.objects.filter(uuid=self.transfer_uuid)
+                .values_list("accessionid", flat=True)
+                .first()
+            )
+        self._checksum_type = None
+        self._files = []
+        self._events = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def add(
+        self,
+        file_path,
+        file_uuid=None,
+        date=None,
+        source_type="ingestion",
+        event_detail="",
+        use="original",
+        original_location=None,
+        checksum_path=None,
+        current_location=None,
+    ):
+        """Queue a file and its events to be inserted.
+
+        :param str file_path: The path of the file, relative to the unit,
+            e.g. ``%transferDirectory%objects/file.txt``.
+        :param str file_uuid: The UUID of the file, a new one is generated if
+            not provided.
+        :param str checksum_path: The path of the file on disk. If provided,
+            its size and checksum are recorded with a "message digest
+            calculation" event, like ``updateSizeAndChecksum`` does.
+        :param str current_location: The current location of the file when it
+            is not ``file_path``, e.g. the path on disk of a reingested file
+            whose original path comes from the METS.
+        :returns File: The File, which may have been inserted already if the
+            batch was full.
+        """
+        if date is None:
+            date = timezone.now()
+        if not original_location:
+            original_location = file_path
+        if not file_uuid:
+            file_uuid = str(uuid.uuid4())
+
+        file_obj = File(
+            uuid=str(file_uuid),
+            originallocation=original_location.encode(),
+            currentlocation=(current_location or file_path).encode(),
+            enteredsystem=date,
+            filegrpuse=use,
+            transfer_id=self.transfer_uuid,
+            sip_id=self.sip_uuid,
+        )
+        self._files.append(file_obj)
+
+        self._add_event(file_obj, source_type, date, event_detail=event_detail)
+        if self.accession_id:
+            self._add_event(
+                file_obj,
+                "registration",
+                date,
+                event_outcome_detail=f"accession#{self.accession_id}",
+            )
+        if checksum_path is not None:
+            if self._checksum_type is None:
+                self._checksum_type = get_setting("checksum_type", "sha256")
+            (
+                file_obj.size,
+                file_obj.checksum,
+                file_obj.checksumtype,
+            ) = get_size_and_checksum(checksum_path, checksum_type=self._checksum_type)
+            self._add_event(
+                file_obj,
+                "message digest calculation",
+                date,
+                event_detail=f'program="python"; module="hashlib.{file_obj.checksumtype}()"',
+                event_outcome_detail=file_obj.checksum,
+            )
+
+        if len(self._files) >= self.batch_size:
+            self.flush()
+
+        return file_obj
+
+    def _add_event(self, file_obj, event_type, date, **kwargs):
+        event = Event(
+            event_id=str(uuid.uuid4()),
+            file_uuid=file_obj,
+            event_type=event_type,
+            event_datetime=date,
+            **kwargs,
+        )
+        self._events.append((event, self.agents))
+
+    def flush(self):
+        """Insert the files and events added since the last flush."""
+        with transaction.atomic():
+            File.objects.bulk_create(self._files)
+            bulkInsertIntoEvents(self._events)
+        self._files, self._events = [], []
+
+
 def rename(source, destination, printfn=print, should_exit=False):
     """Used to move/rename directories. This function was before used to wrap the operation with sudo."""
     if source == destination:
@@ -0,0 +1,52 @@
+"""
+Single-pass file fixity.
+
+``get_checksums`` computes any number of digests of a file reading it only
+once, and ``get_checksums_for_paths`` does it for many files at once.
+"""
+
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("archivematica.common")
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def get_checksums(path, algorithms):
+    """Return the hex digests of the file at ``path`` by algorithm.
+
+    The digests are computed together in a single read of the file.
+    """
+    hashes = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+    with open(path, "rb") as file_:
+        for chunk in iter(lambda: file_.read(CHUNK_SIZE), b""):
+            for hash_ in hashes.values():
+                hash_.update(chunk)
+    return {algorithm: hash_.hexdigest() for algorithm, hash_ in hashes.items()}
+
+
+def get_checksums_for_paths(paths, algorithms, workers=None):
+    """Compute the digests of many files using a pool of threads.
+
+    Hashing releases the GIL, so reading and hashing several files at once
+    overlaps their I/O. Returns a dictionary of digests by path; files that
+    can't be read are logged and left out for the caller to deal with.
+    """
+    paths = list(paths)
+
+    def get(path):
+        try:
+            return get_checksums(path, algorithms)
+        except OSError as err:
+            logger.debug("Unable to compute checksums of %s: %s", path, err)
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(get, paths)
+        return {
+            path: digests
+            for path, digests in zip(paths, results)
+            if digests is not None
+        }
@@ -1,11 +1,19 @@
+import copy
 import logging
 import os
 import platform
+import threading
+import time
 import urllib
+import uuid as uuid_lib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 import archivematicaFunctions as am
 import requests
 from common_metrics import ss_api_timer
+from django.apps import apps
 from django.conf import settings as django_settings
 from requests.auth import AuthBase
 
@@ -24,6 +32,31 @@ class WaitForAsyncError(Error):
     pass
 
 
+# Time (in seconds) the status of a package is remembered for.
+PACKAGE_STATUS_TTL = 10
+
+# Number of concurrent requests made when the status of many packages can't be
+# fetched in a single request.
+PACKAGE_STATUS_WORKERS = 8
+
+# Maximum number of packages whose status is requested at once, which keeps
+# the length of the request URL reasonable.
+PACKAGE_STATUS_BATCH_SIZE = 100
+
+# Maximum number of Storage Service responses cached by each process.
+MAX_CACHE_ENTRIES = 1000
+
+# The revision is a token stored in ``DashboardSetting`` which is replaced when
+# the Storage Service settings, pipeline or locations are changed through the
+# dashboard, so every process drops its cached responses and sessions.
+REVISION_SCOPE = "storage_service"
+REVISION_NAME = "storage_service_revision"
+
+# Time (in seconds) the revision is remembered for, so it is queried at most
+# once per interval instead of once per request.
+REVISION_CHECK_INTERVAL = 5
+
+
 # ####################### INTERFACE WITH STORAGE API #########################
 
 # ########### HELPER FUNCTIONS #############
@@ -54,18 +87,75 @@ def _storage_service_url():
     return storage_service_url
 
 
-def _storage_api_session(timeout=django_settings.STORAGE_SERVICE_CLIENT_QUICK_TIMEOUT):
-    """Return a requests.Session with a customized adapter with timeout support."""
+def get_revision():
+    """Return the current Storage Service revision token or ``None``."""
+    DashboardSetting = apps.get_model(app_label="main", model_name="DashboardSetting")
+    return (
+        DashboardSetting.objects.filter(scope=REVISION_SCOPE, name=REVISION_NAME)
+        .values_list("value", flat=True)
+        .first()
+    )
+
+
+_revision: Optional[str] = None
+_revision_checked_at: Optional[float] = None
+_revision_lock = threading.Lock()
+
+
+def _current_revision():
+    """Return the revision, querying it at most every ``REVISION_CHECK_INTERVAL``."""
+    global _revision, _revision_checked_at
+
+    with _revision_lock:
+        if (
+            _revision_checked_at is not None
+            and time.monotonic() - _revision_checked_at < REVISION_CHECK_INTERVAL
+        ):
+            return _revision
+
+    revision = get_revision()
+    with _revision_lock:
+        _revision, _revision_checked_at = revision, time.monotonic()
+    return revision
+
+
+def invalidate_cache():
+    """Make every process drop its cached responses and sessions.
+
+    Call it after changing the Storage Service settings, pipeline or locations.
+    """
+    global _revision, _revision_checked_at
 
-    class HTTPAdapterWithTimeout(requests.adapters.HTTPAdapter):
-        def __init__(self, timeout=None, *args, **kwargs):
-            self.timeout = timeout
-            super().__init__(*args, **kwargs)
+    DashboardSetting = apps.get_model(app_label="main", model_name="DashboardSetting")
+    revision = uuid_lib.uuid4().hex
+    DashboardSetting.objects.update_or_create(
+        scope=REVISION_SCOPE,
+        name=REVISION_NAME,
+        defaults={"value": revision},
+    )
+    # This process sees the change right away, the others within
+    # ``REVISION_CHECK_INTERVAL`` seconds.
+    with _revision_lock:
+        _revision, _revision_checked_at = revision, time.monotonic()
+    response_cache.clear()
 
-        def send(self, *args, **kwargs):
-            kwargs["timeout"] = self.timeout
-            return super().send(*args, **kwargs)
 
+class HTTPAdapterWithTimeout(requests.adapters.HTTPAdapter):
+    def __init__(self, timeout=None, *args, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, *args, **kwargs):
+        kwargs["timeout"] = self.timeout
+        return super().send(*args, **kwargs)
+
+
+_sessions: dict[float, tuple[requests.Session, Optional[str]]] = {}
+_sessions_lock = threading.Lock()
+_sessions_pid = None
+
+
+def _create_session(timeout):
     session = requests.session()
     session.auth = ApiKeyAuth()
     session.mount("http://", HTTPAdapterWithTimeout(timeout=timeout))
@@ -73,6 +163,30 @@ def _storage_api_session(timeout=django_settings.STORAGE_SERVICE_CLIENT_QUICK_TI
     return session
 
 
+def _storage_api_session(timeout=django_settings.STORAGE_SERVICE_CLIENT_QUICK_TIMEOUT):
+    """Return a requests.Session with a customized adapter with timeout support.
+
+    Sessions are shared by the threads of a process, one per timeout, so
+    connections to the Storage Service are kept alive and reused. They are
+    replaced when the Storage Service revision changes, e.g. because the
+    credentials were updated, which is checked at most every
+    ``REVISION_CHECK_INTERVAL`` seconds.
+    """
+    global _sessions_pid
+
+    revision = _current_revision()
+    with _sessions_lock:
+        # Pooled connections can't be shared with forked processes.
+        if _sessions_pid != os.getpid():
+            _sessions.clear()
+            _sessions_pid = os.getpid()
+        session, session_revision = _sessions.get(timeout, (None, None))
+        if session is None or session_revision != revision:
+            session = _create_session(timeout)
+            _sessions[timeout] = (session, revision)
+        return session
+
+
 def _storage_api_slow_session():
     """Return a requests.Session with a higher configurable timeout."""
     return _storage_api_session(django_settings.STORAGE_SERVICE_CLIENT_TIMEOUT)
@@ -96,6 +210,69 @@ def _storage_relative_from_absolute(location_path, space_path):
     return location_path
 
 
+class ResponseCache:
+    """Thread-safe TTL and LRU cache of Storage Service responses.
+
+    Entries are also dropped when the Storage Service revision changes, which
+    is checked at most every ``REVISION_CHECK_INTERVAL`` seconds. Cached
+    values are copied on the way out so callers can't modify them.
+    """
+
+    def __init__(self, ttl=None, max_entries=MAX_CACHE_ENTRIES, clock=time.monotonic):
+        self._ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return django_settings.STORAGE_SERVICE_CLIENT_CACHE_TTL
+
+    def get_or_fetch(self, key, fetch, cacheable=bool):
+        """Return the value cached for ``key`` or the result of ``fetch()``.
+
+        Fetched values are cached only if ``cacheable(value)`` is true.
+        """
+        revision = _current_revision()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, entry_revision, expires_at = entry
+                if entry_revision == revision and expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        value = fetch()
+        if self.ttl > 0 and cacheable(value):
+            with self._lock:
+                self._entries[key] = (
+                    copy.deepcopy(value),
+                    revision,
+                    self.clock() + self.ttl,
+                )
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
+
+
+def _cached(cache, key, fetch, cacheable=bool):
+    if cache is None:
+        return fetch()
+    return cache.get_or_fetch(key, fetch, cacheable=cacheable)
+
+
 # ########### PIPELINE #############
 
 
@@ -130,10 +307,20 @@ def create_pipeline(
             exc_info=True,
         )
         raise
+    invalidate_cache()
     return True
 
 
-def get_pipeline(uuid):
+def get_pipeline(uuid, cache=response_cache):
+    """Return the pipeline registered in the Storage Service with `uuid`.
+
+    Pass ``cache=None`` to bypass the response cache, e.g. to check whether the
+    Storage Service is reachable.
+    """
+    return _cached(cache, ("pipeline", uuid), lambda: _get_pipeline(uuid))
+
+
+def _get_pipeline(uuid):
     url = _storage_service_url() + "pipeline/" + uuid + "/"
     try:
         with ss_api_timer(function="get_pipeline"):
@@ -154,22 +341,33 @@ def get_pipeline(uuid):
 # ########### LOCATIONS #############
 
 
-def get_location(path=None, purpose=None, space=None):
+def get_location(path=None, purpose=None, space=None, cache=response_cache):
     """Returns a list of storage locations, filtered by parameters.
 
     Queries the storage service and returns a list of storage locations,
-    optionally filtered by purpose, containing space or path.
+    optionally filtered by purpose, containing space or path. Responses are
+    cached (see `ResponseCache`) unless ``cache=None`` is passed.
 
     purpose: How the storage is used.  Should reference storage service
         purposes, found in storage_service/locations/models/location.py
     path: Path to location.  If a space is passed in, paths starting with /
         have the space's path stripped.
     """
-    return_locations = []
     if space and path:
         path = _storage_relative_from_absolute(path, space["path"])
         space = space["uuid"]
-    pipeline = get_pipeline(am.get_setting("dashboard_uuid"))
+    return _cached(
+        cache,
+        ("location", path, purpose, str(space)),
+        lambda: _get_location(path, purpose, space, cache),
+        # Don't remember that there are no locations, they may be added soon.
+        cacheable=lambda locations: locations,
+    )
+
+
+def _get_location(path, purpose, space, cache):
+    return_locations = []
+    pipeline = get_pipeline(am.get_setting("dashboard_uuid"), cache=cache)
     if pipeline is None:
         return None
     url = _storage_service_url() + "location/"
@@ -222,6 +420,14 @@ def location_description_from_slug(aip_location_slug):
     :return: storage service location description
     :rtype: dict
     """
+    return _cached(
+        response_cache,
+        ("location_description", aip_location_slug),
+        lambda: _location_description_from_slug(aip_location_slug),
+    )
+
+
+def _location_description_from_slug(aip_location_slug):
     API_SLUG = "/api/v2/"
     JSON_MIME = "application/json"
     CONTENT_TYPE_HDR = "content-type"
@@ -246,7 +452,13 @@ def location_description_from_slug(aip_location_slug):
     return response.json()
 
 
-def get_default_location(purpose):
+def get_default_location(purpose, cache=response_cache):
+    return _cached(
+        cache, ("default_location", purpose), lambda: _get_default_location(purpose)
+    )
+
+
+def _get_default_location(purpose):
     url = _storage_service_url() + f"location/default/{purpose}"
     with ss_api_timer(function="get_default_location"):
         response = _storage_api_session().get(url)
@@ -454,6 +666,106 @@ def get_file_info(
     return return_files
 
 
+class PackageStatusCache:
+    """Thread-safe cache of package statuses that expire after `ttl` seconds."""
+
+    def __init__(self, ttl=PACKAGE_STATUS_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._statuses = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, uuids):
+        """Return the statuses known for `uuids` that haven't expired."""
+        now = self.clock()
+        result = {}
+        with self._lock:
+            for uuid in uuids:
+                status, expires_at = self._statuses.get(uuid, (None, 0))
+                if expires_at > now:
+                    result[uuid] = status
+                else:
+                    self._statuses.pop(uuid, None)
+        return result
+
+    def set_many(self, statuses):
+        expires_at = self.clock() + self.ttl
+        with self._lock:
+            for uuid, status in statuses.items():
+                self._statuses[uuid] = (status, expires_at)
+
+    def clear(self):
+        with self._lock:
+            self._statuses.clear()
+
+
+package_status_cache = PackageStatusCache()
+
+
+def _get_package_status(session, uuid):
+    url = _storage_service_url() + "file/" + uuid + "/"
+    try:
+        with ss_api_timer(function="get_package_status"):
+            response = session.get(url)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        LOGGER.warning("Unable to get status of package %s: %s", uuid, e)
+        return None
+    return response.json().get("status")
+
+
+def _get_packages_status(uuids):
+    """Fetch the status of the packages given from the Storage Service.
+
+    All the packages are requested at once using a ``uuid__in`` filter. If the
+    Storage Service rejects it, they are requested one by one by a bounded pool
+    of threads instead.
+    """
+    session = _storage_api_slow_session()
+    url = _storage_service_url() + "file/"
+    params = {"uuid__in": ",".join(uuids), "limit": len(uuids)}
+    try:
+        with ss_api_timer(function="get_packages_status"):
+            response = session.get(url, params=params)
+        response.raise_for_status()
+    except requests.exceptions.HTTPError as e:
+        LOGGER.debug("Unable to filter packages by UUID, requesting them: %s", e)
+    except requests.exceptions.RequestException as e:
+        LOGGER.warning("Unable to get status of packages %s: %s", uuids, e)
+        return {}
+    else:
+        requested = set(uuids)
+        return {
+            package["uuid"]: package.get("status")
+            for package in response.json()["objects"]
+            if package["uuid"] in requested
+        }
+
+    with ThreadPoolExecutor(max_workers=PACKAGE_STATUS_WORKERS) as executor:
+        statuses = executor.map(lambda uuid: _get_package_status(session, uuid), uuids)
+        return {
+            uuid: status for uuid, status in zip(uuids, statuses) if status is not None
+        }
+
+
+def get_packages_status(uuids, cache=package_status_cache):
+    """Return the status of many packages by UUID.
+
+    Statuses are fetched in batches and cached for a few seconds, so
+    paging through search results doesn't hit the Storage Service once per
+    package. Packages whose status can't be retrieved are left out.
+    """
+    uuids = list(dict.fromkeys(str(uuid) for uuid in uuids))
+    statuses = cache.get_many(uuids) if cache is not None else {}
+    missing = [uuid for uuid in uuids if uuid not in statuses]
+    for i in range(0, len(missing), PACKAGE_STATUS_BATCH_SIZE):
+        fetched = _get_packages_status(missing[i : i + PACKAGE_STATUS_BATCH_SIZE])
+        if cache is not None:
+            cache.set_many(fetched)
+        statuses.update(fetched)
+    return statuses
+
+
 def download_file_url(file_uuid):
     """
     Returns URL to storage service for downloading `file_uuid`.
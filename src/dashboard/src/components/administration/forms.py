@@ -16,6 +16,7 @@
 # along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
 import os
 
+import storageService as storage_service
 from components import helpers
 from contrib.mcp.client import MCPClient
 from django import forms
@@ -240,6 +241,11 @@ class StorageSettingsForm(SettingsForm):
         ),
     )
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Responses cached with the previous settings may be stale.
+        storage_service.invalidate_cache()
+
 
 class ChecksumSettingsForm(SettingsForm):
     CHOICES = (
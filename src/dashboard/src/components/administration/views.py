@@ -179,7 +179,7 @@ def storage(request):
     human readable form.
     """
     try:
-        response_locations = storage_service.get_location()
+        response_locations = storage_service.get_location(cache=None)
     except Exception:
         messages.warning(
             request,
@@ -555,7 +555,7 @@ def general(request):
 
     not_created_yet = False
     try:
-        pipeline = storage_service.get_pipeline(dashboard_uuid)
+        pipeline = storage_service.get_pipeline(dashboard_uuid, cache=None)
     except Exception as err:
         if err.response is not None and err.response.status_code == 404:
             # The server has returned a 404, we're going to assume that this is
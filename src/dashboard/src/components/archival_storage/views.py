@@ -25,8 +25,6 @@ from datetime import datetime
 import databaseFunctions
 import elasticSearchFunctions as es
 import storageService as storage_service
-from archivematicaFunctions import AMCLIENT_ERROR_CODES
-from archivematicaFunctions import setup_amclient
 from components import advanced_search
 from components import helpers
 from components.archival_storage import forms
@@ -59,59 +57,88 @@ FILE_PERMISSIONS = 0o660
 
 CSV_MIMETYPE = "text/csv"
 
+# Number of hits fetched from ES at a time when exporting search results.
+CSV_EXPORT_PAGE_SIZE = 1000
 
-def sync_es_aip_status_with_storage_service(uuid, es_status):
-    """Update AIP's status in ES indices to match Storage Service.
+# Fields of the documents returned by the search end point.
+_ES_FILE_SOURCE = "filePath,FILEUUID,AIPUUID,accessionid,status"
+_ES_AIP_SOURCE = "name,uuid,size,accessionids,created,status,encrypted,AICID,isPartOf,countAIPsinAIC,location"
+
+
+def sync_es_aips_status_with_storage_service(aips):
+    """Update AIPs' status in ES indices to match Storage Service.
 
     This is a bit of a kludge that is made necessary by the fact that
     the Storage Service does not update ElasticSearch directly when
     a package's status has changed.
 
-    Updates to ES are visible in Archival Storage after running a new
-    search or refreshing the page.
+    The status of all the AIPs is fetched from the Storage Service at
+    once and the ES indices are updated with bulk requests. Updates to
+    ES are visible in Archival Storage after running a new search or
+    refreshing the page.
 
-    :param uuid: AIP UUID.
-    :param es_status: Current package status in ES.
+    :param aips: AIP documents from the AIPs index.
 
-    :returns: Boolean indicating whether AIP should be kept in search
-    results (i.e. has not been deleted from Storage Service).
+    :returns: Set of UUIDs of the AIPs that have been deleted from the
+    Storage Service and should be left out of search results.
     """
-    keep_in_results = True
+    statuses = storage_service.get_packages_status(aip["uuid"] for aip in aips)
+
+    updated_statuses = {}
+    deleted = set()
+    for aip in aips:
+        uuid = aip["uuid"]
+        aip_status = statuses.get(uuid)
+        if not aip_status:
+            logger.warning(
+                "Status for package %s could not be retrieved from Storage Service.",
+                uuid,
+            )
+            continue
 
-    amclient = setup_amclient()
-    amclient.package_uuid = uuid
-    api_results = amclient.get_package_details()
+        es_status = aip.get("status")
+        if (
+            aip_status == es.STATUS_DELETE_REQUESTED
+            and es_status != es.STATUS_DELETE_REQUESTED
+        ):
+            updated_statuses[uuid] = es.STATUS_DELETE_REQUESTED
+        elif aip_status == es.STATUS_UPLOADED and es_status != es.STATUS_UPLOADED:
+            updated_statuses[uuid] = es.STATUS_UPLOADED
+        elif aip_status == es.STATUS_DELETED:
+            deleted.add(uuid)
+
+    if updated_statuses or deleted:
+        es_client = es.get_client()
+        es.update_aips_status(es_client, updated_statuses)
+        es.delete_aips(es_client, deleted)
 
-    if api_results in AMCLIENT_ERROR_CODES:
-        logger.warning(
-            f"Package {uuid} not found in Storage Service. AMClient error code: {api_results}"
-        )
-        return keep_in_results
+    return deleted
 
-    aip_status = api_results.get("status")
 
-    if not aip_status:
-        logger.warning(
-            "Status for package {} could not be retrived from Storage Service."
-        )
-        return keep_in_results
+class AIPLookup:
+    """Per-request cache of the AIP documents in the AIPs index.
 
-    if (
-        aip_status == es.STATUS_DELETE_REQUESTED
-        and es_status != es.STATUS_DELETE_REQUESTED
-    ):
-        es_client = es.get_client()
-        es.mark_aip_deletion_requested(es_client, uuid)
-    elif aip_status == es.STATUS_UPLOADED and es_status != es.STATUS_UPLOADED:
-        es_client = es.get_client()
-        es.revert_aip_deletion_request(es_client, uuid)
-    elif aip_status == es.STATUS_DELETED:
-        keep_in_results = False
-        es_client = es.get_client()
-        es.delete_aip(es_client, uuid)
-        es.delete_aip_files(es_client, uuid)
+    Views needing the AIPs of many files call `prefetch` with all their UUIDs
+    first, so the AIPs are fetched with a single search instead of one per file.
+    """
+
+    FIELDS = "uuid,name,filePath,size,origin,created,status,encrypted"
 
-    return keep_in_results
+    def __init__(self, es_client):
+        self.es_client = es_client
+        self._aips = {}
+
+    def prefetch(self, uuids):
+        missing = [uuid for uuid in uuids if uuid not in self._aips]
+        if missing:
+            aips = es.get_aips_data(self.es_client, missing, fields=self.FIELDS)
+            for uuid in missing:
+                self._aips[uuid] = aips.get(uuid)
+
+    def get(self, uuid):
+        """Return the AIP document with `uuid` or ``None`` if it's not indexed."""
+        self.prefetch([uuid])
+        return self._aips[uuid]
 
 
 def execute(request):
@@ -211,43 +238,123 @@ _ORDERED_DICT_ES_FIELDS = OrderedDict(
     ]
 )
 
+# Same for the fields of the AIP files.
+_ORDERED_DICT_ES_FILE_FIELDS = OrderedDict(
+    [
+        ("FILEUUID", _("UUID")),
+        ("filePath", _("File path")),
+        ("sipname", _("AIP name")),
+        ("AIPUUID", _("AIP UUID")),
+        ("accessionid", _("Accession ID")),
+        (es.ES_FIELD_STATUS, _("Status")),
+    ]
+)
+
 
-def generate_search_as_csv_rows(csvwriter, es_results):
+def generate_search_as_csv_rows(csvwriter, es_results, fields=_ORDERED_DICT_ES_FIELDS):
     """CSV header and rows generator function.
 
     This function yields CSV rows efficiently in the context of HTTP streaming.
-    The structure of the document is determined by ``_ORDERED_DICT_ES_FIELDS``.
+    The structure of the document is determined by ``fields``, which defaults
+    to ``_ORDERED_DICT_ES_FIELDS``. ``es_results`` can be any iterable, e.g. a
+    generator paging through the search, so rows are written as they arrive.
     """
     # Header.
-    yield csvwriter.writerow(_ORDERED_DICT_ES_FIELDS.values())
+    yield csvwriter.writerow(fields.values())
 
     # Rows.
-    keys = _ORDERED_DICT_ES_FIELDS.keys()
+    keys = fields.keys()
     current_timezone = get_current_timezone()
     for item in es_results:
         row = OrderedDict((key, item.get(key)) for key in keys)
 
         # Normalize accession identifiers.
-        try:
-            accession_ids = "; ".join(row[es.ES_FIELD_ACCESSION_IDS])
-        except TypeError:
-            accession_ids = row[es.ES_FIELD_ACCESSION_IDS]
-        row[es.ES_FIELD_ACCESSION_IDS] = accession_ids
+        if es.ES_FIELD_ACCESSION_IDS in row:
+            try:
+                accession_ids = "; ".join(row[es.ES_FIELD_ACCESSION_IDS])
+            except TypeError:
+                accession_ids = row[es.ES_FIELD_ACCESSION_IDS]
+            row[es.ES_FIELD_ACCESSION_IDS] = accession_ids
 
         # Localize date output.
-        try:
-            created = make_aware(
-                datetime.fromtimestamp(row[es.ES_FIELD_CREATED]),
-                timezone=current_timezone,
-            )
-        except TypeError:
-            created = row[es.ES_FIELD_CREATED]
-        row[es.ES_FIELD_CREATED] = created
+        if es.ES_FIELD_CREATED in row:
+            try:
+                created = make_aware(
+                    datetime.fromtimestamp(row[es.ES_FIELD_CREATED]),
+                    timezone=current_timezone,
+                )
+            except TypeError:
+                created = row[es.ES_FIELD_CREATED]
+            row[es.ES_FIELD_CREATED] = created
 
         yield csvwriter.writerow(list(row.values()))
 
 
-def search_as_csv(es_results, file_name):
+def _iter_augmented_results(
+    es_client, index, query, sort, source, file_mode, uuid_file_counts=None
+):
+    pages = es.iter_search_pages(
+        es_client, index, query, sort, _source=source, page_size=CSV_EXPORT_PAGE_SIZE
+    )
+    for hits in pages:
+        raw_results = {"hits": {"hits": hits}}
+        if file_mode:
+            yield from search_augment_file_results(es_client, raw_results)
+        else:
+            yield from search_augment_aip_results(raw_results, uuid_file_counts)
+
+
+def iter_search_results(
+    es_client, index, query, sort, source, file_mode, uuid_file_counts=None
+):
+    """Yield the augmented results of every hit of a search.
+
+    Hits are fetched and augmented a page at a time, so memory use doesn't
+    depend on the number of hits.
+    """
+    try:
+        yield from _iter_augmented_results(
+            es_client, index, query, sort, source, file_mode, uuid_file_counts
+        )
+    except ElasticsearchException:
+        # The response has already started, the export ends here.
+        logger.exception("Error exporting search results from index %s", index)
+
+
+def iter_aip_search_results(es_client, query, sort, source):
+    """Yield the augmented results of every AIP with files matching a search.
+
+    The UUIDs of the AIPs are paged from the aipfiles index with a composite
+    aggregation and the AIPs of each page are fetched in turn, so neither the
+    number of AIPs nor memory use are bounded by the number of matches. Rows
+    follow the order of the AIP UUIDs, ``sort`` applies within each page.
+    """
+    try:
+        for buckets in es.iter_aggregation_pages(
+            es_client,
+            es.AIP_FILES_INDEX,
+            query,
+            "AIPUUID",
+            page_size=CSV_EXPORT_PAGE_SIZE,
+        ):
+            uuid_file_counts = {
+                bucket["key"]["AIPUUID"]: bucket["doc_count"] for bucket in buckets
+            }
+            yield from _iter_augmented_results(
+                es_client,
+                es.AIPS_INDEX,
+                {"query": {"terms": {"uuid": list(uuid_file_counts)}}},
+                sort,
+                source,
+                False,
+                uuid_file_counts=uuid_file_counts,
+            )
+    except ElasticsearchException:
+        # The response has already started, the export ends here.
+        logger.exception("Error exporting AIPs from index %s", es.AIP_FILES_INDEX)
+
+
+def search_as_csv(es_results, file_name, fields=_ORDERED_DICT_ES_FIELDS):
     class echo:
         """File-like object that returns the value written."""
 
@@ -256,7 +363,7 @@ def search_as_csv(es_results, file_name):
 
     writer = csv.writer(echo(), quoting=csv.QUOTE_ALL, lineterminator="\n")
     response = StreamingHttpResponse(
-        generate_search_as_csv_rows(writer, es_results),
+        generate_search_as_csv_rows(writer, es_results, fields=fields),
         content_type=CSV_MIMETYPE,
     )
     response["Content-Disposition"] = f'attachment; filename="{file_name}"'
@@ -315,9 +422,38 @@ def search(request):
 
     es_client = es.get_client()
     try:
+        if request_file:
+            # Stream every hit instead of a page. Sorting by UUIDs too makes
+            # the sort unique, so pages can be fetched with search_after.
+            uuid_fields = ["FILEUUID", "AIPUUID"] if file_mode else [es.ES_FIELD_UUID]
+            sort = [{order_by: sort_direction}] if order_by else []
+            sort += [{field: "asc"} for field in uuid_fields if field != order_by]
+            if file_mode:
+                results = iter_search_results(
+                    es_client,
+                    es.AIP_FILES_INDEX,
+                    query,
+                    sort,
+                    _ES_FILE_SOURCE,
+                    file_mode,
+                )
+            else:
+                results = iter_aip_search_results(
+                    es_client, query, sort, _ES_AIP_SOURCE
+                )
+            return search_as_csv(
+                results,
+                file_name=file_name,
+                fields=(
+                    _ORDERED_DICT_ES_FILE_FIELDS
+                    if file_mode
+                    else _ORDERED_DICT_ES_FIELDS
+                ),
+            )
+
         if file_mode:
             index = es.AIP_FILES_INDEX
-            source = "filePath,FILEUUID,AIPUUID,accessionid,status"
+            source = _ES_FILE_SOURCE
         else:
             # Fetch all unique AIP UUIDs in the returned set of files.
             # ES query will limit to 10 aggregation results by default;
@@ -347,7 +483,7 @@ def search(request):
             }
             query = {"query": {"terms": {"uuid": uuids}}}
             index = es.AIPS_INDEX
-            source = "name,uuid,size,accessionids,created,status,encrypted,AICID,isPartOf,countAIPsinAIC,location"
+            source = _ES_AIP_SOURCE
 
         results = es_client.search(
             index=index,
@@ -363,9 +499,6 @@ def search(request):
         else:
             augmented_results = search_augment_aip_results(results, uuid_file_counts)
 
-        if request_file and not file_mode:
-            return search_as_csv(augmented_results, file_name=file_name)
-
         hit_count = results["hits"]["total"]
 
         return helpers.json_response(
@@ -388,8 +521,8 @@ def search(request):
 def search_augment_aip_results(raw_results, counts):
     """Augment AIP results and update ES status if AIP is pending deletion.
 
-    We perform sync_es_aip_status_with_storage_service routine here to avoid
-    needing to iterate through all of the results a second time.
+    The status of the AIPs in the page is synced with the Storage Service
+    first, so AIPs deleted from it can be left out of the results.
 
     :param raw_results: Raw results returned from ES.
     :param counts: Count of file UUIDs associated with AIP.
@@ -398,8 +531,22 @@ def search_augment_aip_results(raw_results, counts):
     """
     modified_results = []
 
+    # Only AIPs with a status in ES are synced.
+    deleted = sync_es_aips_status_with_storage_service(
+        [
+            item["_source"]
+            for item in raw_results["hits"]["hits"]
+            if item["_source"].get("status") is not None
+        ]
+    )
+
     for item in raw_results["hits"]["hits"]:
         fields = item["_source"]
+        # Only return details for AIPs that haven't been deleted
+        # from the Storage Service in the search results.
+        if fields.get("uuid") in deleted:
+            continue
+
         new_item = {
             "name": fields.get("name", ""),
             "uuid": fields.get("uuid", ""),
@@ -425,17 +572,7 @@ def search_augment_aip_results(raw_results, counts):
         else:
             new_item["type"] = "AIP"
 
-        status = fields.get("status")
-        keep_in_results = True
-        if status is not None:
-            # Only return details for AIPs that haven't been deleted
-            # from the Storage Service in the search results.
-            keep_in_results = sync_es_aip_status_with_storage_service(
-                fields["uuid"], status
-            )
-
-        if keep_in_results:
-            modified_results.append(new_item)
+        modified_results.append(new_item)
 
     return modified_results
 
@@ -450,27 +587,27 @@ def search_augment_file_results(es_client, raw_results):
     """
     modifiedResults = []
 
-    for item in raw_results["hits"]["hits"]:
-        if "_source" not in item:
-            continue
+    hits = [item for item in raw_results["hits"]["hits"] if "_source" in item]
 
-        clone = item["_source"].copy()
+    # Fetch the AIPs of all the files in the page at once.
+    aip_lookup = AIPLookup(es_client)
+    try:
+        aip_lookup.prefetch({item["_source"]["AIPUUID"] for item in hits})
+    except ElasticsearchException:
+        logger.exception("Error fetching the AIPs of the files found")
+        aip_lookup = None
 
-        try:
-            aip = es.get_aip_data(
-                es_client,
-                clone["AIPUUID"],
-                fields="uuid,name,filePath,size,origin,created,encrypted",
-            )
+    for item in hits:
+        clone = item["_source"].copy()
 
+        aip = aip_lookup.get(clone["AIPUUID"]) if aip_lookup else None
+        if aip is not None:
             clone["sipname"] = aip["_source"]["name"]
             clone["fileuuid"] = clone["FILEUUID"]
             clone["href"] = aip["_source"]["filePath"].replace(
                 AIPSTOREPATH + "/", "AIPsStore/"
             )
-
-        except ElasticsearchException:
-            aip = None
+        else:
             clone["sipname"] = False
 
         clone["status"] = AIP_STATUS_DESCRIPTIONS[
@@ -572,9 +709,9 @@ def aip_file_download(request, uuid):
 
     # get file's AIP's properties
     sipuuid = aipfile["_source"]["AIPUUID"]
-    aip = es.get_aip_data(
-        es_client, sipuuid, fields="uuid,name,filePath,size,origin,created"
-    )
+    aip = AIPLookup(es_client).get(sipuuid)
+    if aip is None:
+        raise Http404
     aip_filepath = aip["_source"]["filePath"]
 
     # work out path components
@@ -703,11 +840,8 @@ def file_json(request, document_id_modified):
 
 def view_aip(request, uuid):
     es_client = es.get_client()
-    try:
-        es_aip_doc = es.get_aip_data(
-            es_client, uuid, fields="name,size,created,status,filePath,encrypted"
-        )
-    except IndexError:
+    es_aip_doc = AIPLookup(es_client).get(uuid)
+    if es_aip_doc is None:
         raise Http404
 
     source = es_aip_doc["_source"]
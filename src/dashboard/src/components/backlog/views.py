@@ -20,8 +20,6 @@ import logging
 import elasticSearchFunctions as es
 import requests
 import storageService as storage_service
-from archivematicaFunctions import AMCLIENT_ERROR_CODES
-from archivematicaFunctions import setup_amclient
 from components import advanced_search
 from components import decorators
 from components import helpers
@@ -38,55 +36,56 @@ from django.utils.translation import gettext as _
 logger = logging.getLogger("archivematica.dashboard")
 
 
-def sync_es_transfer_status_with_storage_service(uuid, pending_deletion):
-    """Update transfer's status in ES indices to match Storage Service.
+def sync_es_transfers_status_with_storage_service(transfers):
+    """Update transfers' status in ES indices to match Storage Service.
 
     This is a bit of a kludge that is made necessary by the fact that
     the Storage Service does not update ElasticSearch directly when
     a package's status has changed.
 
-    Updates to ES are visible in Backlog after running a new
-    search or refreshing the page.
+    The status of all the transfers is fetched from the Storage Service
+    at once and the ES indices are updated with bulk requests. Updates
+    to ES are visible in Backlog after running a new search or
+    refreshing the page.
 
-    :param uuid: Transfer UUID.
-    :param pending_deletion: Current pending_deletion value in ES.
+    :param transfers: Transfer documents from the transfers index.
 
-    :returns: Boolean indicating whether transfer should be kept in
-    search results (i.e. has not been deleted from Storage Service).
+    :returns: Set of UUIDs of the transfers that have been deleted from
+    the Storage Service and should be left out of search results.
     """
-    keep_in_results = True
-
-    amclient = setup_amclient()
-    amclient.package_uuid = uuid
-    api_results = amclient.get_package_details()
-
-    if api_results in AMCLIENT_ERROR_CODES:
-        logger.warning(
-            f"Package {uuid} not found in Storage Service. AMClient error code: {api_results}"
-        )
-        return keep_in_results
-
-    transfer_status = api_results.get("status")
-
-    if not transfer_status:
-        logger.warning(
-            "Status for package {} could not be retrived from Storage Service."
-        )
-        return keep_in_results
+    statuses = storage_service.get_packages_status(
+        transfer["uuid"] for transfer in transfers
+    )
 
-    if transfer_status == es.STATUS_DELETE_REQUESTED and pending_deletion is False:
-        es_client = es.get_client()
-        es.mark_backlog_deletion_requested(es_client, uuid)
-    elif transfer_status == es.STATUS_UPLOADED and pending_deletion is True:
-        es_client = es.get_client()
-        es.revert_backlog_deletion_request(es_client, uuid)
-    elif transfer_status == es.STATUS_DELETED:
-        keep_in_results = False
+    pending_deletion = {}
+    deleted = set()
+    for transfer in transfers:
+        uuid = transfer["uuid"]
+        transfer_status = statuses.get(uuid)
+        if not transfer_status:
+            logger.warning(
+                "Status for package %s could not be retrieved from Storage Service.",
+                uuid,
+            )
+            continue
+
+        es_pending_deletion = transfer.get("pending_deletion")
+        if (
+            transfer_status == es.STATUS_DELETE_REQUESTED
+            and es_pending_deletion is False
+        ):
+            pending_deletion[uuid] = True
+        elif transfer_status == es.STATUS_UPLOADED and es_pending_deletion is True:
+            pending_deletion[uuid] = False
+        elif transfer_status == es.STATUS_DELETED:
+            deleted.add(uuid)
+
+    if pending_deletion or deleted:
         es_client = es.get_client()
-        es.remove_backlog_transfer_files(es_client, uuid)
-        es.remove_backlog_transfer(es_client, uuid)
+        es.update_backlog_pending_deletion(es_client, pending_deletion)
+        es.remove_backlog_transfers(es_client, deleted)
 
-    return keep_in_results
+    return deleted
 
 
 def execute(request):
@@ -218,25 +217,22 @@ def search(request):
 
     es_results = [x["_source"] for x in hits["hits"]["hits"]]
 
+    # We only check status against the Storage Service for transfers,
+    # so include all files in search results.
+    deleted = set()
+    if not file_mode:
+        deleted = sync_es_transfers_status_with_storage_service(es_results)
+
     for result in es_results:
         # Format size
         size = result.get("size")
         if size is not None:
             result["size"] = filesizeformat(size)
 
-        if file_mode:
-            # We only check status against the Storage Service for
-            # transfers, so include all files in search results.
+        # Only return details for transfers that haven't been deleted from
+        # the Storage Service in the search results.
+        if file_mode or result["uuid"] not in deleted:
             search_results.append(result)
-        else:
-            pending_deletion = result.get("pending_deletion")
-            keep_in_results = sync_es_transfer_status_with_storage_service(
-                result["uuid"], pending_deletion
-            )
-            # Only return details for transfers that haven't been
-            # deleted from the Storage Service in the search results.
-            if keep_in_results:
-                search_results.append(result)
 
     return helpers.json_response(
         {
@@ -109,7 +109,7 @@ def ingest_status(request, uuid=None):
     response = {"objects": {}, "mcp": False}
     try:
         client = MCPClient(request.user)
-        response["objects"] = client.get_sips_statuses()
+        response.update(client.get_sips_statuses(since=request.GET.get("since")))
     except Exception:
         pass
     else:
@@ -125,7 +125,7 @@ def status(request, uuid=None):
     response = {"objects": {}, "mcp": False}
     try:
         client = MCPClient(request.user)
-        response["objects"] = client.get_transfers_statuses()
+        response.update(client.get_transfers_statuses(since=request.GET.get("since")))
     except Exception:
         pass
     else:
@@ -37,4 +37,5 @@ urlpatterns = [
         name="mark_hidden",
     ),
     path("delete/", views.mark_completed_hidden, name="mark_all_hidden"),
+    path("events/", views.status_events, name="status_events"),
 ]
@@ -14,11 +14,16 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
+import json
 import logging
+import time
 
 import django.http
 from components import helpers
 from contrib.mcp.client import MCPClient
+from contrib.mcp.events import CHANGE_EVENT
+from contrib.mcp.events import RESET_EVENT
+from contrib.mcp.events import events as status_events_buffer
 from django.shortcuts import render
 from main import models
 
@@ -134,3 +139,63 @@ def mark_completed_hidden(request, unit_type):
             "Error setting completed %s units to hidden", unit_type, exc_info=True
         )
         return django.http.JsonResponse({"removed": False}, status=500)
+
+
+# Types of the units published by MCPServer shown in each grid.
+EVENT_UNIT_TYPES = {
+    "transfer": "Transfer",
+    "ingest": "SIP",
+}
+
+# Maximum time (in seconds) between two messages of an events stream.
+EVENTS_KEEPALIVE = 15
+
+# Time (in seconds) after which an events stream is closed. Browsers
+# reconnect automatically, resuming the stream where it was left.
+EVENTS_STREAM_DURATION = 300
+
+
+def _format_event(cursor, event=None, data=None):
+    message = f"id: {cursor}\n"
+    if event is not None:
+        message += f"event: {event}\ndata: {json.dumps(data)}\n"
+    return message + "\n"
+
+
+def status_events(request, unit_type):
+    """Stream the changes of the units of the grid as Server-Sent Events.
+
+    A ``change`` event lists the units that changed, a ``reset`` event means
+    that some changes were missed and all the units should be reloaded.
+
+    :param unit_type: 'transfer' or 'ingest' for Transfers or SIPs
+    """
+    mcp_unit_type = EVENT_UNIT_TYPES[unit_type]
+    cursor = request.headers.get("Last-Event-ID") or status_events_buffer.get_cursor()
+
+    def stream(cursor):
+        yield "retry: 3000\n\n"
+        deadline = time.monotonic() + EVENTS_STREAM_DURATION
+        while time.monotonic() < deadline:
+            events, cursor = status_events_buffer.read(cursor, timeout=EVENTS_KEEPALIVE)
+            units = {
+                event["data"]["unit"]
+                for event in events
+                if event["type"] == CHANGE_EVENT
+                and event["data"].get("unit_type") == mcp_unit_type
+            }
+            if any(event["type"] == RESET_EVENT for event in events):
+                yield _format_event(cursor, RESET_EVENT, {})
+            elif units:
+                yield _format_event(cursor, CHANGE_EVENT, {"units": sorted(units)})
+            else:
+                # No data, but it moves the cursor and keeps the connection.
+                yield _format_event(cursor)
+
+    response = django.http.StreamingHttpResponse(
+        stream(cursor), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Disable buffering in nginx.
+    response["X-Accel-Buffering"] = "no"
+    return response
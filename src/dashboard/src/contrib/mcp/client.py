@@ -206,15 +206,22 @@ class MCPClient:
         data = {"lang": self.lang}
         return self._rpc_sync_call("getProcessingConfigFields", data)
 
-    def _get_units_statuses(self, type_):
+    def _get_units_statuses(self, type_, since=None):
         data = {"type": type_, "lang": self.lang}
+        if since is not None:
+            data["since"] = since
         return self._rpc_sync_call("getUnitsStatuses", data)
 
-    def get_transfers_statuses(self):
-        return self._get_units_statuses(type_="Transfer")
+    def get_transfers_statuses(self, since=None):
+        return self._get_units_statuses(type_="Transfer", since=since)
 
-    def get_sips_statuses(self):
-        return self._get_units_statuses(type_="SIP")
+    def get_sips_statuses(self, since=None):
+        return self._get_units_statuses(type_="SIP", since=since)
+
+    def get_units_events(self, cursor=None):
+        """Return the events published by MCPServer after the cursor given."""
+        data = {"cursor": cursor}
+        return self._rpc_sync_call("getUnitsEvents", data)
 
     def get_unit_status(self, unit_id):
         data = {"id": unit_id, "lang": self.lang}
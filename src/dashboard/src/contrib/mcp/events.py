@@ -0,0 +1,182 @@
+# This file is part of Archivematica.
+#
+# Copyright 2010-2013 Artefactual Systems Inc. <http://artefactual.com>
+#
+# Archivematica is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Archivematica is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
+"""Status events published by MCPServer.
+
+A single thread per dashboard process follows the events stream of MCPServer
+and keeps the events in a ring buffer. Any number of readers (e.g. the
+Server-Sent Events streams of open browser tabs) wait for new events on the
+buffer using cursors, so they don't cost any requests to MCPServer.
+"""
+
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+from contrib.mcp.client import MCPClient
+from django.contrib.auth.models import AnonymousUser
+
+LOGGER = logging.getLogger("archivematica.dashboard.mcp.events")
+
+# Number of events kept in memory.
+EVENT_BUFFER_SIZE = 1000
+
+# Time (in seconds) between requests for new events to MCPServer.
+POLL_INTERVAL = 0.5
+
+# Time (in seconds) to wait before trying again when MCPServer fails.
+RETRY_INTERVAL = 5
+
+# Time (in seconds) after which the thread following MCPServer stops if
+# nobody is reading the events.
+IDLE_TIMEOUT = 60
+
+# Event added to the buffer when events published by MCPServer were missed.
+RESET_EVENT = "reset"
+# Event added to the buffer for every change published by MCPServer.
+CHANGE_EVENT = "change"
+
+
+def _fetch_events(cursor):
+    return MCPClient(AnonymousUser()).get_units_events(cursor=cursor)
+
+
+class StatusEventBuffer:
+    """Ring buffer of the events published by MCPServer.
+
+    Events are dictionaries with an ``id``, a ``type`` (``CHANGE_EVENT`` or
+    ``RESET_EVENT``) and the ``data`` published by MCPServer. Readers follow
+    them with cursors, opaque strings that are only valid in this process.
+    """
+
+    def __init__(
+        self,
+        fetch_events=_fetch_events,
+        max_events=EVENT_BUFFER_SIZE,
+        poll_interval=POLL_INTERVAL,
+        idle_timeout=IDLE_TIMEOUT,
+    ):
+        self.fetch_events = fetch_events
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        # Identifies this buffer in cursors, e.g. after a restart.
+        self.epoch = uuid.uuid4().hex
+
+        self._condition = threading.Condition()
+        self._events = deque(maxlen=max_events)
+        self._last_event_id = 0
+        self._last_read = time.monotonic()
+        self._thread = None
+        self._mcp_cursor = None
+
+    def get_cursor(self):
+        """Return a cursor to follow the events from now on."""
+        with self._condition:
+            return self._get_cursor()
+
+    def _get_cursor(self):
+        return f"{self.epoch}:{self._last_event_id}"
+
+    def read(self, cursor, timeout=None):
+        """Return the events added after the `cursor` given.
+
+        If there are none, wait up to `timeout` seconds for new ones. Returns
+        the list of events and the cursor to pass next time. Readers with an
+        unknown or outdated cursor get a ``RESET_EVENT`` first.
+        """
+        self._start()
+
+        with self._condition:
+            self._last_read = time.monotonic()
+
+            epoch, _, last_event_id = str(cursor).partition(":")
+            try:
+                last_event_id = int(last_event_id)
+            except ValueError:
+                last_event_id = -1
+            if (
+                epoch != self.epoch
+                or last_event_id < 0
+                or last_event_id > self._last_event_id
+            ):
+                return [self._reset_event()], self._get_cursor()
+
+            if last_event_id == self._last_event_id and timeout:
+                self._condition.wait(timeout)
+
+            # Event ids are consecutive, so we can find the cursor position.
+            first_event_id = self._last_event_id - len(self._events) + 1
+            if last_event_id + 1 < first_event_id:
+                return [self._reset_event()], self._get_cursor()
+            events = list(
+                itertools.islice(self._events, last_event_id + 1 - first_event_id, None)
+            )
+
+            return events, self._get_cursor()
+
+    def _reset_event(self):
+        return {"id": self._last_event_id, "type": RESET_EVENT, "data": {}}
+
+    def _add_event(self, type_, data):
+        self._last_event_id += 1
+        self._events.append({"id": self._last_event_id, "type": type_, "data": data})
+
+    def _start(self):
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="StatusEvents", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if time.monotonic() - self._last_read > self.idle_timeout:
+                    # Nobody is listening, we'll start from scratch next time.
+                    self._thread = None
+                    self._mcp_cursor = None
+                    return
+            time.sleep(self.poll_interval if self.poll() else RETRY_INTERVAL)
+
+    def poll(self):
+        """Add the events published by MCPServer since the last poll.
+
+        Returns whether MCPServer could be reached.
+        """
+        try:
+            response = self.fetch_events(self._mcp_cursor)
+        except Exception as err:
+            LOGGER.warning("Unable to read events from MCPServer: %s", err)
+            return False
+
+        with self._condition:
+            last_event_id = self._last_event_id
+            if response.get("reset"):
+                self._add_event(RESET_EVENT, {})
+            for event in response.get("events", []):
+                self._add_event(CHANGE_EVENT, event)
+            self._mcp_cursor = response.get("cursor")
+            if self._last_event_id != last_event_id:
+                self._condition.notify_all()
+
+        return True
+
+
+events = StatusEventBuffer()
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FPRAppConfig(AppConfig):
     default_auto_field = "django.db.models.AutoField"
     name = "fpr"
+
+    def ready(self):
+        import fpr.signals  # noqa: F401
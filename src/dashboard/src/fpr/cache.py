@@ -0,0 +1,244 @@
+"""
+:mod:`fpr.cache`
+
+Process-wide, versioned cache of the active FPR rules.
+
+MCPClient scripts look up the same handful of FPR rows for every file they
+process. ``rules`` loads the active rows once per process, indexes them the way
+they are looked up and reloads them when the FPR revision changes.
+
+The revision is a token stored in ``DashboardSetting`` which is replaced every
+time a model of this app is saved or deleted (see ``fpr.signals``), so changes
+made in the dashboard are picked up by the next batch of every worker. Bulk
+operations like ``QuerySet.update`` don't send signals and must call
+``bump_revision`` themselves.
+"""
+
+import logging
+import uuid
+from collections import defaultdict
+
+from fpr.models import FormatVersion
+from fpr.models import FPRule
+from fpr.models import IDCommand
+from fpr.models import IDRule
+from main.models import DashboardSetting
+from main.models import FileFormatVersion
+
+logger = logging.getLogger(__name__)
+
+REVISION_SCOPE = "fpr"
+REVISION_NAME = "revision"
+
+
+def get_revision():
+    """Return the current FPR revision token or ``None`` if it is unset."""
+    return (
+        DashboardSetting.objects.filter(scope=REVISION_SCOPE, name=REVISION_NAME)
+        .values_list("value", flat=True)
+        .first()
+    )
+
+
+def bump_revision():
+    """Replace the FPR revision token so caches are reloaded."""
+    DashboardSetting.objects.update_or_create(
+        scope=REVISION_SCOPE,
+        name=REVISION_NAME,
+        defaults={"value": uuid.uuid4().hex},
+    )
+
+
+def _get_one(model, items, description):
+    """Mimic ``QuerySet.get`` over a list of cached objects."""
+    if not items:
+        raise model.DoesNotExist(f"{model.__name__} matching {description} not found")
+    if len(items) > 1:
+        raise model.MultipleObjectsReturned(
+            f"{len(items)} {model.__name__} objects matching {description} found"
+        )
+    return items[0]
+
+
+class RuleCache:
+    """Active FPR rules indexed in memory.
+
+    Lookups follow the semantics of the ``active`` managers: ``get_*`` methods
+    raise ``DoesNotExist`` or ``MultipleObjectsReturned`` like ``QuerySet.get``
+    and ``filter_*`` methods return a (possibly empty) tuple.
+    """
+
+    def __init__(self):
+        self.revision = None
+        self.loaded = False
+        self._fprules_by_format_and_purpose = {}
+        self._fprules_by_purpose = {}
+        self._format_versions = {}
+        self._format_versions_by_pronom_id = {}
+        self._idrules_by_command_and_output = {}
+        self._idcommands = ()
+
+    def refresh(self):
+        """Reload the cache if the FPR revision changed since the last load.
+
+        It costs a single query, so callers are expected to call it once per
+        batch of work rather than once per file.
+        """
+        revision = get_revision()
+        if self.loaded and revision == self.revision:
+            return
+        self._load()
+        self.revision = revision
+
+    def clear(self):
+        """Forget the cached rules, the next lookup will load them again."""
+        self.revision = None
+        self.loaded = False
+
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.refresh()
+
+    def _load(self):
+        fprules_by_format_and_purpose = defaultdict(list)
+        fprules_by_purpose = defaultdict(list)
+        for rule in FPRule.active.select_related(
+            "format__format",
+            "command__tool",
+            "command__output_format",
+            "command__verification_command",
+            "command__event_detail_command",
+        ).order_by("pk"):
+            fprules_by_format_and_purpose[(str(rule.format_id), rule.purpose)].append(
+                rule
+            )
+            fprules_by_purpose[rule.purpose].append(rule)
+
+        format_versions = {}
+        format_versions_by_pronom_id = defaultdict(list)
+        for format_version in FormatVersion.active.select_related("format").order_by(
+            "pk"
+        ):
+            format_versions[str(format_version.uuid)] = format_version
+            format_versions_by_pronom_id[format_version.pronom_id].append(
+                format_version
+            )
+
+        idrules_by_command_and_output = defaultdict(list)
+        for rule in IDRule.active.select_related("format__format").order_by("pk"):
+            idrules_by_command_and_output[
+                (str(rule.command_id), rule.command_output)
+            ].append(rule)
+
+        self._fprules_by_format_and_purpose = {
+            key: tuple(value) for key, value in fprules_by_format_and_purpose.items()
+        }
+        self._fprules_by_purpose = {
+            key: tuple(value) for key, value in fprules_by_purpose.items()
+        }
+        self._format_versions = format_versions
+        self._format_versions_by_pronom_id = {
+            key: tuple(value) for key, value in format_versions_by_pronom_id.items()
+        }
+        self._idrules_by_command_and_output = {
+            key: tuple(value) for key, value in idrules_by_command_and_output.items()
+        }
+        self._idcommands = tuple(IDCommand.active.select_related("tool"))
+        self.loaded = True
+        logger.debug(
+            "Loaded %d FPR rules and %d identification rules",
+            sum(len(rules) for rules in self._fprules_by_purpose.values()),
+            sum(len(rules) for rules in self._idrules_by_command_and_output.values()),
+        )
+
+    def filter_fprules(self, format_version, purpose):
+        """Active ``FPRule`` objects for a format version and purpose."""
+        self._ensure_loaded()
+        format_version_id = getattr(format_version, "uuid", format_version)
+        return self._fprules_by_format_and_purpose.get(
+            (str(format_version_id), purpose), ()
+        )
+
+    def get_fprule(self, format_version, purpose):
+        format_version_id = getattr(format_version, "uuid", format_version)
+        return _get_one(
+            FPRule,
+            self.filter_fprules(format_version_id, purpose),
+            f"format={format_version_id}, purpose={purpose}",
+        )
+
+    def filter_fprules_by_purpose(self, purpose):
+        """Active ``FPRule`` objects for a purpose, e.g. ``default_access``."""
+        self._ensure_loaded()
+        return self._fprules_by_purpose.get(purpose, ())
+
+    def get_fprule_by_purpose(self, purpose):
+        return _get_one(
+            FPRule, self.filter_fprules_by_purpose(purpose), f"purpose={purpose}"
+        )
+
+    def get_format_version(self, format_version_id):
+        """Active ``FormatVersion`` by UUID."""
+        self._ensure_loaded()
+        format_version = self._format_versions.get(str(format_version_id))
+        return _get_one(
+            FormatVersion,
+            [format_version] if format_version is not None else [],
+            f"uuid={format_version_id}",
+        )
+
+    def get_format_version_for_file(self, file_uuid):
+        """Active ``FormatVersion`` a file has been identified as.
+
+        Only the link between the file and the format version is queried, the
+        format version itself comes from the cache.
+        """
+        format_versions = self.get_format_versions_for_files([file_uuid])
+        return _get_one(
+            FormatVersion,
+            format_versions.get(str(file_uuid), ()),
+            f"file_uuid={file_uuid}",
+        )
+
+    def get_format_versions_for_files(self, file_uuids):
+        """Active ``FormatVersion`` objects of many files with a single query.
+
+        Returns a dict of tuples indexed by file UUID (as a string), files
+        without an active format version are left out.
+        """
+        self._ensure_loaded()
+        format_versions = defaultdict(list)
+        for file_uuid, format_version_id in FileFormatVersion.objects.filter(
+            file_uuid_id__in=file_uuids
+        ).values_list("file_uuid_id", "format_version_id"):
+            format_version = self._format_versions.get(str(format_version_id))
+            if format_version is not None:
+                format_versions[str(file_uuid)].append(format_version)
+        return {key: tuple(value) for key, value in format_versions.items()}
+
+    def get_format_version_by_pronom_id(self, pronom_id):
+        self._ensure_loaded()
+        return _get_one(
+            FormatVersion,
+            self._format_versions_by_pronom_id.get(pronom_id, ()),
+            f"pronom_id={pronom_id}",
+        )
+
+    def get_idrule(self, command, command_output):
+        self._ensure_loaded()
+        command_id = getattr(command, "uuid", command)
+        return _get_one(
+            IDRule,
+            self._idrules_by_command_and_output.get(
+                (str(command_id), command_output), ()
+            ),
+            f"command={command_id}, command_output={command_output}",
+        )
+
+    def get_default_idcommand(self):
+        """First active ``IDCommand`` or ``None``, like ``active.first()``."""
+        self._ensure_loaded()
+        return self._idcommands[0] if self._idcommands else None
+
+
+rules = RuleCache()
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from fpr import cache
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_fpr_revision(sender, **kwargs):
+    """Invalidate the FPR caches of every process when the FPR changes."""
+    if sender._meta.app_label == "fpr":
+        cache.bump_revision()
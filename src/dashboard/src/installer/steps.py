@@ -68,7 +68,7 @@ def setup_pipeline_in_ss(use_default_config=False):
     # Check if pipeline is already registered on SS
     dashboard_uuid = helpers.get_setting("dashboard_uuid")
     try:
-        storage_service.get_pipeline(dashboard_uuid)
+        storage_service.get_pipeline(dashboard_uuid, cache=None)
     except Exception:
         logger.warning("SS inaccessible or pipeline not registered.")
     else:
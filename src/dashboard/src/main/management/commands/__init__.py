@@ -1,11 +1,18 @@
 import time
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 
 import elasticSearchFunctions as es
 from django.conf import settings as django_settings
 from django.core.management.base import BaseCommand
 from django.core.management.base import CommandError
+from django.db import connections
 from elasticsearch import ElasticsearchException
 
+# Number of packages processed at the same time by default.
+DEFAULT_WORKERS = 4
+
 
 class DashboardCommand(BaseCommand):
     def success(self, message):
@@ -61,3 +68,37 @@ def setup_es_for_aip_reindexing(cmd, delete_all=False):
         es.create_indexes_if_needed(es_client, indices)
 
     return es_client
+
+
+def run_in_workers(func, items, workers=DEFAULT_WORKERS):
+    """Call ``func`` with each of the ``items`` using a pool of threads.
+
+    Yields ``(item, future)`` pairs as the calls complete. Only twice as many
+    calls as ``workers`` are in flight at any time, so ``items`` is consumed
+    lazily. Database connections opened by the calls are closed afterwards.
+
+    :param func: Callable receiving one item.
+    :param items: Iterable of items.
+    :param workers: Number of threads.
+    """
+
+    def call(item):
+        try:
+            return func(item)
+        finally:
+            connections.close_all()
+
+    workers = max(workers, 1)
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        while True:
+            for item in items:
+                pending[executor.submit(call, item)] = item
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future
@@ -29,6 +29,14 @@ starting. This is useful if there are AIPs indexed that have been deleted, or
 if you would like to delete the 'aips' and 'aipfiles' indices entirely and
 recreate them using the most recent version of the ES mappings.
 
+Packages are downloaded, parsed and indexed by a pool of ``--workers``
+threads, and the throughput is reported as the rebuild goes.
+
+``--checkpoint`` names a file where the UUIDs of the packages indexed are
+recorded. Packages listed there are skipped, so an interrupted rebuild can be
+resumed by running the command again with the same checkpoint file (and
+without ``--delete-all``, which starts over).
+
 Execution example:
 ./manage.py rebuild_aip_index_from_storage_service --delete-all
 """
@@ -38,17 +46,25 @@ import os
 import shutil
 import sys
 import tempfile
+import threading
+import time
 
 import archivematicaFunctions as am
 import elasticSearchFunctions as es
+import namespaces as ns
 import storageService
 from elasticsearch import ElasticsearchException
 from lxml import etree
+from main.management.commands import DEFAULT_WORKERS
 from main.management.commands import DashboardCommand
+from main.management.commands import run_in_workers
 from main.management.commands import setup_es_for_aip_reindexing
 
 PACKAGE_TYPES_TO_INDEX = ("AIP", "AIC")
 
+# Time (in seconds) between progress reports.
+REPORT_INTERVAL = 10
+
 
 def get_aips_in_aic(mets_root, temp_dir, uuid):
     """Return the number of AIPs in the AIC as found in the AIP METS.
@@ -79,6 +95,77 @@ def get_aips_in_aic(mets_root, temp_dir, uuid):
     return aips_in_aic
 
 
+class IndexingError(Exception):
+    pass
+
+
+class Checkpoint:
+    """File listing the UUIDs of the packages already indexed, one per line."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.uuids = set()
+        self._lock = threading.Lock()
+        if path and os.path.isfile(path):
+            with open(path) as f:
+                self.uuids = {line.strip() for line in f if line.strip()}
+
+    def __contains__(self, uuid):
+        return uuid in self.uuids
+
+    def add(self, uuid):
+        with self._lock:
+            self.uuids.add(uuid)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(uuid + "\n")
+
+    def clear(self):
+        with self._lock:
+            self.uuids.clear()
+            if self.path and os.path.isfile(self.path):
+                os.remove(self.path)
+
+
+class Progress:
+    """Counts the packages and files indexed to report the throughput."""
+
+    def __init__(self, total, clock=time.monotonic):
+        self.total = total
+        self.clock = clock
+        self.started = clock()
+        self.packages = 0
+        self.files = 0
+        self.failed = 0
+
+    def add(self, files=0, failed=False):
+        if failed:
+            self.failed += 1
+        else:
+            self.packages += 1
+            self.files += files
+
+    def report(self):
+        elapsed = max(self.clock() - self.started, 1e-6)
+        return (
+            f"Processed {self.packages + self.failed} of {self.total} AIPs/AICs ({self.failed} failed) in {elapsed:.0f}s:"
+            f" {self.packages / elapsed:.2f} AIPs/s, {self.files / elapsed:.2f} files/s"
+        )
+
+
+def count_mets_files(mets_root):
+    """Return the number of files indexed from an AIP METS document."""
+    return len(
+        ns.xml_findall_premis(
+            mets_root, "mets:fileSec/mets:fileGrp[@USE='original']/mets:file"
+        )
+    ) + len(
+        ns.xml_findall_premis(
+            mets_root, "mets:fileSec/mets:fileGrp[@USE='metadata']/mets:file"
+        )
+    )
+
+
 class Command(DashboardCommand):
     help = __doc__
 
@@ -108,6 +195,18 @@ class Command(DashboardCommand):
             help="Pipeline UUID to use when filtering packages",
             default=am.get_dashboard_uuid(),
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=DEFAULT_WORKERS,
+            help="Number of packages indexed at the same time"
+            f" (default: {DEFAULT_WORKERS})",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="File recording the packages indexed, used to resume an"
+            " interrupted rebuild",
+        )
 
     def handle(self, *args, **options):
         # Ignore elasticsearch-py logging events unless they're errors.
@@ -149,25 +248,56 @@ class Command(DashboardCommand):
         es_client = setup_es_for_aip_reindexing(self, delete_all)
         self.info("Rebuilding 'aips' and 'aipfiles' indices")
 
+        checkpoint = Checkpoint(options["checkpoint"])
+        if delete_all:
+            checkpoint.clear()
+        elif checkpoint.uuids:
+            aips_to_index = [
+                aip for aip in aips_to_index if aip["uuid"] not in checkpoint
+            ]
+            self.info(
+                f"Skipping {aips_to_index_count - len(aips_to_index)} AIPs/AICs already indexed according to {checkpoint.path}"
+            )
+
         # Index packages.
+        progress = Progress(len(aips_to_index))
         packages_not_indexed = []
-        aip_indexed_count = 0
-        for aip in aips_to_index:
-            is_aic = False
-            if aip["package_type"] == "AIC":
-                is_aic = True
-            index_success = self.process_package(
-                es_client, aip, temp_dir, delete_before_reindexing, is_aic=is_aic
-            )
-            if index_success:
-                aip_indexed_count += 1
+        last_report = time.monotonic()
+        results = run_in_workers(
+            lambda aip: self.process_package(
+                es_client,
+                aip,
+                temp_dir,
+                delete_before_reindexing,
+                is_aic=aip["package_type"] == "AIC",
+            ),
+            aips_to_index,
+            workers=options["workers"],
+        )
+        for aip, future in results:
+            uuid = aip["uuid"]
+            try:
+                files_indexed = future.result()
+            except IndexingError as err:
+                self.error(f"Error indexing package {uuid}. Details: {err}")
+                packages_not_indexed.append(uuid)
+                progress.add(failed=True)
             else:
-                packages_not_indexed.append(aip["uuid"])
+                self.info(f"Successfully indexed package {uuid}")
+                checkpoint.add(uuid)
+                progress.add(files=files_indexed)
+
+            if time.monotonic() - last_report >= REPORT_INTERVAL:
+                self.info(progress.report())
+                last_report = time.monotonic()
+
+        self.info(progress.report())
 
         # Clean up and report on packages indexed.
         self.info("Cleaning up")
         shutil.rmtree(temp_dir)
 
+        aip_indexed_count = aips_to_index_count - len(packages_not_indexed)
         if packages_not_indexed:
             self.error(
                 "Indexing complete. Indexed {count} of {total} AIPs/AICs. Packages not indexed: {uuids}.".format(
@@ -189,6 +319,8 @@ class Command(DashboardCommand):
     ):
         """Index package in 'aips' and 'aipfiles' indices.
 
+        Runs in the worker threads, so it doesn't write to the output.
+
         :param es_client: Elasticsearch client.
         :param package_info: Package info dict returned by Storage
         Service.
@@ -198,8 +330,21 @@ class Command(DashboardCommand):
         :is_aic: Optional boolean to indicate if package being indexed
         is an AIC.
 
-        :returns: Boolean indicating success.
+        :returns: Number of files indexed.
+        :raises IndexingError: If the package can't be indexed.
         """
+        # Each package gets its own directory, AIC METS names may clash.
+        package_dir = tempfile.mkdtemp(dir=temp_dir)
+        try:
+            return self._process_package(
+                es_client, package_info, package_dir, delete_before_reindexing, is_aic
+            )
+        finally:
+            shutil.rmtree(package_dir, ignore_errors=True)
+
+    def _process_package(
+        self, es_client, package_info, temp_dir, delete_before_reindexing, is_aic
+    ):
         uuid = package_info["uuid"]
 
         # Download the AIP METS file to a temporary directory.
@@ -211,14 +356,16 @@ class Command(DashboardCommand):
         storageService.extract_file(uuid, mets_relative_path, mets_download_path)
 
         if not os.path.isfile(mets_download_path):
-            error_message = "Unable to download AIP METS file from Storage Service"
-            self.error(f"Error indexing package {uuid}. Details: {error_message}")
-            return False
+            raise IndexingError("Unable to download AIP METS file from Storage Service")
+
+        try:
+            mets = etree.parse(mets_download_path)
+        except etree.XMLSyntaxError as err:
+            raise IndexingError(err)
 
         aips_in_aic = None
         if is_aic:
-            mets_root = etree.parse(mets_download_path)
-            aips_in_aic = get_aips_in_aic(mets_root, temp_dir, uuid)
+            aips_in_aic = get_aips_in_aic(mets, temp_dir, uuid)
 
         package_name = am.package_name_from_path(
             package_info["current_path"], remove_uuid_suffix=True
@@ -230,11 +377,11 @@ class Command(DashboardCommand):
         )
 
         if delete_before_reindexing:
-            self.info(f"Deleting package {uuid} from 'aips' and 'aipfiles' indices.")
             es.delete_aip(es_client, uuid)
             es.delete_aip_files(es_client, uuid)
 
-        # Index the AIP and then immediately delete the METS file.
+        # Count the files before indexing removes tool output from the METS.
+        files_indexed = count_mets_files(mets)
         try:
             es.index_aip_and_files(
                 client=es_client,
@@ -246,11 +393,10 @@ class Command(DashboardCommand):
                 aips_in_aic=aips_in_aic,
                 encrypted=package_info.get("encrypted", False),
                 location=location_description,
+                printfn=lambda *args, **kwargs: None,
+                mets=mets,
             )
-            self.info(f"Successfully indexed package {uuid}")
-            os.remove(mets_download_path)
-            return True
-        except (ElasticsearchException, etree.XMLSyntaxError) as err:
-            self.error(f"Error indexing package {uuid}. Details: {err}")
-            os.remove(mets_download_path)
-            return False
+        except ElasticsearchException as err:
+            raise IndexingError(err)
+
+        return files_indexed
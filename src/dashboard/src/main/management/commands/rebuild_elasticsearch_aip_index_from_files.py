@@ -169,6 +169,7 @@ def processAIPThenDeleteMETSFile(path, temp_dir, es_client, delete_existing_data
         aips_in_aic=aips_in_aic,
         identifiers=[],  # TODO get these
         location=location_description,
+        mets=root,
     )
 
 
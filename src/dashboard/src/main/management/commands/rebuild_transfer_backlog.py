@@ -34,6 +34,8 @@ with ``--uuid`` option
 
 ``--delete``: before re-reindexing a transfer, will delete any data found in Elasticsearch with a matching UUID. In contrast with the ``--delete-all``, it does not delete the entire index.
 
+``--workers``: number of transfers rebuilt at the same time. Default: 4.
+
 """
 
 import logging
@@ -44,30 +46,52 @@ import sys
 import tempfile
 import time
 import traceback
+import uuid as uuid_lib
+from collections import namedtuple
 from pathlib import Path
 from subprocess import CalledProcessError
 
 import archivematicaFunctions as am
 import bagit
 import elasticSearchFunctions as es
-import metsrw
 import storageService
 from components.rights.load import load_rights
+from databaseFunctions import bulkInsertIntoEvents
 from django.conf import settings as django_settings
 from django.core.exceptions import ValidationError
 from django.core.management.base import CommandError
-from fileOperations import addFileToTransfer
+from django.db import transaction
+from django.utils import timezone
 from fileOperations import extract_package
 from fpr.models import FormatVersion
+from lxml import etree
+from main.management.commands import DEFAULT_WORKERS
 from main.management.commands import DashboardCommand
 from main.management.commands import boolean_input
+from main.management.commands import run_in_workers
 from main.models import Agent
+from main.models import Event
+from main.models import File
 from main.models import FileFormatVersion
 from main.models import FileID
 from main.models import Transfer
+from metsrw.plugins import premisrw
+from metsrw.utils import FILE_ID_PREFIX
+from metsrw.utils import NAMESPACES
+from metsrw.utils import lxmlns
+from metsrw.utils import urldecode
 
 logger = logging.getLogger("archivematica.dashboard")
 
+# Number of files whose rows are inserted in the database at once.
+BULK_CREATE_BATCH_SIZE = 500
+
+PREMIS_CLASSES = {
+    "PREMIS:OBJECT": premisrw.PREMISObject,
+    "PREMIS:EVENT": premisrw.PREMISEvent,
+    "PREMIS:RIGHTS": premisrw.PREMISRights,
+}
+
 
 def _elasticsearch_noop_printfn(*args, **kwargs):
     pass
@@ -125,6 +149,13 @@ class Command(DashboardCommand):
             action="store_true",
             help="Delete AIP-related Elasticsearch data before indexing AIP data",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=DEFAULT_WORKERS,
+            help="Number of transfers rebuilt at the same time"
+            f" (default: {DEFAULT_WORKERS})",
+        )
 
     def handle(self, *args, **options):
         """Entry point of the rebuild_transfer_backlog command."""
@@ -185,6 +216,7 @@ class Command(DashboardCommand):
                 uuid=options["uuid"],
                 skip_to=options["skip_to"],
                 delete=options["delete"],
+                workers=options["workers"],
             )
         else:
             self.populate_data_from_files(
@@ -193,6 +225,7 @@ class Command(DashboardCommand):
                 uuid=options["uuid"],
                 skip_to=options["skip_to"],
                 delete=options["delete"],
+                workers=options["workers"],
             )
 
     def confirm(self, no_prompt):
@@ -227,24 +260,15 @@ class Command(DashboardCommand):
         self.stdout.write("Creating indexes...")
         es.create_indexes_if_needed(es_client, indexes)
 
-    def populate_data_from_files(
-        self, es_client, transfer_backlog_dir, uuid=None, skip_to=None, delete=False
-    ):
-        """Populate indices and/or database from files."""
-        transfer_backlog_dir = Path(transfer_backlog_dir)
-        processed = 0
+    def select_transfers(self, transfer_uuids, uuid=None, skip_to=None):
+        """Yield the indices of the transfers to process.
+
+        :param transfer_uuids: UUIDs of the transfers found.
+        :param uuid: Optional UUID of the only transfer to process.
+        :param skip_to: Optional UUID of the first transfer to process.
+        """
         skip_found = False
-        for transfer_dir in transfer_backlog_dir.glob("*"):
-            if transfer_dir.name == ".gitignore" or transfer_dir.is_file():
-                continue
-            try:
-                bag = bagit.Bag(str(transfer_dir))
-                bag.validate(
-                    processes=multiprocessing.cpu_count(), completeness_only=True
-                )
-            except bagit.BagError:
-                bag = None
-            transfer_uuid = transfer_dir.name[-36:]
+        for index, transfer_uuid in enumerate(transfer_uuids):
             # If skip_to option specified, skip until uuid found
             if skip_to and (skip_to.lower() == transfer_uuid.lower()):
                 skip_found = True
@@ -254,40 +278,103 @@ class Command(DashboardCommand):
             # If specified a single transfer uuid, skip all others
             if uuid and (uuid.lower() != transfer_uuid.lower()):
                 continue
-            # if delete option specified delete before reindexing
-            if delete:
-                self.info(f"Deleting index data of {transfer_uuid}")
-                es.remove_backlog_transfer(es_client, transfer_uuid)
-                es.remove_backlog_transfer_files(es_client, transfer_uuid)
-
-            if bag and "External-Identifier" in bag.info:
-                self.info(f"Importing self-describing transfer {transfer_uuid}.")
-                size = am.get_bag_size(bag, str(transfer_dir))
+            yield index
 
-                _import_self_describing_transfer(
-                    self, es_client, self.stdout, transfer_dir, transfer_uuid, size
-                )
-            else:
-                self.info(f"Rebuilding known transfer {transfer_uuid}.")
-                if bag:
-                    size = am.get_bag_size(bag, str(transfer_dir))
-                else:
-                    size = am.walk_dir(str(transfer_dir))
-
-                _import_pipeline_dependant_transfer(
-                    self, es_client, self.stdout, transfer_dir, transfer_uuid, size
-                )
-            processed += 1
+    def process_transfers(self, func, transfers, workers):
+        """Process the transfers given in parallel.
+
+        :returns: Number of transfers for which ``func`` returned ``True``.
+        """
+        processed = 0
+        for transfer, future in run_in_workers(func, transfers, workers=workers):
+            try:
+                if future.result():
+                    processed += 1
+            except Exception as err:
+                self.error(f"Transfer {transfer} not indexed: {err}")
+                if django_settings.DEBUG:
+                    traceback.print_exc()
+        return processed
+
+    def populate_data_from_files(
+        self,
+        es_client,
+        transfer_backlog_dir,
+        uuid=None,
+        skip_to=None,
+        delete=False,
+        workers=DEFAULT_WORKERS,
+    ):
+        """Populate indices and/or database from files."""
+        transfer_backlog_dir = Path(transfer_backlog_dir)
+        transfer_dirs = [
+            transfer_dir
+            for transfer_dir in sorted(transfer_backlog_dir.glob("*"))
+            if transfer_dir.name != ".gitignore" and not transfer_dir.is_file()
+        ]
+        transfer_dirs = [
+            transfer_dirs[index]
+            for index in self.select_transfers(
+                [transfer_dir.name[-36:] for transfer_dir in transfer_dirs],
+                uuid=uuid,
+                skip_to=skip_to,
+            )
+        ]
+
+        def process(transfer_dir):
+            return self.import_transfer_dir(es_client, transfer_dir, delete=delete)
+
+        processed = self.process_transfers(process, transfer_dirs, workers)
         self.success(f"{processed} transfers indexed!")
 
+    def import_transfer_dir(self, es_client, transfer_dir, delete=False):
+        """Import the transfer found at ``transfer_dir`` in the backlog."""
+        transfer_uuid = transfer_dir.name[-36:]
+        try:
+            bag = bagit.Bag(str(transfer_dir))
+            bag.validate(processes=multiprocessing.cpu_count(), completeness_only=True)
+        except bagit.BagError:
+            bag = None
+        # if delete option specified delete before reindexing
+        if delete:
+            self.info(f"Deleting index data of {transfer_uuid}")
+            es.remove_backlog_transfer(es_client, transfer_uuid)
+            es.remove_backlog_transfer_files(es_client, transfer_uuid)
+
+        if bag and "External-Identifier" in bag.info:
+            self.info(f"Importing self-describing transfer {transfer_uuid}.")
+            size = am.get_bag_size(bag, str(transfer_dir))
+
+            _import_self_describing_transfer(
+                self, es_client, self.stdout, transfer_dir, transfer_uuid, size
+            )
+        else:
+            self.info(f"Rebuilding known transfer {transfer_uuid}.")
+            if bag:
+                size = am.get_bag_size(bag, str(transfer_dir))
+            else:
+                size = am.walk_dir(str(transfer_dir))
+
+            _import_pipeline_dependant_transfer(
+                self, es_client, self.stdout, transfer_dir, transfer_uuid, size
+            )
+        return True
+
     def populate_data_from_storage_service(
-        self, es_client, pipeline_uuid, uuid=None, skip_to=None, delete=False
+        self,
+        es_client,
+        pipeline_uuid,
+        uuid=None,
+        skip_to=None,
+        delete=False,
+        workers=DEFAULT_WORKERS,
     ):
         """Populate indices and/or database from Storage Service.
 
         :param es_client: Elasticsearch client.
         :param pipeline_uuid: UUID of origin pipeline for transfers to
         reindex.
+        :param workers: Number of transfers processed at the same time.
 
         :returns: None
         """
@@ -295,26 +382,35 @@ class Command(DashboardCommand):
         filtered_transfers = storageService.filter_packages(
             transfers, pipeline_uuid=pipeline_uuid
         )
-        processed = 0
-        skip_found = False
-        for transfer in filtered_transfers:
-            transfer_uuid = transfer["uuid"]
-            # If skip_to option specified, skip until uuid found
-            if skip_to and (skip_to.lower() == transfer_uuid.lower()):
-                skip_found = True
-            if skip_to and (not skip_found):
-                self.info(f"Skipping {transfer_uuid}")
-                continue
-            # If specified a single transfer uuid, skip all others
-            if uuid and (uuid.lower() != transfer_uuid.lower()):
-                continue
-            # if delete option specified delete before reindexing
-            if delete:
-                self.info(f"Deleting index data of {transfer_uuid}")
-                es.remove_backlog_transfer(es_client, transfer_uuid)
-                es.remove_backlog_transfer_files(es_client, transfer_uuid)
+        filtered_transfers = [
+            filtered_transfers[index]
+            for index in self.select_transfers(
+                [transfer["uuid"] for transfer in filtered_transfers],
+                uuid=uuid,
+                skip_to=skip_to,
+            )
+        ]
+
+        def process(transfer):
+            return self.import_stored_transfer(es_client, transfer, delete=delete)
+
+        processed = self.process_transfers(process, filtered_transfers, workers)
+        self.success(f"{processed} transfers indexed!")
 
-            temp_backlog_dir = tempfile.mkdtemp()
+    def import_stored_transfer(self, es_client, transfer, delete=False):
+        """Import a transfer downloaded from the Storage Service.
+
+        :returns: Whether the transfer was indexed.
+        """
+        transfer_uuid = transfer["uuid"]
+        # if delete option specified delete before reindexing
+        if delete:
+            self.info(f"Deleting index data of {transfer_uuid}")
+            es.remove_backlog_transfer(es_client, transfer_uuid)
+            es.remove_backlog_transfer_files(es_client, transfer_uuid)
+
+        temp_backlog_dir = tempfile.mkdtemp()
+        try:
             try:
                 local_package = storageService.download_package(
                     transfer_uuid, temp_backlog_dir
@@ -323,7 +419,7 @@ class Command(DashboardCommand):
                 self.error(
                     f"Transfer {transfer_uuid} not indexed. Unable to download from Storage Service."
                 )
-                continue
+                return False
             # Transfers are downloaded as .tar files, so we extract files
             # before indexing.
             try:
@@ -332,7 +428,7 @@ class Command(DashboardCommand):
                 self.error(
                     f"Transfer {transfer_uuid} not indexed. File extraction from tar failed: {err}."
                 )
-                continue
+                return False
             local_package_without_extension = am.package_name_from_path(local_package)
             transfer_indexed = False
             for entry in os.scandir(temp_backlog_dir):
@@ -350,131 +446,324 @@ class Command(DashboardCommand):
                         transfer["size"],
                     )
                     transfer_indexed = True
+        finally:
             shutil.rmtree(temp_backlog_dir)
-            if transfer_indexed:
-                processed += 1
-            else:
-                self.error(
-                    f"Transfer {transfer_uuid} not indexed. Unable to find files extracted from tar."
-                )
-        self.success(f"{processed} transfers indexed!")
+        if not transfer_indexed:
+            self.error(
+                f"Transfer {transfer_uuid} not indexed. Unable to find files extracted from tar."
+            )
+        return transfer_indexed
 
 
-def _import_dir_from_fsentry(cmd, fsentry, transfer_uuid):
-    pass
-    """
-    Directory.objects.create(
-        uuid=uuid.uuid4(),  # TODO: what goes here?
-        transfer_id=transfer_uuid,
-        originallocation=b"TODO",
-        currentlocation=b"TODO")
+MetsFile = namedtuple(
+    "MetsFile", "file_uuid path premis_objects premis_events premis_rights"
+)
+FileRows = namedtuple("FileRows", "file events formats file_ids rights")
+
+
+def _iter_elements(path, tags, events=("end",)):
+    """Parse the XML document at ``path`` incrementally.
+
+    Yields ``(event, element)`` pairs for the elements with the ``tags``
+    given. Elements are freed after the end event so the memory used does
+    not depend on the size of the document.
     """
+    for event, element in etree.iterparse(
+        path, events=events, tag=tags, remove_blank_text=True, huge_tree=True
+    ):
+        yield event, element
+        if event == "end":
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+
+def _parse_amdsec(amdsec):
+    """Return the PREMIS entities of an ``amdSec`` element by MDTYPE."""
+    entities = {mdtype: [] for mdtype in PREMIS_CLASSES}
+    for mdwrap in amdsec.iterfind("*/mets:mdWrap", namespaces=NAMESPACES):
+        premis_class = PREMIS_CLASSES.get(mdwrap.get("MDTYPE"))
+        document = mdwrap.find("mets:xmlData/*", namespaces=NAMESPACES)
+        if premis_class is None or document is None:
+            continue
+        entities[mdwrap.get("MDTYPE")].append(premis_class.fromtree(document))
+    return entities
 
 
-def _import_file_from_fsentry(cmd, fsentry, transfer_uuid):
-    premis_events = fsentry.get_premis_events()
+def _iter_transfer_mets(mets_path):
+    """Parse a transfer METS file incrementally.
 
-    ingestion_date = None
-    for evt in fsentry.get_premis_events():
-        if evt.event_type == "ingestion":
-            ingestion_date = evt.event_date_time
-            break
+    Returns the accession number of the transfer and an iterator of
+    ``MetsFile`` tuples, one per file of the file section with the PREMIS
+    entities of its first ``amdSec``, the ones used by ``metsrw``. The
+    document is read twice, first to map the files to their ``amdSec``
+    elements and then to parse these one at a time.
+    """
+    accession_id = None
+    files = {}
+    amdsec_tag = lxmlns("mets") + "amdSec"
+    alt_record_id_tag = lxmlns("mets") + "altRecordID"
+    for _, element in _iter_elements(
+        mets_path, (alt_record_id_tag, amdsec_tag, lxmlns("mets") + "file")
+    ):
+        if element.tag == alt_record_id_tag:
+            if accession_id is None:
+                accession_id = (
+                    element.text if element.get("TYPE") == "Accession ID" else ""
+                )
+        elif element.tag != amdsec_tag:
+            flocat = element.find("mets:FLocat", namespaces=NAMESPACES)
+            amdids = (element.get("ADMID") or "").split()
+            files[amdids[0] if amdids else element.get("ID")] = (
+                element.get("ID").replace(FILE_ID_PREFIX, "", 1),
+                urldecode(flocat.get(lxmlns("xlink") + "href")),
+            )
 
-    file_obj = addFileToTransfer(
-        f"%transferDirectory%{fsentry.path}",
-        fsentry.file_uuid,
-        transfer_uuid,
-        None,
-        ingestion_date,
-        sourceType="ingestion",
-        use="original",
-    )
+    def _iter_files():
+        # The amdSec elements go before the fileSec in a METS document.
+        for event, element in _iter_elements(
+            mets_path,
+            (amdsec_tag, lxmlns("mets") + "fileSec"),
+            events=("start", "end"),
+        ):
+            if event == "start":
+                if element.tag != amdsec_tag:
+                    break
+                continue
+            try:
+                file_uuid, path = files.pop(element.get("ID"))
+            except KeyError:
+                continue
+            entities = _parse_amdsec(element)
+            yield MetsFile(
+                file_uuid,
+                path,
+                entities["PREMIS:OBJECT"],
+                entities["PREMIS:EVENT"],
+                entities["PREMIS:RIGHTS"],
+            )
+        for file_uuid, path in files.values():
+            yield MetsFile(file_uuid, path, [], [], [])
 
-    for rights_statement in fsentry.get_premis_rights():
-        load_rights(file_obj, rights_statement)
+    return accession_id or None, _iter_files()
 
-    for event in premis_events:
-        _load_event(file_obj, event)
 
-    try:
-        premis_object = fsentry.get_premis_objects()[0]
-    except IndexError:
-        return
+class TransferRows:
+    """Database rows of the files of a transfer, inserted in bulk.
 
-    # Populate extra attributes in the File object.
-    file_obj.checksum = premis_object.message_digest
-    file_obj.checksumtype = _convert_checksum_algo(
-        premis_object.message_digest_algorithm
-    )
-    file_obj.size = premis_object.size
-    file_obj.save()
+    Files are added with ``add`` and their rows inserted by ``flush`` every
+    ``batch_size`` files. Agent and format lookups are cached for the
+    transfer.
 
-    # Populate format details of the File object.
-    if premis_object.format_registry_name != "PRONOM":
-        return
-    try:
-        format_version = FormatVersion.active.get(
-            pronom_id=premis_object.format_registry_key
+    ``add`` raises ``ValueError`` for files that can't be imported. If a
+    batch can't be inserted its files are inserted one by one, and
+    ``on_error`` is called with the UUID and the error of those that fail.
+    """
+
+    def __init__(self, transfer, on_error, batch_size=BULK_CREATE_BATCH_SIZE):
+        self.transfer = transfer
+        self.on_error = on_error
+        self.batch_size = batch_size
+        # Agents linked to the events created by Archivematica.
+        self.transfer_agents = list(transfer.agents.values_list("pk", flat=True))
+        self._agents = {}
+        self._format_versions = {}
+        self._event_ids = set()
+        self._files = []
+
+    def add(self, mets_file):
+        """Add the rows of a file described in the transfer METS."""
+        ingestion_date = None
+        for event in mets_file.premis_events:
+            if event.event_type == "ingestion":
+                ingestion_date = event.event_date_time
+                break
+
+        location = f"%transferDirectory%{mets_file.path}"
+        file_obj = File(
+            uuid=mets_file.file_uuid,
+            transfer=self.transfer,
+            originallocation=location.encode(),
+            currentlocation=location.encode(),
+            enteredsystem=ingestion_date or timezone.now(),
+            filegrpuse="original",
         )
-    except FormatVersion.DoesNotExist:
-        return
-    FileFormatVersion.objects.create(file_uuid=file_obj, format_version=format_version)
-    FileID.objects.create(
-        file=file_obj,
-        format_name=format_version.format.description,
-        format_version=format_version.version or "",
-        format_registry_name=premis_object.format_registry_name,
-        format_registry_key=premis_object.format_registry_key,
-    )
 
+        events = [
+            self._event(file_obj, "ingestion", ingestion_date),
+        ]
+        if self.transfer.accessionid:
+            events.append(
+                self._event(
+                    file_obj,
+                    "registration",
+                    ingestion_date,
+                    event_outcome_detail=f"accession#{self.transfer.accessionid}",
+                )
+            )
+        for event in mets_file.premis_events:
+            events.append(self._load_event(file_obj, event))
+
+        # Reject the file before queuing anything, a single bad event would
+        # make the insert of the whole batch fail.
+        event_ids = [str(event.event_id) for event, _ in events]
+        if len(set(event_ids)) != len(event_ids) or self._event_ids.intersection(
+            event_ids
+        ):
+            raise ValueError("Duplicated event identifier")
+
+        formats, file_ids = [], []
+        try:
+            premis_object = mets_file.premis_objects[0]
+        except IndexError:
+            pass
+        else:
+            # Populate extra attributes in the File object.
+            file_obj.checksum = premis_object.message_digest
+            file_obj.checksumtype = _convert_checksum_algo(
+                premis_object.message_digest_algorithm
+            )
+            file_obj.size = premis_object.size
 
-def _load_event(file_obj, event):
-    create_kwargs = {
-        "event_id": event.event_identifier_value,
-        "event_type": event.event_type,
-        "event_datetime": event.event_date_time,
-    }
+            # Populate format details of the File object.
+            format_version = self._get_format_version(premis_object)
+            if format_version is not None:
+                formats.append(
+                    FileFormatVersion(file_uuid=file_obj, format_version=format_version)
+                )
+                file_ids.append(
+                    FileID(
+                        file=file_obj,
+                        format_name=format_version.format.description,
+                        format_version=format_version.version or "",
+                        format_registry_name=premis_object.format_registry_name,
+                        format_registry_key=premis_object.format_registry_key,
+                    )
+                )
 
-    event_detail = None
-    if event.premis_version == "3.0":
-        event_detail_attr = "event_detail_information__event_detail"
-    else:
-        event_detail_attr = "event_detail"
-    try:
+        self._event_ids.update(event_ids)
+        self._files.append(
+            FileRows(file_obj, events, formats, file_ids, mets_file.premis_rights)
+        )
+        if len(self._files) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Insert the rows added since the last flush."""
+        try:
+            try:
+                with transaction.atomic():
+                    self._insert(self._files)
+            except Exception:
+                # Find the files that can't be inserted.
+                for file_rows in self._files:
+                    try:
+                        with transaction.atomic():
+                            self._insert([file_rows])
+                    except Exception as err:
+                        self.on_error(file_rows.file.uuid, err)
+        finally:
+            self._files = []
+
+    def _insert(self, files):
+        File.objects.bulk_create([file_rows.file for file_rows in files])
+        bulkInsertIntoEvents(
+            [event for file_rows in files for event in file_rows.events]
+        )
+        FileFormatVersion.objects.bulk_create(
+            [item for file_rows in files for item in file_rows.formats]
+        )
+        FileID.objects.bulk_create(
+            [item for file_rows in files for item in file_rows.file_ids]
+        )
+        # Rights statements reference the files, which must exist first.
+        for file_rows in files:
+            for rights_statement in file_rows.rights:
+                load_rights(file_rows.file, rights_statement)
+
+    def _event(self, file_obj, event_type, event_datetime, **kwargs):
+        event = Event(
+            event_id=uuid_lib.uuid4(),
+            file_uuid=file_obj,
+            event_type=event_type,
+            event_datetime=event_datetime or timezone.now(),
+            **kwargs,
+        )
+        return event, self.transfer_agents
+
+    def _load_event(self, file_obj, event):
+        try:
+            event_id = str(uuid_lib.UUID(str(event.event_identifier_value)))
+        except ValueError as err:
+            raise ValueError(
+                f"Invalid event identifier: {event.event_identifier_value}"
+            ) from err
+        create_kwargs = {
+            "event_id": event_id,
+            "event_type": event.event_type,
+            "event_datetime": event.event_date_time,
+        }
+
+        event_detail = None
+        if event.premis_version == "3.0":
+            event_detail_attr = "event_detail_information__event_detail"
+        else:
+            event_detail_attr = "event_detail"
         event_detail = getattr(event, event_detail_attr)
-    except AttributeError:
-        raise
-    if isinstance(event_detail, str):
-        create_kwargs["event_detail"] = event.event_detail
+        if isinstance(event_detail, str):
+            create_kwargs["event_detail"] = event.event_detail
 
-    try:
-        event_outcome_information = event.event_outcome_information[0]
-    except (AttributeError, IndexError):
-        pass
-    else:
-        event_outcome = event_outcome_information.event_outcome
-        if isinstance(event_outcome, str):
-            create_kwargs["event_outcome"] = event_outcome
-        event_outcome_note = event_outcome_information.event_outcome_detail_note
-        if isinstance(event_outcome_note, str):
-            create_kwargs["event_outcome_detail"] = event_outcome_note
-
-    event_obj = file_obj.event_set.create(**create_kwargs)
+        try:
+            event_outcome_information = event.event_outcome_information[0]
+        except (AttributeError, IndexError):
+            pass
+        else:
+            event_outcome = event_outcome_information.event_outcome
+            if isinstance(event_outcome, str):
+                create_kwargs["event_outcome"] = event_outcome
+            event_outcome_note = event_outcome_information.event_outcome_detail_note
+            if isinstance(event_outcome_note, str):
+                create_kwargs["event_outcome_detail"] = event_outcome_note
 
-    try:
-        identifiers = event.linking_agent_identifier
-    except AttributeError:
-        return
-    for item in identifiers:
         try:
-            # Is this cached?
-            agent = Agent.objects.get(
-                identifiertype=item.linking_agent_identifier_type,
-                identifiervalue=item.linking_agent_identifier_value,
+            identifiers = event.linking_agent_identifier
+        except AttributeError:
+            identifiers = ()
+        agents = []
+        for item in identifiers:
+            agent = self._get_agent(
+                item.linking_agent_identifier_type,
+                item.linking_agent_identifier_value,
             )
-        except Agent.DoesNotExist:
-            continue
-        event_obj.agents.add(agent)
+            if agent is not None:
+                agents.append(agent)
+
+        return Event(file_uuid=file_obj, **create_kwargs), agents
+
+    def _get_agent(self, identifier_type, identifier_value):
+        key = (identifier_type, identifier_value)
+        if key not in self._agents:
+            self._agents[key] = (
+                Agent.objects.filter(
+                    identifiertype=identifier_type, identifiervalue=identifier_value
+                )
+                .values_list("pk", flat=True)
+                .first()
+            )
+        return self._agents[key]
+
+    def _get_format_version(self, premis_object):
+        if premis_object.format_registry_name != "PRONOM":
+            return None
+        pronom_id = premis_object.format_registry_key
+        if pronom_id not in self._format_versions:
+            try:
+                self._format_versions[pronom_id] = FormatVersion.active.select_related(
+                    "format"
+                ).get(pronom_id=pronom_id)
+            except FormatVersion.DoesNotExist:
+                self._format_versions[pronom_id] = None
+        return self._format_versions[pronom_id]
 
 
 def _convert_checksum_algo(algo):
@@ -513,47 +802,50 @@ def _import_self_describing_transfer(
 
     :returns: None.
     """
-    transfer, created = Transfer.objects.get_or_create(
-        uuid=transfer_uuid,
-        defaults={
-            "type": "Standard",
-            "diruuids": False,
-            "currentlocation": f"%sharedPath%www/AIPsStore/transferBacklog/originals/{transfer_dir.name}/",
-        },
-    )
-
-    # The transfer did not exist, we need to populate everything else.
-    if created:
-        mets = metsrw.METSDocument.fromfile(_get_transfer_mets_path(transfer_dir))
+    # The rows of the transfer are created all at once or not at all, so an
+    # interrupted rebuild populates the transfer again the next time.
+    with transaction.atomic():
+        transfer, created = Transfer.objects.get_or_create(
+            uuid=transfer_uuid,
+            defaults={
+                "type": "Standard",
+                "diruuids": False,
+                "currentlocation": f"%sharedPath%www/AIPsStore/transferBacklog/originals/{transfer_dir.name}/",
+            },
+        )
 
-        try:
-            alt_id = mets.alternate_ids[0]
-        except IndexError:
-            pass
-        else:
-            if alt_id.type == "Accession ID":
-                transfer.accessionid = alt_id.text
-            transfer.save()
+        # The transfer did not exist, we need to populate everything else.
+        if created:
+            accession_id, mets_files = _iter_transfer_mets(
+                _get_transfer_mets_path(transfer_dir)
+            )
+            if accession_id is not None:
+                transfer.accessionid = accession_id
+                transfer.save()
 
-        for fsentry in mets.all_files():
-            try:
-                if fsentry.type == "Directory":
-                    _import_dir_from_fsentry(cmd, fsentry, transfer_uuid)
-                else:
-                    _import_file_from_fsentry(cmd, fsentry, transfer_uuid)
-            except Exception as err:
+            def warn(file_uuid, err):
                 cmd.warning(
-                    f"There was an error processing file {fsentry.file_uuid} (transfer {transfer_uuid}): {err}"
+                    f"There was an error processing file {file_uuid} (transfer {transfer_uuid}): {err}"
                 )
                 if django_settings.DEBUG:
                     traceback.print_exc()
 
+            rows = TransferRows(transfer, on_error=warn)
+            for mets_file in mets_files:
+                try:
+                    rows.add(mets_file)
+                except Exception as err:
+                    warn(mets_file.file_uuid, err)
+            rows.flush()
+
     es.index_transfer_and_files(
         es_client,
         transfer_uuid,
         str(transfer_dir) + "/",
         size,
         printfn=_elasticsearch_noop_printfn,
+        chunk_size=django_settings.ELASTICSEARCH_BULK_CHUNK_SIZE,
+        thread_count=django_settings.ELASTICSEARCH_BULK_THREAD_COUNT,
     )
 
 
@@ -577,6 +869,8 @@ def _import_pipeline_dependant_transfer(
         str(transfer_dir) + "/",
         size,
         printfn=_elasticsearch_noop_printfn,
+        chunk_size=django_settings.ELASTICSEARCH_BULK_CHUNK_SIZE,
+        thread_count=django_settings.ELASTICSEARCH_BULK_THREAD_COUNT,
     )
     try:
         storageService.reindex_file(transfer_uuid)
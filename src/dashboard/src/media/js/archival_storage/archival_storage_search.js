@@ -137,7 +137,6 @@ $(document).ready(function() {
   var showFiles = $('#id_show_files').prop('checked');
 
   set_create_aic_visibility(showFiles);
-  set_download_csv_visibility(showFiles);
 
   var search = renderArchivalStorageSearchForm(null, null, null);
 
@@ -377,9 +376,6 @@ $(document).ready(function() {
 
     // Refresh visibliity of the "Create an AIC" button to reflect new DataTable.
     set_create_aic_visibility(showFiles);
-
-    // Refresh the visibility of the Download CSV button.
-    set_download_csv_visibility(showFiles);
   }
 
   function set_create_aic_visibility(showFiles) {
@@ -420,15 +416,6 @@ $(document).ready(function() {
   const downloadCSVButton = "download-csv-btn"
   const csvFileName = "archival-storage-report.csv"
 
-  function set_download_csv_visibility(showFiles) {
-    btn = $("#download-csv-btn");
-    if (showFiles) {
-      btn.hide();
-    } else {
-      btn.show();
-    }
-  }
-
   // Return the contents of the Elasticsearch index as a CSV file.
   document.getElementById(downloadCSVButton).onclick = function() { exportFile(csvMimeType, csvFileName) };
 
@@ -439,16 +426,13 @@ $(document).ready(function() {
     // Param mimeType: The format of the content requested.
     // Param reportFileName: The default download filename.
     //
-    // NB. If we extend this For files add the parameter to the
-    // dictionary:
-    //
-    //      "file_mode": showFiles,
-    //
+    // The report lists AIP files instead of AIPs when they are shown.
     var params = {
       "requestFile": true,
       "mimeType": mimeType,
       "fileName": reportFileName,
       "returnAll": true,
+      "file_mode": $('#id_show_files').prop('checked'),
     };
     query = $.param(params);
     window.open('/archival-storage/search/?' + query);
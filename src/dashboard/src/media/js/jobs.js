@@ -721,6 +721,12 @@ BaseAppView = Backbone.View.extend({
 
       this.statusUrl = options.statusUrl;
 
+      // Timestamp of the last response, used to only request the units that
+      // changed since then. Every few polls all the units are requested to
+      // drop the ones removed from the dashboard.
+      this.since = undefined;
+      this.pollsUntilFullPoll = 0;
+
       _.bindAll(this, 'add', 'remove');
       Sips.bind('add', this.add);
       Sips.bind('remove', this.remove);
@@ -728,6 +734,69 @@ BaseAppView = Backbone.View.extend({
       window.statusWidget = new window.StatusView();
 
       this.poll(true);
+      this.listen(options.eventsUrl);
+    },
+
+  // Follow the changes pushed by the server, if the browser supports it, and
+  // poll as soon as units change. Polling at the regular interval is kept,
+  // less often, as a fallback.
+  listen: function(eventsUrl)
+    {
+      if (!eventsUrl || !window.EventSource)
+        {
+          return;
+        }
+
+      var self = this;
+      this.eventSource = new EventSource(eventsUrl);
+
+      // Catch up with the changes made before we were listening.
+      this.eventSource.addEventListener('open', function()
+        {
+          self.pollNow();
+        });
+      this.eventSource.addEventListener('change', function()
+        {
+          self.pollNow();
+        });
+      this.eventSource.addEventListener('reset', function()
+        {
+          self.pollsUntilFullPoll = 0;
+          self.pollNow();
+        });
+    },
+
+  getPollInterval: function()
+    {
+      if (this.eventSource && this.eventSource.readyState === EventSource.OPEN)
+        {
+          return this.interval * 6;
+        }
+
+      return this.interval;
+    },
+
+  schedulePoll: function(delay)
+    {
+      var self = this;
+
+      clearTimeout(this.pollTimer);
+      this.pollTimer = setTimeout(function()
+        {
+          self.poll();
+        }, delay);
+    },
+
+  pollNow: function()
+    {
+      if (this.polling)
+        {
+          this.pollRequested = true;
+        }
+      else
+        {
+          this.schedulePoll(0);
+        }
     },
 
   add: function(sip)
@@ -861,26 +930,45 @@ BaseAppView = Backbone.View.extend({
         }
     },
 
-  // Check if the response from the API has changed since the last poll.
-  hasResponseChanged: function(response)
+  // Check if the units in a full response from the API have changed since
+  // the last poll.
+  hasResponseChanged: function(objects)
     {
-      var changed = this.firstPoll || this.previousVersion !== response;
+      var version = JSON.stringify(objects);
+      var changed = this.firstPoll || this.previousVersion !== version;
 
-      this.previousVersion = response;
+      this.previousVersion = version;
 
       return changed;
     },
 
+  getPollUrl: function()
+    {
+      var url = this.statusUrl + '?' + new Date().getTime();
+
+      if (getURLParameter('paged') || undefined === this.since || this.pollsUntilFullPoll <= 0)
+        {
+          this.pollsUntilFullPoll = 10;
+        }
+      else
+        {
+          this.pollsUntilFullPoll--;
+          url += '&since=' + encodeURIComponent(this.since);
+        }
+
+      return url;
+    },
+
   poll: function(start)
     {
       this.firstPoll = undefined !== start;
+      this.polling = true;
 
       $.ajax({
         context: this,
-        // Use text instead of json to cache raw bytes. We'll parse manually.
         dataType: 'text',
         type: 'GET',
-        url: this.statusUrl + '?' + new Date().getTime(),
+        url: this.getPollUrl(),
         beforeSend: function()
           {
             window.statusWidget.startPoll();
@@ -891,12 +979,16 @@ BaseAppView = Backbone.View.extend({
           },
         success: function(response)
           {
-            if (!this.hasResponseChanged(response)) {
-              return;
-            }
-
             var data = JSON.parse(response);
             var objects = data.objects;
+            // Partial responses only include the units that changed.
+            var full = false !== data.full;
+
+            this.since = data.timestamp;
+
+            if (full && !this.hasResponseChanged(objects)) {
+              return;
+            }
 
             if (getURLParameter('paged'))
               {
@@ -925,7 +1017,7 @@ BaseAppView = Backbone.View.extend({
               }
 
             // Delete sips
-            if (Sips.length > objects.length)
+            if (full && Sips.length > objects.length)
             {
               var unusedSips = Sips.reject(function(sip)
                   {
@@ -947,16 +1039,14 @@ BaseAppView = Backbone.View.extend({
           },
         complete: function()
           {
-            var self = this;
-
             window.statusWidget.endPoll();
 
-            if (!self.idle)
+            this.polling = false;
+
+            if (!this.idle)
             {
-              setTimeout(function()
-                {
-                  self.poll();
-                }, this.interval);
+              this.schedulePoll(this.pollRequested ? 0 : this.getPollInterval());
+              this.pollRequested = false;
             }
           }
       });
@@ -77,6 +77,16 @@ CONFIG_MAPPING = {
         "option": "elasticsearch_max_query_size",
         "type": "int",
     },
+    "elasticsearch_bulk_chunk_size": {
+        "section": "Dashboard",
+        "option": "elasticsearch_bulk_chunk_size",
+        "type": "int",
+    },
+    "elasticsearch_bulk_thread_count": {
+        "section": "Dashboard",
+        "option": "elasticsearch_bulk_thread_count",
+        "type": "int",
+    },
     "search_enabled": {
         "section": "Dashboard",
         "process_function": process_search_enabled,
@@ -141,6 +151,11 @@ CONFIG_MAPPING = {
         "option": "storage_service_client_quick_timeout",
         "type": "float",
     },
+    "storage_service_client_cache_ttl": {
+        "section": "Dashboard",
+        "option": "storage_service_client_cache_ttl",
+        "type": "float",
+    },
     "agentarchives_client_timeout": {
         "section": "Dashboard",
         "option": "agentarchives_client_timeout",
@@ -197,6 +212,8 @@ watch_directory = /var/archivematica/sharedDirectory/watchedDirectories/
 elasticsearch_server = 127.0.0.1:9200
 elasticsearch_timeout = 10
 elasticsearch_max_query_size = 10000
+elasticsearch_bulk_chunk_size = 500
+elasticsearch_bulk_thread_count = 1
 search_enabled = true
 gearman_server = 127.0.0.1:4730
 password_minimum_length = 8
@@ -212,6 +229,7 @@ oidc_authentication = False
 oidc_allow_local_authentication = True
 storage_service_client_timeout = 86400
 storage_service_client_quick_timeout = 5
+storage_service_client_cache_ttl = 60
 agentarchives_client_timeout = 300
 csp_enabled = False
 prometheus_enabled = False
@@ -565,11 +583,14 @@ WATCH_DIRECTORY = config.get("watch_directory")
 ELASTICSEARCH_SERVER = config.get("elasticsearch_server")
 ELASTICSEARCH_TIMEOUT = config.get("elasticsearch_timeout")
 ELASTICSEARCH_MAX_QUERY_SIZE = config.get("elasticsearch_max_query_size")
+ELASTICSEARCH_BULK_CHUNK_SIZE = config.get("elasticsearch_bulk_chunk_size")
+ELASTICSEARCH_BULK_THREAD_COUNT = config.get("elasticsearch_bulk_thread_count")
 SEARCH_ENABLED = config.get("search_enabled")
 STORAGE_SERVICE_CLIENT_TIMEOUT = config.get("storage_service_client_timeout")
 STORAGE_SERVICE_CLIENT_QUICK_TIMEOUT = config.get(
     "storage_service_client_quick_timeout"
 )
+STORAGE_SERVICE_CLIENT_CACHE_TTL = config.get("storage_service_client_cache_ttl")
 AGENTARCHIVES_CLIENT_TIMEOUT = config.get("agentarchives_client_timeout")
 
 SITE_URL = config.get("site_url")
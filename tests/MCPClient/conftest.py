@@ -4,6 +4,7 @@ import pytest
 import pytest_django
 from client.job import Job
 from django.utils import timezone
+from fpr import cache as fpr_cache
 from fpr import models as fprmodels
 from main import models
 
@@ -25,6 +26,16 @@ def set_xml_catalog_files(monkeypatch: pytest.MonkeyPatch) -> None:
     )
 
 
+@pytest.fixture(autouse=True)
+def clear_fpr_cache() -> None:
+    """Don't let FPR rules cached by a test leak into the next one.
+
+    Some tests change the FPR with bulk updates, which don't bump the FPR
+    revision the cache relies on.
+    """
+    fpr_cache.rules.clear()
+
+
 @pytest.fixture()
 def mcp_job() -> Job:
     return Job("stub", "stub", [])
@@ -1,11 +1,19 @@
+import pathlib
 import uuid
 from unittest import mock
 
+import metsrw
+import namespaces as ns
 import pytest
+from assign_file_uuids import MetsFileInfo
 from assign_file_uuids import call
+from assign_file_uuids import get_file_info_from_mets
+from assign_file_uuids import get_mets_file_index
 from client.job import Job
 from main import models
 
+THIS_DIR = pathlib.Path(__file__).parent
+
 
 @pytest.fixture
 def sip_directory_path(sip_directory_path):
@@ -143,3 +151,108 @@ def test_call_updates_transfer_file_on_reingest(
     job.print_output.assert_called_with(
         "Updating current location for", str(f.uuid), "with", file_info
     )
+
+
+@pytest.mark.django_db
+@mock.patch("assign_file_uuids.REGISTRATION_BATCH_SIZE", 2)
+@mock.patch("metsrw.METSDocument.fromfile")
+@mock.patch("assign_file_uuids.find_mets_file")
+@mock.patch("assign_file_uuids.get_file_info_from_mets")
+def test_call_sets_current_location_of_every_reingested_file(
+    get_file_info_from_mets,
+    find_mets_file,
+    fromfile,
+    sip_directory_path,
+    transfer,
+):
+    # More files than fit in a registration batch.
+    for i in range(4):
+        (sip_directory_path / "contents" / f"file-{i}.txt").touch()
+
+    def file_info(job, mets_index, file_path_relative_to_sip):
+        name = pathlib.Path(file_path_relative_to_sip).name
+        return {
+            "uuid": str(uuid.uuid4()),
+            "filegrpuse": "original",
+            "original_path": f"%transferDirectory%original/{name}",
+            "current_path": f"%transferDirectory%contents/{name}",
+        }
+
+    get_file_info_from_mets.side_effect = file_info
+
+    job = mock.MagicMock(
+        spec=Job,
+        args=[
+            "assign_file_uuids.py",
+            "--transferUUID",
+            str(transfer.uuid),
+            "--sipDirectory",
+            f"{sip_directory_path}/",
+            "--filterSubdir",
+            "contents",
+        ],
+    )
+    transfer.type = models.Transfer.ARCHIVEMATICA_AIP
+    transfer.save()
+
+    call([job])
+
+    job.set_status.assert_called_once_with(0)
+    locations = sorted(
+        (bytes(original), bytes(current))
+        for original, current in models.File.objects.filter(
+            transfer=transfer
+        ).values_list("originallocation", "currentlocation")
+    )
+    assert locations == [
+        (
+            f"%transferDirectory%original/{name}".encode(),
+            f"%transferDirectory%contents/{name}".encode(),
+        )
+        for name in sorted(["file-in.txt"] + [f"file-{i}.txt" for i in range(4)])
+    ]
+
+
+def test_get_mets_file_index_matches_file_lookups():
+    mets = metsrw.METSDocument.fromfile(
+        str(THIS_DIR / "fixtures" / "mets_no_metadata.xml")
+    )
+
+    index = get_mets_file_index(mets)
+
+    files = [entry for entry in mets.all_files() if entry.type == "Item"]
+    assert files
+    for entry in files:
+        assert mets.get_file(path=entry.path) is entry
+        techmd = [
+            item for item in entry.amdsecs[0].subsections if item.subsection == "techMD"
+        ][-1]
+        assert index[entry.path] == (
+            entry.file_uuid,
+            entry.use,
+            ns.xml_findtext_premis(techmd.contents.document, "premis:originalName"),
+        )
+
+
+def test_get_file_info_from_mets_uses_index():
+    job = mock.Mock(spec=Job)
+    index = {
+        "objects/file.txt": MetsFileInfo(
+            "d39a1f38-7c4c-4a15-9fab-6f5f6d2ef6a9",
+            "original",
+            "%transferDirectory%objects/file.txt",
+        )
+    }
+
+    assert get_file_info_from_mets(
+        job, index, "%transferDirectory%objects/file.txt"
+    ) == {
+        "uuid": "d39a1f38-7c4c-4a15-9fab-6f5f6d2ef6a9",
+        "filegrpuse": "original",
+        "current_path": "%transferDirectory%objects/file.txt",
+        "original_path": "%transferDirectory%objects/file.txt",
+    }
+    assert get_file_info_from_mets(job, index, "%transferDirectory%objects/x") == {}
+    job.print_error.assert_called_once_with(
+        "FSEntry for file objects/x not found in METS"
+    )
@@ -2,6 +2,7 @@ from unittest import mock
 
 import characterize_file
 import pytest
+import pytest_django
 from client.job import Job
 from fpr import models as fprmodels
 from main import models
@@ -153,13 +154,11 @@ def test_job_fails_if_command_fails(
 
 
 @pytest.mark.django_db
-@mock.patch("characterize_file.insertIntoFPCommandOutput")
 @mock.patch("characterize_file.etree")
 @mock.patch("characterize_file.executeOrRun")
 def test_job_saves_valid_xml_command_output(
     execute_or_run: mock.Mock,
     etree: mock.Mock,
-    insert_into_fp_command_output: mock.Mock,
     sip_file: models.File,
     sip: models.SIP,
     rule_with_xml_output_format: fprmodels.FPRule,
@@ -190,9 +189,9 @@ def test_job_saves_valid_xml_command_output(
     ]
     job.write_error.assert_called_once_with(stderr)
     etree.fromstring.assert_called_once_with(stdout.encode())
-    insert_into_fp_command_output.assert_called_once_with(
-        sip_file.uuid, stdout, rule_with_xml_output_format.uuid
-    )
+    output = models.FPCommandOutput.objects.get(file=sip_file)
+    assert output.content == stdout
+    assert output.rule == rule_with_xml_output_format
 
 
 @pytest.mark.django_db
@@ -228,3 +227,49 @@ def test_job_fails_with_invalid_xml_command_output(
             f'XML output for command "{rule_with_xml_output_format.command.description}" ({rule_with_xml_output_format.command.uuid}) was not valid XML; not saving to database'
         ),
     ]
+
+
+@pytest.mark.django_db
+@mock.patch("characterize_file.executeOrRun")
+def test_batch_runs_commands_in_pool_and_saves_output_in_bulk(
+    execute_or_run: mock.Mock,
+    sip: models.SIP,
+    sip_file: models.File,
+    rule_with_xml_output_format: fprmodels.FPRule,
+    sip_file_format_version: models.FileFormatVersion,
+    django_assert_max_num_queries: pytest_django.DjangoAssertNumQueries,
+) -> None:
+    files = [sip_file] + [
+        models.File.objects.create(
+            sip=sip,
+            currentlocation=f"%SIPDirectory%objects/file{i}.txt".encode(),
+        )
+        for i in range(4)
+    ]
+    for f in files[1:]:
+        models.FileFormatVersion.objects.create(
+            file_uuid=f, format_version=sip_file_format_version.format_version
+        )
+    # The first file has been characterized already.
+    models.FPCommandOutput.objects.create(
+        file=files[0], rule=rule_with_xml_output_format
+    )
+    execute_or_run.side_effect = lambda *args, **kwargs: (0, "<mock/>", "")
+    jobs = []
+    for f in files:
+        job = mock.Mock(spec=Job)
+        job.JobContext = mock.MagicMock()
+        jobs.append((job, characterize_file.CharacterizeFileArgs(f.uuid, sip.uuid)))
+
+    # Queries don't grow with the number of commands run.
+    with django_assert_max_num_queries(len(files) * 4):
+        characterize_file.characterize(jobs, max_workers=2)
+
+    for job, _ in jobs:
+        job.set_status.assert_called_once_with(0)
+    assert execute_or_run.call_count == len(files) - 1
+    assert set(
+        models.FPCommandOutput.objects.filter(
+            rule=rule_with_xml_output_format
+        ).values_list("file_id", flat=True)
+    ) == {f.uuid for f in files}
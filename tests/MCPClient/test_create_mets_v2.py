@@ -3,11 +3,19 @@ from contextlib import ExitStack as does_not_raise
 from unittest import mock
 
 import pytest
+from create_mets_v2 import MetsState
+from create_mets_v2 import SIPFileData
 from create_mets_v2 import createDMDIDsFromCSVMetadata
+from create_mets_v2 import getAMDSec
 from create_mets_v2 import main
 from lxml import etree
+from main.models import Agent
+from main.models import Derivation
 from main.models import DublinCore
+from main.models import Event
 from main.models import File
+from main.models import FileID
+from main.models import FPCommandOutput
 from main.models import MetadataAppliesToType
 from main.models import SIPArrange
 from namespaces import NSMAP
@@ -391,3 +399,101 @@ def test_structmap_is_created_from_sip_arrangement(
     assert file3_div.attrib["TYPE"] == "File"
     assert subdir_second_div.attrib["TYPE"] == "Subseries"
     assert file4_div.attrib["TYPE"] == "File"
+
+
+@pytest.mark.django_db
+def test_amdsec_is_the_same_with_prefetched_file_data(
+    mcp_job, sip, sip_file, preservation_file, fprule_characterization
+):
+    FileID.objects.create(
+        file=sip_file,
+        format_name="MP3",
+        format_version="1",
+        format_registry_name="PRONOM",
+        format_registry_key="fmt/134",
+    )
+    FPCommandOutput.objects.create(
+        file=sip_file, rule=fprule_characterization, content="<fits/>"
+    )
+    agent = Agent.objects.create(
+        identifiertype="preservation system", identifiervalue="test", name="test"
+    )
+    event = Event.objects.create(file_uuid=sip_file, event_type="normalization")
+    event.agents.add(agent)
+    Derivation.objects.create(
+        source_file=sip_file, derived_file=preservation_file, event=event
+    )
+
+    def get_amdsec(state):
+        amdsec, _ = getAMDSec(
+            mcp_job,
+            sip_file.uuid,
+            "objects/file.mp3",
+            "preservation",
+            sip.uuid,
+            sip_file.transfer_id,
+            "",
+            None,
+            "",
+            state,
+        )
+        return etree.tostring(amdsec)
+
+    expected = get_amdsec(MetsState())
+
+    state = MetsState()
+    state.sip_file_data = SIPFileData(sip.uuid)
+    assert state.sip_file_data.load([sip_file.currentlocation]) == [str(sip_file.uuid)]
+
+    assert get_amdsec(state) == expected
+    assert state.sip_file_data.get_file(sip_file.currentlocation).uuid == sip_file.uuid
+
+
+@pytest.mark.django_db
+def test_file_agents_are_the_same_with_prefetched_file_data(mcp_job, sip, sip_file):
+    agents = [
+        Agent.objects.create(
+            identifiertype="preservation system",
+            identifiervalue=f"agent {i}",
+            name=f"agent {i}",
+        )
+        for i in range(3)
+    ]
+    # Link the agents in a different order than they were created.
+    ingestion = Event.objects.create(file_uuid=sip_file, event_type="ingestion")
+    ingestion.agents.add(agents[2])
+    validation = Event.objects.create(file_uuid=sip_file, event_type="validation")
+    validation.agents.add(agents[1], agents[0])
+    scan = Event.objects.create(file_uuid=sip_file, event_type="virus check")
+    scan.agents.add(agents[2], agents[0])
+
+    def get_amdsec(state):
+        amdsec, _ = getAMDSec(
+            mcp_job,
+            sip_file.uuid,
+            "objects/file.mp3",
+            "original",
+            sip.uuid,
+            sip_file.transfer_id,
+            "",
+            None,
+            "",
+            state,
+        )
+        return etree.tostring(amdsec)
+
+    expected = get_amdsec(MetsState())
+
+    state = MetsState()
+    state.sip_file_data = SIPFileData(sip.uuid)
+    state.sip_file_data.load([sip_file.currentlocation])
+
+    assert state.sip_file_data.get_file_agents(sip_file.uuid) == list(
+        Agent.objects.filter(event__file_uuid_id=str(sip_file.uuid))
+        .distinct()
+        .order_by("pk")
+    )
+    assert get_amdsec(state) == expected
+    assert etree.fromstring(expected).xpath(
+        "//premis:agentIdentifierValue/text()", namespaces=NSMAP
+    )[-3:] == ["agent 0", "agent 1", "agent 2"]
@@ -1,4 +1,5 @@
 import pathlib
+import threading
 from unittest import mock
 
 import extract_contents
@@ -463,3 +464,80 @@ def test_job_uses_replacement_keys_in_bash_command(
         printing=True,
         capture_output=True,
     )
+
+
+@pytest.mark.django_db
+@mock.patch("extract_contents.executeOrRun")
+def test_job_extracts_packages_concurrently_and_registers_them_in_order(
+    execute_or_run,
+    transfer,
+    transfer_directory_path,
+    task,
+    format_version,
+    fpcommand,
+    fprule_extraction,
+):
+    packages = []
+    for name in ("a.zip", "b.zip", "c.zip"):
+        location = f"%transferDirectory%objects/{name}".encode()
+        package = models.File.objects.create(
+            transfer=transfer, originallocation=location, currentlocation=location
+        )
+        models.FileFormatVersion.objects.create(
+            file_uuid=package, format_version=format_version
+        )
+        (transfer_directory_path / "objects").mkdir(exist_ok=True)
+        (transfer_directory_path / "objects" / name).touch()
+        packages.append(package)
+
+    # Every extraction waits for the others, so the job only completes if
+    # they run at the same time.
+    barrier = threading.Barrier(len(packages), timeout=10)
+
+    def execute_or_run_side_effect(*args, **kwargs):
+        extraction_path = pathlib.Path(kwargs["arguments"][1])
+        extraction_path.mkdir()
+        (extraction_path / "contents.txt").touch()
+        barrier.wait()
+
+        return (0, "", "")
+
+    execute_or_run.side_effect = execute_or_run_side_effect
+
+    date = "2024-08-01"
+    job = mock.Mock(spec=Job)
+
+    assert (
+        extract_contents.main(
+            job,
+            str(transfer.uuid),
+            f"{transfer_directory_path}/",
+            date,
+            str(task.taskuuid),
+            max_workers=len(packages),
+        )
+        == 0
+    )
+    assert execute_or_run.call_count == len(packages)
+
+    extracted_files = models.File.objects.filter(transfer=transfer).exclude(
+        uuid__in=[package.uuid for package in packages]
+    )
+    assert sorted(f.currentlocation.decode() for f in extracted_files) == [
+        f"{package.currentlocation.decode()}-{date}/contents.txt"
+        for package in packages
+    ]
+    assert models.Event.objects.filter(
+        file_uuid__in=extracted_files, event_type="unpacking"
+    ).count() == len(packages)
+
+    # The results are reported in the order the extractions were started,
+    # i.e. the order of the files of the transfer.
+    extracted_messages = [
+        c.args[1]
+        for c in job.pyprint.mock_calls
+        if c.args[:1] == ("Extracted contents from",)
+    ]
+    assert extracted_messages == [
+        pathlib.Path(c.kwargs["arguments"][0]).name for c in execute_or_run.mock_calls
+    ]
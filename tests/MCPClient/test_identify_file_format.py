@@ -1,8 +1,11 @@
+import base64
 import pathlib
+from typing import Generator
 from unittest import mock
 
 import identify_file_format
 import pytest
+import pytest_django
 from client.job import Job
 from fpr import models as fprmodels
 from main import models
@@ -360,3 +363,72 @@ def test_job_falls_back_to_identification_rule_if_format_version_does_not_exist(
         ).count()
         == 1
     )
+
+
+@pytest.fixture
+def siegfried_server(
+    settings: pytest_django.fixtures.SettingsWrapper, idcommand: fprmodels.IDCommand
+) -> Generator[mock.Mock, None, None]:
+    settings.SIEGFRIED_SERVER = "localhost:5138"
+    idcommand.tool.description = "Siegfried"
+    idcommand.tool.save()
+
+    with mock.patch("identify_file_format.requests.Session") as session:
+        yield session.return_value
+
+
+@pytest.mark.django_db
+@mock.patch("identify_file_format.executeOrRun")
+def test_job_identifies_file_format_using_siegfried_server(
+    execute_or_run: mock.Mock,
+    siegfried_server: mock.Mock,
+    job: mock.Mock,
+    sip_file: models.File,
+    sip_file_path: pathlib.Path,
+    format_version: fprmodels.FormatVersion,
+) -> None:
+    command_output = "fmt/111"
+    siegfried_server.get.return_value.json.return_value = {
+        "files": [{"matches": [{"ns": "pronom", "id": command_output}]}]
+    }
+
+    fprmodels.FormatVersion.objects.filter(pronom_id=command_output).delete()
+    format_version.pronom_id = command_output
+    format_version.save()
+
+    identify_file_format.call([job])
+
+    job.set_status.assert_called_once_with(identify_file_format.SUCCESS)
+    execute_or_run.assert_not_called()
+    siegfried_server.get.assert_called_once_with(
+        "http://localhost:5138/identify/"
+        + base64.urlsafe_b64encode(str(sip_file_path).encode()).decode(),
+        params={"base64": "true", "format": "json"},
+        timeout=300,
+    )
+    assert (
+        models.FileFormatVersion.objects.filter(
+            file_uuid=sip_file, format_version=format_version
+        ).count()
+        == 1
+    )
+    siegfried_server.close.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_job_fails_if_siegfried_server_cannot_identify_file_format(
+    siegfried_server: mock.Mock,
+    job: mock.Mock,
+    idcommand: fprmodels.IDCommand,
+) -> None:
+    siegfried_server.get.return_value.json.return_value = {
+        "files": [{"matches": [{"ns": "pronom", "id": "UNKNOWN"}]}]
+    }
+
+    identify_file_format.call([job])
+
+    job.set_status.assert_called_once_with(identify_file_format.ERROR)
+    assert job.print_error.mock_calls == [
+        mock.call(f"Error: IDCommand with UUID {idcommand.uuid} exited non-zero."),
+        mock.call("Error: siegfried determined that the file format is UNKNOWN"),
+    ]
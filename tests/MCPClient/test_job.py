@@ -1,7 +1,12 @@
 import os
+from unittest import mock
 from uuid import uuid4
 
+import pytest
 from client.job import Job
+from client.job import truncate_output
+from django.utils import timezone
+from main.models import Task
 
 THIS_DIR = os.path.dirname(os.path.realpath(__file__))
 
@@ -28,3 +33,53 @@ def test_job_encoding():
     assert stderr == expected_stderr
     assert isinstance(job.error, str)
     assert isinstance(stderr, str)
+
+
+@pytest.mark.django_db
+def test_bulk_update_task_status(settings, job):
+    settings.CAPTURE_CLIENT_SCRIPT_OUTPUT = True
+    settings.CLIENT_SCRIPT_OUTPUT_MAX_SIZE = 0
+    jobs = []
+    for exit_code in (0, 1, None):
+        task = Task.objects.create(job=job, createdtime=timezone.now())
+        client_job = Job(name="somejob", uuid=str(task.taskuuid), arguments=[])
+        client_job.set_status(exit_code)
+        client_job.pyprint(TEXT)
+        client_job.print_error(f"exit code {exit_code}")
+        jobs.append(client_job)
+
+    with mock.patch("client.job.TASK_UPDATE_BATCH_SIZE", 2):
+        rows_per_statement = Job.bulk_update_task_status(jobs)
+
+    assert rows_per_statement == [2, 1]
+    for client_job in jobs:
+        task = Task.objects.get(taskuuid=client_job.uuid)
+        assert task.exitcode == client_job.get_exit_code()
+        assert task.endtime == client_job.end_time
+        assert task.stdout == f"{TEXT}\n"
+        assert task.stderror == client_job.get_stderr()
+    assert [client_job.get_exit_code() for client_job in jobs] == [0, 1, 0]
+
+
+@pytest.mark.django_db
+def test_bulk_update_task_status_truncates_output(settings, job):
+    settings.CAPTURE_CLIENT_SCRIPT_OUTPUT = True
+    settings.CLIENT_SCRIPT_OUTPUT_MAX_SIZE = 10
+    task = Task.objects.create(job=job, createdtime=timezone.now())
+    client_job = Job(name="somejob", uuid=str(task.taskuuid), arguments=[])
+    client_job.write_output("a" * 10 + "b" * 10 + "c" * 10)
+
+    Job.bulk_update_task_status([client_job])
+
+    task.refresh_from_db()
+    assert task.stdout == "aaaaa\n[... 20 bytes truncated ...]\nccccc"
+    assert client_job.get_stdout() == "a" * 10 + "b" * 10 + "c" * 10
+
+
+def test_truncate_output_keeps_multibyte_characters_whole():
+    assert truncate_output(TEXT * 4, 0) == TEXT * 4
+    assert truncate_output(TEXT, 100) == TEXT
+
+    result = truncate_output(TEXT * 4, 8)
+
+    assert result == "‘\n[... 42 bytes truncated ...]\n‘"
@@ -7,6 +7,7 @@ from typing import Sequence
 from typing import Tuple
 from unittest import mock
 
+import databaseFunctions
 import normalize
 import pytest
 import pytest_django
@@ -216,6 +217,34 @@ def test_manual_normalization_creates_event_and_derivation(
     )
 
 
+@pytest.mark.django_db
+def test_derivation_event_is_queued_with_its_derivation(
+    sip_file: models.File, manual_preservation_file: models.File
+) -> None:
+    events = databaseFunctions.EventBatch()
+
+    normalize.insert_derivation_event(
+        original_uuid=str(sip_file.uuid),
+        output_uuid=str(manual_preservation_file.uuid),
+        derivation_uuid=str(uuid.uuid4()),
+        event_detail_output="manual normalization",
+        outcome_detail_note=None,
+        events=events,
+    )
+
+    # Both the event and the derivation wait for the batch to be flushed.
+    assert len(events) == 2
+    assert not models.Derivation.objects.exists()
+
+    events.flush()
+
+    derivation = models.Derivation.objects.get(
+        source_file=sip_file, derived_file=manual_preservation_file
+    )
+    assert derivation.event.event_type == "normalization"
+    assert derivation.event.file_uuid == sip_file
+
+
 @pytest.fixture
 def invalid_normalization_csv(normalization_csv: pathlib.Path) -> pathlib.Path:
     normalization_csv.write_text(
@@ -1,6 +1,8 @@
+import datetime
 import os
 import shutil
 import tempfile
+from unittest import mock
 
 import store_file_modification_dates
 from django.test import TestCase
@@ -27,14 +29,7 @@ class TestStoreFileModification(TestCase):
         )
         shutil.rmtree(transfer_path)
 
-    @override_settings(TIME_ZONE="US/Eastern")
-    def test_store_file_modification_dates(self):
-        """Test store_file_modification_dates.
-
-        It should store file modification dates.
-        """
-
-        # Create files
+    def _create_files(self):
         transfer = models.Transfer.objects.get(uuid=self.transfer_uuid)
         transfer_path = transfer.currentlocation.replace(
             "%sharedPath%", self.temp_dir + "/"
@@ -52,6 +47,16 @@ class TestStoreFileModification(TestCase):
                 f.write(path.encode("utf8"))
             os.utime(path, (1049597970, 1049597970))
 
+    @override_settings(TIME_ZONE="US/Eastern")
+    def test_store_file_modification_dates(self):
+        """Test store_file_modification_dates.
+
+        It should store file modification dates.
+        """
+
+        # Create files
+        self._create_files()
+
         # Store file modification dates
         store_file_modification_dates.main(
             self.transfer_uuid, self.temp_dir + "/", get_current_timezone()
@@ -91,3 +96,22 @@ class TestStoreFileModification(TestCase):
             )
             == expected_time
         )
+
+    def test_store_file_modification_dates_in_bulk(self):
+        """The dates of all the files are stored with a single update."""
+        self._create_files()
+
+        # The dates are read from the scan of the transfer directory.
+        with self.assertNumQueries(3), mock.patch.object(
+            store_file_modification_dates, "get_modification_date"
+        ) as get_modification_date:
+            store_file_modification_dates.main(
+                self.transfer_uuid, self.temp_dir + "/", get_current_timezone()
+            )
+        get_modification_date.assert_not_called()
+
+        assert set(
+            models.File.objects.filter(transfer_id=self.transfer_uuid).values_list(
+                "modificationtime", flat=True
+            )
+        ) == {datetime.datetime(2003, 4, 6, 2, 59, 30, tzinfo=datetime.timezone.utc)}
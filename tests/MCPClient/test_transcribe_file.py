@@ -181,7 +181,7 @@ def test_fetch_rules_for_derivatives(
         file_=derivation.source_file
     )
 
-    assert list(rules_of_derived_file.values_list("purpose")) == [("transcription",)]
+    assert [rule.purpose for rule in rules_of_derived_file] == ["transcription"]
 
     assert (
         models.Derivation.objects.filter(
@@ -1,4 +1,6 @@
+import concurrent.futures
 import math
+import threading
 import uuid
 from unittest import mock
 
@@ -7,6 +9,8 @@ import pytest
 from server.jobs import Job
 from server.tasks import GearmanTaskBackend
 from server.tasks import Task
+from server.tasks import get_task_backend
+from server.tasks.backends.gearman_backend import GearmanDispatcher
 
 
 class MockJob(Job):
@@ -34,6 +38,22 @@ def simple_task(request):
     )
 
 
+@pytest.fixture
+def dispatcher(request):
+    """Dispatcher returning futures resolved by the test."""
+    dispatcher = mock.Mock(spec=GearmanDispatcher)
+    dispatcher.futures = []
+
+    def submit_job(**kwargs):
+        future = concurrent.futures.Future()
+        dispatcher.futures.append(future)
+        return future
+
+    dispatcher.submit_job.side_effect = submit_job
+
+    return dispatcher
+
+
 def format_gearman_request(tasks):
     request = {"tasks": {}}
     for task in tasks:
@@ -58,16 +78,25 @@ def format_gearman_response(task_results):
     return response
 
 
-@mock.patch("server.tasks.backends.gearman_backend.MCPGearmanClient")
+def completed_request(state=gearman.JOB_COMPLETE, result=None):
+    job_request = gearman.job.GearmanJobRequest(
+        mock.Mock(), background=False, max_attempts=0
+    )
+    job_request.state = state
+    job_request.result = result
+
+    return job_request
+
+
 @mock.patch("server.tasks.GearmanTaskBackend.TASK_BATCH_SIZE", 1)
 @mock.patch("server.tasks.backends.gearman_backend.Task.bulk_log")
-def test_gearman_task_submission(bulk_log, mock_client, simple_job, simple_task):
-    backend = GearmanTaskBackend()
+def test_gearman_task_submission(bulk_log, dispatcher, simple_job, simple_task):
+    backend = GearmanTaskBackend(dispatcher=dispatcher)
     backend.submit_task(simple_job, simple_task)
 
     task_data = format_gearman_request([simple_task])
 
-    submit_job_kwargs = mock_client.return_value.submit_job.call_args[1]
+    submit_job_kwargs = dispatcher.submit_job.call_args[1]
 
     assert submit_job_kwargs["task"] == simple_job.name.encode()
     assert submit_job_kwargs["data"] == task_data
@@ -75,51 +104,41 @@ def test_gearman_task_submission(bulk_log, mock_client, simple_job, simple_task)
         uuid.UUID(submit_job_kwargs["unique"].decode())
     except ValueError:
         pytest.fail("Expected unique to be a valid UUID.")
-    assert submit_job_kwargs["wait_until_complete"] is False
-    assert submit_job_kwargs["background"] is False
     assert submit_job_kwargs["max_retries"] == GearmanTaskBackend.MAX_RETRIES
 
 
-@mock.patch("server.tasks.backends.gearman_backend.MCPGearmanClient")
 @mock.patch("server.tasks.backends.gearman_backend.Task.bulk_log")
-def test_gearman_task_result_success(bulk_log, mock_client, simple_job, simple_task):
-    backend = GearmanTaskBackend()
-
-    mock_gearman_job = mock.Mock()
-    job_request = gearman.job.GearmanJobRequest(
-        mock_gearman_job, background=True, max_attempts=0
-    )
+def test_gearman_task_result_success(bulk_log, dispatcher, simple_job, simple_task):
+    backend = GearmanTaskBackend(dispatcher=dispatcher)
 
-    def mock_jobs_completed(*args):
-        job_request.state = gearman.JOB_COMPLETE
-        job_request.result = format_gearman_response(
-            [
-                (
-                    simple_task.uuid,
-                    {
-                        "exitCode": 0,
-                        "stdout": "stdout example",
-                        "stderr": "stderr example",
-                    },
-                )
-            ]
+    backend.submit_task(simple_job, simple_task)
+    results_future = backend.get_results_future(simple_job)
+
+    dispatcher.submit_job.assert_called_once()
+    assert not results_future.done()
+
+    dispatcher.futures[0].set_result(
+        completed_request(
+            result=format_gearman_response(
+                [
+                    (
+                        simple_task.uuid,
+                        {
+                            "exitCode": 0,
+                            "stdout": "stdout example",
+                            "stderr": "stderr example",
+                        },
+                    )
+                ]
+            )
         )
-
-        return [job_request]
-
-    mock_client.return_value.submit_job.return_value = job_request
-    mock_client.return_value.wait_until_any_job_completed.side_effect = (
-        mock_jobs_completed
     )
 
-    backend.submit_task(simple_job, simple_task)
+    assert results_future.done()
     results = list(backend.wait_for_results(simple_job))
 
     assert len(results) == 1
 
-    mock_client.return_value.submit_job.assert_called_once()
-    mock_client.return_value.wait_until_any_job_completed.assert_called_once()
-
     task_result = results[0]
     assert task_result.exit_code == 0
     assert task_result.stdout == "stdout example"
@@ -127,48 +146,52 @@ def test_gearman_task_result_success(bulk_log, mock_client, simple_job, simple_t
     assert task_result.done is True
 
 
-@mock.patch("server.tasks.backends.gearman_backend.MCPGearmanClient")
+@pytest.mark.parametrize(
+    "result",
+    (
+        completed_request(state=gearman.JOB_FAILED),
+        ConnectionError("Lost connection to Gearman"),
+    ),
+    ids=["failed", "lost"],
+)
 @mock.patch("server.tasks.backends.gearman_backend.Task.bulk_log")
-def test_gearman_task_result_error(bulk_log, mock_client, simple_job, simple_task):
-    backend = GearmanTaskBackend()
-
-    mock_gearman_job = mock.Mock()
-    job_request = gearman.job.GearmanJobRequest(
-        mock_gearman_job, background=True, max_attempts=0
-    )
-
-    def mock_jobs_completed(*args):
-        job_request.state = gearman.JOB_FAILED
-        job_request.exception = Exception("Error!")
-
-        return [job_request]
-
-    mock_client.return_value.submit_job.return_value = job_request
-    mock_client.return_value.wait_until_any_job_completed.side_effect = (
-        mock_jobs_completed
-    )
+def test_gearman_task_result_error(
+    bulk_log, dispatcher, simple_job, simple_task, result
+):
+    backend = GearmanTaskBackend(dispatcher=dispatcher)
 
     backend.submit_task(simple_job, simple_task)
+    backend.get_results_future(simple_job)
+    if isinstance(result, Exception):
+        dispatcher.futures[0].set_exception(result)
+    else:
+        dispatcher.futures[0].set_result(result)
+
     results = list(backend.wait_for_results(simple_job))
 
     assert len(results) == 1
 
-    mock_client.return_value.submit_job.assert_called_once()
-    mock_client.return_value.wait_until_any_job_completed.assert_called_once()
+    dispatcher.submit_job.assert_called_once()
 
     task_result = results[0]
     assert task_result.exit_code == 1
     assert task_result.done is True
 
 
+def test_gearman_results_future_without_tasks(dispatcher, simple_job):
+    backend = GearmanTaskBackend(dispatcher=dispatcher)
+
+    assert backend.get_results_future(simple_job).done()
+    assert list(backend.wait_for_results(simple_job)) == []
+
+
 @pytest.mark.parametrize(
     "reverse_result_order", (False, True), ids=["regular", "reversed"]
 )
-@mock.patch("server.tasks.backends.gearman_backend.MCPGearmanClient")
 @mock.patch.object(GearmanTaskBackend, "TASK_BATCH_SIZE", 2)
 @mock.patch("server.tasks.backends.gearman_backend.Task.bulk_log")
 def test_gearman_multiple_batches(
-    bulk_log, mock_client, simple_job, simple_task, reverse_result_order
+    bulk_log, dispatcher, simple_job, simple_task, reverse_result_order
 ):
     tasks = []
     for i in range(5):
@@ -181,29 +204,26 @@ def test_gearman_multiple_batches(
         )
         tasks.append(task)
 
-    backend = GearmanTaskBackend()
+    backend = GearmanTaskBackend(dispatcher=dispatcher)
 
-    job_requests = []
-    for _ in range(3):
-        mock_gearman_job = mock.Mock()
-        job_request = gearman.job.GearmanJobRequest(
-            mock_gearman_job, background=True, max_attempts=0
-        )
-        job_requests.append(job_request)
-
-    def mock_get_job_statuses(*args):
-        """Complete one batch per call, either in regular or reverse order."""
-        status_requests = list(job_requests)
-        if reverse_result_order:
-            status_requests = reversed(status_requests)
-            task_batches = [tasks[4:], tasks[2:4], tasks[:2]]
-        else:
-            task_batches = [tasks[:2], tasks[2:4], tasks[4:]]
-
-        for index, job_request in enumerate(status_requests):
-            if job_request.state != gearman.JOB_COMPLETE:
-                job_request.state = gearman.JOB_COMPLETE
-                job_request.result = format_gearman_response(
+    for task in tasks:
+        backend.submit_task(simple_job, task)
+    results_future = backend.get_results_future(simple_job)
+
+    expected_batch_count = int(math.ceil(5 / backend.TASK_BATCH_SIZE))
+    assert dispatcher.submit_job.call_count == expected_batch_count
+
+    task_batches = [tasks[:2], tasks[2:4], tasks[4:]]
+    batch_futures = list(dispatcher.futures)
+    if reverse_result_order:
+        task_batches.reverse()
+        batch_futures.reverse()
+
+    def complete_batch(index):
+        """Complete one batch, either in regular or reverse order."""
+        batch_futures[index].set_result(
+            completed_request(
+                result=format_gearman_response(
                     [
                         (
                             task.uuid,
@@ -216,25 +236,139 @@ def test_gearman_multiple_batches(
                         for task in task_batches[index]
                     ]
                 )
-                break
+            )
+        )
+
+    # Results are yielded as soon as their batch is complete.
+    results = []
+    results_iter = backend.wait_for_results(simple_job)
+    for index, batch in enumerate(task_batches):
+        assert not results_future.done()
+        complete_batch(index)
+        results.extend(next(results_iter) for _ in batch)
+    assert list(results_iter) == []
+
+    assert results_future.done()
+    assert results == task_batches[0] + task_batches[1] + task_batches[2]
+
+
+def test_gearman_dispatcher_resolves_completed_jobs():
+    client = mock.Mock(done_requests=[], request_to_rotating_connection_queue={})
+    requests = [completed_request(state=gearman.JOB_CREATED) for _ in range(2)]
+    client.submit_job.side_effect = requests
 
-        return job_requests
+    def poll_connections_until_stopped(connections, continue_fn, timeout=None):
+        # The second job is completed while the first one is still running.
+        requests[1].state = gearman.JOB_COMPLETE
+        client.request_done(requests[1])
 
-    mock_client.return_value.submit_job.side_effect = job_requests
-    mock_client.return_value.wait_until_any_job_completed.side_effect = (
-        mock_get_job_statuses
+    client.poll_connections_until_stopped.side_effect = poll_connections_until_stopped
+    client.request_done.side_effect = client.done_requests.append
+
+    dispatcher = GearmanDispatcher(client=client)
+    futures = [dispatcher.submit_job(task=b"test", data={}) for _ in requests]
+
+    try:
+        assert futures[1].result(timeout=5) is requests[1]
+        assert not futures[0].done()
+
+        requests[0].state = gearman.JOB_UNKNOWN
+        client.request_done(requests[0])
+        with pytest.raises(ConnectionError):
+            futures[0].result(timeout=5)
+    finally:
+        dispatcher.stop()
+
+    assert client.submit_job.call_args[1] == {
+        "task": b"test",
+        "data": {},
+        "wait_until_complete": False,
+        "background": False,
+        "poll_timeout": GearmanDispatcher.SUBMIT_TIMEOUT,
+    }
+
+
+def test_gearman_dispatcher_fails_jobs_not_accepted_in_time():
+    client = mock.Mock(done_requests=[], request_to_rotating_connection_queue={})
+    requests = [completed_request(state=gearman.JOB_PENDING) for _ in range(2)]
+    requests[0].timed_out = True
+    requests[1].timed_out = False
+    client.submit_job.side_effect = requests
+
+    dispatcher = GearmanDispatcher(client=client)
+    futures = [dispatcher.submit_job(task=b"test", data={}) for _ in requests]
+
+    try:
+        with pytest.raises(TimeoutError):
+            futures[0].result(timeout=5)
+        # The other jobs are still submitted.
+        requests[1].state = gearman.JOB_COMPLETE
+        client.done_requests.append(requests[1])
+        assert futures[1].result(timeout=5) is requests[1]
+    finally:
+        dispatcher.stop()
+
+
+def test_gearman_dispatcher_fails_jobs_on_poll_errors():
+    client = mock.Mock(done_requests=[], request_to_rotating_connection_queue={})
+    client.submit_job.return_value = completed_request(state=gearman.JOB_CREATED)
+    client.poll_connections_until_stopped.side_effect = (
+        gearman.errors.ServerUnavailable("Found no valid connections")
     )
 
-    for task in tasks:
-        backend.submit_task(simple_job, task)
-    results = list(backend.wait_for_results(simple_job))
+    dispatcher = GearmanDispatcher(client=client)
+    future = dispatcher.submit_job(task=b"test", data={})
+
+    try:
+        with pytest.raises(gearman.errors.ServerUnavailable):
+            future.result(timeout=5)
+    finally:
+        dispatcher.stop()
+
+
+def test_gearman_dispatcher_stops_while_idle():
+    client = mock.Mock(done_requests=[], request_to_rotating_connection_queue={})
+    dispatcher = GearmanDispatcher(client=client)
+    dispatcher.IDLE_TIMEOUT = 60
+
+    dispatcher.start()
+    dispatcher.stop(timeout=5)
+
+    assert not dispatcher._thread.is_alive()
+
+
+@mock.patch("server.tasks.backends.gearman_backend.get_dispatcher")
+def test_task_backend_is_shared_by_threads(get_dispatcher):
+    backends = []
+    thread = threading.Thread(target=lambda: backends.append(get_task_backend()))
+    thread.start()
+    thread.join()
+
+    assert backends == [get_task_backend()]
 
-    expected_batch_count = int(math.ceil(5 / backend.TASK_BATCH_SIZE))
-    expected_first_result = tasks[-1] if reverse_result_order else tasks[0]
 
-    assert len(results) == 5
-    assert results[0] is expected_first_result
-    assert mock_client.return_value.submit_job.call_count == expected_batch_count
-    assert mock_client.return_value.wait_until_any_job_completed.call_count == len(
-        job_requests
+@mock.patch("server.tasks.backends.gearman_backend.Task.bulk_log")
+def test_gearman_backend_collects_results_from_another_thread(
+    bulk_log, dispatcher, simple_job, simple_task
+):
+    backend = GearmanTaskBackend(dispatcher=dispatcher)
+    backend.submit_task(simple_job, simple_task)
+    results_future = backend.get_results_future(simple_job)
+
+    dispatcher.futures[0].set_result(
+        completed_request(
+            result=format_gearman_response([(simple_task.uuid, {"exitCode": 0})])
+        )
+    )
+    assert results_future.done()
+
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.extend(backend.wait_for_results(simple_job))
     )
+    thread.start()
+    thread.join()
+
+    assert results == [simple_task]
+    assert backend.pending_gearman_jobs == {}
+    assert backend.current_task_batches == {}
@@ -1,3 +1,4 @@
+import os
 import uuid
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
@@ -13,6 +14,7 @@ from server.packages import Transfer
 from server.packages import _determine_transfer_paths
 from server.packages import _move_to_internal_shared_dir
 from server.packages import _pad_destination_filepath_if_it_already_exists
+from server.packages import _scan_files
 from server.packages import create_package
 from server.queues import PackageQueue
 from server.workflow import Workflow
@@ -427,3 +429,88 @@ def test_create_package(tmp_path, admin_user, settings):
 
     # Verify a transfer was added.
     assert models.Transfer.objects.count() == 1
+
+
+@mock.patch("server.packages.invalidate_preconfigured_choices")
+def test_moving_a_package_invalidates_its_preconfigured_choices(
+    invalidate_preconfigured_choices, tmp_path
+):
+    old_path = f"{tmp_path}/old/"
+    transfer = Transfer(old_path, uuid.uuid4())
+
+    transfer.current_path = old_path
+    invalidate_preconfigured_choices.assert_not_called()
+
+    transfer.current_path = f"{tmp_path}/new/"
+    invalidate_preconfigured_choices.assert_called_once_with(old_path)
+
+
+def test_scan_files_lists_files_like_os_walk(tmp_path):
+    for path in ("a/b/c.txt", "a/d.txt", "e/f.txt", "g.txt"):
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).touch()
+    (tmp_path / "linked_dir").symlink_to(tmp_path / "a")
+    (tmp_path / "broken_link").symlink_to(tmp_path / "missing")
+
+    batches = list(_scan_files(str(tmp_path)))
+
+    assert [[path for path, _ in files] for files in batches] == [
+        [os.path.join(root, name) for name in names]
+        for root, _, names in os.walk(tmp_path)
+        if names
+    ]
+    assert {path for files in batches for path, exists in files if not exists} == {
+        str(tmp_path / "broken_link")
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+def test_package_files_joins_database_rows_and_disk_files(tmp_path):
+    transfer_uuid = uuid.uuid4()
+    transfer_path = tmp_path / f"test-transfer-{transfer_uuid}"
+    transfer = Transfer.get_or_create_from_db_by_path(f"{transfer_path}/")
+    (transfer_path / "objects").mkdir(parents=True)
+    (transfer_path / "objects" / "file.txt").touch()
+    (transfer_path / "objects" / "new_file.txt").touch()
+    file_ = models.File.objects.create(
+        uuid=uuid.uuid4(),
+        originallocation=b"%transferDirectory%objects/file.txt",
+        currentlocation=b"%transferDirectory%objects/file.txt",
+        filegrpuse="original",
+        transfer_id=transfer.uuid,
+    )
+    models.File.objects.create(
+        uuid=uuid.uuid4(),
+        originallocation=b"%transferDirectory%objects/deleted.txt",
+        currentlocation=b"%transferDirectory%objects/deleted.txt",
+        filegrpuse="original",
+        transfer_id=transfer.uuid,
+    )
+
+    result = list(transfer.files())
+
+    assert [(item["%fileUUID%"], item["%relativeLocation%"]) for item in result] == [
+        (str(file_.uuid), str(transfer_path / "objects" / "file.txt")),
+        ("None", str(transfer_path / "objects" / "new_file.txt")),
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_package_files_are_yielded_while_walking_the_directory(tmp_path):
+    transfer_uuid = uuid.uuid4()
+    transfer_path = tmp_path / f"test-transfer-{transfer_uuid}"
+    transfer = Transfer.get_or_create_from_db_by_path(f"{transfer_path}/")
+    for directory in ("", "a", "b"):
+        (transfer_path / directory).mkdir(exist_ok=True)
+        (transfer_path / directory / "file.txt").touch()
+
+    with mock.patch("os.scandir", side_effect=os.scandir) as scandir:
+        files = transfer.files()
+        first = next(files)
+
+        assert scandir.call_count == 1
+        assert first["%relativeLocation%"] == str(transfer_path / "file.txt")
+        assert sorted(item["%relativeLocation%"] for item in files) == [
+            str(transfer_path / "a" / "file.txt"),
+            str(transfer_path / "b" / "file.txt"),
+        ]
@@ -4,10 +4,12 @@ from unittest import mock
 
 import pytest
 from server.processing_config import ChainChoicesField
+from server.processing_config import ProcessingConfigCache
 from server.processing_config import ReplaceDictField
 from server.processing_config import SharedChainChoicesField
 from server.processing_config import StorageLocationField
 from server.processing_config import get_processing_fields
+from server.processing_config import load_processing_xml
 from server.processing_config import processing_configuration_file_exists
 from server.processing_config import processing_fields
 from server.workflow import load
@@ -421,3 +423,78 @@ def test_processing_configuration_file_exists_with_nonexistent_file(isfile, logg
     logger.debug.assert_called_once_with(
         "Processing configuration file for %s does not exist", "bogus.xml"
     )
+
+
+PROCESSING_CONFIG = """<processingMCP>
+  <preconfiguredChoices>
+    <preconfiguredChoice>
+      <appliesTo>de6eb412-0029-4dbd-9bfa-7311697d6012</appliesTo>
+      <goToChain>{}</goToChain>
+    </preconfiguredChoice>
+  </preconfiguredChoices>
+</processingMCP>
+"""
+
+
+@pytest.fixture
+def processing_config_path(settings, tmp_path):
+    settings.PROCESSING_XML_FILE = "processingMCP.xml"
+    path = tmp_path / settings.PROCESSING_XML_FILE
+    path.write_text(PROCESSING_CONFIG.format("51e395b9-1b74-419c-b013-3283b7fe39ff"))
+    return path
+
+
+def test_processing_config_cache_parses_each_file_once(processing_config_path):
+    cache = ProcessingConfigCache()
+    package_path = str(processing_config_path.parent)
+
+    with mock.patch(
+        "server.processing_config.load_processing_xml",
+        side_effect=load_processing_xml,
+    ) as load:
+        assert cache.get_choices(package_path) == {
+            "de6eb412-0029-4dbd-9bfa-7311697d6012": "51e395b9-1b74-419c-b013-3283b7fe39ff"
+        }
+        cache.get_choices(package_path)
+
+    load.assert_called_once_with(package_path)
+
+
+def test_processing_config_cache_reloads_modified_files(processing_config_path):
+    cache = ProcessingConfigCache()
+    package_path = str(processing_config_path.parent)
+    cache.get_choices(package_path)
+
+    processing_config_path.write_text(PROCESSING_CONFIG.format("changed"))
+    os.utime(processing_config_path, ns=(0, 0))
+
+    assert cache.get_choices(package_path) == {
+        "de6eb412-0029-4dbd-9bfa-7311697d6012": "changed"
+    }
+
+    processing_config_path.unlink()
+
+    assert cache.get_choices(package_path) == {}
+
+
+def test_processing_config_cache_evicts_least_recently_used_entries(
+    processing_config_path, tmp_path
+):
+    cache = ProcessingConfigCache(max_size=1)
+    package_path = str(processing_config_path.parent)
+    other_package_path = tmp_path / "other"
+    other_package_path.mkdir()
+    (other_package_path / "processingMCP.xml").write_text(
+        PROCESSING_CONFIG.format("other")
+    )
+    cache.get_choices(package_path)
+
+    cache.get_choices(str(other_package_path))
+
+    with mock.patch(
+        "server.processing_config.load_processing_xml",
+        side_effect=load_processing_xml,
+    ) as load:
+        cache.get_choices(package_path)
+
+    load.assert_called_once_with(package_path)
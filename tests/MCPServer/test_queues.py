@@ -6,6 +6,7 @@ import uuid
 from unittest import mock
 
 import pytest
+from server.jobs import ClientScriptJob
 from server.jobs import DecisionJob
 from server.jobs import Job
 from server.packages import DIP
@@ -65,6 +66,28 @@ class MockDecisionJob(DecisionJob):
         pass
 
 
+class MockClientScriptJob(ClientScriptJob):
+    """Mock Job waiting for the results of its tasks without a thread."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.results_collected = threading.Event()
+        self.next_job = None
+
+    def run(self, *args, **kwargs):
+        self.results_future = concurrent.futures.Future()
+
+        return self
+
+    def collect_results(self):
+        self.results_future = None
+        self.results_collected.set()
+        self.next_job = MockJob(self.job_chain, self.link, self.package)
+
+        return self.next_job
+
+
 @pytest.fixture(scope="module")
 def simple_executor(request):
     return concurrent.futures.ThreadPoolExecutor(max_workers=1)
@@ -276,7 +299,7 @@ def test_all_scheduled_jobs_are_processed(
 
     # Mark the link as terminal to ensure that new jobs are enqueued.
     # It causes the queue manager to hit the database.
-    workflow_link._src["end"] = True
+    workflow_link.end = True
 
     test_job1 = MockJob(mock.Mock(), workflow_link, dip_1)
     test_job2 = MockJob(mock.Mock(), workflow_link, dip_2)
@@ -304,3 +327,25 @@ def test_all_scheduled_jobs_are_processed(
     assert test_job2.job_ran.is_set()
     assert package_queue.job_queue.qsize() == 0
     assert package_queue.dip_queue.qsize() == 0
+
+
+def test_client_script_job_results_are_collected_when_ready(
+    package_queue, transfer, workflow_link
+):
+    test_job = MockClientScriptJob(mock.Mock(), workflow_link, transfer)
+    package_queue.schedule_job(test_job)
+
+    _process_one_job(package_queue)
+
+    # The job doesn't hold a worker thread while its tasks run.
+    assert test_job.awaiting_results
+    assert not test_job.results_collected.is_set()
+    assert package_queue.job_queue.qsize() == 0
+
+    test_job.results_future.set_result(None)
+    test_job.results_collected.wait(1.0)
+    time.sleep(0.05)
+
+    assert test_job.results_collected.is_set()
+    assert package_queue.job_queue.qsize() == 1
+    assert package_queue.job_queue.get_nowait() is test_job.next_job
@@ -7,6 +7,7 @@ import pytest
 from django.utils import timezone
 from main import models
 from server import rpc_server
+from server import unit_changes
 from server import workflow
 
 ASSETS_DIR = (
@@ -14,6 +15,12 @@ ASSETS_DIR = (
 )
 
 
+@pytest.fixture
+def wf():
+    with open(ASSETS_DIR / "workflow.json") as fp:
+        return workflow.load(fp)
+
+
 @pytest.mark.django_db
 def test_approve_partial_reingest_handler():
     sip = models.SIP.objects.create(uuid=str(uuid.uuid4()))
@@ -33,3 +40,142 @@ def test_approve_partial_reingest_handler():
     server._approve_partial_reingest_handler(None, wf, {"sip_uuid": sip.pk})
 
     package_queue.decide.assert_called_once()
+
+
+@pytest.mark.django_db
+@mock.patch("server.rpc_server.changes", unit_changes.UnitChangeLog())
+def test_units_statuses_handler(wf):
+    change_log = rpc_server.changes
+    link = next(iter(wf.get_links().values()))
+    transfers = [
+        models.Transfer.objects.create(
+            uuid=str(uuid.uuid4()), status=models.PACKAGE_STATUS_PROCESSING
+        )
+        for _ in range(2)
+    ]
+    hidden_transfer = models.Transfer.objects.create(
+        uuid=str(uuid.uuid4()), hidden=True
+    )
+    for transfer in transfers + [hidden_transfer]:
+        for _ in range(2):
+            models.Job.objects.create(
+                sipuuid=transfer.pk,
+                unittype="unitTransfer",
+                directory=f"%sharedPath%currentlyProcessing/transfer-{transfer.pk}/",
+                microservicechainlink=link.id,
+                createdtime=timezone.now(),
+                currentstep=models.Job.STATUS_COMPLETED_SUCCESSFULLY,
+            )
+    server = rpc_server.RPCServer(wf, threading.Event(), mock.MagicMock(), None)
+    payload = {"type": "Transfer", "lang": "en"}
+
+    result = server._units_statuses_handler(None, None, payload)
+
+    assert result["full"]
+    assert {unit["uuid"] for unit in result["objects"]} == {
+        str(transfer.pk) for transfer in transfers
+    }
+    unit = result["objects"][0]
+    assert unit["active"]
+    assert unit["directory"] == "transfer"
+    assert len(unit["jobs"]) == 2
+    assert unit["jobs"][0]["link_id"] == str(link.id)
+
+    # Only the units changed since the previous request are returned.
+    change_log.record(transfers[1].pk)
+    result = server._units_statuses_handler(
+        None, None, {**payload, "since": result["timestamp"]}
+    )
+
+    assert not result["full"]
+    assert [unit["uuid"] for unit in result["objects"]] == [str(transfers[1].pk)]
+
+    result = server._units_statuses_handler(
+        None, None, {**payload, "since": result["timestamp"]}
+    )
+
+    assert not result["full"]
+    assert result["objects"] == []
+
+
+def test_unit_change_log():
+    now = [100.0]
+    change_log = unit_changes.UnitChangeLog(clock=lambda: now[0])
+    unit_ids = [uuid.uuid4() for _ in range(3)]
+
+    for unit_id in unit_ids:
+        now[0] += 1
+        change_log.record(unit_id)
+    now[0] += 1
+    change_log.record(unit_ids[0])
+
+    assert change_log.changed_since(None) is None
+    assert change_log.changed_since(99.0) is None
+    assert change_log.changed_since(100.0) == [
+        str(unit_ids[0]),
+        str(unit_ids[2]),
+        str(unit_ids[1]),
+    ]
+    assert change_log.changed_since(103.0) == [str(unit_ids[0]), str(unit_ids[2])]
+    assert change_log.changed_since(105.0) == []
+
+
+@pytest.mark.django_db
+def test_units_statuses_handler_embeds_access_system_id(wf):
+    link = next(iter(wf.get_links().values()))
+    transfer = models.Transfer.objects.create(
+        uuid=str(uuid.uuid4()), access_system_id="system-id"
+    )
+    sip = models.SIP.objects.create(uuid=str(uuid.uuid4()))
+    models.File.objects.create(transfer=transfer, sip=sip)
+    models.Job.objects.create(
+        sipuuid=sip.pk,
+        unittype="unitSIP",
+        microservicechainlink=link.id,
+        createdtime=timezone.now(),
+    )
+    server = rpc_server.RPCServer(wf, threading.Event(), mock.MagicMock(), None)
+
+    result = server._units_statuses_handler(None, None, {"type": "SIP", "lang": "en"})
+
+    assert len(result["objects"]) == 1
+    assert result["objects"][0]["access_system_id"] == "system-id"
+    assert str(result["objects"][0]["directory"]) == str(sip.pk)
+
+
+def test_unit_change_log_events():
+    change_log = unit_changes.UnitChangeLog(max_events=3)
+    unit_id = uuid.uuid4()
+
+    events, cursor, reset = change_log.events_since(None)
+    assert (events, reset) == ([], False)
+
+    change_log.record(unit_id, unit_type="SIP", status=1)
+    events, cursor, reset = change_log.events_since(cursor)
+
+    assert not reset
+    assert [
+        (event["unit"], event["unit_type"], event["status"]) for event in events
+    ] == [(str(unit_id), "SIP", 1)]
+    assert change_log.events_since(cursor) == ([], cursor, False)
+
+    # Readers falling behind the buffer or coming from another process
+    # are told to reload everything.
+    for _ in range(4):
+        change_log.record(unit_id)
+    events, new_cursor, reset = change_log.events_since(cursor)
+    assert reset
+    assert len(events) == 3
+    assert change_log.events_since("another-process:1") == ([], new_cursor, True)
+
+
+def test_units_events_handler(wf):
+    server = rpc_server.RPCServer(wf, threading.Event(), mock.MagicMock(), None)
+    result = server._units_events_handler(None, None, {})
+    unit_id = uuid.uuid4()
+
+    rpc_server.changes.record(unit_id, unit_type="Transfer")
+    result = server._units_events_handler(None, None, {"cursor": result["cursor"]})
+
+    assert not result["reset"]
+    assert [event["unit"] for event in result["events"]] == [str(unit_id)]
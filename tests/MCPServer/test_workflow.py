@@ -59,14 +59,14 @@ def test_load_valid_document(path):
     assert isinstance(first_chain.link, workflow.Link)
     assert isinstance(first_chain.link, workflow.BaseLink)
     assert isinstance(first_chain["description"], workflow.TranslationLabel)
-    assert first_chain["description"]._src == first_chain._src["description"]._src
+    assert first_chain["description"] is first_chain.description
 
     links = wf.get_links()
     assert len(links) > 0
     first_link = next(iter(links.values()))
     assert repr(first_link) == f"Link <{first_link.id}>"
     assert isinstance(first_link, workflow.Link)
-    assert first_link.config == first_link._src["config"]
+    assert first_link.config == first_link["config"]
 
     wdirs = wf.get_wdirs()
     assert len(wdirs) > 0
@@ -94,7 +94,7 @@ def test_load_valid_document(path):
     # Test get_label method in LinkBase.
     assert (
         first_link.get_label("description")
-        == first_link._src["description"][translation.FALLBACK_LANG]
+        == first_link.description[translation.FALLBACK_LANG]
     )
     assert first_link.get_label("foobar") is None
 
@@ -109,6 +109,88 @@ def test_link_browse_methods():
     assert ln.get_status_id(code="1") == workflow._STATUSES["Failed"]
 
 
+def test_link_without_next_link():
+    with open(os.path.join(FIXTURES_DIR, "workflow-sample.json")) as fp:
+        wf = workflow.load(fp)
+    ln = wf.get_link("03df8d8c-34d3-4924-86d4-f4e706c1522b")
+    with pytest.raises(KeyError):
+        ln.get_next_link(code=0)
+    assert ln.get_status_id(code=0) == workflow._STATUSES["Completed successfully"]
+    assert ln.get_status_id(code=1) == workflow._STATUSES["Failed"]
+    assert ln.exit_codes == {
+        "0": {"job_status": workflow._STATUSES["Completed successfully"]}
+    }
+
+
+def test_load_shares_translations():
+    with open(os.path.join(ASSETS_DIR, "workflow.json")) as fp:
+        wf = workflow.load(fp)
+
+    groups = {}
+    for link in wf.get_links().values():
+        assert not hasattr(link, "__dict__")
+        group = groups.setdefault(repr(link["group"]), link["group"])
+        assert link["group"] is group
+
+
+def test_load_uses_snapshot(tmp_path):
+    path = os.path.join(ASSETS_DIR, "workflow.json")
+    with open(path, "rb") as fp:
+        wf = workflow.load(fp, cache_dir=str(tmp_path))
+    assert len(list(tmp_path.glob("workflow-*.marshal"))) == 1
+
+    with open(path, "rb") as fp, mock.patch("server.workflow._validate") as validate:
+        cached_wf = workflow.load(fp, cache_dir=str(tmp_path))
+
+    validate.assert_not_called()
+    assert str(cached_wf) == str(wf)
+    assert cached_wf.get_links().keys() == wf.get_links().keys()
+
+
+def test_load_ignores_broken_snapshot(tmp_path):
+    path = os.path.join(FIXTURES_DIR, "workflow-sample.json")
+    with open(path, "rb") as fp:
+        workflow.load(fp, cache_dir=str(tmp_path))
+    (snapshot,) = tmp_path.glob("workflow-*.marshal")
+    snapshot.write_bytes(b"broken")
+
+    with open(path, "rb") as fp:
+        wf = workflow.load(fp, cache_dir=str(tmp_path))
+
+    assert len(wf.get_links()) == 1
+
+
+def test_load_ignores_snapshots_writable_by_others(tmp_path):
+    path = os.path.join(FIXTURES_DIR, "workflow-sample.json")
+    with open(path, "rb") as fp:
+        workflow.load(fp, cache_dir=str(tmp_path))
+    tmp_path.chmod(0o770)
+
+    with open(path, "rb") as fp, mock.patch("server.workflow._validate") as validate:
+        workflow.load(fp, cache_dir=str(tmp_path))
+
+    validate.assert_called_once()
+
+
+def test_load_removes_partial_snapshots(tmp_path):
+    path = os.path.join(FIXTURES_DIR, "workflow-sample.json")
+    with open(path, "rb") as fp, mock.patch(
+        "marshal.dump", side_effect=ValueError("unmarshallable object")
+    ):
+        wf = workflow.load(fp, cache_dir=str(tmp_path))
+
+    assert len(wf.get_links()) == 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_load_validates_changed_documents(tmp_path):
+    with open(os.path.join(FIXTURES_DIR, "workflow-sample.json"), "rb") as fp:
+        workflow.load(fp, cache_dir=str(tmp_path))
+
+    with pytest.raises(workflow.SchemaValidationError):
+        workflow.load(StringIO("""{}"""), cache_dir=str(tmp_path))
+
+
 def test_get_schema():
     schema = workflow._get_schema()
     assert schema["$id"] == "https://www.archivematica.org/labs/workflow/schema/v1.json"
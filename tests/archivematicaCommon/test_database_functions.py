@@ -4,6 +4,7 @@ import uuid
 import databaseFunctions
 import pytest
 from django.test import TestCase
+from main.models import Derivation
 from main.models import Event
 from main.models import File
 
@@ -122,6 +123,20 @@ class TestDatabaseFunctions(TestCase):
         )
         assert 2 in agents  # organization
 
+    # getAMAgentsForUnit
+    def test_get_agents_for_unit(self):
+        assert sorted(
+            databaseFunctions.getAMAgentsForUnit(
+                sipUUID="742b0443-cf18-442a-94f9-6d5b4948227d"
+            )
+        ) == [2, 5]
+        assert sorted(
+            databaseFunctions.getAMAgentsForUnit(
+                transferUUID="11449c3c-a31d-4663-8a01-10d1c705410f"
+            )
+        ) == [2, 10]
+        assert databaseFunctions.getAMAgentsForUnit() == [2]
+
     # insertIntoEvents
 
     def test_insert_into_events(self):
@@ -152,3 +167,69 @@ class TestDatabaseFunctions(TestCase):
         ).agents
         assert agents.get(id=2)
         assert agents.get(id=5)
+
+    # EventBatch
+    def test_event_batch_fetches_agents_once_per_unit(self):
+        file_uuids = [
+            "88c8f115-80bc-4da4-a1e6-0158f5df13b9",  # SIP with agent 5
+            "dc569efe-c88f-4be3-94d3-d9eac0c5d410",  # Another SIP with agent 5
+            "1f4af873-8d60-4907-a92e-d1889e643524",  # Transfer with agent 10
+        ]
+
+        # A savepoint, one file lookup, two agent lookups per unit and the
+        # inserts of the events and their agents.
+        with self.assertNumQueries(11):
+            with databaseFunctions.EventBatch() as events:
+                for file_uuid in file_uuids:
+                    events.add(fileUUID=file_uuid, eventType="virus check")
+                events.add(fileUUID=file_uuids[0], agents=[10])
+
+        agents = {
+            str(event.file_uuid_id): sorted(event.agents.values_list("pk", flat=True))
+            for event in Event.objects.filter(event_type="virus check")
+        }
+        assert agents == {
+            file_uuids[0]: [2, 5],
+            file_uuids[1]: [2, 5],
+            file_uuids[2]: [2, 10],
+        }
+        assert list(
+            Event.objects.get(
+                file_uuid=file_uuids[0], event_type=""
+            ).agents.values_list("pk", flat=True)
+        ) == [10]
+
+    def test_event_batch_inserts_derivations_after_events(self):
+        source_uuid = "88c8f115-80bc-4da4-a1e6-0158f5df13b9"
+        derived_uuid = "dc569efe-c88f-4be3-94d3-d9eac0c5d410"
+        batch = databaseFunctions.EventBatch(batch_size=3)
+        event = batch.add(fileUUID=source_uuid, eventType="normalization", agents=[5])
+        batch.add_derivation(
+            sourceFileUUID=source_uuid,
+            derivedFileUUID=derived_uuid,
+            relatedEventUUID=event.event_id,
+        )
+        assert len(batch) == 2
+        assert not Derivation.objects.filter(event_id=event.event_id).exists()
+
+        batch.add_derivation(sourceFileUUID=source_uuid, derivedFileUUID=derived_uuid)
+
+        assert len(batch) == 0
+        assert (
+            Derivation.objects.get(event_id=event.event_id).event.event_type
+            == "normalization"
+        )
+        assert Derivation.objects.filter(source_file_id=source_uuid).count() == 2
+
+    def test_event_batch_inserts_events_when_full(self):
+        batch = databaseFunctions.EventBatch(batch_size=2)
+        batch.add(fileUUID="88c8f115-80bc-4da4-a1e6-0158f5df13b9")
+        assert len(batch) == 1
+        batch.add(fileUUID="88c8f115-80bc-4da4-a1e6-0158f5df13b9")
+        assert len(batch) == 0
+        assert (
+            Event.objects.filter(
+                file_uuid="88c8f115-80bc-4da4-a1e6-0158f5df13b9"
+            ).count()
+            == 2
+        )
@@ -1,17 +1,24 @@
 import datetime
 import os
 import pathlib
+import threading
 import uuid
 from unittest import mock
 
+import elasticsearch
 import elasticSearchFunctions
+import namespaces as ns
 import pytest
 from components import helpers
 from django.utils.timezone import make_aware
+from fpr.models import Format
+from fpr.models import FormatGroup
+from fpr.models import FormatVersion
 from lxml import etree
 from main.models import SIP
 from main.models import Directory
 from main.models import File
+from main.models import FileFormatVersion
 from main.models import Identifier
 from main.models import Transfer
 
@@ -330,6 +337,217 @@ def test_set_tags_fails_when_file_cant_be_found(perform_request, es_client):
     )
 
 
+def _search_response(*hits):
+    return {
+        "took": 1,
+        "timed_out": False,
+        "_shards": {"total": 5, "successful": 5, "skipped": 0, "failed": 0},
+        "hits": {"total": len(hits), "max_score": None, "hits": list(hits)},
+    }
+
+
+@mock.patch("elasticSearchFunctions.bulk")
+@mock.patch(
+    "elasticSearchFunctions.scan",
+    side_effect=[
+        iter(
+            [
+                {"_id": "aip-1", "_source": {"uuid": "aip-uuid-1"}},
+                {"_id": "aip-2", "_source": {"uuid": "aip-uuid-2"}},
+            ]
+        ),
+        (
+            {"_id": f"file-{i}", "_source": {"AIPUUID": f"aip-uuid-{i % 2 + 1}"}}
+            for i in range(20000)
+        ),
+    ],
+)
+def test_update_aips_status_streams_every_file(scan, bulk, es_client):
+    actions = []
+    bulk.side_effect = lambda client, items: actions.extend(items)
+
+    elasticSearchFunctions.update_aips_status(
+        es_client, {"aip-uuid-1": "DEL_REQ", "aip-uuid-2": "UPLOADED"}
+    )
+
+    assert scan.call_args_list == [
+        mock.call(
+            es_client,
+            query={
+                "query": {"terms": {"uuid": ["aip-uuid-1", "aip-uuid-2"]}},
+                "_source": ["uuid"],
+            },
+            index="aips",
+        ),
+        mock.call(
+            es_client,
+            query={
+                "query": {"terms": {"AIPUUID": ["aip-uuid-1", "aip-uuid-2"]}},
+                "_source": ["AIPUUID"],
+            },
+            index="aipfiles",
+        ),
+    ]
+    bulk.assert_called_once()
+    assert len(actions) == 20002
+    assert actions[:3] + actions[-1:] == [
+        {
+            "_op_type": "update",
+            "_index": index,
+            "_type": elasticSearchFunctions.DOC_TYPE,
+            "_id": document_id,
+            "doc": {"status": status},
+        }
+        for index, document_id, status in [
+            ("aips", "aip-1", "DEL_REQ"),
+            ("aips", "aip-2", "UPLOADED"),
+            ("aipfiles", "file-0", "DEL_REQ"),
+            ("aipfiles", "file-19999", "UPLOADED"),
+        ]
+    ]
+
+
+@mock.patch(
+    "elasticsearch.transport.Transport.perform_request",
+    return_value=_search_response(
+        {"_id": "aip-1", "_source": {"uuid": "aip-uuid-1", "name": "AIP 1"}},
+        {"_id": "aip-2", "_source": {"uuid": "aip-uuid-2", "name": "AIP 2"}},
+    ),
+)
+def test_get_aips_data(perform_request, es_client):
+    result = elasticSearchFunctions.get_aips_data(
+        es_client, ["aip-uuid-1", "aip-uuid-2", "aip-uuid-1", "aip-uuid-3"], "name"
+    )
+
+    assert {uuid: aip["_id"] for uuid, aip in result.items()} == {
+        "aip-uuid-1": "aip-1",
+        "aip-uuid-2": "aip-2",
+    }
+    perform_request.assert_called_once_with(
+        "GET",
+        "/aips/_search",
+        params={"_source": b"uuid,name", "size": "3"},
+        body={"query": {"terms": {"uuid": ["aip-uuid-1", "aip-uuid-2", "aip-uuid-3"]}}},
+    )
+
+
+@mock.patch(
+    "elasticsearch.transport.Transport.perform_request",
+    side_effect=[
+        _search_response(
+            {"_id": "1", "_source": {}, "sort": ["a"]},
+            {"_id": "2", "_source": {}, "sort": ["b"]},
+        ),
+        _search_response(),
+    ],
+)
+def test_iter_search_pages(perform_request, es_client):
+    pages = elasticSearchFunctions.iter_search_pages(
+        es_client,
+        "aips",
+        {"query": {"match_all": {}}},
+        [{"uuid": "asc"}],
+        page_size=2,
+    )
+
+    assert [[hit["_id"] for hit in hits] for hits in pages] == [["1", "2"]]
+    assert perform_request.call_args_list == [
+        mock.call(
+            "GET",
+            "/aips/_search",
+            params={"size": "2"},
+            body={"query": {"match_all": {}}, "sort": [{"uuid": "asc"}]},
+        ),
+        mock.call(
+            "GET",
+            "/aips/_search",
+            params={"size": "2"},
+            body={
+                "query": {"match_all": {}},
+                "sort": [{"uuid": "asc"}],
+                "search_after": ["b"],
+            },
+        ),
+    ]
+
+
+def _aggregation_response(*keys, after_key=None):
+    values = {"buckets": [{"key": {"AIPUUID": key}, "doc_count": 1} for key in keys]}
+    if after_key is not None:
+        values["after_key"] = {"AIPUUID": after_key}
+    return dict(_search_response(), aggregations={"values": values})
+
+
+@mock.patch(
+    "elasticsearch.transport.Transport.perform_request",
+    side_effect=[
+        _aggregation_response("a", "b", after_key="b"),
+        _aggregation_response("c", after_key="c"),
+    ],
+)
+def test_iter_aggregation_pages(perform_request, es_client):
+    pages = elasticSearchFunctions.iter_aggregation_pages(
+        es_client, "aipfiles", {"query": {"match_all": {}}}, "AIPUUID", page_size=2
+    )
+
+    assert [[bucket["key"]["AIPUUID"] for bucket in buckets] for buckets in pages] == [
+        ["a", "b"],
+        ["c"],
+    ]
+    composite = {"size": 2, "sources": [{"AIPUUID": {"terms": {"field": "AIPUUID"}}}]}
+    assert perform_request.call_args_list == [
+        mock.call(
+            "GET",
+            "/aipfiles/_search",
+            params={},
+            body={
+                "query": {"match_all": {}},
+                "size": 0,
+                "aggs": {"values": {"composite": composite}},
+            },
+        ),
+        mock.call(
+            "GET",
+            "/aipfiles/_search",
+            params={},
+            body={
+                "query": {"match_all": {}},
+                "size": 0,
+                "aggs": {
+                    "values": {"composite": dict(composite, after={"AIPUUID": "b"})}
+                },
+            },
+        ),
+    ]
+
+
+@mock.patch("elasticsearch.transport.Transport.perform_request")
+def test_remove_backlog_transfers(perform_request, es_client):
+    elasticSearchFunctions.remove_backlog_transfers(es_client, ["transfer-uuid"])
+
+    assert perform_request.call_args_list == [
+        mock.call(
+            "POST",
+            "/transfers/_delete_by_query",
+            params={},
+            body={"query": {"terms": {"uuid": ["transfer-uuid"]}}},
+        ),
+        mock.call(
+            "POST",
+            "/transferfiles/_delete_by_query",
+            params={},
+            body={"query": {"terms": {"sipuuid": ["transfer-uuid"]}}},
+        ),
+    ]
+
+
+@mock.patch("elasticsearch.transport.Transport.perform_request")
+def test_remove_backlog_transfers_without_transfers(perform_request, es_client):
+    elasticSearchFunctions.remove_backlog_transfers(es_client, set())
+
+    perform_request.assert_not_called()
+
+
 @pytest.mark.django_db
 @mock.patch("elasticSearchFunctions.get_dashboard_uuid")
 @mock.patch("elasticSearchFunctions.bulk")
@@ -897,6 +1115,28 @@ def test_get_metadata(
     )
 
 
+def test_mets_index_matches_xpath_lookups():
+    doc = etree.parse(
+        os.path.join(THIS_DIR, "fixtures", "test_index_metadata-METS.xml")
+    )
+    root = doc.getroot()
+
+    mets_index = elasticSearchFunctions.METSIndex(doc)
+
+    assert mets_index.file_pointer_divisions
+    for file_id, division in mets_index.file_pointer_divisions.items():
+        assert division is ns.xml_find_premis(
+            root,
+            f"mets:structMap[@TYPE='physical']//mets:fptr[@FILEID='{file_id}']/..",
+        )
+    assert mets_index.amd_secs
+    for amd_sec_id, amd_sec in mets_index.amd_secs.items():
+        assert amd_sec is ns.xml_find_premis(root, f"mets:amdSec[@ID='{amd_sec_id}']")
+    assert mets_index.dmd_secs
+    for dmd_sec_id, dmd_sec in mets_index.dmd_secs.items():
+        assert dmd_sec is ns.xml_find_premis(root, f"mets:dmdSec[@ID='{dmd_sec_id}']")
+
+
 def test_index_aip_and_files_logs_error_if_mets_does_not_exist(
     es_client, tmp_path, caplog
 ):
@@ -1047,12 +1287,22 @@ def transfer_file(transfer):
 
 
 @pytest.mark.django_db
+@mock.patch("elasticSearchFunctions.bulk")
 @mock.patch("elasticsearch.Elasticsearch.index")
 @mock.patch(
     "elasticsearch.client.cluster.ClusterClient.health",
     return_value={"status": "green"},
 )
-def test_index_transfer_and_files(health, index, es_client, transfer, transfer_file):
+def test_index_transfer_and_files(
+    health, index, bulk, es_client, transfer, transfer_file
+):
+    indexed_files = []
+
+    def _bulk(client, actions, *args, **kwargs):
+        indexed_files.extend(actions)
+        return len(indexed_files), []
+
+    bulk.side_effect = _bulk
     dashboard_uuid = uuid.uuid4()
     helpers.set_setting("dashboard_uuid", str(dashboard_uuid))
     printfn = mock.Mock()
@@ -1072,9 +1322,20 @@ def test_index_transfer_and_files(health, index, es_client, transfer, transfer_f
     assert result == 0
 
     assert health.mock_calls == [mock.call(), mock.call()]
-    assert index.mock_calls == [
-        mock.call(
-            body={
+    bulk.assert_called_once_with(
+        es_client,
+        mock.ANY,
+        chunk_size=1,
+        max_retries=elasticSearchFunctions.BULK_MAX_RETRIES,
+        initial_backoff=elasticSearchFunctions.BULK_INITIAL_BACKOFF,
+        max_backoff=elasticSearchFunctions.BULK_MAX_BACKOFF,
+    )
+    assert indexed_files == [
+        {
+            "_op_type": "index",
+            "_index": "transferfiles",
+            "_type": "_doc",
+            "_source": {
                 "filename": expected_file_name,
                 "relative_path": f"{expected_transfer_name}/{expected_file_name}",
                 "fileuuid": str(transfer_file.uuid),
@@ -1092,9 +1353,9 @@ def test_index_transfer_and_files(health, index, es_client, transfer, transfer_f
                 "format": [],
                 "pending_deletion": False,
             },
-            index="transferfiles",
-            doc_type="_doc",
-        ),
+        }
+    ]
+    assert index.mock_calls == [
         mock.call(
             body={
                 "accessionid": transfer.accessionid,
@@ -1128,6 +1389,103 @@ def test_index_transfer_and_files(health, index, es_client, transfer, transfer_f
     )
 
 
+@pytest.mark.django_db
+@mock.patch("elasticSearchFunctions.bulk")
+@mock.patch(
+    "elasticsearch.client.cluster.ClusterClient.health",
+    return_value={"status": "green"},
+)
+def test_index_transfer_files_in_parallel(
+    health, bulk, es_client, transfer, transfer_file
+):
+    format_version = FormatVersion.objects.create(
+        format=Format.objects.create(
+            description="Text", group=FormatGroup.objects.create(description="Text")
+        ),
+        description="Plain Text",
+        pronom_id="x-fmt/111",
+    )
+    FileFormatVersion.objects.create(
+        file_uuid=transfer_file, format_version=format_version
+    )
+    for i in range(4):
+        (pathlib.Path(transfer.currentlocation) / f"other_{i}.txt").touch()
+    indexed_files = []
+    bulk_threads = set()
+
+    def _bulk(client, actions, *args, **kwargs):
+        bulk_threads.add(threading.get_ident())
+        indexed_files.extend(action["_source"] for action in actions)
+        return len(actions), []
+
+    bulk.side_effect = _bulk
+    print_threads = set()
+    printfn = mock.Mock(
+        side_effect=lambda *args: print_threads.add(threading.get_ident())
+    )
+
+    result = elasticSearchFunctions._index_transfer_files(
+        es_client,
+        str(transfer.uuid),
+        transfer.currentlocation,
+        "transfer",
+        transfer.accessionid,
+        "2024-01-01",
+        printfn=printfn,
+        chunk_size=2,
+        thread_count=2,
+    )
+
+    assert result == 5
+    health.assert_called_once()
+    assert bulk.call_count == 3
+    assert threading.get_ident() not in bulk_threads
+    assert print_threads == {threading.get_ident()}
+    assert sorted(f["filename"] for f in indexed_files) == [
+        "file.txt",
+        "other_0.txt",
+        "other_1.txt",
+        "other_2.txt",
+        "other_3.txt",
+    ]
+    assert [(f["fileuuid"], f["format"]) for f in indexed_files if f["fileuuid"]] == [
+        (
+            str(transfer_file.uuid),
+            [{"puid": "x-fmt/111", "format": "Plain Text", "group": "Text"}],
+        )
+    ]
+
+
+@mock.patch("time.sleep")
+@mock.patch(
+    "elasticSearchFunctions.bulk",
+    side_effect=[
+        elasticsearch.ConnectionError("N/A", "Connection refused", None),
+        (2, []),
+    ],
+)
+def test_bulk_index_retries_when_the_cluster_cannot_be_reached(bulk, sleep, es_client):
+    actions = [{"_source": {}}, {"_source": {}}]
+
+    assert elasticSearchFunctions._bulk_index(es_client, actions) == 2
+
+    assert (
+        bulk.mock_calls
+        == [
+            mock.call(
+                es_client,
+                actions,
+                chunk_size=2,
+                max_retries=elasticSearchFunctions.BULK_MAX_RETRIES,
+                initial_backoff=elasticSearchFunctions.BULK_INITIAL_BACKOFF,
+                max_backoff=elasticSearchFunctions.BULK_MAX_BACKOFF,
+            )
+        ]
+        * 2
+    )
+    sleep.assert_called_once_with(elasticSearchFunctions.BULK_INITIAL_BACKOFF)
+
+
 @mock.patch(
     "elasticSearchFunctions.search_all_results",
     return_value={
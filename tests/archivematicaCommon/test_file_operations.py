@@ -3,11 +3,13 @@ from unittest import mock
 
 import pytest
 from django.db.models import Q
+from fileOperations import FileRegistry
 from fileOperations import FindFileInNormalizatonCSVError
 from fileOperations import addAccessionEvent
 from fileOperations import findFileInNormalizationCSV
 from fileOperations import get_extract_dir_name
 from main.models import SIP
+from main.models import Agent
 from main.models import Event
 from main.models import File
 from main.models import Transfer
@@ -266,3 +268,60 @@ def test_findFileInNormalizationCSV_fails_if_multiple_target_files_exist(
         f"More than one result found for {purpose} file ({target_file}) in DB.",
         file=mock.ANY,
     )
+
+
+@pytest.mark.django_db
+def test_file_registry_inserts_files_and_events_in_bulk(
+    tmp_path, django_assert_max_num_queries
+):
+    transfer = Transfer.objects.create(accessionid="my-id")
+    agent = Agent.objects.default_organization_agent()
+    contents = tmp_path / "file.txt"
+    contents.write_text("contents")
+
+    # Queries grow with the number of batches, not with the number of files.
+    with django_assert_max_num_queries(20):
+        with FileRegistry(transfer_uuid=transfer.uuid, batch_size=2) as registry:
+            for i in range(5):
+                registry.add(
+                    f"%transferDirectory%objects/file{i}.txt",
+                    source_type="unpacking",
+                    event_detail="Unpacked from: archive.zip",
+                    checksum_path=str(contents),
+                )
+
+    files = File.objects.filter(transfer=transfer)
+    assert files.count() == 5
+    assert {(f.size, f.checksumtype) for f in files} == {(8, "sha256")}
+    f = files.get(currentlocation=b"%transferDirectory%objects/file0.txt")
+    assert f.originallocation == f.currentlocation
+    assert sorted(
+        f.event_set.values_list("event_type", "event_detail", "event_outcome_detail")
+    ) == [
+        (
+            "message digest calculation",
+            'program="python"; module="hashlib.sha256()"',
+            f.checksum,
+        ),
+        ("registration", "", "accession#my-id"),
+        ("unpacking", "Unpacked from: archive.zip", ""),
+    ]
+    for event in Event.objects.filter(file_uuid__transfer=transfer):
+        assert list(event.agents.all()) == [agent]
+
+
+@pytest.mark.django_db
+def test_file_registry_discards_files_on_error():
+    sip = SIP.objects.create()
+
+    with pytest.raises(ValueError):
+        with FileRegistry(sip_uuid=sip.uuid) as registry:
+            registry.add("%SIPDirectory%objects/file.txt")
+            raise ValueError()
+
+    assert not File.objects.filter(sip=sip).exists()
+
+
+def test_file_registry_requires_a_single_unit():
+    with pytest.raises(ValueError):
+        FileRegistry()
@@ -0,0 +1,33 @@
+import hashlib
+from unittest import mock
+
+import fixity
+import pytest
+
+CONTENTS = b"Lorem ipsum"
+
+
+@pytest.fixture
+def file_path(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_bytes(CONTENTS)
+    return path
+
+
+def test_get_checksums_reads_the_file_once(file_path):
+    with mock.patch("fixity.open", side_effect=open) as open_:
+        result = fixity.get_checksums(file_path, ["md5", "sha256"])
+
+    assert result == {
+        "md5": hashlib.md5(CONTENTS).hexdigest(),
+        "sha256": hashlib.sha256(CONTENTS).hexdigest(),
+    }
+    open_.assert_called_once()
+
+
+def test_get_checksums_for_paths(tmp_path, file_path):
+    missing_file = tmp_path / "missing.txt"
+
+    result = fixity.get_checksums_for_paths([file_path, missing_file], ["sha512"])
+
+    assert result == {file_path: {"sha512": hashlib.sha512(CONTENTS).hexdigest()}}
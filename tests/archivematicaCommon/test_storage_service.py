@@ -7,11 +7,17 @@ import json
 from unittest import mock
 
 import pytest
+import storageService
 from requests import Response
 from storageService import location_description_from_slug
 from storageService import retrieve_storage_location_description
 
 
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    storageService.response_cache.clear()
+
+
 def mock_response(status_code, content_type, content):
     response = Response()
     response.status_code = status_code
@@ -92,3 +98,185 @@ def test_retrieve_storage_location(
     location_description_from_slug.return_value = return_value
     res = retrieve_storage_location_description(slug)
     assert res == expected_result
+
+
+@pytest.mark.django_db
+@mock.patch("storageService._storage_service_url", return_value="http://ss/api/v2/")
+@mock.patch("requests.Session.get")
+def test_get_packages_status_filters_packages_by_uuid(get, _storage_service_url):
+    get.return_value = mock_response(
+        200,
+        "application/json",
+        {
+            "meta": {"next": None},
+            "objects": [
+                {"uuid": "uuid-1", "status": "UPLOADED"},
+                {"uuid": "uuid-2", "status": "DEL_REQ"},
+            ],
+        },
+    )
+    cache = storageService.PackageStatusCache()
+
+    result = storageService.get_packages_status(
+        ["uuid-1", "uuid-2", "uuid-3"], cache=cache
+    )
+    assert storageService.get_packages_status(["uuid-2"], cache=cache) == {
+        "uuid-2": "DEL_REQ"
+    }
+
+    assert result == {"uuid-1": "UPLOADED", "uuid-2": "DEL_REQ"}
+    get.assert_called_once_with(
+        "http://ss/api/v2/file/",
+        params={"uuid__in": "uuid-1,uuid-2,uuid-3", "limit": 3},
+    )
+
+
+@pytest.mark.django_db
+@mock.patch("storageService._storage_service_url", return_value="http://ss/api/v2/")
+@mock.patch("requests.Session.get")
+def test_get_packages_status_falls_back_to_package_requests(get, _storage_service_url):
+    responses = {
+        "http://ss/api/v2/file/": mock_response(400, "application/json", {}),
+        "http://ss/api/v2/file/uuid-1/": mock_response(
+            200, "application/json", {"uuid": "uuid-1", "status": "DELETED"}
+        ),
+        "http://ss/api/v2/file/uuid-2/": mock_response(404, "application/json", {}),
+    }
+    get.side_effect = lambda url, **kwargs: responses[url]
+
+    result = storageService.get_packages_status(["uuid-1", "uuid-2"], cache=None)
+
+    assert result == {"uuid-1": "DELETED"}
+    assert get.call_count == 3
+
+
+@pytest.mark.django_db
+@mock.patch("storageService._storage_service_url", return_value="http://ss/api/v2/")
+@mock.patch("requests.Session.get")
+def test_get_packages_status_requests_packages_in_batches(
+    get, _storage_service_url, monkeypatch
+):
+    monkeypatch.setattr(storageService, "PACKAGE_STATUS_BATCH_SIZE", 2)
+    get.side_effect = lambda url, params: mock_response(
+        200,
+        "application/json",
+        {
+            "objects": [
+                {"uuid": uuid, "status": "UPLOADED"}
+                for uuid in params["uuid__in"].split(",")
+            ]
+        },
+    )
+
+    result = storageService.get_packages_status(["1", "2", "3"], cache=None)
+
+    assert result == {"1": "UPLOADED", "2": "UPLOADED", "3": "UPLOADED"}
+    assert [call.kwargs["params"]["uuid__in"] for call in get.call_args_list] == [
+        "1,2",
+        "3",
+    ]
+
+
+def test_package_status_cache_expires_statuses():
+    now = [0]
+    cache = storageService.PackageStatusCache(ttl=10, clock=lambda: now[0])
+    cache.set_many({"uuid-1": "UPLOADED"})
+
+    now[0] = 9
+    assert cache.get_many(["uuid-1", "uuid-2"]) == {"uuid-1": "UPLOADED"}
+
+    now[0] = 10
+    assert cache.get_many(["uuid-1"]) == {}
+
+
+@pytest.mark.django_db
+def test_response_cache_expires_entries():
+    now = [0]
+    cache = storageService.ResponseCache(ttl=60, clock=lambda: now[0])
+    fetch = mock.Mock(side_effect=[{"uuid": "1"}, {"uuid": "2"}])
+
+    first = cache.get_or_fetch("key", fetch)
+    first["uuid"] = "modified"
+    now[0] = 59
+    assert cache.get_or_fetch("key", fetch) == {"uuid": "1"}
+
+    now[0] = 60
+    assert cache.get_or_fetch("key", fetch) == {"uuid": "2"}
+    assert fetch.call_count == 2
+
+
+@pytest.mark.django_db
+def test_response_cache_evicts_least_recently_used_entries():
+    cache = storageService.ResponseCache(ttl=60, max_entries=2)
+    fetch = mock.Mock(side_effect=lambda: {"fetched": fetch.call_count})
+
+    cache.get_or_fetch("a", fetch)
+    cache.get_or_fetch("b", fetch)
+    cache.get_or_fetch("a", fetch)
+    cache.get_or_fetch("c", fetch)
+
+    assert cache.get_or_fetch("a", fetch) == {"fetched": 1}
+    assert cache.get_or_fetch("b", fetch) == {"fetched": 4}
+
+
+@pytest.mark.django_db
+def test_response_cache_does_not_cache_empty_values():
+    cache = storageService.ResponseCache(ttl=60)
+    fetch = mock.Mock(side_effect=[[], [{"uuid": "1"}]])
+
+    assert cache.get_or_fetch("key", fetch) == []
+    assert cache.get_or_fetch("key", fetch) == [{"uuid": "1"}]
+
+
+@pytest.mark.django_db
+@mock.patch("storageService._storage_service_url", return_value="http://ss/api/v2/")
+@mock.patch("requests.Session.get")
+def test_get_location_is_cached_until_invalidated(get, _storage_service_url):
+    get.side_effect = lambda url, **kwargs: mock_response(
+        200,
+        "application/json",
+        {"uuid": "pipeline-uuid"}
+        if "pipeline" in url
+        else {"meta": {"next": None}, "objects": [{"uuid": "location-uuid"}]},
+    )
+
+    assert storageService.get_location(purpose="CP") == [{"uuid": "location-uuid"}]
+    assert storageService.get_first_location(purpose="CP") == {"uuid": "location-uuid"}
+    assert get.call_count == 2
+
+    storageService.invalidate_cache()
+
+    assert storageService.get_location(purpose="CP") == [{"uuid": "location-uuid"}]
+    assert get.call_count == 4
+
+
+@pytest.mark.django_db
+def test_storage_api_session_is_reused_until_invalidated():
+    session = storageService._storage_api_session()
+
+    assert storageService._storage_api_session() is session
+    assert storageService._storage_api_slow_session() is not session
+
+    storageService.invalidate_cache()
+
+    assert storageService._storage_api_session() is not session
+
+
+@pytest.mark.django_db
+def test_revision_is_checked_once_per_interval():
+    now = [1000.0]
+    with mock.patch("time.monotonic", side_effect=lambda: now[0]), mock.patch(
+        "storageService.get_revision", return_value="revision"
+    ) as get_revision:
+        storageService.invalidate_cache()
+        now[0] += storageService.REVISION_CHECK_INTERVAL
+
+        storageService._storage_api_session()
+        storageService._storage_api_session()
+        storageService.response_cache.get_or_fetch("key", lambda: ["value"])
+        storageService.response_cache.get_or_fetch("key", lambda: ["value"])
+        assert get_revision.call_count == 1
+
+        now[0] += storageService.REVISION_CHECK_INTERVAL
+        storageService._storage_api_session()
+        assert get_revision.call_count == 2
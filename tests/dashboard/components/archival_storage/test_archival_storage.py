@@ -14,6 +14,7 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
+import csv
 import json
 import os
 import pathlib
@@ -22,11 +23,13 @@ from io import StringIO
 from unittest import mock
 from urllib.parse import urlencode
 
+import elasticSearchFunctions as es
 import metsrw
 import pytest
 from agentarchives.atom.client import CommunicationError
 from components import helpers
 from components.archival_storage import atom
+from components.archival_storage import views
 from django.http import HttpResponse
 from django.http import HttpResponseNotFound
 from django.http import StreamingHttpResponse
@@ -381,11 +384,11 @@ class TestArchivalStorageDataTableState(TestCase):
 
 @mock.patch("components.helpers.processing_config_path")
 @mock.patch("elasticSearchFunctions.get_client")
-@mock.patch("elasticSearchFunctions.get_aip_data")
+@mock.patch("elasticSearchFunctions.get_aips_data")
 @mock.patch("components.archival_storage.forms.get_atom_client")
 def test_view_aip_metadata_only_dip_upload_with_missing_description_slug(
     get_atom_client,
-    get_aip_data,
+    get_aips_data,
     get_client,
     processing_config_path,
     amsetup,
@@ -396,10 +399,12 @@ def test_view_aip_metadata_only_dip_upload_with_missing_description_slug(
     processing_config_path.return_value = str(processing_configurations_dir)
     sip_uuid = uuid.uuid4()
     file_path = tmpdir.mkdir("file")
-    get_aip_data.return_value = {
-        "_source": {
-            "name": f"transfer-{sip_uuid}",
-            "filePath": str(file_path),
+    get_aips_data.return_value = {
+        str(sip_uuid): {
+            "_source": {
+                "name": f"transfer-{sip_uuid}",
+                "filePath": str(file_path),
+            }
         }
     }
     get_atom_client.return_value = mock.Mock(
@@ -543,13 +548,15 @@ def processing_configurations_dir(tmp_path):
 
 @mock.patch("components.helpers.processing_config_path")
 @mock.patch(
-    "elasticSearchFunctions.get_aip_data",
-    return_value={"_source": {"name": "My AIP", "filePath": "path"}},
+    "elasticSearchFunctions.get_aips_data",
+    side_effect=lambda client, uuids, fields: {
+        uuid: {"_source": {"name": "My AIP", "filePath": "path"}} for uuid in uuids
+    },
 )
 @mock.patch("elasticSearchFunctions.get_client")
 def test_view_aip_reingest_form_displays_processing_configurations_choices(
     get_client,
-    get_aip_data,
+    get_aips_data,
     processing_config_path,
     amsetup,
     admin_client,
@@ -580,11 +587,16 @@ def test_view_aip_reingest_form_displays_processing_configurations_choices(
 )
 @mock.patch("components.helpers.processing_config_path")
 @mock.patch("storageService.request_reingest")
-@mock.patch("elasticSearchFunctions.get_aip_data")
+@mock.patch(
+    "elasticSearchFunctions.get_aips_data",
+    side_effect=lambda client, uuids, fields: {
+        uuid: {"_source": {"name": "My AIP", "filePath": "path"}} for uuid in uuids
+    },
+)
 @mock.patch("elasticSearchFunctions.get_client")
 def test_view_aip_reingest_form_submits_reingest(
     get_client,
-    get_aip_data,
+    get_aips_data,
     request_reingest,
     processing_config_path,
     error,
@@ -612,3 +624,189 @@ def test_view_aip_reingest_form_submits_reingest(
 
     request_reingest.assert_called_once_with(aip_uuid, reingest_type, processing_config)
     assert message in response.content.decode()
+
+
+@mock.patch("elasticSearchFunctions.delete_aips")
+@mock.patch("elasticSearchFunctions.update_aips_status")
+@mock.patch("elasticSearchFunctions.get_client")
+@mock.patch("storageService.get_packages_status")
+def test_search_augment_aip_results_syncs_statuses_in_bulk(
+    get_packages_status, get_client, update_aips_status, delete_aips
+):
+    get_packages_status.return_value = {
+        "uploaded": es.STATUS_UPLOADED,
+        "requested": es.STATUS_DELETE_REQUESTED,
+        "deleted": es.STATUS_DELETED,
+    }
+    raw_results = {
+        "hits": {
+            "hits": [
+                {"_source": {"uuid": "uploaded", "status": es.STATUS_UPLOADED}},
+                {"_source": {"uuid": "requested", "status": es.STATUS_UPLOADED}},
+                {"_source": {"uuid": "deleted", "status": es.STATUS_UPLOADED}},
+                {"_source": {"uuid": "unknown", "status": es.STATUS_UPLOADED}},
+                {"_source": {"uuid": "without-status"}},
+            ]
+        }
+    }
+
+    results = views.search_augment_aip_results(raw_results, {})
+
+    assert [result["uuid"] for result in results] == [
+        "uploaded",
+        "requested",
+        "unknown",
+        "without-status",
+    ]
+    assert list(get_packages_status.call_args.args[0]) == [
+        "uploaded",
+        "requested",
+        "deleted",
+        "unknown",
+    ]
+    update_aips_status.assert_called_once_with(
+        get_client.return_value, {"requested": es.STATUS_DELETE_REQUESTED}
+    )
+    delete_aips.assert_called_once_with(get_client.return_value, {"deleted"})
+
+
+@mock.patch("elasticSearchFunctions.get_aips_data")
+def test_search_augment_file_results_fetches_aips_at_once(get_aips_data):
+    get_aips_data.return_value = {
+        "aip-uuid": {
+            "_source": {"name": "My AIP", "filePath": "/var/AIPsStore/my-aip.7z"}
+        }
+    }
+    raw_results = {
+        "hits": {
+            "hits": [
+                {
+                    "_id": f"document-{index}",
+                    "_source": {
+                        "AIPUUID": aip_uuid,
+                        "FILEUUID": f"file-{index}",
+                        "filePath": f"objects/file-{index}.txt",
+                    },
+                }
+                for index, aip_uuid in enumerate(["aip-uuid", "aip-uuid", "missing"])
+            ]
+        }
+    }
+
+    results = views.search_augment_file_results(mock.sentinel.es_client, raw_results)
+
+    get_aips_data.assert_called_once_with(
+        mock.sentinel.es_client,
+        mock.ANY,
+        fields=views.AIPLookup.FIELDS,
+    )
+    assert sorted(get_aips_data.call_args.args[1]) == ["aip-uuid", "missing"]
+    assert [result["sipname"] for result in results] == ["My AIP", "My AIP", False]
+    assert results[0]["filename"] == "file-0.txt"
+
+
+@mock.patch("elasticSearchFunctions.get_aips_data")
+@mock.patch("elasticSearchFunctions.get_client")
+def test_search_as_csv_streams_every_file(get_client, get_aips_data, rf, monkeypatch):
+    monkeypatch.setattr(views, "CSV_EXPORT_PAGE_SIZE", 2)
+    get_aips_data.return_value = {
+        "aip-uuid": {"_source": {"name": "My AIP", "filePath": "my-aip.7z"}}
+    }
+
+    def file_hit(index):
+        return {
+            "_id": f"document-{index}",
+            "_source": {
+                "AIPUUID": "aip-uuid",
+                "FILEUUID": f"file-{index}",
+                "filePath": f"objects/file-{index}.txt",
+                "accessionid": "",
+            },
+            "sort": [f"file-{index}", "aip-uuid"],
+        }
+
+    search = get_client.return_value.search
+    search.side_effect = [
+        {"hits": {"hits": [file_hit(0), file_hit(1)]}},
+        {"hits": {"hits": [file_hit(2)]}},
+    ]
+    request = rf.get(
+        reverse("archival_storage:archival_storage_search"),
+        {"requestFile": "true", "mimeType": "text/csv", "file_mode": "true"},
+    )
+
+    response = views.search(request)
+    assert search.call_count == 0
+
+    content = b"".join(response.streaming_content).decode()
+    assert content.splitlines() == [
+        '"UUID","File path","AIP name","AIP UUID","Accession ID","Status"',
+        *(
+            f'"file-{index}","objects/file-{index}.txt","My AIP","aip-uuid","","Stored"'
+            for index in range(3)
+        ),
+    ]
+    assert search.call_count == 2
+    second_body = search.call_args_list[1].kwargs["body"]
+    assert second_body["sort"] == [{"FILEUUID": "asc"}, {"AIPUUID": "asc"}]
+    assert second_body["search_after"] == ["file-1", "aip-uuid"]
+
+
+@mock.patch(
+    "components.archival_storage.views.sync_es_aips_status_with_storage_service",
+    return_value=set(),
+)
+@mock.patch("elasticSearchFunctions.get_client")
+def test_search_as_csv_streams_every_aip(get_client, sync_status, rf, monkeypatch):
+    monkeypatch.setattr(views, "CSV_EXPORT_PAGE_SIZE", 2)
+
+    def aggregation(*uuids, after_key=None):
+        values = {
+            "buckets": [
+                {"key": {"AIPUUID": uuid}, "doc_count": index + 1}
+                for index, uuid in enumerate(uuids)
+            ]
+        }
+        if after_key:
+            values["after_key"] = {"AIPUUID": after_key}
+        return {"aggregations": {"values": values}}
+
+    def aip_hits(*uuids):
+        return {
+            "hits": {
+                "hits": [
+                    {"_source": {"uuid": uuid, "name": f"AIP {uuid}"}, "sort": [uuid]}
+                    for uuid in uuids
+                ]
+            }
+        }
+
+    search = get_client.return_value.search
+    search.side_effect = [
+        aggregation("aip-1", "aip-2", after_key="aip-2"),
+        aip_hits("aip-1", "aip-2"),
+        aip_hits(),
+        aggregation("aip-3", after_key="aip-3"),
+        aip_hits("aip-3"),
+    ]
+    request = rf.get(
+        reverse("archival_storage:archival_storage_search"),
+        {"requestFile": "true", "mimeType": "text/csv"},
+    )
+
+    response = views.search(request)
+    content = b"".join(response.streaming_content).decode()
+
+    rows = list(csv.DictReader(StringIO(content)))
+    assert [(row["UUID"], row["File count"]) for row in rows] == [
+        ("aip-1", "1"),
+        ("aip-2", "2"),
+        ("aip-3", "1"),
+    ]
+    # The AIPs of each page of UUIDs are fetched in turn.
+    assert search.call_args_list[1].kwargs["body"]["query"] == {
+        "terms": {"uuid": ["aip-1", "aip-2"]}
+    }
+    assert search.call_args_list[4].kwargs["body"]["query"] == {
+        "terms": {"uuid": ["aip-3"]}
+    }
@@ -3,6 +3,8 @@ from unittest import mock
 
 import pytest
 from components import helpers
+from components.unit import views
+from contrib.mcp import events
 from django.urls import reverse
 from django.utils import timezone
 from main import models
@@ -146,3 +148,63 @@ class TestMarkCompletedHiddenView:
 
         assert resp.status_code == 200
         assert resp.json() == {"removed": [str(transfer.pk)]}
+
+
+def test_status_events_view_streams_changes_of_the_grid_units(rf):
+    responses = iter(
+        [
+            {"events": [], "cursor": "1", "reset": False},
+            {
+                "events": [
+                    {"unit": "transfer-uuid", "unit_type": "Transfer"},
+                    {"unit": "sip-uuid", "unit_type": "SIP"},
+                ],
+                "cursor": "2",
+                "reset": False,
+            },
+        ]
+    )
+    buffer = events.StatusEventBuffer(
+        fetch_events=lambda cursor: next(
+            responses, {"events": [], "cursor": cursor, "reset": False}
+        ),
+        poll_interval=0.01,
+    )
+
+    with mock.patch("components.unit.views.status_events_buffer", buffer):
+        request = rf.get(
+            reverse("unit:status_events", kwargs={"unit_type": "transfer"})
+        )
+        response = views.status_events(request, "transfer")
+        stream = iter(response.streaming_content)
+
+        assert response["Content-Type"] == "text/event-stream"
+        assert next(stream) == b"retry: 3000\n\n"
+        assert (
+            next(stream)
+            == (
+                f"id: {buffer.epoch}:2\n"
+                "event: change\n"
+                'data: {"units": ["transfer-uuid"]}\n\n'
+            ).encode()
+        )
+
+
+def test_status_events_view_resets_unknown_cursors(rf):
+    buffer = events.StatusEventBuffer(
+        fetch_events=lambda cursor: {"events": [], "cursor": cursor, "reset": False}
+    )
+
+    with mock.patch("components.unit.views.status_events_buffer", buffer):
+        request = rf.get(
+            reverse("unit:status_events", kwargs={"unit_type": "ingest"}),
+            HTTP_LAST_EVENT_ID="unknown:1",
+        )
+        response = views.status_events(request, "ingest")
+        stream = iter(response.streaming_content)
+        next(stream)
+
+        assert (
+            next(stream)
+            == (f"id: {buffer.epoch}:0\nevent: reset\ndata: {{}}\n\n").encode()
+        )
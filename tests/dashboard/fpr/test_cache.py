@@ -0,0 +1,125 @@
+import pytest
+import pytest_django
+from fpr import cache
+from fpr import models
+from main import models as main_models
+
+
+@pytest.fixture
+def rule_cache() -> cache.RuleCache:
+    return cache.RuleCache()
+
+
+@pytest.fixture
+def format_version() -> models.FormatVersion:
+    format = models.Format.objects.create(description="Format")
+
+    return models.FormatVersion.objects.create(
+        format=format, description="Format version", pronom_id="fmt/test"
+    )
+
+
+@pytest.fixture
+def fprule(format_version: models.FormatVersion) -> models.FPRule:
+    command = models.FPCommand.objects.create(description="Command")
+
+    return models.FPRule.objects.create(
+        command=command, format=format_version, purpose=models.FPRule.ACCESS
+    )
+
+
+@pytest.mark.django_db
+def test_saving_fpr_models_bumps_the_revision(
+    format_version: models.FormatVersion,
+) -> None:
+    revision = cache.get_revision()
+
+    format_version.save()
+
+    assert cache.get_revision() != revision
+
+
+@pytest.mark.django_db
+def test_rule_cache_indexes_active_rules(
+    rule_cache: cache.RuleCache,
+    format_version: models.FormatVersion,
+    fprule: models.FPRule,
+) -> None:
+    models.FPRule.objects.create(
+        command=fprule.command,
+        format=format_version,
+        purpose=models.FPRule.ACCESS,
+        enabled=False,
+    )
+
+    assert rule_cache.filter_fprules(format_version, models.FPRule.ACCESS) == (fprule,)
+    assert rule_cache.get_fprule(format_version.uuid, models.FPRule.ACCESS) == fprule
+    assert rule_cache.filter_fprules(format_version, models.FPRule.THUMBNAIL) == ()
+    assert (
+        rule_cache.get_format_version_by_pronom_id(format_version.pronom_id)
+        == format_version
+    )
+
+
+@pytest.mark.django_db
+def test_rule_cache_mimics_queryset_get(
+    rule_cache: cache.RuleCache,
+    format_version: models.FormatVersion,
+    fprule: models.FPRule,
+) -> None:
+    with pytest.raises(models.FPRule.DoesNotExist):
+        rule_cache.get_fprule(format_version, models.FPRule.THUMBNAIL)
+
+    models.FPRule.objects.create(
+        command=fprule.command, format=format_version, purpose=models.FPRule.ACCESS
+    )
+
+    rule_cache.refresh()
+    with pytest.raises(models.FPRule.MultipleObjectsReturned):
+        rule_cache.get_fprule(format_version, models.FPRule.ACCESS)
+
+
+@pytest.mark.django_db
+def test_rule_cache_reloads_when_the_revision_changes(
+    rule_cache: cache.RuleCache,
+    format_version: models.FormatVersion,
+    fprule: models.FPRule,
+    django_assert_num_queries: pytest_django.DjangoAssertNumQueries,
+) -> None:
+    rule_cache.refresh()
+
+    # Only the revision is queried if the FPR has not changed.
+    with django_assert_num_queries(1):
+        rule_cache.refresh()
+
+    fprule.enabled = False
+    fprule.save()
+
+    rule_cache.refresh()
+    assert rule_cache.filter_fprules(format_version, models.FPRule.ACCESS) == ()
+
+
+@pytest.mark.django_db
+def test_rule_cache_gets_format_versions_for_many_files(
+    rule_cache: cache.RuleCache,
+    format_version: models.FormatVersion,
+    django_assert_num_queries: pytest_django.DjangoAssertNumQueries,
+) -> None:
+    identified, unidentified = (
+        main_models.File.objects.create(currentlocation=b"%SIPDirectory%a"),
+        main_models.File.objects.create(currentlocation=b"%SIPDirectory%b"),
+    )
+    main_models.FileFormatVersion.objects.create(
+        file_uuid=identified, format_version=format_version
+    )
+    rule_cache.refresh()
+
+    with django_assert_num_queries(1):
+        format_versions = rule_cache.get_format_versions_for_files(
+            [identified.uuid, unidentified.uuid]
+        )
+
+    assert format_versions == {str(identified.uuid): (format_version,)}
+    assert rule_cache.get_format_version_for_file(identified.uuid) == format_version
+    with pytest.raises(models.FormatVersion.DoesNotExist):
+        rule_cache.get_format_version_for_file(unidentified.uuid)
@@ -0,0 +1,119 @@
+import uuid
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from elasticsearch import ElasticsearchException
+
+COMMAND = "main.management.commands.rebuild_aip_index_from_storage_service"
+
+METS = """<?xml version="1.0" encoding="UTF-8"?>
+<mets:mets xmlns:mets="http://www.loc.gov/METS/">
+  <mets:fileSec>
+    <mets:fileGrp USE="original">
+      <mets:file ID="file-1"/>
+      <mets:file ID="file-2"/>
+    </mets:fileGrp>
+    <mets:fileGrp USE="metadata">
+      <mets:file ID="file-3"/>
+    </mets:fileGrp>
+  </mets:fileSec>
+</mets:mets>
+"""
+
+
+def _package(package_uuid):
+    return {
+        "uuid": package_uuid,
+        "package_type": "AIP",
+        "current_path": f"aip-{package_uuid}.7z",
+        "current_full_path": f"/var/aips/aip-{package_uuid}.7z",
+        "current_location": "/api/v2/location/loc/",
+        "size": 1024,
+    }
+
+
+def _extract_file(uuid, relative_path, save_path):
+    with open(save_path, "w") as f:
+        f.write(METS)
+
+
+@pytest.fixture
+def packages():
+    return [_package(str(uuid.uuid4())) for _ in range(3)]
+
+
+@pytest.fixture
+def storage_service(packages):
+    with mock.patch(
+        f"{COMMAND}.storageService.get_file_info", return_value=packages
+    ), mock.patch(
+        f"{COMMAND}.storageService.filter_packages", return_value=packages
+    ), mock.patch(
+        f"{COMMAND}.storageService.extract_file", side_effect=_extract_file
+    ), mock.patch(
+        f"{COMMAND}.storageService.retrieve_storage_location_description",
+        return_value="Store AIPs",
+    ):
+        yield
+
+
+@pytest.fixture
+def es_client():
+    with mock.patch(
+        f"{COMMAND}.setup_es_for_aip_reindexing", return_value=mock.sentinel.client
+    ):
+        yield mock.sentinel.client
+
+
+@pytest.mark.django_db
+def test_rebuild_indexes_packages_and_reports_throughput(
+    storage_service, es_client, packages, capsys
+):
+    with mock.patch(f"{COMMAND}.es.index_aip_and_files") as index_aip_and_files:
+        call_command("rebuild_aip_index_from_storage_service", "--workers", "2")
+
+    indexed = {call.kwargs["uuid"] for call in index_aip_and_files.call_args_list}
+    assert indexed == {package["uuid"] for package in packages}
+    assert all(
+        call.kwargs["client"] is es_client
+        and call.kwargs["mets"] is not None
+        and call.kwargs["location"] == "Store AIPs"
+        for call in index_aip_and_files.call_args_list
+    )
+
+    output = capsys.readouterr().out
+    assert "Processed 3 of 3 AIPs/AICs (0 failed)" in output
+    assert "AIPs/s" in output
+    assert "files/s" in output
+    assert "Indexing complete. Successfully indexed 3 AIPs/AICs." in output
+
+
+@pytest.mark.django_db
+def test_rebuild_resumes_from_checkpoint(
+    storage_service, es_client, packages, tmp_path, capsys
+):
+    checkpoint = tmp_path / "checkpoint.txt"
+    checkpoint.write_text(packages[0]["uuid"] + "\n")
+
+    def index_aip_and_files(**kwargs):
+        if kwargs["uuid"] == packages[1]["uuid"]:
+            raise ElasticsearchException("Index error")
+
+    with mock.patch(
+        f"{COMMAND}.es.index_aip_and_files", side_effect=index_aip_and_files
+    ) as index_aip_and_files:
+        call_command(
+            "rebuild_aip_index_from_storage_service", "--checkpoint", str(checkpoint)
+        )
+
+    indexed = {call.kwargs["uuid"] for call in index_aip_and_files.call_args_list}
+    assert indexed == {packages[1]["uuid"], packages[2]["uuid"]}
+
+    # Only the packages indexed successfully are added to the checkpoint.
+    assert checkpoint.read_text().split() == [packages[0]["uuid"], packages[2]["uuid"]]
+
+    output = capsys.readouterr().out
+    assert "Skipping 1 AIPs/AICs already indexed" in output
+    assert f"Error indexing package {packages[1]['uuid']}" in output
+    assert "Indexed 2 of 3 AIPs/AICs" in output
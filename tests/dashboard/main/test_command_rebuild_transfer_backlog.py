@@ -0,0 +1,195 @@
+import pathlib
+import types
+import uuid
+from unittest import mock
+
+import metsrw
+import pytest
+from fpr import models as fprmodels
+from main import models
+from main.management.commands import rebuild_transfer_backlog
+
+THIS_DIR = pathlib.Path(__file__).parent
+METS_PATH = THIS_DIR / "fixtures" / "transfer_mets.xml"
+
+FILE_1_UUID = "d39a1f38-7c4c-4a15-9fab-6f5f6d2ef6a9"
+FILE_2_UUID = "8f3e1d2c-5b6a-4c7d-9e8f-0a1b2c3d4e5f"
+
+
+@pytest.fixture
+def transfer_dir(tmp_path):
+    transfer_uuid = str(uuid.uuid4())
+    path = tmp_path / f"transfer-{transfer_uuid}"
+    mets_dir = path / "metadata" / "submissionDocumentation"
+    mets_dir.mkdir(parents=True)
+    (mets_dir / "METS.xml").write_bytes(METS_PATH.read_bytes())
+    return path
+
+
+@pytest.fixture
+def format_version(db):
+    format = fprmodels.Format.objects.create(description="Plain Text File")
+    return fprmodels.FormatVersion.objects.create(
+        format=format, description="Plain Text File", pronom_id="fmt/test"
+    )
+
+
+@pytest.fixture
+def agent(db):
+    return models.Agent.objects.create(
+        identifiertype="preservation system",
+        identifiervalue="Archivematica-1.16",
+        name="Archivematica",
+        agenttype="software",
+    )
+
+
+def test_iter_transfer_mets_matches_metsrw():
+    accession_id, mets_files = rebuild_transfer_backlog._iter_transfer_mets(
+        str(METS_PATH)
+    )
+    mets_files = {mets_file.file_uuid: mets_file for mets_file in mets_files}
+
+    assert accession_id == "2024-001"
+    mets = metsrw.METSDocument.fromfile(str(METS_PATH))
+    for fsentry in mets.all_files():
+        if fsentry.type == "Directory":
+            continue
+        mets_file = mets_files.pop(fsentry.file_uuid)
+        assert mets_file.path == fsentry.path
+        assert [event.event_identifier_value for event in mets_file.premis_events] == [
+            event.event_identifier_value for event in fsentry.get_premis_events()
+        ]
+        assert [obj.message_digest for obj in mets_file.premis_objects] == [
+            obj.message_digest for obj in fsentry.get_premis_objects()
+        ]
+        assert mets_file.premis_rights == []
+    assert mets_files == {}
+
+
+@pytest.mark.django_db
+def test_import_self_describing_transfer_creates_rows_in_bulk(
+    transfer_dir, format_version, agent, django_assert_max_num_queries
+):
+    transfer_uuid = transfer_dir.name[-36:]
+    cmd = mock.Mock()
+
+    with mock.patch(
+        "elasticSearchFunctions.index_transfer_and_files"
+    ) as index_transfer_and_files, django_assert_max_num_queries(20):
+        rebuild_transfer_backlog._import_self_describing_transfer(
+            cmd, mock.sentinel.es_client, None, transfer_dir, transfer_uuid, 1024
+        )
+
+    cmd.warning.assert_not_called()
+    index_transfer_and_files.assert_called_once()
+
+    transfer = models.Transfer.objects.get(uuid=transfer_uuid)
+    assert transfer.accessionid == "2024-001"
+
+    file_1 = models.File.objects.get(uuid=FILE_1_UUID)
+    assert file_1.transfer == transfer
+    assert file_1.currentlocation == b"%transferDirectory%objects/dir/file1.txt"
+    assert file_1.checksumtype == "sha256"
+    assert file_1.size == 12
+    assert (
+        models.FileFormatVersion.objects.get(file_uuid=file_1).format_version
+        == format_version
+    )
+    assert file_1.fileid_set.get().format_registry_key == "fmt/test"
+    assert sorted(file_1.event_set.values_list("event_type", flat=True)) == [
+        "ingestion",
+        "ingestion",
+        "message digest calculation",
+        "registration",
+    ]
+    event = file_1.event_set.get(event_id="4b5e8c1a-3f0d-4b27-8a8a-1a1f2a1c6b02")
+    assert event.event_outcome_detail == (
+        "d2a84f4b8b650937ec8f73cd8be2c74add5a911ba64df27458ed8229da804a26"
+    )
+    assert list(event.agents.all()) == [agent]
+
+    file_2 = models.File.objects.get(uuid=FILE_2_UUID)
+    assert file_2.currentlocation == b"%transferDirectory%objects/file 2.txt"
+    assert not models.FileFormatVersion.objects.filter(file_uuid=file_2).exists()
+
+
+@pytest.mark.django_db
+def test_import_self_describing_transfer_skips_known_transfers(transfer_dir):
+    transfer_uuid = transfer_dir.name[-36:]
+    models.Transfer.objects.create(uuid=transfer_uuid)
+
+    with mock.patch("elasticSearchFunctions.index_transfer_and_files"):
+        rebuild_transfer_backlog._import_self_describing_transfer(
+            mock.Mock(), mock.sentinel.es_client, None, transfer_dir, transfer_uuid, 0
+        )
+
+    assert not models.File.objects.filter(transfer_id=transfer_uuid).exists()
+
+
+def _premis_event(event_identifier_value, event_type="ingestion"):
+    return types.SimpleNamespace(
+        event_identifier_value=event_identifier_value,
+        event_type=event_type,
+        event_date_time="2024-01-01T00:00:00",
+        premis_version="3.0",
+        event_detail_information__event_detail="",
+        event_detail="",
+    )
+
+
+def _mets_file(file_uuid, *premis_events):
+    return rebuild_transfer_backlog.MetsFile(
+        file_uuid, f"objects/{file_uuid}.txt", [], list(premis_events), []
+    )
+
+
+@pytest.mark.django_db
+def test_transfer_rows_rejects_files_with_invalid_event_identifiers():
+    transfer = models.Transfer.objects.create(uuid=uuid.uuid4())
+    rows = rebuild_transfer_backlog.TransferRows(transfer, on_error=mock.Mock())
+    event_id = str(uuid.uuid4())
+
+    with pytest.raises(ValueError, match="Invalid event identifier"):
+        rows.add(_mets_file(str(uuid.uuid4()), _premis_event("not-a-uuid")))
+    rows.add(_mets_file(FILE_1_UUID, _premis_event(event_id.upper())))
+    with pytest.raises(ValueError, match="Duplicated event identifier"):
+        rows.add(_mets_file(FILE_2_UUID, _premis_event(event_id)))
+    rows.flush()
+
+    rows.on_error.assert_not_called()
+    assert list(
+        models.File.objects.filter(transfer=transfer).values_list("uuid", flat=True)
+    ) == [uuid.UUID(FILE_1_UUID)]
+    assert models.Event.objects.get(event_id=event_id).file_uuid_id == uuid.UUID(
+        FILE_1_UUID
+    )
+
+
+@pytest.mark.django_db
+def test_transfer_rows_inserts_files_one_by_one_if_the_batch_fails():
+    transfer = models.Transfer.objects.create(uuid=uuid.uuid4())
+    # The event identifier of the second file is already taken.
+    event_id = str(uuid.uuid4())
+    models.Event.objects.create(event_id=event_id)
+    rows = rebuild_transfer_backlog.TransferRows(
+        transfer, on_error=mock.Mock(), batch_size=3
+    )
+    file_uuids = [str(uuid.uuid4()) for _ in range(4)]
+
+    rows.add(_mets_file(file_uuids[0]))
+    rows.add(_mets_file(file_uuids[1], _premis_event(event_id)))
+    rows.add(_mets_file(file_uuids[2]))
+
+    assert rows.on_error.mock_calls == [mock.call(file_uuids[1], mock.ANY)]
+
+    rows.add(_mets_file(file_uuids[3]))
+    rows.flush()
+
+    assert rows.on_error.call_count == 1
+    assert sorted(
+        str(file_uuid)
+        for file_uuid in models.File.objects.filter(transfer=transfer).values_list(
+            "uuid", flat=True
+        )
+    ) == sorted(file_uuids[:1] + file_uuids[2:])
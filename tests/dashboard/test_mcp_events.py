@@ -0,0 +1,57 @@
+from contrib.mcp import events
+
+
+def test_status_event_buffer_follows_mcpserver_events():
+    cursors = []
+    responses = iter(
+        [
+            {"events": [{"unit": "1"}], "cursor": "a", "reset": False},
+            {"events": [{"unit": "2"}, {"unit": "3"}], "cursor": "b", "reset": False},
+            {"events": [], "cursor": "c", "reset": True},
+        ]
+    )
+
+    def fetch_events(cursor):
+        cursors.append(cursor)
+        return next(responses)
+
+    buffer = events.StatusEventBuffer(fetch_events=fetch_events)
+    cursor = buffer.get_cursor()
+
+    buffer.poll()
+    buffer.poll()
+    result, cursor = buffer.read(cursor)
+
+    assert [event["data"] for event in result] == [
+        {"unit": "1"},
+        {"unit": "2"},
+        {"unit": "3"},
+    ]
+    assert {event["type"] for event in result} == {events.CHANGE_EVENT}
+    assert buffer.read(cursor) == ([], cursor)
+
+    buffer.poll()
+    result, cursor = buffer.read(cursor)
+
+    assert [event["type"] for event in result] == [events.RESET_EVENT]
+    assert cursors[:3] == [None, "a", "b"]
+
+
+def test_status_event_buffer_resets_readers_that_missed_events():
+    buffer = events.StatusEventBuffer(
+        fetch_events=lambda cursor: {
+            "events": [{"unit": "1"}, {"unit": "2"}],
+            "cursor": cursor,
+            "reset": False,
+        },
+        max_events=2,
+    )
+    cursor = buffer.get_cursor()
+    buffer.poll()
+    buffer.poll()
+
+    result, new_cursor = buffer.read(cursor)
+
+    assert [event["type"] for event in result] == [events.RESET_EVENT]
+    assert buffer.read(new_cursor) == ([], new_cursor)
+    assert buffer.read("another-process:1")[0][0]["type"] == events.RESET_EVENT